@@ -0,0 +1,42 @@
+"""add_recebimento_pedido_compra
+
+Revision ID: 0d7e3b5a9f18
+Revises: f6b2d8a41c93
+Create Date: 2026-10-19 21:48:37.105526
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0d7e3b5a9f18'
+down_revision: Union[str, Sequence[str], None] = 'f6b2d8a41c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('itens_pedido_compra') as batch_op:
+        batch_op.add_column(sa.Column('quantidade_recebida', sa.Float(), server_default='0', nullable=True))
+
+    with op.batch_alter_table('pedidos_compra') as batch_op:
+        batch_op.add_column(sa.Column('data_recebimento', sa.DateTime(), nullable=True))
+
+    # Pedidos já marcados como recebidos antes do fluxo de recebimento
+    op.execute(
+        "UPDATE itens_pedido_compra SET quantidade_recebida = quantidade "
+        "WHERE pedido_id IN (SELECT id FROM pedidos_compra WHERE status = 'RECEBIDO')"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('pedidos_compra') as batch_op:
+        batch_op.drop_column('data_recebimento')
+
+    with op.batch_alter_table('itens_pedido_compra') as batch_op:
+        batch_op.drop_column('quantidade_recebida')
@@ -0,0 +1,57 @@
+"""add_aliquotas_tributarias
+
+Revision ID: 3f7b0e6c2d58
+Revises: 8a6f2c1d9e43
+Create Date: 2026-10-19 16:38:05.271940
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f7b0e6c2d58'
+down_revision: Union[str, Sequence[str], None] = '8a6f2c1d9e43'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'aliquotas_tributarias',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('ncm', sa.String(), nullable=True),
+        sa.Column('cfop', sa.String(), nullable=True),
+        sa.Column('uf', sa.String(length=2), nullable=True),
+        sa.Column('aliquota_icms', sa.Float(), nullable=True),
+        sa.Column('aliquota_ipi', sa.Float(), nullable=True),
+        sa.Column('aliquota_pis', sa.Float(), nullable=True),
+        sa.Column('aliquota_cofins', sa.Float(), nullable=True),
+        sa.Column('ativo', sa.Integer(), server_default='1', nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('ncm', 'cfop', 'uf', name='uk_aliquota_ncm_cfop_uf')
+    )
+    op.create_index('ix_aliquotas_tributarias_id', 'aliquotas_tributarias', ['id'])
+
+    with op.batch_alter_table('itens_nota_fiscal') as batch_op:
+        batch_op.add_column(sa.Column('aliquota_pis', sa.Float(), server_default='0', nullable=True))
+        batch_op.add_column(sa.Column('valor_pis', sa.Float(), server_default='0', nullable=True))
+        batch_op.add_column(sa.Column('aliquota_cofins', sa.Float(), server_default='0', nullable=True))
+        batch_op.add_column(sa.Column('valor_cofins', sa.Float(), server_default='0', nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('itens_nota_fiscal') as batch_op:
+        batch_op.drop_column('valor_cofins')
+        batch_op.drop_column('aliquota_cofins')
+        batch_op.drop_column('valor_pis')
+        batch_op.drop_column('aliquota_pis')
+
+    op.drop_index('ix_aliquotas_tributarias_id', table_name='aliquotas_tributarias')
+    op.drop_table('aliquotas_tributarias')
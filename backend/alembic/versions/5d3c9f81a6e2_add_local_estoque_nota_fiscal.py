@@ -0,0 +1,34 @@
+"""add_local_estoque_nota_fiscal
+
+Revision ID: 5d3c9f81a6e2
+Revises: e2a85c6b1f47
+Create Date: 2026-10-19 12:41:07.229813
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d3c9f81a6e2'
+down_revision: Union[str, Sequence[str], None] = 'e2a85c6b1f47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('notas_fiscais') as batch_op:
+        batch_op.add_column(sa.Column('local_estoque_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            'fk_notas_fiscais_local_estoque', 'locais_estoque', ['local_estoque_id'], ['id']
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('notas_fiscais') as batch_op:
+        batch_op.drop_constraint('fk_notas_fiscais_local_estoque', type_='foreignkey')
+        batch_op.drop_column('local_estoque_id')
@@ -0,0 +1,61 @@
+"""add_eventos_dominio
+
+Revision ID: 7c2e5a9f4b61
+Revises: d5a3e9b7c214
+Create Date: 2026-10-19 19:47:03.218964
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e5a9f4b61'
+down_revision: Union[str, Sequence[str], None] = 'd5a3e9b7c214'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'eventos_dominio',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tipo', sa.String(), nullable=False),
+        sa.Column('agregado', sa.String(), nullable=False),
+        sa.Column('agregado_id', sa.Integer(), nullable=False),
+        sa.Column('dados', sa.JSON(), nullable=True),
+        sa.Column('usuario_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_eventos_dominio_id', 'eventos_dominio', ['id'])
+    op.create_index('ix_eventos_dominio_tipo', 'eventos_dominio', ['tipo'])
+    op.create_index('ix_eventos_dominio_agregado', 'eventos_dominio', ['agregado', 'agregado_id'])
+
+    op.create_table(
+        'consumos_evento',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('consumidor', sa.String(), nullable=False),
+        sa.Column('evento_id', sa.Integer(), nullable=False),
+        sa.Column('concluido', sa.Integer(), server_default='0', nullable=True),
+        sa.Column('tentativas', sa.Integer(), server_default='0', nullable=True),
+        sa.Column('erro', sa.Text(), nullable=True),
+        sa.Column('processado_em', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['evento_id'], ['eventos_dominio.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('consumidor', 'evento_id', name='uk_consumo_evento')
+    )
+    op.create_index('ix_consumos_evento_id', 'consumos_evento', ['id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_consumos_evento_id', table_name='consumos_evento')
+    op.drop_table('consumos_evento')
+    op.drop_index('ix_eventos_dominio_agregado', table_name='eventos_dominio')
+    op.drop_index('ix_eventos_dominio_tipo', table_name='eventos_dominio')
+    op.drop_index('ix_eventos_dominio_id', table_name='eventos_dominio')
+    op.drop_table('eventos_dominio')
@@ -0,0 +1,32 @@
+"""add_indice_notas_fiscais_emissao_status
+
+Revision ID: 8a6f2c1d9e43
+Revises: 5d3c9f81a6e2
+Create Date: 2026-10-19 15:02:17.846213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a6f2c1d9e43'
+down_revision: Union[str, Sequence[str], None] = '5d3c9f81a6e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_notas_fiscais_emissao_status',
+        'notas_fiscais',
+        ['data_emissao', 'status']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_notas_fiscais_emissao_status', table_name='notas_fiscais')
@@ -0,0 +1,38 @@
+"""add_indices_estatisticas_locais
+
+Revision ID: 9b1e4d2a7c30
+Revises: 683c4ca3ec71
+Create Date: 2026-10-19 09:12:41.305118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b1e4d2a7c30'
+down_revision: Union[str, Sequence[str], None] = '683c4ca3ec71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_estoque_por_local_local_quantidade',
+        'estoque_por_local',
+        ['local_id', 'quantidade']
+    )
+    op.create_index(
+        'ix_movimentos_estoque_origem_tipo_data',
+        'movimentos_estoque',
+        ['local_origem_id', 'tipo_movimento', 'data_movimento']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_movimentos_estoque_origem_tipo_data', table_name='movimentos_estoque')
+    op.drop_index('ix_estoque_por_local_local_quantidade', table_name='estoque_por_local')
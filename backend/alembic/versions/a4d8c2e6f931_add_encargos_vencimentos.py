@@ -0,0 +1,39 @@
+"""add_encargos_vencimentos
+
+Revision ID: a4d8c2e6f931
+Revises: e9c3f7a1b248
+Create Date: 2026-10-19 23:12:05.418276
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d8c2e6f931'
+down_revision: Union[str, Sequence[str], None] = 'e9c3f7a1b248'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABELAS = ('contas_pagar', 'contas_receber', 'parcelas_conta_pagar', 'parcelas_conta_receber')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for tabela in TABELAS:
+        with op.batch_alter_table(tabela) as batch_op:
+            batch_op.add_column(sa.Column('multa_apurada', sa.Float(), server_default='0', nullable=True))
+            batch_op.add_column(sa.Column('juros_mora_apurados', sa.Float(), server_default='0', nullable=True))
+            batch_op.add_column(sa.Column('data_apuracao_encargos', sa.Date(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for tabela in reversed(TABELAS):
+        with op.batch_alter_table(tabela) as batch_op:
+            batch_op.drop_column('data_apuracao_encargos')
+            batch_op.drop_column('juros_mora_apurados')
+            batch_op.drop_column('multa_apurada')
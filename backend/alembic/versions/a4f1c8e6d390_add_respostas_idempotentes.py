@@ -0,0 +1,46 @@
+"""add_respostas_idempotentes
+
+Revision ID: a4f1c8e6d390
+Revises: 7c2e5a9f4b61
+Create Date: 2026-10-19 20:21:45.671203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4f1c8e6d390'
+down_revision: Union[str, Sequence[str], None] = '7c2e5a9f4b61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'respostas_idempotentes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('usuario', sa.String(), nullable=False),
+        sa.Column('chave', sa.String(), nullable=False),
+        sa.Column('impressao', sa.String(length=64), nullable=False),
+        sa.Column('status_code', sa.Integer(), nullable=True),
+        sa.Column('tipo_conteudo', sa.String(), nullable=True),
+        sa.Column('corpo', sa.LargeBinary(), nullable=True),
+        sa.Column('concluida', sa.Integer(), server_default='0', nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.Column('expira_em', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('usuario', 'chave', name='uk_resposta_idempotente')
+    )
+    op.create_index('ix_respostas_idempotentes_id', 'respostas_idempotentes', ['id'])
+    op.create_index('ix_respostas_idempotentes_expira_em', 'respostas_idempotentes', ['expira_em'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_respostas_idempotentes_expira_em', table_name='respostas_idempotentes')
+    op.drop_index('ix_respostas_idempotentes_id', table_name='respostas_idempotentes')
+    op.drop_table('respostas_idempotentes')
@@ -0,0 +1,30 @@
+"""add_xml_nfe_nota_fiscal
+
+Revision ID: b18d4e7a9c05
+Revises: 3f7b0e6c2d58
+Create Date: 2026-10-19 18:11:42.530716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b18d4e7a9c05'
+down_revision: Union[str, Sequence[str], None] = '3f7b0e6c2d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('notas_fiscais') as batch_op:
+        batch_op.add_column(sa.Column('xml_nfe', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('notas_fiscais') as batch_op:
+        batch_op.drop_column('xml_nfe')
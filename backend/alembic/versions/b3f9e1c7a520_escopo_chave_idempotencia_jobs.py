@@ -0,0 +1,54 @@
+"""escopo_chave_idempotencia_jobs
+
+Revision ID: b3f9e1c7a520
+Revises: a4d8c2e6f931
+Create Date: 2026-10-19 23:48:31.207915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f9e1c7a520'
+down_revision: Union[str, Sequence[str], None] = 'a4d8c2e6f931'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Nome da unicidade antiga quando o banco não a nomeou (SQLite)
+CONVENCAO = {"uq": "uq_%(table_name)s_%(column_0_name)s"}
+
+
+def _unicidade_global(bind) -> Union[str, None, bool]:
+    """Nome da unicidade só em chave_idempotencia (None = sem nome, False = não existe)"""
+    for constraint in sa.inspect(bind).get_unique_constraints('jobs'):
+        if constraint['column_names'] == ['chave_idempotencia']:
+            return constraint['name']
+    return False
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    nome = _unicidade_global(op.get_bind())
+    if nome is not False:
+        with op.batch_alter_table('jobs', naming_convention=CONVENCAO) as batch_op:
+            batch_op.drop_constraint(nome or 'uq_jobs_chave_idempotencia', type_='unique')
+    
+    op.create_index(
+        'uk_jobs_usuario_chave', 'jobs', ['usuario_id', 'tipo', 'chave_idempotencia'], unique=True
+    )
+    op.create_index(
+        'uk_jobs_sistema_chave', 'jobs', ['tipo', 'chave_idempotencia'], unique=True,
+        sqlite_where=sa.text('usuario_id IS NULL'), postgresql_where=sa.text('usuario_id IS NULL')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uk_jobs_sistema_chave', table_name='jobs')
+    op.drop_index('uk_jobs_usuario_chave', table_name='jobs')
+    with op.batch_alter_table('jobs', naming_convention=CONVENCAO) as batch_op:
+        batch_op.create_unique_constraint('uq_jobs_chave_idempotencia', ['chave_idempotencia'])
@@ -0,0 +1,65 @@
+"""add_exposicao_credito
+
+Revision ID: b7e4a2c9d615
+Revises: 0d7e3b5a9f18
+Create Date: 2026-10-19 23:12:05.418307
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4a2c9d615'
+down_revision: Union[str, Sequence[str], None] = '0d7e3b5a9f18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BACKFILL = """
+INSERT INTO exposicao_credito (cliente_id, receber_aberto, pedidos_aprovados)
+SELECT c.id, COALESCE(t.aberto, 0), COALESCE(p.aprovados, 0)
+FROM clientes c
+LEFT JOIN (
+    SELECT cliente_id,
+           SUM(CASE WHEN valor_original + COALESCE(juros, 0) - COALESCE(desconto, 0) - COALESCE(valor_recebido, 0) > 0
+                    THEN valor_original + COALESCE(juros, 0) - COALESCE(desconto, 0) - COALESCE(valor_recebido, 0)
+                    ELSE 0 END) AS aberto
+    FROM contas_receber
+    WHERE status <> 'PAGO'
+    GROUP BY cliente_id
+) t ON t.cliente_id = c.id
+LEFT JOIN (
+    SELECT cliente_id, SUM(valor_total) AS aprovados
+    FROM pedidos_venda
+    WHERE status = 'aprovado'
+    GROUP BY cliente_id
+) p ON p.cliente_id = c.id
+WHERE t.cliente_id IS NOT NULL OR p.cliente_id IS NOT NULL
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'exposicao_credito',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cliente_id', sa.Integer(), nullable=False),
+        sa.Column('receber_aberto', sa.Float(), server_default='0', nullable=False),
+        sa.Column('pedidos_aprovados', sa.Float(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.ForeignKeyConstraint(['cliente_id'], ['clientes.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('cliente_id', name='uk_exposicao_credito_cliente')
+    )
+    op.create_index('ix_exposicao_credito_id', 'exposicao_credito', ['id'])
+
+    op.execute(BACKFILL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_exposicao_credito_id', table_name='exposicao_credito')
+    op.drop_table('exposicao_credito')
@@ -0,0 +1,79 @@
+"""unique_estoque_por_local
+
+Revision ID: c47f0a9e5d12
+Revises: 9b1e4d2a7c30
+Create Date: 2026-10-19 10:03:18.552907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47f0a9e5d12'
+down_revision: Union[str, Sequence[str], None] = '9b1e4d2a7c30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _possui_unicidade(bind) -> bool:
+    """Verifica se (material_id, local_id) já é único (constraint ou índice)"""
+    inspector = sa.inspect(bind)
+    colunas = {'material_id', 'local_id'}
+    
+    for constraint in inspector.get_unique_constraints('estoque_por_local'):
+        if set(constraint['column_names']) == colunas:
+            return True
+    
+    for indice in inspector.get_indexes('estoque_por_local'):
+        if indice.get('unique') and set(indice['column_names']) == colunas:
+            return True
+    
+    return False
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if _possui_unicidade(bind):
+        return
+    
+    # Consolidar registros duplicados no de menor id antes de criar o índice
+    op.execute("""
+        UPDATE estoque_por_local
+        SET quantidade = (
+            SELECT SUM(COALESCE(e2.quantidade, 0))
+            FROM estoque_por_local e2
+            WHERE e2.material_id = estoque_por_local.material_id
+              AND e2.local_id = estoque_por_local.local_id
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM estoque_por_local
+            GROUP BY material_id, local_id
+            HAVING COUNT(*) > 1
+        )
+    """)
+    op.execute("""
+        DELETE FROM estoque_por_local
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM estoque_por_local
+            GROUP BY material_id, local_id
+        )
+    """)
+    
+    op.create_index(
+        'uk_material_local',
+        'estoque_por_local',
+        ['material_id', 'local_id'],
+        unique=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    indices = {i['name'] for i in sa.inspect(bind).get_indexes('estoque_por_local')}
+    if 'uk_material_local' in indices:
+        op.drop_index('uk_material_local', table_name='estoque_por_local')
@@ -0,0 +1,55 @@
+"""add_jobs
+
+Revision ID: d5a3e9b7c214
+Revises: b18d4e7a9c05
+Create Date: 2026-10-19 19:02:17.845310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a3e9b7c214'
+down_revision: Union[str, Sequence[str], None] = 'b18d4e7a9c05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tipo', sa.String(), nullable=False),
+        sa.Column('status', sa.Enum('PENDENTE', 'EXECUTANDO', 'CONCLUIDO', 'FALHOU', 'CANCELADO', name='statusjob'), nullable=False),
+        sa.Column('parametros', sa.JSON(), nullable=True),
+        sa.Column('resultado', sa.JSON(), nullable=True),
+        sa.Column('erro', sa.Text(), nullable=True),
+        sa.Column('progresso', sa.Float(), server_default='0', nullable=True),
+        sa.Column('mensagem', sa.String(), nullable=True),
+        sa.Column('tentativas', sa.Integer(), server_default='0', nullable=True),
+        sa.Column('max_tentativas', sa.Integer(), server_default='3', nullable=True),
+        sa.Column('disponivel_em', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.Column('chave_idempotencia', sa.String(), nullable=True),
+        sa.Column('worker', sa.String(), nullable=True),
+        sa.Column('usuario_id', sa.Integer(), nullable=True),
+        sa.Column('iniciado_em', sa.DateTime(), nullable=True),
+        sa.Column('concluido_em', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('chave_idempotencia')
+    )
+    op.create_index('ix_jobs_id', 'jobs', ['id'])
+    op.create_index('ix_jobs_status_disponivel', 'jobs', ['status', 'disponivel_em'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_jobs_status_disponivel', table_name='jobs')
+    op.drop_index('ix_jobs_id', table_name='jobs')
+    op.drop_table('jobs')
+    sa.Enum(name='statusjob').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,51 @@
+"""add_estoque_reservado
+
+Revision ID: e2a85c6b1f47
+Revises: c47f0a9e5d12
+Create Date: 2026-10-19 11:20:54.817342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a85c6b1f47'
+down_revision: Union[str, Sequence[str], None] = 'c47f0a9e5d12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'estoque_reservado',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('material_id', sa.Integer(), nullable=False),
+        sa.Column('local_id', sa.Integer(), nullable=False),
+        sa.Column('quantidade', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.ForeignKeyConstraint(['material_id'], ['materiais.id'], ),
+        sa.ForeignKeyConstraint(['local_id'], ['locais_estoque.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('material_id', 'local_id', name='uk_reserva_material_local')
+    )
+    op.create_index('ix_estoque_reservado_id', 'estoque_reservado', ['id'])
+
+    with op.batch_alter_table('pedidos_venda') as batch_op:
+        batch_op.add_column(sa.Column('local_reserva_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            'fk_pedidos_venda_local_reserva', 'locais_estoque', ['local_reserva_id'], ['id']
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('pedidos_venda') as batch_op:
+        batch_op.drop_constraint('fk_pedidos_venda_local_reserva', type_='foreignkey')
+        batch_op.drop_column('local_reserva_id')
+
+    op.drop_index('ix_estoque_reservado_id', table_name='estoque_reservado')
+    op.drop_table('estoque_reservado')
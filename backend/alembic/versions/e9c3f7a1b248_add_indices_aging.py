@@ -0,0 +1,29 @@
+"""add_indices_aging
+
+Revision ID: e9c3f7a1b248
+Revises: b7e4a2c9d615
+Create Date: 2026-10-19 23:58:41.260914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9c3f7a1b248'
+down_revision: Union[str, Sequence[str], None] = 'b7e4a2c9d615'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_parcelas_conta_receber_conta', 'parcelas_conta_receber', ['conta_receber_id'])
+    op.create_index('ix_parcelas_conta_pagar_conta', 'parcelas_conta_pagar', ['conta_pagar_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_parcelas_conta_pagar_conta', table_name='parcelas_conta_pagar')
+    op.drop_index('ix_parcelas_conta_receber_conta', table_name='parcelas_conta_receber')
@@ -0,0 +1,50 @@
+"""add_historico_precos
+
+Revision ID: f6b2d8a41c93
+Revises: a4f1c8e6d390
+Create Date: 2026-10-19 21:05:12.384901
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6b2d8a41c93'
+down_revision: Union[str, Sequence[str], None] = 'a4f1c8e6d390'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'historico_precos',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('material_id', sa.Integer(), nullable=False),
+        sa.Column('fornecedor_id', sa.Integer(), nullable=False),
+        sa.Column('ultimo_preco', sa.Float(), nullable=False),
+        sa.Column('preco_minimo', sa.Float(), nullable=False),
+        sa.Column('preco_maximo', sa.Float(), nullable=False),
+        sa.Column('soma_precos', sa.Float(), server_default='0', nullable=False),
+        sa.Column('observacoes', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('media_movel', sa.Float(), nullable=False),
+        sa.Column('ultima_origem', sa.String(), nullable=True),
+        sa.Column('data_ultimo_preco', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.ForeignKeyConstraint(['material_id'], ['materiais.id']),
+        sa.ForeignKeyConstraint(['fornecedor_id'], ['fornecedores.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('material_id', 'fornecedor_id', name='uk_historico_preco_material_fornecedor')
+    )
+    op.create_index('ix_historico_precos_id', 'historico_precos', ['id'])
+    op.create_index('ix_historico_precos_fornecedor', 'historico_precos', ['fornecedor_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_historico_precos_fornecedor', table_name='historico_precos')
+    op.drop_index('ix_historico_precos_id', table_name='historico_precos')
+    op.drop_table('historico_precos')
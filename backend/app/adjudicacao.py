@@ -0,0 +1,234 @@
+"""
+Adjudicação por item das cotações.
+
+O mapa de preços item x fornecedor vem de uma única agregação (menor preço
+de cada fornecedor por item, já filtrado pelo prazo máximo). Sobre ele:
+
+- adjudicação livre: cada item vai para o fornecedor mais barato (ótimo)
+- com limite de fornecedores: busca exaustiva entre as combinações quando
+  elas são poucas e, acima de LIMITE_COMBINACOES, escolha gulosa seguida de
+  trocas enquanto houver melhora
+- referência: melhor fornecedor único que cote todos os itens
+
+Os custos ficam em colunas (uma lista por fornecedor) e o custo de um
+conjunto de fornecedores é sum(map(min, zip(*colunas))), sem laços Python
+por célula.
+"""
+import math
+from itertools import combinations
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models_modules import Fornecedor, ItemCotacao, ItemRespostaFornecedor, RespostaFornecedor
+
+
+LIMITE_COMBINACOES = 2000
+
+INFINITO = math.inf
+
+
+class AdjudicacaoInviavel(ValueError):
+    """Nenhuma combinação permitida de fornecedores cobre todos os itens cotados"""
+
+
+def _consultar_itens(session: Session, cotacao_id: int):
+    stmt = select(
+        ItemCotacao.id, ItemCotacao.descricao, ItemCotacao.quantidade, ItemCotacao.unidade
+    ).where(ItemCotacao.cotacao_id == cotacao_id).order_by(ItemCotacao.id)
+    return session.execute(stmt).all()
+
+
+def _consultar_precos(session: Session, cotacao_id: int, prazo_maximo_dias: Optional[int]):
+    """Menor preço unitário de cada fornecedor por item (respostas dentro do prazo)"""
+    stmt = select(
+        ItemRespostaFornecedor.item_cotacao_id,
+        RespostaFornecedor.fornecedor_id,
+        Fornecedor.nome.label("fornecedor_nome"),
+        func.min(RespostaFornecedor.prazo_entrega_dias).label("prazo_entrega_dias"),
+        func.min(ItemRespostaFornecedor.preco_unitario).label("preco_unitario")
+    ).join(
+        RespostaFornecedor, RespostaFornecedor.id == ItemRespostaFornecedor.resposta_id
+    ).join(
+        Fornecedor, Fornecedor.id == RespostaFornecedor.fornecedor_id
+    ).where(
+        RespostaFornecedor.cotacao_id == cotacao_id
+    ).group_by(
+        ItemRespostaFornecedor.item_cotacao_id, RespostaFornecedor.fornecedor_id, Fornecedor.nome
+    )
+
+    if prazo_maximo_dias is not None:
+        stmt = stmt.where(RespostaFornecedor.prazo_entrega_dias <= prazo_maximo_dias)
+
+    return session.execute(stmt).all()
+
+
+def _custo(colunas: Sequence[List[float]], conjunto: Sequence[int]) -> float:
+    """Custo total adjudicando cada item ao mais barato do conjunto (inf se algum item fica descoberto)"""
+    return sum(map(min, zip(*(colunas[j] for j in conjunto))))
+
+
+def _melhor_conjunto(colunas: List[List[float]], limite: int) -> Tuple[Tuple[int, ...], bool]:
+    """
+    Conjunto de até `limite` fornecedores com menor custo total
+
+    Returns:
+        (índices dos fornecedores, True se o resultado é comprovadamente ótimo)
+    """
+    n = len(colunas)
+    if math.comb(n, limite) <= LIMITE_COMBINACOES:
+        melhor = min(combinations(range(n), limite), key=lambda conjunto: _custo(colunas, conjunto))
+        return melhor, True
+
+    # Gulosa: adiciona quem mais reduz o custo (primeiro cobrindo os itens)
+    conjunto: List[int] = []
+    minimos = [INFINITO] * len(colunas[0])
+    for _ in range(limite):
+        def _avaliar(j: int) -> Tuple[int, float]:
+            novos = list(map(min, minimos, colunas[j]))
+            return (sum(1 for v in novos if v == INFINITO), sum(v for v in novos if v != INFINITO))
+
+        escolhido = min((j for j in range(n) if j not in conjunto), key=_avaliar)
+        conjunto.append(escolhido)
+        minimos = list(map(min, minimos, colunas[escolhido]))
+
+    # Troca um fornecedor de dentro por um de fora enquanto o custo cair
+    custo_atual = _custo(colunas, conjunto)
+    melhorou = True
+    while melhorou:
+        melhorou = False
+        for posicao in range(len(conjunto)):
+            for candidato in range(n):
+                if candidato in conjunto:
+                    continue
+                teste = conjunto[:posicao] + [candidato] + conjunto[posicao + 1:]
+                custo_teste = _custo(colunas, teste)
+                if custo_teste < custo_atual:
+                    conjunto, custo_atual, melhorou = teste, custo_teste, True
+
+    return tuple(sorted(conjunto)), False
+
+
+def calcular_adjudicacao(
+    session: Session,
+    cotacao_id: int,
+    prazo_maximo_dias: Optional[int] = None,
+    max_fornecedores: Optional[int] = None
+) -> dict:
+    """
+    Adjudicação de menor custo por item para uma cotação
+
+    Args:
+        prazo_maximo_dias: ignora respostas com prazo de entrega maior
+        max_fornecedores: limita quantos fornecedores podem ser vencedores
+
+    Returns:
+        dict com os itens adjudicados, o resumo por fornecedor, o melhor
+        fornecedor único e a economia em relação a ele
+
+    Raises:
+        AdjudicacaoInviavel: o limite de fornecedores não permite cobrir
+            todos os itens cotados
+    """
+    itens = _consultar_itens(session, cotacao_id)
+    precos = _consultar_precos(session, cotacao_id, prazo_maximo_dias)
+
+    fornecedores: Dict[int, dict] = {}
+    for p in precos:
+        fornecedores.setdefault(p.fornecedor_id, {
+            "fornecedor_id": p.fornecedor_id,
+            "fornecedor_nome": p.fornecedor_nome,
+            "prazo_entrega_dias": p.prazo_entrega_dias
+        })
+    ordem_fornecedores = sorted(fornecedores)
+    indice_fornecedor = {fornecedor_id: j for j, fornecedor_id in enumerate(ordem_fornecedores)}
+
+    cotados = {p.item_cotacao_id for p in precos}
+    itens_cotados = [item for item in itens if item.id in cotados]
+    itens_sem_cotacao = [
+        {"item_cotacao_id": item.id, "descricao": item.descricao}
+        for item in itens if item.id not in cotados
+    ]
+    indice_item = {item.id: i for i, item in enumerate(itens_cotados)}
+
+    # Matriz de custos (preço unitário x quantidade) guardada por coluna
+    unitarios = [[INFINITO] * len(itens_cotados) for _ in ordem_fornecedores]
+    for p in precos:
+        if p.item_cotacao_id in indice_item:
+            unitarios[indice_fornecedor[p.fornecedor_id]][indice_item[p.item_cotacao_id]] = p.preco_unitario
+    quantidades = [item.quantidade for item in itens_cotados]
+    colunas = [list(map(lambda preco, qtd: preco * qtd, coluna, quantidades)) for coluna in unitarios]
+
+    resultado = {
+        "parametros": {"prazo_maximo_dias": prazo_maximo_dias, "max_fornecedores": max_fornecedores},
+        "otimo": True,
+        "valor_total": 0.0,
+        "fornecedores": [],
+        "itens": [],
+        "itens_sem_cotacao": itens_sem_cotacao,
+        "melhor_fornecedor_unico": None,
+        "economia": None,
+        "economia_percentual": None
+    }
+    if not itens_cotados:
+        return resultado
+
+    # Referência: fornecedor único que cota todos os itens
+    totais_unicos = [sum(coluna) for coluna in colunas]
+    melhor_unico = min(range(len(colunas)), key=totais_unicos.__getitem__)
+    if totais_unicos[melhor_unico] != INFINITO:
+        resultado["melhor_fornecedor_unico"] = {
+            **fornecedores[ordem_fornecedores[melhor_unico]],
+            "valor_total": round(totais_unicos[melhor_unico], 2)
+        }
+
+    conjunto: Sequence[int] = range(len(colunas))
+    if max_fornecedores is not None:
+        # Fornecedores que a adjudicação livre usaria; se cabem no limite, ela já é a resposta
+        livres = {
+            coluna_min for coluna_min in (
+                min(range(len(colunas)), key=lambda j: colunas[j][i]) for i in range(len(itens_cotados))
+            )
+        }
+        if len(livres) > max_fornecedores:
+            conjunto, resultado["otimo"] = _melhor_conjunto(colunas, max_fornecedores)
+            if _custo(colunas, conjunto) == INFINITO:
+                raise AdjudicacaoInviavel(
+                    f"Nenhuma combinação de até {max_fornecedores} fornecedor(es) cobre todos os itens cotados"
+                )
+
+    # Adjudica cada item ao mais barato do conjunto (empate: menor fornecedor_id)
+    resumo: Dict[int, dict] = {}
+    valor_total = 0.0
+    for i, item in enumerate(itens_cotados):
+        j = min(conjunto, key=lambda k: colunas[k][i])
+        fornecedor = fornecedores[ordem_fornecedores[j]]
+        preco_total = colunas[j][i]
+        valor_total += preco_total
+        resultado["itens"].append({
+            "item_cotacao_id": item.id,
+            "descricao": item.descricao,
+            "quantidade": item.quantidade,
+            "unidade": item.unidade,
+            "fornecedor_id": fornecedor["fornecedor_id"],
+            "preco_unitario": unitarios[j][i],
+            "preco_total": round(preco_total, 2)
+        })
+        linha = resumo.setdefault(j, {**fornecedor, "itens": 0, "valor_total": 0.0})
+        linha["itens"] += 1
+        linha["valor_total"] += preco_total
+
+    for linha in resumo.values():
+        linha["valor_total"] = round(linha["valor_total"], 2)
+    resultado["fornecedores"] = sorted(resumo.values(), key=lambda l: l["valor_total"], reverse=True)
+    resultado["valor_total"] = round(valor_total, 2)
+
+    if resultado["melhor_fornecedor_unico"]:
+        referencia = totais_unicos[melhor_unico]
+        resultado["economia"] = round(referencia - valor_total, 2)
+        resultado["economia_percentual"] = (
+            round((referencia - valor_total) / referencia * 100, 2) if referencia else 0.0
+        )
+
+    return resultado
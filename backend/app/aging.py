@@ -0,0 +1,312 @@
+"""
+Aging de contas a receber e a pagar.
+
+Os itens em aberto são as parcelas dos títulos parcelados e os próprios
+títulos sem parcelas (UNION ALL, sem contar o mesmo valor duas vezes). Cada
+item cai em uma faixa de atraso por comparação do vencimento com datas de
+corte calculadas a partir da data-base (CASE portátil, sem aritmética de
+datas no banco), e o resumo por cliente/fornecedor sai de uma única
+consulta agrupada.
+
+Saldo na data-base: itens emitidos até a data-base; o que foi quitado
+depois dela conta pelo valor de face. Como só a data do primeiro
+recebimento é gravada no título, recebimentos parciais posteriores a ela
+são considerados já recebidos.
+"""
+from datetime import date, datetime, time, timedelta
+from enum import Enum
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import Integer, case, cast, exists, func, literal, or_, select, union_all
+from sqlalchemy.orm import Session
+
+from app.models_modules import (
+    Cliente, ContaPagar, ContaReceber, Fornecedor, ParcelaContaPagar, ParcelaContaReceber, StatusPagamento
+)
+
+
+FAIXAS_PADRAO = (30, 60, 90)
+MAXIMO_FAIXAS = 12
+SALDO_MINIMO = 0.005
+
+CHAVE_A_VENCER = "a_vencer"
+
+
+class TipoAging(str, Enum):
+    RECEBER = "receber"
+    PAGAR = "pagar"
+
+
+class _Origem(NamedTuple):
+    """Colunas de títulos e parcelas de um lado (receber ou pagar)"""
+    titulo: Any
+    parcela: Any
+    parcela_titulo_id: Any
+    entidade: Any
+    titulo_entidade_id: Any
+    titulo_liquidado: Any
+    titulo_data_liquidacao: Any
+    parcela_liquidado: Any
+    parcela_data_liquidacao: Any
+    chave: str
+
+
+ORIGENS = {
+    TipoAging.RECEBER: _Origem(
+        ContaReceber, ParcelaContaReceber, ParcelaContaReceber.conta_receber_id, Cliente,
+        ContaReceber.cliente_id, ContaReceber.valor_recebido, ContaReceber.data_recebimento,
+        ParcelaContaReceber.valor_recebido, ParcelaContaReceber.data_recebimento, "cliente"
+    ),
+    TipoAging.PAGAR: _Origem(
+        ContaPagar, ParcelaContaPagar, ParcelaContaPagar.conta_pagar_id, Fornecedor,
+        ContaPagar.fornecedor_id, ContaPagar.valor_pago, ContaPagar.data_pagamento,
+        ParcelaContaPagar.valor_pago, ParcelaContaPagar.data_pagamento, "fornecedor"
+    ),
+}
+
+
+# =============================================================================
+# FAIXAS
+# =============================================================================
+
+def interpretar_faixas(texto: Optional[str]) -> Tuple[int, ...]:
+    """
+    Limites superiores das faixas de atraso em dias ("30,60,90")
+
+    Raises:
+        ValueError: valores não inteiros, não positivos, repetidos ou em excesso
+    """
+    if not texto:
+        return FAIXAS_PADRAO
+    try:
+        faixas = tuple(int(parte) for parte in texto.split(",") if parte.strip())
+    except ValueError:
+        raise ValueError("Faixas devem ser números inteiros de dias separados por vírgula")
+    if not faixas or len(faixas) > MAXIMO_FAIXAS:
+        raise ValueError(f"Informe de 1 a {MAXIMO_FAIXAS} faixas")
+    if faixas[0] <= 0 or any(b <= a for a, b in zip(faixas, faixas[1:])):
+        raise ValueError("Faixas devem ser positivas e crescentes")
+    return faixas
+
+
+def descrever_faixas(faixas: Sequence[int]) -> List[dict]:
+    """Chave e intervalo de dias de atraso de cada faixa (a vencer, 1-30, ..., acima do último limite)"""
+    descricoes = [{"chave": CHAVE_A_VENCER, "de": None, "ate": 0}]
+    inicio = 1
+    for limite in faixas:
+        descricoes.append({"chave": f"{inicio}_{limite}", "de": inicio, "ate": limite})
+        inicio = limite + 1
+    descricoes.append({"chave": f"acima_{faixas[-1]}", "de": inicio, "ate": None})
+    return descricoes
+
+
+def _faixa(vencimento, data_base: date, faixas: Sequence[int]):
+    """Índice da faixa do item (0 = a vencer) por comparação com as datas de corte"""
+    inicio_base = datetime.combine(data_base, time.min)
+    cortes = [inicio_base] + [inicio_base - timedelta(days=limite) for limite in faixas]
+    return case(
+        *((vencimento >= corte, indice) for indice, corte in enumerate(cortes)),
+        else_=len(cortes)
+    )
+
+
+# =============================================================================
+# CONSULTAS
+# =============================================================================
+
+def _saldo(valor, juros, desconto, liquidado, data_liquidacao, fim_base: datetime):
+    """Saldo em aberto na data-base (quitado depois dela: valor de face)"""
+    return case(
+        (data_liquidacao > fim_base, valor),
+        else_=valor + func.coalesce(juros, 0.0) - func.coalesce(desconto, 0.0) - func.coalesce(liquidado, 0.0)
+    )
+
+
+def itens_abertos(
+    tipo: TipoAging,
+    data_base: date,
+    faixas: Sequence[int],
+    entidade_id: Optional[int] = None
+):
+    """Subconsulta com um item em aberto por linha: títulos sem parcelas e parcelas"""
+    origem = ORIGENS[tipo]
+    titulo, parcela = origem.titulo, origem.parcela
+    fim_base = datetime.combine(data_base, time.max)
+
+    saldo_titulo = _saldo(
+        titulo.valor_original, titulo.juros, titulo.desconto,
+        origem.titulo_liquidado, origem.titulo_data_liquidacao, fim_base
+    )
+    titulos = select(
+        titulo.id.label("titulo_id"),
+        cast(literal(None), Integer).label("parcela"),
+        origem.titulo_entidade_id.label("entidade_id"),
+        titulo.numero_documento.label("documento"),
+        titulo.data_vencimento.label("data_vencimento"),
+        saldo_titulo.label("saldo"),
+        _faixa(titulo.data_vencimento, data_base, faixas).label("faixa")
+    ).where(
+        titulo.data_emissao <= fim_base,
+        or_(titulo.status != StatusPagamento.PAGO, origem.titulo_data_liquidacao > fim_base),
+        saldo_titulo > SALDO_MINIMO,
+        ~exists().where(origem.parcela_titulo_id == titulo.id)
+    )
+
+    saldo_parcela = _saldo(
+        parcela.valor, parcela.juros, parcela.desconto,
+        origem.parcela_liquidado, origem.parcela_data_liquidacao, fim_base
+    )
+    parcelas = select(
+        titulo.id.label("titulo_id"),
+        parcela.numero_parcela.label("parcela"),
+        origem.titulo_entidade_id.label("entidade_id"),
+        titulo.numero_documento.label("documento"),
+        parcela.data_vencimento.label("data_vencimento"),
+        saldo_parcela.label("saldo"),
+        _faixa(parcela.data_vencimento, data_base, faixas).label("faixa")
+    ).join(
+        titulo, titulo.id == origem.parcela_titulo_id
+    ).where(
+        titulo.data_emissao <= fim_base,
+        or_(parcela.status != StatusPagamento.PAGO, origem.parcela_data_liquidacao > fim_base),
+        saldo_parcela > SALDO_MINIMO
+    )
+
+    if entidade_id is not None:
+        titulos = titulos.where(origem.titulo_entidade_id == entidade_id)
+        parcelas = parcelas.where(origem.titulo_entidade_id == entidade_id)
+
+    return union_all(titulos, parcelas).subquery("itens")
+
+
+def consulta_resumo(
+    tipo: TipoAging,
+    data_base: date,
+    faixas: Sequence[int],
+    entidade_id: Optional[int] = None
+):
+    """select() agrupado por cliente/fornecedor com o saldo de cada faixa"""
+    origem = ORIGENS[tipo]
+    itens = itens_abertos(tipo, data_base, faixas, entidade_id)
+    descricoes = descrever_faixas(faixas)
+
+    return select(
+        itens.c.entidade_id,
+        origem.entidade.nome.label("nome"),
+        *(
+            func.sum(case((itens.c.faixa == indice, itens.c.saldo), else_=0.0)).label(descricao["chave"])
+            for indice, descricao in enumerate(descricoes)
+        ),
+        func.sum(itens.c.saldo).label("total"),
+        func.count().label("itens"),
+        func.min(itens.c.data_vencimento).label("vencimento_mais_antigo")
+    ).join(
+        origem.entidade, origem.entidade.id == itens.c.entidade_id
+    ).group_by(
+        itens.c.entidade_id, origem.entidade.nome
+    ).order_by(
+        func.sum(itens.c.saldo).desc(), itens.c.entidade_id
+    )
+
+
+def consulta_detalhe(
+    tipo: TipoAging,
+    data_base: date,
+    faixas: Sequence[int],
+    entidade_id: Optional[int] = None
+):
+    """select() com cada item em aberto e sua faixa (para exportação)"""
+    origem = ORIGENS[tipo]
+    itens = itens_abertos(tipo, data_base, faixas, entidade_id)
+    return select(
+        itens.c.entidade_id,
+        origem.entidade.nome.label("nome"),
+        itens.c.titulo_id,
+        itens.c.parcela,
+        itens.c.documento,
+        itens.c.data_vencimento,
+        itens.c.faixa,
+        itens.c.saldo
+    ).join(
+        origem.entidade, origem.entidade.id == itens.c.entidade_id
+    ).order_by(itens.c.entidade_id, itens.c.data_vencimento, itens.c.titulo_id)
+
+
+# =============================================================================
+# RELATÓRIO
+# =============================================================================
+
+def calcular_aging(
+    session: Session,
+    tipo: TipoAging,
+    data_base: Optional[date] = None,
+    faixas: Sequence[int] = FAIXAS_PADRAO,
+    entidade_id: Optional[int] = None
+) -> dict:
+    """
+    Aging por cliente (receber) ou fornecedor (pagar) na data-base
+
+    Returns:
+        dict com as faixas, uma linha por cliente/fornecedor (saldo por faixa,
+        total, quantidade de itens e vencimento mais antigo) e os totais gerais
+    """
+    data_base = data_base or date.today()
+    descricoes = descrever_faixas(faixas)
+    chaves = [descricao["chave"] for descricao in descricoes]
+    chave_entidade = f"{ORIGENS[tipo].chave}_id"
+
+    linhas = []
+    totais = dict.fromkeys(chaves + ["total"], 0.0)
+    quantidade_itens = 0
+    for linha in session.execute(consulta_resumo(tipo, data_base, faixas, entidade_id)):
+        for chave in totais:
+            totais[chave] += getattr(linha, chave) or 0.0
+        quantidade_itens += linha.itens
+        linhas.append({
+            chave_entidade: linha.entidade_id,
+            "nome": linha.nome,
+            **{chave: round(getattr(linha, chave) or 0.0, 2) for chave in totais},
+            "itens": linha.itens,
+            "vencimento_mais_antigo": linha.vencimento_mais_antigo
+        })
+
+    return {
+        "tipo": tipo.value,
+        "data_base": data_base,
+        "faixas": descricoes,
+        "linhas": linhas,
+        "totais": {**{chave: round(valor, 2) for chave, valor in totais.items()}, "itens": quantidade_itens}
+    }
+
+
+def colunas_exportacao(tipo: TipoAging, faixas: Sequence[int], detalhado: bool) -> List[str]:
+    """Cabeçalhos da exportação (resumo ou detalhe)"""
+    chave_entidade = f"{ORIGENS[tipo].chave}_id"
+    if detalhado:
+        return [
+            chave_entidade, "nome", "titulo_id", "parcela", "documento",
+            "data_vencimento", "dias_atraso", "faixa", "saldo"
+        ]
+    return [chave_entidade, "nome"] + [d["chave"] for d in descrever_faixas(faixas)] + [
+        "total", "itens", "vencimento_mais_antigo"
+    ]
+
+
+def transformar_detalhe(data_base: date, faixas: Sequence[int]):
+    """Converte a linha de consulta_detalhe: dias de atraso e chave da faixa"""
+    chaves = [descricao["chave"] for descricao in descrever_faixas(faixas)]
+
+    def _transformar(linha) -> Tuple:
+        vencimento = linha.data_vencimento
+        dias = (data_base - (vencimento.date() if isinstance(vencimento, datetime) else vencimento)).days
+        return (
+            linha.entidade_id, linha.nome, linha.titulo_id, linha.parcela, linha.documento,
+            vencimento, max(dias, 0), chaves[linha.faixa], round(linha.saldo, 2)
+        )
+
+    return _transformar
+
+
+def transformar_resumo(linha) -> Tuple:
+    """Arredonda os valores da linha de consulta_resumo"""
+    return tuple(round(valor, 2) if isinstance(valor, float) else valor for valor in linha)
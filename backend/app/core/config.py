@@ -38,6 +38,44 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: str = ""
     SMTP_FROM: str = ""
     
+    # NF-e
+    NFE_CNPJ_EMITENTE: str = ""
+    NFE_RAZAO_SOCIAL: str = ""
+    NFE_UF_EMITENTE: str = "SP"
+    NFE_AMBIENTE: int = 2  # 1=produção, 2=homologação
+    NFE_CERTIFICADO: str = ""  # Caminho do certificado A1 (.pfx); vazio = assinatura local
+    NFE_CERTIFICADO_SENHA: str = ""
+    NFE_TRANSMISSOR: str = "local"
+    NFE_WORKERS: int = -1  # Processos de assinatura; -1 = núcleos - 1, 0 = sem pool
+    
+    # Jobs em segundo plano
+    JOBS_WORKERS: int = 2  # Processos do pool; 0 = sem executor embutido
+    JOBS_INTERVALO_SEGUNDOS: float = 1.0  # Intervalo de varredura da fila
+    JOBS_SINAL_VIDA_SEGUNDOS: float = 30.0  # Intervalo do sinal de vida dos jobs em execução
+    JOBS_TIMEOUT_SEGUNDOS: int = 300  # Job executando sem sinal de vida do worker volta para a fila
+    JOBS_RETENCAO_DIAS: int = 30  # Jobs finalizados mais antigos são removidos
+    
+    # Vencimentos (varredura diária de títulos em atraso)
+    VENCIMENTOS_VARREDURA_DIARIA: bool = True  # Agenda a varredura uma vez por dia no executor de jobs
+    VENCIMENTOS_LOTE: int = 1000  # Títulos/parcelas por UPDATE (um commit por lote)
+    ENCARGOS_MULTA_PERCENTUAL: float = 2.0  # Multa sobre o principal em aberto
+    ENCARGOS_JUROS_MES_PERCENTUAL: float = 1.0  # Juros de mora ao mês, pro rata por dia de atraso
+    ENCARGOS_CARENCIA_DIAS: int = 0  # Dias de atraso tolerados antes de cobrar multa e juros
+    
+    # Idempotency-Key
+    IDEMPOTENCIA_TTL_HORAS: int = 24  # Tempo em que uma chave devolve a resposta gravada
+    IDEMPOTENCIA_CACHE_MAX: int = 10000  # Entradas no cache em memória (0 = só banco)
+    
+    # Instrumentação (/metrics)
+    METRICAS_HABILITADAS: bool = True
+    METRICAS_LIMITE_N_MAIS_UM: int = 10  # Mesmo comando SQL repetido acima disso numa requisição gera aviso
+    
+    # Perfilador (dev tools)
+    PERFIL_LIMITE_LENTO_MS: int = 1000  # Requisições acima disso são capturadas (0 = desligado)
+    PERFIL_INTERVALO_AMOSTRA_MS: int = 20  # Intervalo de amostragem das requisições lentas
+    PERFIL_CAPTURAS_MAX: int = 50  # Tamanho do buffer circular de capturas
+    PERFIL_DURACAO_MAXIMA_SEGUNDOS: int = 60  # Limite do perfil sob demanda
+    
     # Feature Flags
     ENABLE_REGISTRATION: bool = False
     ENABLE_EMAIL_VERIFICATION: bool = False
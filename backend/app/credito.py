@@ -0,0 +1,331 @@
+"""
+Exposição de crédito dos clientes.
+
+A tabela exposicao_credito guarda, por cliente, o saldo em aberto das contas
+a receber e o valor dos pedidos de venda aprovados (ainda não faturados).
+Ela é mantida de forma incremental por um ouvinte after_flush da Session:
+pelo histórico dos atributos de cada título ou pedido gravado, calcula a
+diferença que a alteração causa na exposição do cliente e aplica todas as
+diferenças do flush em um único upsert (receber_aberto = receber_aberto + d).
+Só quando o valor anterior de algum atributo não estava carregado o cliente
+é recalculado do zero a partir das tabelas de origem.
+
+Com isso a aprovação de pedidos confere o limite de crédito com um UPDATE
+condicional sobre uma única linha, sem somar títulos ou pedidos.
+"""
+from collections import defaultdict
+from datetime import datetime
+from enum import Enum
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import case, delete, event, func, inspect, select, update
+from sqlalchemy.orm import Session
+
+from app.models_modules import Cliente, ContaReceber, ExposicaoCredito, PedidoVenda, StatusPagamento
+
+
+STATUS_PEDIDO_EXPOSTO = "aprovado"
+
+ATRIBUTOS_MONITORADOS = {
+    ContaReceber: ("cliente_id", "status", "valor_original", "juros", "desconto", "valor_recebido"),
+    PedidoVenda: ("cliente_id", "status", "valor_total"),
+}
+
+TOLERANCIA = 1e-6
+
+_DESCONHECIDO = object()
+
+
+class LimiteCreditoExcedido(Exception):
+    """O pedido levaria a exposição do cliente acima do limite de crédito"""
+
+    def __init__(self, cliente_id: int, limite: float, exposicao: float, solicitado: float):
+        self.cliente_id = cliente_id
+        self.limite = limite
+        self.exposicao = exposicao
+        self.solicitado = solicitado
+        super().__init__(
+            f"Limite de crédito excedido. Limite: {limite:.2f}, "
+            f"Exposição atual: {exposicao:.2f}, Pedido: {solicitado:.2f}"
+        )
+
+
+# =============================================================================
+# CONTRIBUIÇÃO DE TÍTULOS E PEDIDOS
+# =============================================================================
+
+def _status(valor) -> str:
+    """Status como texto minúsculo (aceita o enum, o nome ou o valor)"""
+    if isinstance(valor, Enum):
+        valor = valor.value
+    return (valor or "").lower()
+
+
+def saldo_titulo(status, valor_original, juros, desconto, valor_recebido) -> float:
+    """Saldo em aberto de uma conta a receber (zero se quitada)"""
+    if _status(status) == StatusPagamento.PAGO.value:
+        return 0.0
+    saldo = (valor_original or 0.0) + (juros or 0.0) - (desconto or 0.0) - (valor_recebido or 0.0)
+    return max(saldo, 0.0)
+
+
+def _contribuicao(tipo, valores: dict) -> Tuple[Optional[int], float, float]:
+    """(cliente_id, receber_aberto, pedidos_aprovados) de um título ou pedido"""
+    if tipo is ContaReceber:
+        return valores["cliente_id"], saldo_titulo(
+            valores["status"], valores["valor_original"], valores["juros"],
+            valores["desconto"], valores["valor_recebido"]
+        ), 0.0
+    aprovado = _status(valores["status"]) == STATUS_PEDIDO_EXPOSTO
+    return valores["cliente_id"], 0.0, (valores["valor_total"] or 0.0) if aprovado else 0.0
+
+
+def _valor_anterior(estado, atributo: str):
+    """Valor do atributo antes do flush (_DESCONHECIDO se não estava carregado)"""
+    historico = estado.attrs[atributo].history
+    if historico.deleted:
+        return historico.deleted[0]
+    if historico.unchanged:
+        return historico.unchanged[0]
+    return _DESCONHECIDO
+
+
+@event.listens_for(Session, "after_flush")
+def _atualizar_exposicao(session: Session, contexto) -> None:
+    deltas: Dict[int, List[float]] = defaultdict(lambda: [0.0, 0.0])
+    recalcular: Set[int] = set()
+
+    for instancia in chain(session.new, session.dirty, session.deleted):
+        tipo = type(instancia)
+        atributos = ATRIBUTOS_MONITORADOS.get(tipo)
+        if atributos is None:
+            continue
+
+        estado = inspect(instancia)
+        removido = instancia in session.deleted
+        if not removido and instancia not in session.new and not any(
+            estado.attrs[atributo].history.has_changes() for atributo in atributos
+        ):
+            continue
+
+        if instancia in session.new:
+            anterior = (None, 0.0, 0.0)
+        else:
+            valores = {atributo: _valor_anterior(estado, atributo) for atributo in atributos}
+            if any(valor is _DESCONHECIDO for valor in valores.values()):
+                recalcular.update(
+                    cliente_id for cliente_id in (valores["cliente_id"], instancia.cliente_id)
+                    if cliente_id not in (None, _DESCONHECIDO)
+                )
+                continue
+            anterior = _contribuicao(tipo, valores)
+
+        atual = (None, 0.0, 0.0) if removido else _contribuicao(
+            tipo, {atributo: getattr(instancia, atributo) for atributo in atributos}
+        )
+
+        for cliente_id, aberto, aprovados, sinal in ((*anterior, -1), (*atual, 1)):
+            if cliente_id is not None:
+                deltas[cliente_id][0] += sinal * aberto
+                deltas[cliente_id][1] += sinal * aprovados
+
+    linhas = [
+        {"cliente_id": cliente_id, "receber_aberto": aberto, "pedidos_aprovados": aprovados}
+        for cliente_id, (aberto, aprovados) in sorted(deltas.items())
+        if cliente_id not in recalcular and (abs(aberto) > TOLERANCIA or abs(aprovados) > TOLERANCIA)
+    ]
+    if linhas:
+        _gravar_exposicao(session, linhas, somar=True)
+    if recalcular:
+        recalcular_exposicao(session, recalcular)
+
+
+# =============================================================================
+# GRAVAÇÃO
+# =============================================================================
+
+def _gravar_exposicao(session: Session, linhas: List[dict], somar: bool) -> None:
+    """
+    Upsert das linhas de exposição (somando aos valores atuais ou substituindo)
+
+    Em SQLite e PostgreSQL é um único INSERT ... ON CONFLICT DO UPDATE para
+    todas as linhas; nos demais dialetos, UPDATE e INSERT se nenhuma linha
+    for afetada.
+    """
+    tabela = ExposicaoCredito.__table__
+    agora = datetime.utcnow()
+    linhas = [{**linha, "updated_at": agora} for linha in linhas]
+    conexao = session.connection()
+    dialeto = conexao.dialect.name
+
+    if dialeto in ("sqlite", "postgresql"):
+        if dialeto == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+
+        stmt = insert(tabela)
+        novos = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[tabela.c.cliente_id],
+            set_={
+                "receber_aberto": (tabela.c.receber_aberto + novos.receber_aberto) if somar else novos.receber_aberto,
+                "pedidos_aprovados": (
+                    (tabela.c.pedidos_aprovados + novos.pedidos_aprovados) if somar else novos.pedidos_aprovados
+                ),
+                "updated_at": novos.updated_at
+            }
+        )
+        conexao.execute(stmt, linhas)
+        return
+
+    from sqlalchemy import insert
+
+    for linha in linhas:
+        resultado = conexao.execute(
+            update(tabela).where(tabela.c.cliente_id == linha["cliente_id"]).values(
+                receber_aberto=(tabela.c.receber_aberto + linha["receber_aberto"]) if somar else linha["receber_aberto"],
+                pedidos_aprovados=(
+                    (tabela.c.pedidos_aprovados + linha["pedidos_aprovados"]) if somar else linha["pedidos_aprovados"]
+                ),
+                updated_at=agora
+            )
+        )
+        if resultado.rowcount == 0:
+            conexao.execute(insert(tabela).values(**linha))
+
+
+def _totais_origem(session: Session, cliente_ids: Optional[Set[int]]) -> Dict[int, List[float]]:
+    """Exposição calculada das tabelas de origem (títulos em aberto e pedidos aprovados)"""
+    saldo = (
+        ContaReceber.valor_original
+        + func.coalesce(ContaReceber.juros, 0.0)
+        - func.coalesce(ContaReceber.desconto, 0.0)
+        - func.coalesce(ContaReceber.valor_recebido, 0.0)
+    )
+    titulos = select(
+        ContaReceber.cliente_id, func.sum(case((saldo > 0, saldo), else_=0.0))
+    ).where(ContaReceber.status != StatusPagamento.PAGO).group_by(ContaReceber.cliente_id)
+    pedidos = select(
+        PedidoVenda.cliente_id, func.sum(PedidoVenda.valor_total)
+    ).where(PedidoVenda.status == STATUS_PEDIDO_EXPOSTO).group_by(PedidoVenda.cliente_id)
+
+    if cliente_ids is not None:
+        titulos = titulos.where(ContaReceber.cliente_id.in_(cliente_ids))
+        pedidos = pedidos.where(PedidoVenda.cliente_id.in_(cliente_ids))
+
+    conexao = session.connection()
+    totais: Dict[int, List[float]] = defaultdict(lambda: [0.0, 0.0])
+    for indice, stmt in enumerate((titulos, pedidos)):
+        for cliente_id, valor in conexao.execute(stmt):
+            totais[cliente_id][indice] = valor or 0.0
+    return totais
+
+
+def recalcular_exposicao(session: Session, cliente_ids: Iterable[int]) -> None:
+    """Recalcula do zero a exposição dos clientes informados (não faz commit)"""
+    cliente_ids = set(cliente_ids)
+    totais = _totais_origem(session, cliente_ids)
+    _gravar_exposicao(session, [
+        {"cliente_id": cliente_id, "receber_aberto": totais[cliente_id][0], "pedidos_aprovados": totais[cliente_id][1]}
+        for cliente_id in sorted(cliente_ids)
+    ], somar=False)
+
+
+def reconstruir_exposicao_credito(session: Session) -> dict:
+    """Refaz toda a tabela exposicao_credito a partir das tabelas de origem (não faz commit)"""
+    totais = _totais_origem(session, None)
+    session.connection().execute(delete(ExposicaoCredito.__table__))
+    linhas = [
+        {"cliente_id": cliente_id, "receber_aberto": aberto, "pedidos_aprovados": aprovados}
+        for cliente_id, (aberto, aprovados) in sorted(totais.items())
+    ]
+    if linhas:
+        _gravar_exposicao(session, linhas, somar=False)
+    return {"clientes": len(linhas)}
+
+
+# =============================================================================
+# LIMITE DE CRÉDITO
+# =============================================================================
+
+def verificar_limite_credito(session: Session, cliente_id: int, limite: Optional[float], valor: float) -> None:
+    """
+    Confere se um pedido de `valor` cabe no limite de crédito do cliente
+
+    O teste é um UPDATE condicional na linha de exposição do cliente: em
+    bancos com bloqueio de linha, aprovações concorrentes do mesmo cliente
+    são serializadas até o commit. Limite zero ou vazio significa cliente sem
+    limite. A exposição do pedido é somada pelo ouvinte ao gravar o status.
+
+    Raises:
+        LimiteCreditoExcedido: exposição atual + valor > limite
+    """
+    if not limite or limite <= 0:
+        return
+
+    _gravar_exposicao(session, [{"cliente_id": cliente_id, "receber_aberto": 0.0, "pedidos_aprovados": 0.0}], somar=True)
+
+    tabela = ExposicaoCredito.__table__
+    resultado = session.execute(
+        update(tabela).where(
+            tabela.c.cliente_id == cliente_id,
+            tabela.c.receber_aberto + tabela.c.pedidos_aprovados + valor <= limite + TOLERANCIA
+        ).values(updated_at=datetime.utcnow())
+    )
+    if resultado.rowcount == 0:
+        exposicao = session.execute(
+            select(tabela.c.receber_aberto + tabela.c.pedidos_aprovados).where(tabela.c.cliente_id == cliente_id)
+        ).scalar() or 0.0
+        raise LimiteCreditoExcedido(cliente_id, limite, exposicao, valor)
+
+
+def consultar_exposicao(
+    session: Session,
+    cliente_id: Optional[int] = None,
+    percentual_minimo: Optional[float] = None,
+    skip: int = 0,
+    limit: int = 100
+) -> List[dict]:
+    """
+    Exposição, limite e disponível por cliente
+
+    Com percentual_minimo, só clientes com limite definido cuja exposição
+    chegue a esse percentual do limite, dos mais comprometidos para os menos.
+    """
+    aberto = func.coalesce(ExposicaoCredito.receber_aberto, 0.0)
+    aprovados = func.coalesce(ExposicaoCredito.pedidos_aprovados, 0.0)
+    exposicao = aberto + aprovados
+    limite = func.coalesce(Cliente.limite_credito, 0.0)
+    utilizacao = case((limite > 0, exposicao * 100.0 / limite), else_=None)
+
+    stmt = select(
+        Cliente.id.label("cliente_id"),
+        Cliente.codigo,
+        Cliente.nome,
+        limite.label("limite_credito"),
+        aberto.label("receber_aberto"),
+        aprovados.label("pedidos_aprovados"),
+        exposicao.label("exposicao"),
+        utilizacao.label("utilizacao_percentual")
+    ).outerjoin(ExposicaoCredito, ExposicaoCredito.cliente_id == Cliente.id)
+
+    if cliente_id is not None:
+        stmt = stmt.where(Cliente.id == cliente_id)
+    if percentual_minimo is not None:
+        stmt = stmt.where(limite > 0, exposicao * 100.0 >= limite * percentual_minimo)
+
+    stmt = stmt.order_by(utilizacao.desc().nulls_last(), Cliente.id).offset(skip).limit(limit)
+
+    return [
+        {
+            **linha._asdict(),
+            "disponivel": round(linha.limite_credito - linha.exposicao, 2) if linha.limite_credito > 0 else None,
+            "utilizacao_percentual": (
+                round(linha.utilizacao_percentual, 2) if linha.utilizacao_percentual is not None else None
+            ),
+            "acima_limite": linha.limite_credito > 0 and linha.exposicao > linha.limite_credito + TOLERANCIA
+        }
+        for linha in session.execute(stmt)
+    ]
@@ -0,0 +1,223 @@
+"""
+Emissão de notas fiscais com lançamento de estoque em lote.
+
+Uma ou várias NFs em rascunho são emitidas de uma vez: o local de estoque é
+resolvido uma única vez (NF > informado > padrão), as quantidades dos itens
+são agregadas por material no banco e todas as variações de estoque e linhas
+de MovimentoEstoque são gravadas em operações de conjunto. Cada nota emitida
+publica NFEmitida (e EstoqueMovimentado, quando lançou estoque) no outbox.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.eventos import ESTOQUE_MOVIMENTADO, NF_EMITIDA, publicar
+from app.helpers import lancar_estoque_em_lote, obter_local_padrao
+from app.models_modules import (
+    EstoquePorLocal, EstoqueReservado, ItemNotaFiscal, MovimentoEstoque, NotaFiscal,
+    StatusNotaFiscal, TipoMovimento, TipoNotaFiscal
+)
+
+
+# Sinal do lançamento de estoque por tipo de NF (devolução de venda volta ao estoque)
+SINAL_ESTOQUE = {
+    TipoNotaFiscal.SAIDA: -1,
+    TipoNotaFiscal.ENTRADA: 1,
+    TipoNotaFiscal.DEVOLUCAO: 1,
+}
+
+
+class ErroEmissaoNF(Exception):
+    """Falha que impede a emissão do lote inteiro"""
+
+
+def _quantidades_por_nota(
+    session: Session,
+    nf_ids: Sequence[int]
+) -> Dict[int, Dict[int, float]]:
+    """{nf_id: {material_id: quantidade}} agregado no banco"""
+    linhas = session.execute(
+        select(
+            ItemNotaFiscal.nota_fiscal_id,
+            ItemNotaFiscal.material_id,
+            func.sum(ItemNotaFiscal.quantidade)
+        ).where(
+            ItemNotaFiscal.nota_fiscal_id.in_(nf_ids),
+            ItemNotaFiscal.material_id.isnot(None)
+        ).group_by(ItemNotaFiscal.nota_fiscal_id, ItemNotaFiscal.material_id)
+    )
+
+    resultado: Dict[int, Dict[int, float]] = defaultdict(dict)
+    for nf_id, material_id, quantidade in linhas:
+        resultado[nf_id][material_id] = quantidade or 0.0
+    return resultado
+
+
+def _saldos(
+    session: Session,
+    pares: Sequence[Tuple[int, int]]
+) -> Dict[Tuple[int, int], float]:
+    """Saldo disponível (estoque - reservado) de cada (material_id, local_id) em uma consulta"""
+    if not pares:
+        return {}
+
+    materiais = {m for m, _ in pares}
+    locais = {l for _, l in pares}
+    linhas = session.execute(
+        select(
+            EstoquePorLocal.material_id,
+            EstoquePorLocal.local_id,
+            EstoquePorLocal.quantidade - func.coalesce(EstoqueReservado.quantidade, 0.0)
+        ).outerjoin(
+            EstoqueReservado,
+            and_(
+                EstoqueReservado.material_id == EstoquePorLocal.material_id,
+                EstoqueReservado.local_id == EstoquePorLocal.local_id
+            )
+        ).where(
+            EstoquePorLocal.material_id.in_(materiais),
+            EstoquePorLocal.local_id.in_(locais)
+        )
+    )
+    return {(m, l): q or 0.0 for m, l, q in linhas}
+
+
+def emitir_notas(
+    session: Session,
+    notas: Sequence[NotaFiscal],
+    baixar_estoque: bool = True,
+    local_id: Optional[int] = None,
+    usuario_id: Optional[int] = None
+) -> dict:
+    """
+    Emite as notas informadas, lançando o estoque em lote
+
+    Notas que não estão em rascunho ou sem saldo disponível (estoque fora
+    das reservas de pedidos aprovados) são rejeitadas individualmente (na
+    ordem de id); as demais são emitidas juntas.
+    Não faz commit.
+
+    Returns:
+        {"emitidas": [NotaFiscal], "rejeitadas": [{"id", "numero", "motivo"}]}
+
+    Raises:
+        ErroEmissaoNF: nenhum local de estoque disponível, ou o saldo mudou
+            entre a validação e o lançamento (o chamador deve fazer rollback)
+    """
+    rejeitadas: List[dict] = []
+    candidatas: List[NotaFiscal] = []
+
+    for nf in sorted(notas, key=lambda n: n.id):
+        if nf.status != StatusNotaFiscal.RASCUNHO:
+            rejeitadas.append({
+                "id": nf.id,
+                "numero": nf.numero,
+                "motivo": "Apenas notas em rascunho podem ser emitidas"
+            })
+        else:
+            candidatas.append(nf)
+
+    if not candidatas:
+        return {"emitidas": [], "rejeitadas": rejeitadas}
+
+    emitidas: List[NotaFiscal] = []
+    deltas: Dict[Tuple[int, int], float] = defaultdict(float)
+    movimentos: List[dict] = []
+    lancamentos: Dict[int, Tuple[int, int, Dict[int, float]]] = {}
+
+    if baixar_estoque:
+        local_padrao_id = local_id
+        if not local_padrao_id and any(not nf.local_estoque_id for nf in candidatas):
+            local_padrao = obter_local_padrao(session)
+            if not local_padrao:
+                raise ErroEmissaoNF("Nenhum local de estoque ativo encontrado")
+            local_padrao_id = local_padrao.id
+
+        quantidades = _quantidades_por_nota(session, [nf.id for nf in candidatas])
+        locais = {nf.id: nf.local_estoque_id or local_padrao_id for nf in candidatas}
+        saldos = _saldos(session, [
+            (material_id, locais[nf_id])
+            for nf_id, itens in quantidades.items()
+            for material_id in itens
+        ])
+
+        for nf in candidatas:
+            sinal = SINAL_ESTOQUE.get(nf.tipo, 0)
+            itens = quantidades.get(nf.id, {}) if sinal else {}
+            local = locais[nf.id]
+
+            faltando = [
+                material_id for material_id, quantidade in itens.items()
+                if sinal < 0 and saldos.get((material_id, local), 0.0) < quantidade
+            ]
+            if faltando:
+                rejeitadas.append({
+                    "id": nf.id,
+                    "numero": nf.numero,
+                    "motivo": f"Estoque insuficiente no local {local} para os materiais {sorted(faltando)}"
+                })
+                continue
+
+            for material_id, quantidade in itens.items():
+                chave = (material_id, local)
+                saldos[chave] = saldos.get(chave, 0.0) + sinal * quantidade
+                deltas[chave] += sinal * quantidade
+                movimentos.append({
+                    "material_id": material_id,
+                    "tipo_movimento": TipoMovimento.SAIDA if sinal < 0 else TipoMovimento.ENTRADA,
+                    "quantidade": quantidade,
+                    "documento": f"NF {nf.numero}",
+                    "observacao": (
+                        f"Emissão da NF {nf.numero}" if sinal < 0
+                        else f"Recebimento da NF {nf.numero}"
+                    ),
+                    "usuario_id": usuario_id,
+                    "local_origem_id": local if sinal < 0 else None,
+                    "local_destino_id": local if sinal > 0 else None,
+                })
+
+            if itens:
+                lancamentos[nf.id] = (local, sinal, itens)
+            emitidas.append(nf)
+    else:
+        emitidas = candidatas
+
+    if deltas:
+        resultado = lancar_estoque_em_lote(dict(deltas), session)
+        if not resultado["sucesso"]:
+            raise ErroEmissaoNF(resultado["mensagem"])
+
+    if movimentos:
+        session.execute(insert(MovimentoEstoque), movimentos)
+
+    agora = datetime.utcnow()
+    for nf in emitidas:
+        nf.status = StatusNotaFiscal.EMITIDA
+        nf.data_emissao = agora
+        if usuario_id:
+            nf.usuario_emissao_id = usuario_id
+
+        publicar(session, NF_EMITIDA, "nota_fiscal", nf.id, {
+            "numero": nf.numero,
+            "serie": nf.serie,
+            "tipo": nf.tipo.value if nf.tipo else None,
+            "cliente_id": nf.cliente_id,
+            "fornecedor_id": nf.fornecedor_id,
+            "valor_total": nf.valor_total
+        }, usuario_id=usuario_id)
+        if nf.id in lancamentos:
+            local, sinal, itens = lancamentos[nf.id]
+            publicar(session, ESTOQUE_MOVIMENTADO, "nota_fiscal", nf.id, {
+                "documento": f"NF {nf.numero}",
+                "local_id": local,
+                "sinal": sinal,
+                "itens": [
+                    {"material_id": material_id, "quantidade": quantidade}
+                    for material_id, quantidade in itens.items()
+                ]
+            }, usuario_id=usuario_id)
+
+    return {"emitidas": emitidas, "rejeitadas": rejeitadas}
@@ -0,0 +1,200 @@
+"""
+Eventos de domínio com outbox transacional.
+
+A alteração de negócio chama publicar(session, ...) antes do commit: o evento
+é gravado na tabela eventos_dominio na mesma transação, então só existe se a
+alteração foi confirmada. Efeitos colaterais entre módulos (títulos a receber,
+caches, integrações) ficam em consumidores registrados com
+@consumidor("nome", TIPO, ...) e são executados depois, fora da requisição.
+
+- Cada consumidor processa os eventos em ordem de id; o registro em
+  consumos_evento (único por consumidor + evento) é gravado no mesmo commit
+  do trabalho do consumidor, então um evento nunca é aplicado duas vezes.
+- Falhas ficam registradas e são repetidas até MAX_TENTATIVAS_CONSUMO.
+- O executor de jobs drena a fila (e é acordado após cada commit que
+  publicou eventos); processar_eventos() também pode ser chamado direto.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, event, func, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.models_modules import ConsumoEvento, EventoDominio
+
+
+logger = logging.getLogger(__name__)
+
+# Tipos de evento
+PEDIDO_FATURADO = "PedidoFaturado"
+NF_EMITIDA = "NFEmitida"
+TITULO_BAIXADO = "TituloBaixado"
+ESTOQUE_MOVIMENTADO = "EstoqueMovimentado"
+
+MAX_TENTATIVAS_CONSUMO = 5
+LOTE_CONSUMO = 100
+
+
+class Consumidor(NamedTuple):
+    funcao: Callable[[Session, EventoDominio], None]
+    tipos: Tuple[str, ...]
+
+
+CONSUMIDORES: Dict[str, Consumidor] = {}
+
+# Chamados após o commit de uma sessão que publicou eventos
+OUVINTES_PUBLICACAO: List[Callable[[], None]] = []
+
+
+def consumidor(nome: str, *tipos: str):
+    """Registra um consumidor para os tipos de evento informados"""
+    def registrar(funcao):
+        CONSUMIDORES[nome] = Consumidor(funcao, tuple(tipos))
+        return funcao
+    return registrar
+
+
+def publicar(
+    session: Session,
+    tipo: str,
+    agregado: str,
+    agregado_id: int,
+    dados: Optional[dict] = None,
+    usuario_id: Optional[int] = None
+) -> EventoDominio:
+    """Adiciona o evento à transação corrente (não faz commit)"""
+    evento = EventoDominio(
+        tipo=tipo,
+        agregado=agregado,
+        agregado_id=agregado_id,
+        dados=dados or {},
+        usuario_id=usuario_id,
+        created_at=datetime.utcnow()
+    )
+    session.add(evento)
+    session.info["eventos_publicados"] = True
+    return evento
+
+
+@event.listens_for(Session, "after_commit")
+def _notificar_publicacao(session: Session) -> None:
+    if session.info.pop("eventos_publicados", False):
+        for ouvinte in OUVINTES_PUBLICACAO:
+            ouvinte()
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_publicacao(session: Session) -> None:
+    session.info.pop("eventos_publicados", None)
+
+
+def _pendentes(consumidor_nome: str, tipos: Tuple[str, ...]):
+    """Condição dos eventos ainda não consumidos (ou a repetir) por um consumidor"""
+    return select(EventoDominio.id).outerjoin(
+        ConsumoEvento,
+        and_(
+            ConsumoEvento.evento_id == EventoDominio.id,
+            ConsumoEvento.consumidor == consumidor_nome
+        )
+    ).where(
+        EventoDominio.tipo.in_(tipos),
+        or_(
+            ConsumoEvento.id.is_(None),
+            and_(ConsumoEvento.concluido == 0, ConsumoEvento.tentativas < MAX_TENTATIVAS_CONSUMO)
+        )
+    )
+
+
+def existem_eventos_pendentes(session: Session) -> bool:
+    for nome, registrado in CONSUMIDORES.items():
+        if session.execute(_pendentes(nome, registrado.tipos).limit(1)).first():
+            return True
+    return False
+
+
+def _ja_consumido(session: Session, nome: str, evento_id: int) -> bool:
+    return session.query(ConsumoEvento.id).filter(
+        ConsumoEvento.consumidor == nome,
+        ConsumoEvento.evento_id == evento_id,
+        ConsumoEvento.concluido == 1
+    ).first() is not None
+
+
+def _registrar_consumo(session: Session, nome: str, evento_id: int, erro: Optional[str]) -> None:
+    consumo = session.query(ConsumoEvento).filter(
+        ConsumoEvento.consumidor == nome,
+        ConsumoEvento.evento_id == evento_id
+    ).first()
+    if consumo is None:
+        consumo = ConsumoEvento(consumidor=nome, evento_id=evento_id, tentativas=0)
+        session.add(consumo)
+
+    consumo.tentativas = (consumo.tentativas or 0) + 1
+    consumo.concluido = 0 if erro else 1
+    consumo.erro = erro
+    consumo.processado_em = datetime.utcnow()
+
+
+def processar_eventos(
+    session_factory: Optional[Callable[[], Session]] = None,
+    limite: int = LOTE_CONSUMO
+) -> int:
+    """
+    Entrega os eventos pendentes a cada consumidor registrado
+
+    Returns:
+        Quantidade de eventos consumidos com sucesso
+    """
+    session_factory = session_factory or SessionLocal
+    consumidos = 0
+
+    for nome, registrado in list(CONSUMIDORES.items()):
+        session = session_factory()
+        try:
+            ids = session.execute(
+                _pendentes(nome, registrado.tipos).order_by(EventoDominio.id).limit(limite)
+            ).scalars().all()
+
+            for evento_id in ids:
+                evento = session.get(EventoDominio, evento_id)
+                try:
+                    registrado.funcao(session, evento)
+                    _registrar_consumo(session, nome, evento_id, None)
+                    session.commit()
+                    consumidos += 1
+                except Exception as erro:
+                    session.rollback()
+                    if isinstance(erro, IntegrityError) and _ja_consumido(session, nome, evento_id):
+                        # Outro worker consumiu o mesmo evento primeiro
+                        continue
+                    logger.exception("Consumidor %s falhou no evento %s", nome, evento_id)
+                    _registrar_consumo(session, nome, evento_id, str(erro) or erro.__class__.__name__)
+                    session.commit()
+        finally:
+            session.close()
+
+    return consumidos
+
+
+def resumo_consumidores(session: Session) -> List[Dict[str, Any]]:
+    """Pendentes e falhas definitivas por consumidor"""
+    resumo = []
+    for nome, registrado in CONSUMIDORES.items():
+        pendentes = session.execute(
+            select(func.count()).select_from(_pendentes(nome, registrado.tipos).subquery())
+        ).scalar()
+        falhos = session.query(ConsumoEvento).filter(
+            ConsumoEvento.consumidor == nome,
+            ConsumoEvento.concluido == 0,
+            ConsumoEvento.tentativas >= MAX_TENTATIVAS_CONSUMO
+        ).count()
+        resumo.append({
+            "consumidor": nome,
+            "tipos": list(registrado.tipos),
+            "pendentes": pendentes,
+            "falhos": falhos
+        })
+    return resumo
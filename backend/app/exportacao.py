@@ -0,0 +1,243 @@
+"""
+Exportação em streaming de relatórios (CSV, JSONL e XLSX).
+
+As linhas são lidas do banco em lotes via cursor no servidor (yield_per) e
+serializadas sob demanda dentro de um StreamingResponse, de modo que o uso de
+memória não cresce com o volume exportado e o primeiro byte é enviado assim que
+o primeiro lote é lido.
+"""
+import csv
+import io
+import json
+import zipfile
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence
+from xml.sax.saxutils import escape
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+
+TAMANHO_LOTE = 1000
+
+
+class FormatoExportacao(str, Enum):
+    CSV = "csv"
+    JSONL = "jsonl"
+    XLSX = "xlsx"
+
+
+MEDIA_TYPES = {
+    FormatoExportacao.CSV: "text/csv; charset=utf-8",
+    FormatoExportacao.JSONL: "application/x-ndjson",
+    FormatoExportacao.XLSX: "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+# =============================================================================
+# LEITURA EM LOTES
+# =============================================================================
+
+def iterar_consulta(session: Session, stmt, tamanho_lote: int = TAMANHO_LOTE) -> Iterator[Any]:
+    """
+    Executa um select() retornando as linhas em lotes (cursor no servidor).
+
+    Nenhum lote anterior fica retido em memória: cada linha é liberada assim
+    que consumida pelo serializador.
+    """
+    resultado = session.execute(stmt.execution_options(yield_per=tamanho_lote))
+    for linha in resultado:
+        yield linha
+
+
+def _valor_simples(valor: Any) -> Any:
+    """Normaliza valores para serialização (enums, datas, None)"""
+    if isinstance(valor, Enum):
+        return valor.value
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return valor
+
+
+# =============================================================================
+# SERIALIZADORES
+# =============================================================================
+
+def gerar_csv(colunas: Sequence[str], linhas: Iterable[Sequence[Any]]) -> Iterator[bytes]:
+    """Serializa as linhas em CSV, emitindo um bloco de bytes por lote"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+
+    # BOM para o Excel reconhecer UTF-8
+    buffer.write("\ufeff")
+    writer.writerow(colunas)
+
+    for i, linha in enumerate(linhas, start=1):
+        writer.writerow(["" if v is None else _valor_simples(v) for v in linha])
+        if i % TAMANHO_LOTE == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    yield buffer.getvalue().encode("utf-8")
+
+
+def gerar_jsonl(colunas: Sequence[str], linhas: Iterable[Sequence[Any]]) -> Iterator[bytes]:
+    """Serializa as linhas em JSON Lines (um objeto por linha)"""
+    partes: List[str] = []
+
+    for linha in linhas:
+        registro = {coluna: _valor_simples(valor) for coluna, valor in zip(colunas, linha)}
+        partes.append(json.dumps(registro, ensure_ascii=False, default=str))
+        if len(partes) >= TAMANHO_LOTE:
+            yield ("\n".join(partes) + "\n").encode("utf-8")
+            partes = []
+
+    if partes:
+        yield ("\n".join(partes) + "\n").encode("utf-8")
+
+
+class _BufferDrenavel:
+    """Destino de escrita sem seek para o zipfile; os bytes são drenados a cada lote"""
+
+    def __init__(self):
+        self._partes: List[bytes] = []
+
+    def write(self, dados: bytes) -> int:
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self) -> None:
+        pass
+
+    def drenar(self) -> bytes:
+        dados = b"".join(self._partes)
+        self._partes = []
+        return dados
+
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+
+_XLSX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Relatorio" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _celula_xlsx(valor: Any) -> str:
+    """Monta uma célula da planilha (números nativos, demais valores como texto)"""
+    if valor is None:
+        return "<c/>"
+    if isinstance(valor, bool):
+        valor = int(valor)
+    if isinstance(valor, (int, float)):
+        return f"<c><v>{valor}</v></c>"
+    texto = escape(str(_valor_simples(valor)))
+    return f'<c t="inlineStr"><is><t>{texto}</t></is></c>'
+
+
+def gerar_xlsx(colunas: Sequence[str], linhas: Iterable[Sequence[Any]]) -> Iterator[bytes]:
+    """
+    Serializa as linhas em uma planilha XLSX mínima.
+
+    O pacote zip é escrito em modo streaming (sem seek), e a planilha usa
+    inline strings para não precisar manter a tabela de strings em memória.
+    """
+    destino = _BufferDrenavel()
+
+    with zipfile.ZipFile(destino, mode="w", compression=zipfile.ZIP_DEFLATED) as pacote:
+        pacote.writestr("[Content_Types].xml", _XLSX_CONTENT_TYPES)
+        pacote.writestr("_rels/.rels", _XLSX_RELS)
+        pacote.writestr("xl/workbook.xml", _XLSX_WORKBOOK)
+        pacote.writestr("xl/_rels/workbook.xml.rels", _XLSX_WORKBOOK_RELS)
+        yield destino.drenar()
+
+        with pacote.open("xl/worksheets/sheet1.xml", mode="w", force_zip64=True) as planilha:
+            planilha.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetData>'
+            )
+            cabecalho = "".join(_celula_xlsx(c) for c in colunas)
+            planilha.write(f"<row>{cabecalho}</row>".encode("utf-8"))
+
+            for i, linha in enumerate(linhas, start=1):
+                celulas = "".join(_celula_xlsx(v) for v in linha)
+                planilha.write(f"<row>{celulas}</row>".encode("utf-8"))
+                if i % TAMANHO_LOTE == 0:
+                    yield destino.drenar()
+
+            planilha.write(b"</sheetData></worksheet>")
+
+    yield destino.drenar()
+
+
+SERIALIZADORES: dict = {
+    FormatoExportacao.CSV: gerar_csv,
+    FormatoExportacao.JSONL: gerar_jsonl,
+    FormatoExportacao.XLSX: gerar_xlsx,
+}
+
+
+# =============================================================================
+# RESPOSTA HTTP
+# =============================================================================
+
+def resposta_exportacao(
+    colunas: Sequence[str],
+    linhas: Iterable[Sequence[Any]],
+    formato: FormatoExportacao,
+    nome_arquivo: str,
+    transformar: Optional[Callable[[Any], Sequence[Any]]] = None
+) -> StreamingResponse:
+    """
+    Monta o StreamingResponse de exportação
+
+    Args:
+        colunas: Cabeçalhos na ordem das linhas
+        linhas: Iterável de linhas (normalmente de iterar_consulta)
+        formato: csv, jsonl ou xlsx
+        nome_arquivo: Nome base do arquivo, sem extensão
+        transformar: Função opcional aplicada a cada linha antes de serializar
+    """
+    if transformar is not None:
+        linhas = (transformar(linha) for linha in linhas)
+
+    formato = FormatoExportacao(formato)
+    return StreamingResponse(
+        SERIALIZADORES[formato](colunas, linhas),
+        media_type=MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nome_arquivo}.{formato.value}"'}
+    )
@@ -148,6 +148,28 @@ def gerar_codigo_local_estoque(db: Session) -> str:
     return f"LOC-{num:04d}"
 
 
+def gerar_numero_pedido_compra(db: Session) -> str:
+    """
+    Gera número sequencial para pedido de compra
+    Formato: PC-2025-00001, PC-2025-00002, etc
+    """
+    from app.models_modules import PedidoCompra
+    from datetime import datetime
+    
+    ultimo = db.query(PedidoCompra).order_by(PedidoCompra.id.desc()).first()
+    
+    if ultimo and ultimo.numero:
+        try:
+            # Extrai o número do último pedido (PC-2025-00001 -> 1)
+            num = int(ultimo.numero.split('-')[-1]) + 1
+        except (IndexError, ValueError):
+            num = 1
+    else:
+        num = 1
+    
+    return f"PC-{datetime.now().year}-{num:05d}"
+
+
 def validar_cpf(cpf: str) -> bool:
     """
     Valida CPF brasileiro
@@ -228,18 +250,83 @@ def calcular_estoque_total(material_id: int, db: Session) -> float:
     return total or 0.0
 
 
+def obter_local_padrao(db: Session):
+    """
+    Retorna o local de estoque padrão, ou o primeiro local ativo se não houver padrão
+    """
+    from app.models_modules import LocalEstoque
+    
+    local = db.query(LocalEstoque).filter(LocalEstoque.padrao == 1).first()
+    if not local:
+        local = db.query(LocalEstoque).filter(LocalEstoque.ativo == 1).first()
+    
+    return local
+
+
 def obter_saldo_por_local(material_id: int, local_id: int, db: Session) -> float:
     """
     Obtém o saldo de um material em um local específico
     """
     from app.models_modules import EstoquePorLocal
     
-    estoque = db.query(EstoquePorLocal).filter(
+    saldo = db.query(EstoquePorLocal.quantidade).filter(
         EstoquePorLocal.material_id == material_id,
         EstoquePorLocal.local_id == local_id
-    ).first()
+    ).scalar()
     
-    return estoque.quantidade if estoque else 0.0
+    return saldo or 0.0
+
+
+def _upsert_estoque_local(db: Session, material_id: int, local_id: int, quantidade: float, somar: bool):
+    """
+    Executa o upsert de (material_id, local_id) em um único comando
+    
+    Em SQLite e PostgreSQL usa INSERT ... ON CONFLICT DO UPDATE sobre a chave
+    única uk_material_local. Nos demais dialetos faz UPDATE e, se nenhuma linha
+    for afetada, INSERT.
+    """
+    from app.models_modules import EstoquePorLocal
+    from datetime import datetime
+    
+    tabela = EstoquePorLocal.__table__
+    agora = datetime.utcnow()
+    nova_quantidade = (tabela.c.quantidade + quantidade) if somar else quantidade
+    dialeto = db.get_bind().dialect.name
+    
+    if dialeto in ("sqlite", "postgresql"):
+        if dialeto == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        
+        stmt = insert(tabela).values(
+            material_id=material_id,
+            local_id=local_id,
+            quantidade=quantidade,
+            updated_at=agora
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[tabela.c.material_id, tabela.c.local_id],
+            set_={"quantidade": nova_quantidade, "updated_at": agora}
+        )
+        db.execute(stmt)
+        return
+    
+    from sqlalchemy import insert, update
+    
+    resultado = db.execute(
+        update(tabela).where(
+            tabela.c.material_id == material_id,
+            tabela.c.local_id == local_id
+        ).values(quantidade=nova_quantidade, updated_at=agora)
+    )
+    if resultado.rowcount == 0:
+        db.execute(insert(tabela).values(
+            material_id=material_id,
+            local_id=local_id,
+            quantidade=quantidade,
+            updated_at=agora
+        ))
 
 
 def criar_ou_atualizar_estoque_local(
@@ -249,28 +336,168 @@ def criar_ou_atualizar_estoque_local(
     db: Session
 ) -> None:
     """
-    Cria ou atualiza o registro de estoque por local
+    Cria ou atualiza o registro de estoque por local com a quantidade absoluta
+    """
+    _upsert_estoque_local(db, material_id, local_id, quantidade, somar=False)
+
+
+def somar_estoque_local(material_id: int, local_id: int, delta: float, db: Session) -> None:
+    """
+    Soma delta (positivo ou negativo) ao estoque do local, criando o registro se preciso
+    """
+    _upsert_estoque_local(db, material_id, local_id, delta, somar=True)
+
+
+def _reservado_no_local(tabela):
+    """Subconsulta com o reservado para pedidos aprovados do material/local da linha de estoque"""
+    from app.models_modules import EstoqueReservado
+    from sqlalchemy import func, select
+    
+    reservado = EstoqueReservado.__table__
+    return select(func.coalesce(func.max(reservado.c.quantidade), 0.0)).where(
+        reservado.c.material_id == tabela.c.material_id,
+        reservado.c.local_id == tabela.c.local_id
+    ).scalar_subquery()
+
+
+def obter_disponivel_por_local(material_id: int, local_id: int, db: Session) -> float:
+    """
+    Saldo do local que pode sair: estoque - reservado para pedidos aprovados
     """
     from app.models_modules import EstoquePorLocal
+    from sqlalchemy import select
+    
+    tabela = EstoquePorLocal.__table__
+    disponivel = db.execute(
+        select(tabela.c.quantidade - _reservado_no_local(tabela)).where(
+            tabela.c.material_id == material_id,
+            tabela.c.local_id == local_id
+        )
+    ).scalar()
+    
+    return disponivel or 0.0
+
+
+def baixar_estoque_local(material_id: int, local_id: int, quantidade: float, db: Session) -> bool:
+    """
+    Retira quantidade do estoque do local somente se houver saldo disponível
+    
+    A verificação e a baixa são um único UPDATE condicional, então duas
+    saídas concorrentes não conseguem deixar o saldo negativo. O reservado
+    para pedidos aprovados não pode sair (o faturamento libera a reserva do
+    pedido antes da baixa).
+    
+    Returns:
+        True se a baixa foi feita, False se o saldo disponível era insuficiente
+    """
+    from app.models_modules import EstoquePorLocal
+    from sqlalchemy import update
     from datetime import datetime
     
-    estoque = db.query(EstoquePorLocal).filter(
-        EstoquePorLocal.material_id == material_id,
-        EstoquePorLocal.local_id == local_id
-    ).first()
+    tabela = EstoquePorLocal.__table__
+    resultado = db.execute(
+        update(tabela).where(
+            tabela.c.material_id == material_id,
+            tabela.c.local_id == local_id,
+            tabela.c.quantidade - _reservado_no_local(tabela) >= quantidade
+        ).values(
+            quantidade=tabela.c.quantidade - quantidade,
+            updated_at=datetime.utcnow()
+        )
+    )
+    return resultado.rowcount > 0
+
+
+def lancar_estoque_em_lote(deltas: dict, db: Session) -> dict:
+    """
+    Aplica variações de estoque de vários materiais/locais em operações de conjunto
     
-    if estoque:
-        estoque.quantidade = quantidade
-        estoque.updated_at = datetime.utcnow()
-    else:
-        estoque = EstoquePorLocal(
-            material_id=material_id,
-            local_id=local_id,
-            quantidade=quantidade
+    Args:
+        deltas: {(material_id, local_id): variação}; negativo = saída
+    
+    - Saídas: um UPDATE condicional por local (CASE por material), que só
+      baixa onde há saldo fora das reservas de pedidos aprovados; se alguma
+      linha não for afetada, nada deve ser confirmado e o chamador deve
+      fazer rollback
+    - Entradas: um INSERT ... ON CONFLICT multi-linha (upsert somando)
+    - estoque_atual dos materiais envolvidos é recalculado em um único UPDATE
+    
+    Retorna dict com sucesso, mensagem e materiais com saldo insuficiente
+    """
+    from app.models_modules import EstoquePorLocal
+    from sqlalchemy import case, func, select, update
+    from datetime import datetime
+    
+    tabela = EstoquePorLocal.__table__
+    agora = datetime.utcnow()
+    
+    saidas_por_local = {}
+    entradas = []
+    for (material_id, local_id), delta in deltas.items():
+        if delta < 0:
+            saidas_por_local.setdefault(local_id, {})[material_id] = -delta
+        elif delta > 0:
+            entradas.append((material_id, local_id, delta))
+    
+    for local_id, quantidades in saidas_por_local.items():
+        quantidade = case(quantidades, value=tabela.c.material_id, else_=0.0)
+        resultado = db.execute(
+            update(tabela).where(
+                tabela.c.local_id == local_id,
+                tabela.c.material_id.in_(list(quantidades)),
+                tabela.c.quantidade - _reservado_no_local(tabela) >= quantidade
+            ).values(
+                quantidade=tabela.c.quantidade - quantidade,
+                updated_at=agora
+            )
+        )
+        if resultado.rowcount != len(quantidades):
+            insuficientes = sorted(
+                material_id for material_id, q in quantidades.items()
+                if obter_disponivel_por_local(material_id, local_id, db) < q
+            )
+            return {
+                "sucesso": False,
+                "mensagem": f"Estoque insuficiente no local {local_id} para os materiais {insuficientes}",
+                "insuficientes": insuficientes
+            }
+    
+    if entradas:
+        dialeto = db.get_bind().dialect.name
+        if dialeto in ("sqlite", "postgresql"):
+            if dialeto == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            
+            stmt = insert(tabela).values([
+                {"material_id": m, "local_id": l, "quantidade": q, "updated_at": agora}
+                for m, l, q in entradas
+            ])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[tabela.c.material_id, tabela.c.local_id],
+                set_={
+                    "quantidade": tabela.c.quantidade + stmt.excluded.quantidade,
+                    "updated_at": agora
+                }
+            )
+            db.execute(stmt)
+        else:
+            for material_id, local_id, quantidade in entradas:
+                somar_estoque_local(material_id, local_id, quantidade, db)
+    
+    materiais = sorted({material_id for material_id, _ in deltas})
+    if materiais:
+        total = select(func.coalesce(func.sum(tabela.c.quantidade), 0.0)).where(
+            tabela.c.material_id == Material.__table__.c.id
+        ).scalar_subquery()
+        db.execute(
+            update(Material.__table__).where(
+                Material.__table__.c.id.in_(materiais)
+            ).values(estoque_atual=total)
         )
-        db.add(estoque)
     
-    db.flush()  # Garante que foi salvo sem commitar
+    return {"sucesso": True, "mensagem": "Estoque lançado com sucesso", "insuficientes": []}
 
 
 def atualizar_estoque_material(material_id: int, db: Session):
@@ -324,26 +551,22 @@ def processar_movimentacao_estoque(
                 return {"sucesso": False, "mensagem": "Local de destino obrigatório para entrada"}
             
             # Adiciona ao estoque do local
-            saldo_atual = obter_saldo_por_local(material_id, local_destino_id, db)
-            novo_saldo = saldo_atual + quantidade
-            criar_ou_atualizar_estoque_local(material_id, local_destino_id, novo_saldo, db)
+            somar_estoque_local(material_id, local_destino_id, quantidade, db)
             
         elif tipo_movimento == "SAIDA":
             if not local_origem_id:
                 return {"sucesso": False, "mensagem": "Local de origem obrigatório para saída"}
             
             # Remove do estoque do local
-            saldo_atual = obter_saldo_por_local(material_id, local_origem_id, db)
-            novo_saldo = saldo_atual - quantidade
-            
-            if novo_saldo < 0 and not permitir_negativo:
+            if permitir_negativo:
+                somar_estoque_local(material_id, local_origem_id, -quantidade, db)
+            elif not baixar_estoque_local(material_id, local_origem_id, quantidade, db):
+                saldo_atual = obter_disponivel_por_local(material_id, local_origem_id, db)
                 return {
                     "sucesso": False, 
                     "mensagem": f"Estoque insuficiente. Disponível: {saldo_atual}, Solicitado: {quantidade}"
                 }
             
-            criar_ou_atualizar_estoque_local(material_id, local_origem_id, novo_saldo, db)
-            
         elif tipo_movimento == "TRANSFERENCIA":
             if not local_origem_id or not local_destino_id:
                 return {"sucesso": False, "mensagem": "Local de origem e destino obrigatórios para transferência"}
@@ -352,21 +575,17 @@ def processar_movimentacao_estoque(
                 return {"sucesso": False, "mensagem": "Local de origem e destino não podem ser iguais"}
             
             # Remove da origem
-            saldo_origem = obter_saldo_por_local(material_id, local_origem_id, db)
-            novo_saldo_origem = saldo_origem - quantidade
-            
-            if novo_saldo_origem < 0 and not permitir_negativo:
+            if permitir_negativo:
+                somar_estoque_local(material_id, local_origem_id, -quantidade, db)
+            elif not baixar_estoque_local(material_id, local_origem_id, quantidade, db):
+                saldo_origem = obter_disponivel_por_local(material_id, local_origem_id, db)
                 return {
                     "sucesso": False, 
                     "mensagem": f"Estoque insuficiente na origem. Disponível: {saldo_origem}, Solicitado: {quantidade}"
                 }
             
-            criar_ou_atualizar_estoque_local(material_id, local_origem_id, novo_saldo_origem, db)
-            
             # Adiciona ao destino
-            saldo_destino = obter_saldo_por_local(material_id, local_destino_id, db)
-            novo_saldo_destino = saldo_destino + quantidade
-            criar_ou_atualizar_estoque_local(material_id, local_destino_id, novo_saldo_destino, db)
+            somar_estoque_local(material_id, local_destino_id, quantidade, db)
             
         elif tipo_movimento == "AJUSTE":
             if not local_destino_id:
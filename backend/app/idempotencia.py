@@ -0,0 +1,275 @@
+"""
+Suporte a Idempotency-Key nos endpoints de escrita.
+
+Terminais que repetem requisições em links instáveis enviam o mesmo
+cabeçalho Idempotency-Key; a primeira execução grava a resposta e as
+repetições recebem a resposta gravada sem executar a regra de negócio.
+
+- Escopo: (sujeito do token, chave); sem token, só a chave. A impressão (sha256 de método, rota e
+  corpo) impede reaproveitar a chave em outra requisição (422).
+- Antes de executar, uma linha "em andamento" é inserida; a constraint
+  única faz uma repetição simultânea receber 409 em vez de executar de novo.
+- Respostas 5xx (ou exceções) removem a linha, permitindo nova tentativa.
+- O cache em memória (LRU com validade) responde repetições sem ir ao banco;
+  a tabela guarda o corpo comprimido e é limpa pela manutenção dos jobs.
+"""
+import hashlib
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, NamedTuple, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.config import settings
+from app.db import get_session
+from app.models_modules import RespostaIdempotente
+from app.security import decode_access_token
+
+
+CABECALHO = "Idempotency-Key"
+CABECALHO_REPETIDA = "Idempotent-Replayed"
+TAMANHO_MAXIMO_CHAVE = 255
+ESCOPO_ANONIMO = "-"
+
+# Endpoints cobertos (método, caminho)
+ROTAS_IDEMPOTENTES = [
+    ("POST", re.compile(r"^/financeiro/contas-pagar/\d+/baixar$")),
+    ("POST", re.compile(r"^/financeiro/transferencias/?$")),
+    ("POST", re.compile(r"^/vendas/pedidos/?$")),
+    ("POST", re.compile(r"^/vendas/pedidos/\d+/faturar$")),
+    ("POST", re.compile(r"^/materiais/movimentos/?$")),
+]
+
+
+class RespostaGravada(NamedTuple):
+    impressao: str
+    status_code: int
+    tipo_conteudo: Optional[str]
+    corpo: bytes  # Comprimido
+    expira_em: datetime
+
+
+class CacheRespostas:
+    """LRU em memória com validade por entrada"""
+
+    def __init__(self, maximo: int):
+        self.maximo = maximo
+        self._itens: "OrderedDict[Tuple[str, str], RespostaGravada]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave: Tuple[str, str]) -> Optional[RespostaGravada]:
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            if item.expira_em <= datetime.utcnow():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return item
+
+    def gravar(self, chave: Tuple[str, str], item: RespostaGravada) -> None:
+        if self.maximo <= 0:
+            return
+        with self._lock:
+            self._itens[chave] = item
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.maximo:
+                self._itens.popitem(last=False)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._itens.clear()
+
+
+cache_respostas = CacheRespostas(settings.IDEMPOTENCIA_CACHE_MAX)
+
+
+def rota_idempotente(metodo: str, caminho: str) -> bool:
+    return any(metodo == m and padrao.match(caminho) for m, padrao in ROTAS_IDEMPOTENTES)
+
+
+def calcular_impressao(metodo: str, caminho: str, corpo: bytes) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{metodo} {caminho}\n".encode())
+    digest.update(corpo)
+    return digest.hexdigest()
+
+
+def _usuario(request: Request) -> str:
+    """Sujeito do token; rotas sem autenticação (vendas) usam o escopo anônimo"""
+    autorizacao = request.headers.get("authorization", "")
+    if autorizacao.lower().startswith("bearer "):
+        payload = decode_access_token(autorizacao[7:])
+        if payload and payload.get("sub"):
+            return payload["sub"]
+    return ESCOPO_ANONIMO
+
+
+def _responder(gravada: RespostaGravada) -> Response:
+    return Response(
+        content=zlib.decompress(gravada.corpo),
+        status_code=gravada.status_code,
+        media_type=gravada.tipo_conteudo,
+        headers={CABECALHO_REPETIDA: "true"}
+    )
+
+
+def _erro(status_code: int, detalhe: str) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content={"detail": detalhe})
+
+
+def _de_registro(registro: RespostaIdempotente) -> RespostaGravada:
+    return RespostaGravada(
+        registro.impressao, registro.status_code, registro.tipo_conteudo,
+        registro.corpo, registro.expira_em
+    )
+
+
+def reservar_chave(
+    session: Session,
+    usuario: str,
+    chave: str,
+    impressao: str
+) -> Tuple[Optional[RespostaGravada], Optional[RespostaIdempotente]]:
+    """
+    Reserva a chave para esta requisição
+
+    Returns:
+        (gravada, None) - a chave já tem resposta (ou está em andamento:
+            gravada com status_code None)
+        (None, registro) - reservada; executar e depois concluir_chave()
+    """
+    agora = datetime.utcnow()
+    session.execute(delete(RespostaIdempotente).where(
+        RespostaIdempotente.usuario == usuario,
+        RespostaIdempotente.chave == chave,
+        RespostaIdempotente.expira_em <= agora
+    ))
+
+    registro = RespostaIdempotente(
+        usuario=usuario,
+        chave=chave,
+        impressao=impressao,
+        concluida=0,
+        created_at=agora,
+        expira_em=agora + timedelta(hours=settings.IDEMPOTENCIA_TTL_HORAS)
+    )
+    session.add(registro)
+    try:
+        session.commit()
+        return None, registro
+    except IntegrityError:
+        session.rollback()
+
+    existente = session.query(RespostaIdempotente).filter(
+        RespostaIdempotente.usuario == usuario,
+        RespostaIdempotente.chave == chave
+    ).one()
+    if not existente.concluida:
+        return RespostaGravada(existente.impressao, None, None, b"", existente.expira_em), None
+    return _de_registro(existente), None
+
+
+def concluir_chave(
+    session: Session,
+    registro: RespostaIdempotente,
+    status_code: int,
+    tipo_conteudo: Optional[str],
+    corpo: bytes
+) -> Optional[RespostaGravada]:
+    """Grava a resposta (ou libera a chave, em erro de servidor)"""
+    if status_code >= 500:
+        liberar_chave(session, registro)
+        return None
+
+    registro.status_code = status_code
+    registro.tipo_conteudo = tipo_conteudo
+    registro.corpo = zlib.compress(corpo)
+    registro.concluida = 1
+    session.commit()
+    return _de_registro(registro)
+
+
+def liberar_chave(session: Session, registro: RespostaIdempotente) -> None:
+    session.rollback()
+    session.execute(delete(RespostaIdempotente).where(RespostaIdempotente.id == registro.id))
+    session.commit()
+
+
+def limpar_respostas_expiradas(session: Session) -> int:
+    removidas = session.execute(
+        delete(RespostaIdempotente).where(RespostaIdempotente.expira_em <= datetime.utcnow())
+    ).rowcount
+    session.commit()
+    return removidas
+
+
+class MiddlewareIdempotencia(BaseHTTPMiddleware):
+    """Aplica Idempotency-Key às rotas de ROTAS_IDEMPOTENTES"""
+
+    def _provedor_sessao(self, request: Request) -> Callable:
+        # Respeita a sessão substituída nos testes (dependency_overrides)
+        return request.app.dependency_overrides.get(get_session, get_session)
+
+    async def dispatch(self, request: Request, call_next):
+        chave = request.headers.get(CABECALHO)
+        if not chave or not rota_idempotente(request.method, request.url.path):
+            return await call_next(request)
+
+        if len(chave) > TAMANHO_MAXIMO_CHAVE:
+            return _erro(400, f"{CABECALHO} deve ter no máximo {TAMANHO_MAXIMO_CHAVE} caracteres")
+
+        usuario = _usuario(request)
+        impressao = calcular_impressao(request.method, request.url.path, await request.body())
+        escopo = (usuario, chave)
+
+        gravada = cache_respostas.obter(escopo)
+        if gravada is None:
+            gerador = self._provedor_sessao(request)()
+            session = next(gerador)
+            try:
+                gravada, registro = await run_in_threadpool(reservar_chave, session, usuario, chave, impressao)
+                if registro is not None:
+                    return await self._executar(request, call_next, session, registro, escopo)
+            finally:
+                gerador.close()
+
+        if gravada.status_code is None:
+            return _erro(409, "Requisição com esta chave ainda está em andamento")
+        if gravada.impressao != impressao:
+            return _erro(422, f"{CABECALHO} já utilizada em outra requisição")
+
+        cache_respostas.gravar(escopo, gravada)
+        return _responder(gravada)
+
+    async def _executar(self, request, call_next, session, registro, escopo) -> Response:
+        try:
+            resposta = await call_next(request)
+            corpo = b"".join([parte async for parte in resposta.body_iterator])
+        except Exception:
+            await run_in_threadpool(liberar_chave, session, registro)
+            raise
+
+        gravada = await run_in_threadpool(
+            concluir_chave, session, registro, resposta.status_code,
+            resposta.headers.get("content-type"), corpo
+        )
+        if gravada is not None:
+            cache_respostas.gravar(escopo, gravada)
+
+        return Response(
+            content=corpo,
+            status_code=resposta.status_code,
+            headers=dict(resposta.headers),
+            media_type=resposta.media_type
+        )
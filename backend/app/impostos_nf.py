@@ -0,0 +1,454 @@
+"""
+Cálculo de impostos de notas fiscais (ICMS, IPI, PIS e COFINS).
+
+Os itens são processados em forma colunar: cada campo (quantidade, valor
+unitário, alíquotas...) é uma sequência, e bases, impostos e totais de todos os
+itens são calculados em uma única passada com Decimal e arredondamento
+ROUND_HALF_UP no centavo, por item. Os totais da NF são a soma dos valores já
+arredondados dos itens, como exige o leiaute da NF-e.
+
+As alíquotas vêm da tabela aliquotas_tributarias (NCM x CFOP x UF), mantida em
+cache no processo. O cache é validado por uma consulta de assinatura (quantidade
+de regras e última alteração), então alterações feitas por outro worker são
+percebidas sem reiniciar a aplicação.
+"""
+import threading
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.models_modules import (
+    AliquotaTributaria, Cliente, Fornecedor, ItemNotaFiscal, NotaFiscal, StatusNotaFiscal
+)
+
+
+CENTAVO = Decimal("0.01")
+CEM = Decimal("100")
+ZERO = Decimal("0")
+
+TAMANHO_LOTE = 500
+
+IMPOSTOS = ("icms", "ipi", "pis", "cofins")
+
+# Colunas de entrada por item (ncm/cfop/uf são texto, as demais numéricas)
+COLUNAS_NUMERICAS = (
+    "quantidade", "valor_unitario", "valor_desconto", "valor_frete",
+    "valor_seguro", "valor_outras_despesas",
+    "aliquota_icms", "valor_icms", "aliquota_ipi", "valor_ipi",
+    "aliquota_pis", "valor_pis", "aliquota_cofins", "valor_cofins",
+)
+
+
+class Aliquotas(NamedTuple):
+    """Alíquotas em percentual; None = não definida nesta regra"""
+    icms: Optional[Decimal] = None
+    ipi: Optional[Decimal] = None
+    pis: Optional[Decimal] = None
+    cofins: Optional[Decimal] = None
+
+
+def _decimal_ou_none(valor: Any) -> Optional[Decimal]:
+    """Como _decimal, preservando None (alíquota não definida)"""
+    return None if valor is None else _decimal(valor)
+
+
+def _decimal(valor: Any) -> Decimal:
+    """Converte float/str/None para Decimal sem herdar o erro binário do float"""
+    if valor is None:
+        return ZERO
+    if isinstance(valor, Decimal):
+        return valor
+    return Decimal(str(valor))
+
+
+def normalizar_codigo(valor: Optional[str]) -> Optional[str]:
+    """Remove pontuação de NCM/CFOP e padroniza UF; vazio vira None (curinga)"""
+    if valor is None:
+        return None
+    texto = "".join(c for c in str(valor) if c.isalnum()).upper()
+    return texto or None
+
+
+# =============================================================================
+# TABELA DE ALÍQUOTAS (CACHE)
+# =============================================================================
+
+class TabelaAliquotas:
+    """
+    Regras de alíquota indexadas por (ncm, cfop, uf)
+
+    Cada imposto é resolvido separadamente, da chave mais específica para a
+    mais genérica (NCM tem precedência sobre CFOP, e este sobre UF): o ICMS pode
+    vir de uma regra por UF e o IPI de uma regra por NCM. O resultado de cada
+    combinação é memorizado, então uma NF de 1.000 itens com poucos NCMs
+    distintos resolve cada combinação uma única vez.
+    """
+
+    def __init__(self, regras: Mapping[Tuple[Optional[str], Optional[str], Optional[str]], Aliquotas]):
+        self._regras = dict(regras)
+        self._resolvidas: Dict[Tuple, Aliquotas] = {}
+
+    def __len__(self) -> int:
+        return len(self._regras)
+
+    def resolver(self, ncm: Optional[str], cfop: Optional[str], uf: Optional[str]) -> Aliquotas:
+        """Alíquotas da combinação; impostos sem regra aplicável ficam None"""
+        chave = (normalizar_codigo(ncm), normalizar_codigo(cfop), normalizar_codigo(uf))
+        if chave in self._resolvidas:
+            return self._resolvidas[chave]
+
+        ncm, cfop, uf = chave
+        valores: Dict[str, Optional[Decimal]] = dict.fromkeys(IMPOSTOS)
+        for candidata in (
+            (ncm, cfop, uf), (ncm, cfop, None), (ncm, None, uf), (ncm, None, None),
+            (None, cfop, uf), (None, cfop, None), (None, None, uf), (None, None, None),
+        ):
+            regra = self._regras.get(candidata)
+            if regra is None:
+                continue
+            for imposto in IMPOSTOS:
+                if valores[imposto] is None:
+                    valores[imposto] = getattr(regra, imposto)
+            if all(v is not None for v in valores.values()):
+                break
+
+        resolvida = Aliquotas(**valores)
+        self._resolvidas[chave] = resolvida
+        return resolvida
+
+
+_cache_lock = threading.Lock()
+_cache: Dict[str, Any] = {"assinatura": None, "tabela": None}
+
+
+def _assinatura(session: Session) -> tuple:
+    """Quantidade de regras ativas e última alteração (muda a cada escrita)"""
+    quantidade, ultima = session.execute(
+        select(
+            func.count(AliquotaTributaria.id),
+            func.max(AliquotaTributaria.updated_at)
+        ).where(AliquotaTributaria.ativo == 1)
+    ).one()
+    return (str(session.get_bind().url), quantidade, ultima)
+
+
+def obter_tabela_aliquotas(session: Session) -> TabelaAliquotas:
+    """Tabela de alíquotas do cache, recarregada se as regras mudaram"""
+    assinatura = _assinatura(session)
+    tabela = _cache["tabela"]
+    if tabela is not None and _cache["assinatura"] == assinatura:
+        return tabela
+
+    with _cache_lock:
+        if _cache["tabela"] is not None and _cache["assinatura"] == assinatura:
+            return _cache["tabela"]
+
+        linhas = session.execute(
+            select(
+                AliquotaTributaria.ncm,
+                AliquotaTributaria.cfop,
+                AliquotaTributaria.uf,
+                AliquotaTributaria.aliquota_icms,
+                AliquotaTributaria.aliquota_ipi,
+                AliquotaTributaria.aliquota_pis,
+                AliquotaTributaria.aliquota_cofins
+            ).where(AliquotaTributaria.ativo == 1)
+        )
+        tabela = TabelaAliquotas({
+            (normalizar_codigo(ncm), normalizar_codigo(cfop), normalizar_codigo(uf)): Aliquotas(
+                _decimal_ou_none(icms), _decimal_ou_none(ipi),
+                _decimal_ou_none(pis), _decimal_ou_none(cofins)
+            )
+            for ncm, cfop, uf, icms, ipi, pis, cofins in linhas
+        })
+        _cache["tabela"] = tabela
+        _cache["assinatura"] = assinatura
+        return tabela
+
+
+def invalidar_cache_aliquotas() -> None:
+    """Descarta o cache deste processo (os demais percebem pela assinatura)"""
+    with _cache_lock:
+        _cache["tabela"] = None
+        _cache["assinatura"] = None
+
+
+# =============================================================================
+# CÁLCULO COLUNAR
+# =============================================================================
+
+def para_colunas(itens: Iterable[Mapping[str, Any]], campos: Sequence[str]) -> Dict[str, list]:
+    """Transpõe uma lista de dicts de itens em colunas"""
+    colunas: Dict[str, list] = {campo: [] for campo in campos}
+    for item in itens:
+        for campo in campos:
+            colunas[campo].append(item.get(campo))
+    return colunas
+
+
+def calcular_itens(
+    colunas: Mapping[str, Sequence[Any]],
+    tabela: TabelaAliquotas,
+    preservar_informados: bool = True
+) -> Dict[str, List[Decimal]]:
+    """
+    Calcula bases e impostos de um lote de itens em uma passada
+
+    Args:
+        colunas: sequências de mesmo tamanho com os campos de COLUNAS_NUMERICAS
+            e ainda "ncm", "cfop" e "uf" (CFOP já resolvido item > NF)
+        tabela: alíquotas por NCM/CFOP/UF
+        preservar_informados: alíquota ou valor de imposto informado no item
+            (> 0) prevalece sobre a tabela; desligado no recálculo, em que a
+            tabela tem precedência e os valores são sempre recalculados
+
+    Regras:
+        - valor_produto = quantidade x valor unitário (arredondado)
+        - base = produto + frete + seguro + outras despesas - desconto
+        - ICMS e IPI sobre a base; PIS e COFINS sobre a base sem o ICMS
+        - cada valor é arredondado no centavo (ROUND_HALF_UP) por item
+
+    Returns:
+        Colunas Decimal: valor_produto, valor_total, base_calculo, base_pis_cofins
+        e, para cada imposto, aliquota_<imposto> e valor_<imposto>
+    """
+    n = len(colunas["quantidade"])
+    numericas = {campo: [_decimal(v) for v in colunas.get(campo) or [None] * n] for campo in COLUNAS_NUMERICAS}
+
+    regras = [
+        tabela.resolver(ncm, cfop, uf)
+        for ncm, cfop, uf in zip(
+            colunas.get("ncm") or [None] * n,
+            colunas.get("cfop") or [None] * n,
+            colunas.get("uf") or [None] * n
+        )
+    ]
+
+    valor_produto = [
+        (q * vu).quantize(CENTAVO, ROUND_HALF_UP)
+        for q, vu in zip(numericas["quantidade"], numericas["valor_unitario"])
+    ]
+    base = [
+        (p + fr + se + ou - de).quantize(CENTAVO, ROUND_HALF_UP)
+        for p, fr, se, ou, de in zip(
+            valor_produto, numericas["valor_frete"], numericas["valor_seguro"],
+            numericas["valor_outras_despesas"], numericas["valor_desconto"]
+        )
+    ]
+
+    resultado: Dict[str, List[Decimal]] = {
+        "valor_produto": valor_produto,
+        "valor_total": base,
+        "base_calculo": base,
+    }
+
+    for imposto in IMPOSTOS:
+        informadas = numericas[f"aliquota_{imposto}"]
+        da_tabela = [getattr(regra, imposto) for regra in regras]
+        if preservar_informados:
+            aliquotas = [
+                inf if inf > 0 or tab is None else tab
+                for inf, tab in zip(informadas, da_tabela)
+            ]
+        else:
+            aliquotas = [
+                inf if tab is None else tab
+                for inf, tab in zip(informadas, da_tabela)
+            ]
+
+        if imposto in ("pis", "cofins"):
+            if "base_pis_cofins" not in resultado:
+                resultado["base_pis_cofins"] = [
+                    max(b - icms, ZERO) for b, icms in zip(base, resultado["valor_icms"])
+                ]
+            bases = resultado["base_pis_cofins"]
+        else:
+            bases = base
+
+        calculados = [
+            (b * a / CEM).quantize(CENTAVO, ROUND_HALF_UP)
+            for b, a in zip(bases, aliquotas)
+        ]
+        if preservar_informados:
+            calculados = [
+                inf if inf > 0 else calc
+                for inf, calc in zip(numericas[f"valor_{imposto}"], calculados)
+            ]
+
+        resultado[f"aliquota_{imposto}"] = aliquotas
+        resultado[f"valor_{imposto}"] = calculados
+
+    return resultado
+
+
+def calcular_totais_nf(nf_data: Mapping[str, Any], calculado: Mapping[str, Sequence[Decimal]]) -> dict:
+    """
+    Totais da NF a partir das colunas já arredondadas dos itens
+
+    Total = Produtos + IPI + Frete + Seguro + Outras - Desconto (valores da NF)
+    """
+    valor_produtos = sum(calculado["valor_total"], ZERO)
+    totais = {f"valor_{imposto}": sum(calculado[f"valor_{imposto}"], ZERO) for imposto in IMPOSTOS}
+
+    valor_total = (
+        valor_produtos + totais["valor_ipi"]
+        + _decimal(nf_data.get("valor_frete"))
+        + _decimal(nf_data.get("valor_seguro"))
+        + _decimal(nf_data.get("valor_outras_despesas"))
+        - _decimal(nf_data.get("valor_desconto"))
+    )
+
+    return {
+        "valor_produtos": float(valor_produtos),
+        **{campo: float(valor) for campo, valor in totais.items()},
+        "valor_total": float(valor_total.quantize(CENTAVO, ROUND_HALF_UP)),
+    }
+
+
+CAMPOS_GRAVADOS = ("valor_total",) + tuple(
+    f"{prefixo}_{imposto}" for imposto in IMPOSTOS for prefixo in ("aliquota", "valor")
+)
+CAMPOS_TOTALIZADOS = ("valor_total",) + tuple(f"valor_{imposto}" for imposto in IMPOSTOS)
+
+
+def obter_uf_destinatario(
+    session: Session,
+    cliente_id: Optional[int],
+    fornecedor_id: Optional[int]
+) -> Optional[str]:
+    """UF do cliente (ou do fornecedor, nas notas de entrada)"""
+    if cliente_id:
+        return session.execute(select(Cliente.estado).where(Cliente.id == cliente_id)).scalar()
+    if fornecedor_id:
+        return session.execute(select(Fornecedor.estado).where(Fornecedor.id == fornecedor_id)).scalar()
+    return None
+
+
+def calcular_nota(
+    session: Session,
+    nf_data: Mapping[str, Any],
+    itens: Sequence[Mapping[str, Any]],
+    uf: Optional[str] = None
+) -> Tuple[List[dict], dict]:
+    """
+    Calcula itens e totais de uma NF nova
+
+    Returns:
+        (itens com valor_total, alíquotas e impostos preenchidos, totais da NF)
+    """
+    colunas = para_colunas(itens, COLUNAS_NUMERICAS + ("ncm", "cfop"))
+    colunas["cfop"] = [cfop or nf_data.get("cfop") for cfop in colunas["cfop"]]
+    colunas["uf"] = [uf] * len(itens)
+
+    calculado = calcular_itens(colunas, obter_tabela_aliquotas(session))
+
+    itens_calculados = []
+    for i, item in enumerate(itens):
+        novo = dict(item)
+        for campo in CAMPOS_GRAVADOS:
+            novo[campo] = float(calculado[campo][i])
+        itens_calculados.append(novo)
+
+    return itens_calculados, calcular_totais_nf(nf_data, calculado)
+
+
+# =============================================================================
+# RECÁLCULO EM LOTE
+# =============================================================================
+
+def recalcular_notas(
+    session: Session,
+    nf_ids: Optional[Sequence[int]] = None,
+    tamanho_lote: int = TAMANHO_LOTE
+) -> dict:
+    """
+    Recalcula impostos e totais de rascunhos com a tabela atual
+
+    Os itens de cada lote de notas são lidos em uma consulta colunar, calculados
+    juntos e gravados com UPDATE em lote por chave primária. Só rascunhos são
+    alterados: notas emitidas, autorizadas ou denegadas têm totais vinculados
+    ao XML assinado e à chave de acesso, e canceladas são definitivas. Não faz
+    commit.
+
+    Returns:
+        {"notas": quantidade de notas, "itens": quantidade de itens,
+         "ignoradas": ids informados em nf_ids que não são rascunho}
+    """
+    filtro = [NotaFiscal.status == StatusNotaFiscal.RASCUNHO]
+    ignoradas: List[int] = []
+    if nf_ids:
+        filtro.append(NotaFiscal.id.in_(nf_ids))
+        ignoradas = session.execute(
+            select(NotaFiscal.id).where(
+                NotaFiscal.id.in_(nf_ids), NotaFiscal.status != StatusNotaFiscal.RASCUNHO
+            ).order_by(NotaFiscal.id)
+        ).scalars().all()
+
+    cabecalhos = session.execute(
+        select(
+            NotaFiscal.id,
+            NotaFiscal.cfop,
+            NotaFiscal.valor_frete,
+            NotaFiscal.valor_seguro,
+            NotaFiscal.valor_outras_despesas,
+            NotaFiscal.valor_desconto,
+            func.coalesce(Cliente.estado, Fornecedor.estado).label("uf")
+        ).outerjoin(
+            Cliente, Cliente.id == NotaFiscal.cliente_id
+        ).outerjoin(
+            Fornecedor, Fornecedor.id == NotaFiscal.fornecedor_id
+        ).where(*filtro).order_by(NotaFiscal.id)
+    ).all()
+
+    tabela = obter_tabela_aliquotas(session)
+    total_itens = 0
+
+    for inicio in range(0, len(cabecalhos), tamanho_lote):
+        lote = {nf.id: nf for nf in cabecalhos[inicio:inicio + tamanho_lote]}
+
+        linhas = session.execute(
+            select(
+                ItemNotaFiscal.id,
+                ItemNotaFiscal.nota_fiscal_id,
+                ItemNotaFiscal.ncm,
+                ItemNotaFiscal.cfop,
+                *(getattr(ItemNotaFiscal, campo) for campo in COLUNAS_NUMERICAS)
+            ).where(
+                ItemNotaFiscal.nota_fiscal_id.in_(list(lote))
+            ).order_by(ItemNotaFiscal.nota_fiscal_id, ItemNotaFiscal.id)
+        ).all()
+
+        colunas: Dict[str, list] = {campo: [] for campo in COLUNAS_NUMERICAS + ("ncm", "cfop", "uf")}
+        for linha in linhas:
+            nf = lote[linha.nota_fiscal_id]
+            colunas["ncm"].append(linha.ncm)
+            colunas["cfop"].append(linha.cfop or nf.cfop)
+            colunas["uf"].append(nf.uf)
+            for campo in COLUNAS_NUMERICAS:
+                colunas[campo].append(getattr(linha, campo))
+
+        calculado = calcular_itens(colunas, tabela, preservar_informados=False)
+
+        if linhas:
+            session.execute(update(ItemNotaFiscal), [
+                {"id": linha.id, **{campo: float(calculado[campo][i]) for campo in CAMPOS_GRAVADOS}}
+                for i, linha in enumerate(linhas)
+            ])
+
+        # Totais por nota a partir das colunas calculadas
+        por_nota: Dict[int, Dict[str, list]] = defaultdict(lambda: defaultdict(list))
+        for i, linha in enumerate(linhas):
+            colunas_nota = por_nota[linha.nota_fiscal_id]
+            for campo in CAMPOS_TOTALIZADOS:
+                colunas_nota[campo].append(calculado[campo][i])
+
+        session.execute(update(NotaFiscal), [
+            {"id": nf_id, **calcular_totais_nf(nf._mapping, por_nota[nf_id])}
+            for nf_id, nf in lote.items()
+        ])
+        total_itens += len(linhas)
+
+    return {"notas": len(cabecalhos), "itens": total_itens, "ignoradas": ignoradas}
@@ -0,0 +1,611 @@
+"""
+Fila de jobs em segundo plano.
+
+Operações longas (geração de contas recorrentes, baixas múltiplas, emissão de
+notas em lote...) são gravadas na tabela jobs e a requisição responde 202 com
+o endereço /jobs/{id} para acompanhamento.
+
+- Tarefas são funções registradas com @tarefa("nome") que recebem a sessão,
+  os parâmetros (JSON) e um objeto de progresso. A tarefa não faz commit: o
+  trabalho e a conclusão do job são gravados na mesma transação.
+- O executor embutido (thread de despacho + pool de processos) reivindica
+  jobs com um UPDATE condicional, então vários workers da API podem
+  compartilhar a mesma fila sem executar um job duas vezes.
+- A thread de despacho renova updated_at dos jobs que está executando a cada
+  JOBS_SINAL_VIDA_SEGUNDOS, independentemente da tarefa; só jobs sem esse
+  sinal de vida (worker encerrado) voltam para a fila.
+- Falhas são repetidas com backoff exponencial até max_tentativas; erros de
+  validação (ErroDefinitivo ou HTTPException 4xx) falham na primeira vez.
+- Uma chave de idempotência devolve o job já criado pelo mesmo usuário para a
+  mesma tarefa em vez de enfileirar outro.
+- Tarefas registradas com diaria=True são enfileiradas pela manutenção do
+  executor uma vez por dia (chave "nome:AAAA-MM-DD").
+- O mesmo executor drena o outbox de eventos de domínio (app.eventos).
+"""
+import importlib
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import SessionLocal
+from app.eventos import OUVINTES_PUBLICACAO, existem_eventos_pendentes, processar_eventos
+from app.idempotencia import limpar_respostas_expiradas
+from app.models_modules import Job, StatusJob
+
+
+logger = logging.getLogger(__name__)
+
+# Módulos que registram tarefas e consumidores de eventos (importados nos processos do pool)
+MODULOS_TAREFAS = (
+    "app.routes.compras",
+    "app.routes.financeiro",
+    "app.routes.faturamento",
+)
+
+BACKOFF_BASE_SEGUNDOS = 5
+BACKOFF_MAXIMO_SEGUNDOS = 300
+INTERVALO_PROGRESSO_SEGUNDOS = 0.5
+INTERVALO_MANUTENCAO_SEGUNDOS = 60
+
+STATUS_FINALIZADOS = (StatusJob.CONCLUIDO, StatusJob.FALHOU, StatusJob.CANCELADO)
+
+
+class ErroDefinitivo(Exception):
+    """Falha que não adianta repetir (dados inválidos, registro inexistente)"""
+
+
+class Tarefa(NamedTuple):
+    funcao: Callable[..., Optional[dict]]
+    max_tentativas: int
+    diaria: bool = False
+
+
+TAREFAS: Dict[str, Tarefa] = {}
+
+
+def tarefa(nome: str, max_tentativas: int = 3, diaria: bool = False):
+    """
+    Registra uma função como tarefa de job
+
+    A função recebe (session, parametros, progresso) e devolve um dict
+    serializável em JSON com o resultado. Com diaria=True a tarefa é
+    enfileirada automaticamente uma vez por dia, sem parâmetros.
+    """
+    def registrar(funcao):
+        TAREFAS[nome] = Tarefa(funcao, max_tentativas, diaria)
+        return funcao
+    return registrar
+
+
+# =============================================================================
+# PROGRESSO
+# =============================================================================
+
+class Progresso:
+    """
+    Atualiza progresso e mensagem do job em uma sessão própria
+
+    As gravações são limitadas a uma a cada INTERVALO_PROGRESSO_SEGUNDOS. No
+    SQLite a transação da tarefa bloqueia o banco inteiro, então o progresso
+    intermediário não é gravado (só a conclusão). O sinal de vida do job não
+    depende do progresso: é gravado pelo executor (registrar_sinal_de_vida).
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], job_id: int, ativo: bool = True):
+        self._session_factory = session_factory
+        self.job_id = job_id
+        self.ativo = ativo
+        self._ultima_gravacao = 0.0
+
+    def __call__(self, percentual: float, mensagem: Optional[str] = None) -> None:
+        if not self.ativo:
+            return
+        agora = time.monotonic()
+        if percentual < 100 and agora - self._ultima_gravacao < INTERVALO_PROGRESSO_SEGUNDOS:
+            return
+        self._ultima_gravacao = agora
+
+        valores: Dict[str, Any] = {
+            "progresso": round(max(0.0, min(percentual, 100.0)), 2),
+            "updated_at": datetime.utcnow(),
+        }
+        if mensagem is not None:
+            valores["mensagem"] = mensagem
+
+        session = self._session_factory()
+        try:
+            session.execute(update(Job).where(Job.id == self.job_id).values(**valores))
+            session.commit()
+        finally:
+            session.close()
+
+
+# =============================================================================
+# FILA
+# =============================================================================
+
+def _job_da_chave(session: Session, tipo: str, chave_idempotencia: str, usuario_id: Optional[int]) -> Optional[Job]:
+    """Job já criado com a chave pelo mesmo usuário (ou pelo sistema) para a mesma tarefa"""
+    return session.query(Job).filter(
+        Job.usuario_id == usuario_id,
+        Job.tipo == tipo,
+        Job.chave_idempotencia == chave_idempotencia
+    ).first()
+
+
+def enfileirar(
+    session: Session,
+    tipo: str,
+    parametros: Optional[dict] = None,
+    chave_idempotencia: Optional[str] = None,
+    usuario_id: Optional[int] = None
+) -> Tuple[Job, bool]:
+    """
+    Grava um job pendente e faz commit
+
+    A chave de idempotência vale por (usuario_id, tipo): a mesma chave
+    enviada por outro usuário ou para outra tarefa cria um job novo.
+    
+    Returns:
+        (job, criado) - criado=False quando a chave já existia
+
+    Raises:
+        ValueError: tarefa não registrada
+    """
+    if tipo not in TAREFAS:
+        raise ValueError(f"Tarefa não registrada: {tipo}")
+
+    if chave_idempotencia:
+        existente = _job_da_chave(session, tipo, chave_idempotencia, usuario_id)
+        if existente:
+            return existente, False
+
+    job = Job(
+        tipo=tipo,
+        parametros=parametros or {},
+        chave_idempotencia=chave_idempotencia,
+        max_tentativas=TAREFAS[tipo].max_tentativas,
+        usuario_id=usuario_id,
+        status=StatusJob.PENDENTE,
+        disponivel_em=datetime.utcnow()
+    )
+    session.add(job)
+    try:
+        session.commit()
+    except IntegrityError:
+        # Outra requisição gravou a mesma chave entre a consulta e o insert
+        session.rollback()
+        existente = _job_da_chave(session, tipo, chave_idempotencia, usuario_id) if chave_idempotencia else None
+        if not existente:
+            raise
+        return existente, False
+
+    session.refresh(job)
+    notificar_executor()
+    return job, True
+
+
+def resposta_job(job: Job) -> JSONResponse:
+    """Resposta 202 com o endereço de acompanhamento do job"""
+    url = f"/jobs/{job.id}"
+    return JSONResponse(
+        status_code=202,
+        content={
+            "message": "Operação enfileirada",
+            "job_id": job.id,
+            "status": job.status.value,
+            "status_url": url
+        },
+        headers={"Location": url}
+    )
+
+
+def reivindicar_jobs(session: Session, worker: str, limite: int = 1) -> List[int]:
+    """
+    Marca até `limite` jobs disponíveis como EXECUTANDO para este worker
+
+    Cada job é tomado com um UPDATE condicional ao status PENDENTE; se outro
+    worker chegou antes, o rowcount é zero e o job é ignorado.
+    """
+    agora = datetime.utcnow()
+    candidatos = session.execute(
+        select(Job.id).where(
+            Job.status == StatusJob.PENDENTE,
+            Job.disponivel_em <= agora
+        ).order_by(Job.disponivel_em, Job.id).limit(limite * 2)
+    ).scalars().all()
+
+    reivindicados: List[int] = []
+    for job_id in candidatos:
+        resultado = session.execute(
+            update(Job).where(
+                Job.id == job_id,
+                Job.status == StatusJob.PENDENTE
+            ).values(
+                status=StatusJob.EXECUTANDO,
+                worker=worker,
+                tentativas=Job.tentativas + 1,
+                iniciado_em=agora,
+                updated_at=agora
+            )
+        )
+        if resultado.rowcount:
+            reivindicados.append(job_id)
+            if len(reivindicados) >= limite:
+                break
+
+    session.commit()
+    return reivindicados
+
+
+def _falha_definitiva(erro: Exception) -> bool:
+    if isinstance(erro, ErroDefinitivo):
+        return True
+    return isinstance(erro, HTTPException) and erro.status_code < 500
+
+
+def _mensagem_erro(erro: Exception) -> str:
+    if isinstance(erro, HTTPException):
+        return str(erro.detail)
+    return str(erro) or erro.__class__.__name__
+
+
+def _registrar_falha(session: Session, job_id: int, erro: Exception) -> None:
+    """Agenda nova tentativa com backoff ou encerra o job como FALHOU"""
+    job = session.get(Job, job_id)
+    if job is None:
+        return
+
+    agora = datetime.utcnow()
+    job.erro = _mensagem_erro(erro)
+    job.worker = None
+
+    if _falha_definitiva(erro) or (job.tentativas or 0) >= (job.max_tentativas or 1):
+        job.status = StatusJob.FALHOU
+        job.concluido_em = agora
+    else:
+        espera = min(BACKOFF_BASE_SEGUNDOS * 2 ** ((job.tentativas or 1) - 1), BACKOFF_MAXIMO_SEGUNDOS)
+        job.status = StatusJob.PENDENTE
+        job.disponivel_em = agora + timedelta(seconds=espera)
+
+    session.commit()
+
+
+def executar_job(job_id: int, session_factory: Optional[Callable[[], Session]] = None) -> Optional[StatusJob]:
+    """
+    Executa um job já reivindicado (status EXECUTANDO)
+
+    O resultado da tarefa e a conclusão do job são gravados no mesmo commit;
+    em caso de erro a transação da tarefa é desfeita antes de registrar a falha.
+    """
+    session_factory = session_factory or SessionLocal
+    session = session_factory()
+    try:
+        job = session.get(Job, job_id)
+        if job is None or job.status != StatusJob.EXECUTANDO:
+            return None
+
+        registrada = TAREFAS.get(job.tipo)
+        try:
+            if registrada is None:
+                raise ErroDefinitivo(f"Tarefa não registrada: {job.tipo}")
+
+            resultado = registrada.funcao(
+                session, dict(job.parametros or {}),
+                Progresso(session_factory, job_id, ativo=session.get_bind().dialect.name != "sqlite")
+            )
+
+            job.status = StatusJob.CONCLUIDO
+            job.resultado = resultado if isinstance(resultado, dict) else {"valor": resultado}
+            job.progresso = 100.0
+            job.erro = None
+            job.concluido_em = datetime.utcnow()
+            session.commit()
+            return StatusJob.CONCLUIDO
+        except Exception as erro:
+            session.rollback()
+            _registrar_falha(session, job_id, erro)
+            return session.get(Job, job_id).status
+    finally:
+        session.close()
+
+
+def processar_pendentes(
+    session_factory: Optional[Callable[[], Session]] = None,
+    limite: int = 100,
+    worker: str = "sincrono"
+) -> int:
+    """Executa os jobs disponíveis no próprio processo (scripts, testes, cron)"""
+    session_factory = session_factory or SessionLocal
+    executados = 0
+
+    while executados < limite:
+        session = session_factory()
+        try:
+            ids = reivindicar_jobs(session, worker, 1)
+        finally:
+            session.close()
+        if not ids:
+            break
+        executar_job(ids[0], session_factory)
+        executados += 1
+
+    return executados
+
+
+def cancelar_job(session: Session, job: Job) -> bool:
+    """Cancela um job que ainda não começou; não faz commit"""
+    if job.status != StatusJob.PENDENTE:
+        return False
+    job.status = StatusJob.CANCELADO
+    job.concluido_em = datetime.utcnow()
+    return True
+
+
+def reprocessar_job(session: Session, job: Job) -> bool:
+    """Devolve à fila um job que falhou, zerando as tentativas; não faz commit"""
+    if job.status != StatusJob.FALHOU:
+        return False
+    job.status = StatusJob.PENDENTE
+    job.tentativas = 0
+    job.erro = None
+    job.progresso = 0.0
+    job.concluido_em = None
+    job.disponivel_em = datetime.utcnow()
+    return True
+
+
+def registrar_sinal_de_vida(session: Session, worker: str, job_ids: List[int]) -> int:
+    """Renova updated_at dos jobs que o worker ainda está executando"""
+    if not job_ids:
+        return 0
+    atualizados = session.execute(
+        update(Job).where(
+            Job.id.in_(job_ids),
+            Job.status == StatusJob.EXECUTANDO,
+            Job.worker == worker
+        ).values(updated_at=datetime.utcnow())
+    ).rowcount
+    session.commit()
+    return atualizados
+
+
+def recuperar_jobs_orfaos(session: Session, timeout_segundos: int) -> int:
+    """
+    Jobs EXECUTANDO sem sinal de vida voltam para a fila (ou falham)
+    
+    O executor renova updated_at de cada job em andamento a cada
+    JOBS_SINAL_VIDA_SEGUNDOS, mesmo que a tarefa não grave progresso; um job
+    parado há mais de timeout_segundos pertence a um worker que não existe mais.
+    """
+    limite = datetime.utcnow() - timedelta(seconds=timeout_segundos)
+    orfao = (Job.status == StatusJob.EXECUTANDO) & (Job.updated_at < limite)
+
+    falhos = session.execute(
+        update(Job).where(orfao, Job.tentativas >= Job.max_tentativas).values(
+            status=StatusJob.FALHOU,
+            erro="Tempo limite de execução excedido",
+            worker=None,
+            concluido_em=datetime.utcnow()
+        )
+    ).rowcount
+    devolvidos = session.execute(
+        update(Job).where(orfao).values(status=StatusJob.PENDENTE, worker=None)
+    ).rowcount
+    session.commit()
+    return falhos + devolvidos
+
+
+def agendar_tarefas_diarias(session: Session, hoje: Optional[date] = None) -> int:
+    """Enfileira as tarefas diárias ainda não enfileiradas hoje; devolve quantas foram criadas"""
+    hoje = hoje or datetime.utcnow().date()
+    criados = 0
+    for nome, registrada in TAREFAS.items():
+        if registrada.diaria:
+            _job, criado = enfileirar(session, nome, chave_idempotencia=f"{nome}:{hoje.isoformat()}")
+            criados += criado
+    return criados
+
+
+def limpar_jobs_finalizados(session: Session, dias: int) -> int:
+    """Remove jobs finalizados há mais de `dias` dias"""
+    removidos = session.execute(
+        delete(Job).where(
+            Job.status.in_(STATUS_FINALIZADOS),
+            Job.concluido_em < datetime.utcnow() - timedelta(days=dias)
+        )
+    ).rowcount
+    session.commit()
+    return removidos
+
+
+# =============================================================================
+# EXECUTOR EMBUTIDO
+# =============================================================================
+
+def _inicializar_processo() -> None:
+    """Processo do pool: descarta conexões herdadas e registra as tarefas"""
+    from app.db import engine
+    engine.dispose(close=False)
+    for modulo in MODULOS_TAREFAS:
+        importlib.import_module(modulo)
+
+
+def _executar_no_processo(job_id: int) -> Optional[StatusJob]:
+    return executar_job(job_id)
+
+
+def _processar_eventos_no_processo() -> int:
+    return processar_eventos()
+
+
+class ExecutorJobs:
+    """
+    Thread de despacho que alimenta um pool de processos
+
+    A thread reivindica no máximo tantos jobs quantos processos livres houver,
+    então a fila nunca é esvaziada por um único worker da API.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        intervalo: float = 1.0,
+        session_factory: Callable[[], Session] = SessionLocal
+    ):
+        self.workers = workers
+        self.intervalo = intervalo
+        self.session_factory = session_factory
+        self.nome = f"{socket.gethostname()}:{os.getpid()}"
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._em_andamento: Dict[Future, int] = {}
+        self._eventos: Optional[Future] = None
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ultima_manutencao = 0.0
+        self._ultimo_sinal_vida = 0.0
+
+    def iniciar(self) -> None:
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_inicializar_processo)
+        self._thread = threading.Thread(target=self._laco, name="executor-jobs", daemon=True)
+        self._thread.start()
+
+    def notificar(self) -> None:
+        self._acordar.set()
+
+    def parar(self) -> None:
+        self._parar.set()
+        self._acordar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        if self._pool is not None:
+            # Jobs em execução terminam nos processos; os não iniciados voltam
+            # para a fila pela recuperação de órfãos
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _manutencao(self) -> None:
+        agora = time.monotonic()
+        if agora - self._ultima_manutencao < INTERVALO_MANUTENCAO_SEGUNDOS:
+            return
+        self._ultima_manutencao = agora
+
+        session = self.session_factory()
+        try:
+            recuperar_jobs_orfaos(session, settings.JOBS_TIMEOUT_SEGUNDOS)
+            limpar_jobs_finalizados(session, settings.JOBS_RETENCAO_DIAS)
+            limpar_respostas_expiradas(session)
+            agendar_tarefas_diarias(session)
+        finally:
+            session.close()
+
+    def _sinal_de_vida(self) -> None:
+        """Sinal de vida dos jobs em andamento, gravado pelo despacho e não pela tarefa"""
+        agora = time.monotonic()
+        if not self._em_andamento or agora - self._ultimo_sinal_vida < settings.JOBS_SINAL_VIDA_SEGUNDOS:
+            return
+        self._ultimo_sinal_vida = agora
+
+        session = self.session_factory()
+        try:
+            registrar_sinal_de_vida(session, self.nome, list(self._em_andamento.values()))
+        except OperationalError:
+            # SQLite: a transação de uma tarefa segura o banco; fica para o próximo intervalo
+            session.rollback()
+            self._ultimo_sinal_vida = 0.0
+        finally:
+            session.close()
+
+    def _despachar_eventos(self) -> None:
+        """Um único dreno do outbox por vez, no pool"""
+        if self._eventos is not None and not self._eventos.done():
+            return
+        session = self.session_factory()
+        try:
+            pendentes = existem_eventos_pendentes(session)
+        finally:
+            session.close()
+        if pendentes:
+            self._eventos = self._pool.submit(_processar_eventos_no_processo)
+
+    def _laco(self) -> None:
+        while not self._parar.is_set():
+            try:
+                self._em_andamento = {f: job_id for f, job_id in self._em_andamento.items() if not f.done()}
+                self._sinal_de_vida()
+                self._manutencao()
+                livres = self.workers - len(self._em_andamento)
+
+                if livres > 0:
+                    session = self.session_factory()
+                    try:
+                        ids = reivindicar_jobs(session, self.nome, livres)
+                    finally:
+                        session.close()
+                    for job_id in ids:
+                        self._em_andamento[self._pool.submit(_executar_no_processo, job_id)] = job_id
+
+                self._despachar_eventos()
+            except Exception:
+                logger.exception("Erro no despacho de jobs")
+
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+
+
+_executor: Optional[ExecutorJobs] = None
+
+
+def iniciar_executor() -> None:
+    """Inicia o executor embutido se JOBS_WORKERS > 0 (startup da aplicação)"""
+    global _executor
+    if _executor is None and settings.JOBS_WORKERS > 0:
+        _executor = ExecutorJobs(settings.JOBS_WORKERS, settings.JOBS_INTERVALO_SEGUNDOS)
+        _executor.iniciar()
+
+
+def parar_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.parar()
+        _executor = None
+
+
+def notificar_executor() -> None:
+    """Acorda o despacho para pegar um job recém-enfileirado"""
+    if _executor is not None:
+        _executor.notificar()
+
+
+OUVINTES_PUBLICACAO.append(notificar_executor)
+
+
+def executar_worker_dedicado() -> None:
+    """Worker fora da API (python -m app.jobs), com JOBS_WORKERS processos"""
+    logging.basicConfig(level=settings.LOG_LEVEL)
+    _inicializar_processo()
+    executor = ExecutorJobs(max(settings.JOBS_WORKERS, 1), settings.JOBS_INTERVALO_SEGUNDOS)
+    executor.iniciar()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        executor.parar()
+
+
+if __name__ == "__main__":
+    # Importa pelo nome do pacote para usar o mesmo registro de tarefas das rotas
+    from app.jobs import executar_worker_dedicado as _executar
+    _executar()
@@ -0,0 +1,320 @@
+"""
+Instrumentação de requisições e consultas SQL.
+
+- MiddlewareMetricas mede cada requisição HTTP (latência por rota, status)
+  e abre um contexto por requisição.
+- Os eventos before/after_cursor_execute do SQLAlchemy contam e cronometram
+  cada comando SQL no contexto da requisição corrente (a ContextVar segue
+  a requisição até o threadpool dos endpoints síncronos).
+- Detecção de N+1: quando a mesma forma de comando (literais e listas IN
+  normalizados) roda mais de METRICAS_LIMITE_N_MAIS_UM vezes numa requisição,
+  um aviso é registrado no log e no contador http_n_mais_um_total.
+- exportar_prometheus() gera o formato texto do Prometheus para /metrics.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_SQL = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+ROTA_DESCONHECIDA = "desconhecida"
+
+
+# =============================================================================
+# MÉTRICAS
+# =============================================================================
+
+Rotulos = Tuple[Tuple[str, str], ...]
+
+
+def _rotulos(**valores: str) -> Rotulos:
+    return tuple(sorted(valores.items()))
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatar_rotulos(rotulos: Rotulos, extra: Optional[Tuple[str, str]] = None) -> str:
+    pares = list(rotulos) + ([extra] if extra else [])
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{nome}="{_escapar(str(valor))}"' for nome, valor in pares) + "}"
+
+
+class Contador:
+    def __init__(self, nome: str, ajuda: str):
+        self.nome = nome
+        self.ajuda = ajuda
+        self._valores: Dict[Rotulos, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, rotulos: Rotulos = (), valor: float = 1.0) -> None:
+        with self._lock:
+            self._valores[rotulos] = self._valores.get(rotulos, 0.0) + valor
+
+    def valor(self, rotulos: Rotulos = ()) -> float:
+        return self._valores.get(rotulos, 0.0)
+
+    def exportar(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} counter"]
+        with self._lock:
+            for rotulos, valor in sorted(self._valores.items()):
+                linhas.append(f"{self.nome}{_formatar_rotulos(rotulos)} {valor:g}")
+        return linhas
+
+
+class Medidor(Contador):
+    def dec(self, rotulos: Rotulos = (), valor: float = 1.0) -> None:
+        self.inc(rotulos, -valor)
+
+    def exportar(self) -> List[str]:
+        linhas = super().exportar()
+        linhas[1] = f"# TYPE {self.nome} gauge"
+        return linhas
+
+
+class Histograma:
+    def __init__(self, nome: str, ajuda: str, buckets: Sequence[float]):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.buckets = tuple(sorted(buckets))
+        # rotulos -> [contagem por bucket..., soma, total]
+        self._series: Dict[Rotulos, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, rotulos: Rotulos = ()) -> None:
+        with self._lock:
+            serie = self._series.get(rotulos)
+            if serie is None:
+                serie = self._series[rotulos] = [0.0] * (len(self.buckets) + 2)
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[i] += 1
+                    break
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def total(self, rotulos: Rotulos = ()) -> float:
+        serie = self._series.get(rotulos)
+        return serie[-1] if serie else 0.0
+
+    def exportar(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        with self._lock:
+            for rotulos, serie in sorted(self._series.items()):
+                acumulado = 0.0
+                for limite, quantidade in zip(self.buckets, serie):
+                    acumulado += quantidade
+                    linhas.append(
+                        f"{self.nome}_bucket{_formatar_rotulos(rotulos, ('le', f'{limite:g}'))} {acumulado:g}"
+                    )
+                linhas.append(f"{self.nome}_bucket{_formatar_rotulos(rotulos, ('le', '+Inf'))} {serie[-1]:g}")
+                linhas.append(f"{self.nome}_sum{_formatar_rotulos(rotulos)} {serie[-2]:.6f}")
+                linhas.append(f"{self.nome}_count{_formatar_rotulos(rotulos)} {serie[-1]:g}")
+        return linhas
+
+
+requisicoes_total = Contador("http_requisicoes_total", "Requisições HTTP por método, rota e status")
+requisicoes_em_andamento = Medidor("http_requisicoes_em_andamento", "Requisições HTTP em execução")
+latencia_requisicao = Histograma(
+    "http_requisicao_duracao_segundos", "Latência das requisições HTTP por rota", BUCKETS_LATENCIA
+)
+consultas_por_requisicao = Histograma(
+    "http_sql_consultas_por_requisicao", "Comandos SQL executados por requisição", BUCKETS_CONSULTAS
+)
+sql_por_requisicao = Histograma(
+    "http_sql_duracao_segundos", "Tempo total em SQL por requisição", BUCKETS_LATENCIA
+)
+duracao_sql = Histograma("sql_comando_duracao_segundos", "Duração de cada comando SQL", BUCKETS_SQL)
+n_mais_um_total = Contador("http_n_mais_um_total", "Requisições com o mesmo comando SQL repetido acima do limite")
+
+METRICAS = [
+    requisicoes_total, requisicoes_em_andamento, latencia_requisicao,
+    consultas_por_requisicao, sql_por_requisicao, duracao_sql, n_mais_um_total,
+]
+
+
+def exportar_prometheus() -> str:
+    linhas: List[str] = []
+    for metrica in METRICAS:
+        linhas.extend(metrica.exportar())
+    return "\n".join(linhas) + "\n"
+
+
+# =============================================================================
+# CONTEXTO DA REQUISIÇÃO E EVENTOS SQL
+# =============================================================================
+
+_LISTA_PARAMETROS = re.compile(r"\(\s*(?:\?|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+))*\s*\)")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_ESPACOS = re.compile(r"\s+")
+
+
+def forma_comando(sql: str) -> str:
+    """Forma do comando: literais e listas de parâmetros viram ?"""
+    forma = _LITERAL.sub("?", sql)
+    forma = _LISTA_PARAMETROS.sub("(?)", forma)
+    return _ESPACOS.sub(" ", forma).strip()
+
+
+class ContextoRequisicao:
+    """SQL executado durante uma requisição"""
+
+    __slots__ = (
+        "metodo", "caminho", "inicio", "thread_id", "consultas", "segundos_sql",
+        "formas", "segundos_por_forma", "amostras"
+    )
+
+    def __init__(self, metodo: str, caminho: str):
+        self.metodo = metodo
+        self.caminho = caminho
+        self.inicio = time.perf_counter()
+        # Thread que executa a requisição (atualizada a cada SQL: endpoints
+        # síncronos rodam no threadpool)
+        self.thread_id = threading.get_ident()
+        self.consultas = 0
+        self.segundos_sql = 0.0
+        self.formas: Counter = Counter()
+        self.segundos_por_forma: Dict[str, float] = {}
+        # Pilhas amostradas pelo perfilador (app.perfilador)
+        self.amostras: Counter = Counter()
+
+    def registrar(self, sql: str, segundos: float) -> None:
+        forma = forma_comando(sql)
+        self.thread_id = threading.get_ident()
+        self.consultas += 1
+        self.segundos_sql += segundos
+        self.formas[forma] += 1
+        self.segundos_por_forma[forma] = self.segundos_por_forma.get(forma, 0.0) + segundos
+
+    def repetidas(self, limite: int) -> List[Tuple[str, int]]:
+        return [(forma, n) for forma, n in self.formas.most_common() if n > limite]
+
+
+requisicao_atual: ContextVar[Optional[ContextoRequisicao]] = ContextVar("requisicao_atual", default=None)
+
+# Requisições em execução (lidas pelo perfilador)
+requisicoes_ativas: Set[ContextoRequisicao] = set()
+
+# Chamados com (contexto, rota, status, segundos) ao fim de cada requisição
+OUVINTES_FIM_REQUISICAO: List[Callable[[ContextoRequisicao, str, int, float], None]] = []
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes_comando(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("inicio_comandos", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _depois_comando(conn, cursor, statement, parameters, context, executemany):
+    inicios = conn.info.get("inicio_comandos")
+    if not inicios:
+        return
+    segundos = time.perf_counter() - inicios.pop()
+    duracao_sql.observar(segundos)
+
+    contexto = requisicao_atual.get()
+    if contexto is not None:
+        contexto.registrar(statement, segundos)
+
+
+@event.listens_for(Engine, "handle_error")
+def _erro_comando(contexto_erro):
+    conn = contexto_erro.connection
+    if conn is not None and conn.info.get("inicio_comandos"):
+        conn.info["inicio_comandos"].pop()
+
+
+# =============================================================================
+# MIDDLEWARE
+# =============================================================================
+
+def _rota(scope) -> str:
+    """Modelo da rota (/vendas/pedidos/{pedido_id}) para não explodir a cardinalidade"""
+    modelo = getattr(scope.get("route"), "path", None)
+    if not modelo:
+        return ROTA_DESCONHECIDA
+    # Conforme a versão do FastAPI, rotas de routers incluídos vêm sem o
+    # prefixo; ele é recuperado dos primeiros segmentos do caminho
+    partes = scope["path"].split("/")
+    return "/".join(partes[:max(len(partes) - modelo.count("/"), 1)]) + modelo
+
+
+def finalizar_requisicao(contexto: ContextoRequisicao, rota: str, status: int, segundos: float) -> None:
+    """Registra as métricas da requisição e avisa sobre N+1"""
+    rotulos = _rotulos(metodo=contexto.metodo, rota=rota)
+    requisicoes_total.inc(_rotulos(metodo=contexto.metodo, rota=rota, status=str(status)))
+    latencia_requisicao.observar(segundos, rotulos)
+    consultas_por_requisicao.observar(contexto.consultas, rotulos)
+    sql_por_requisicao.observar(contexto.segundos_sql, rotulos)
+
+    repetidas = contexto.repetidas(settings.METRICAS_LIMITE_N_MAIS_UM)
+    if repetidas:
+        n_mais_um_total.inc(rotulos)
+        forma, vezes = repetidas[0]
+        logger.warning(
+            "Possível N+1 em %s %s: comando repetido %d vezes (%d consultas no total): %s",
+            contexto.metodo, rota, vezes, contexto.consultas, forma[:300]
+        )
+
+    for ouvinte in OUVINTES_FIM_REQUISICAO:
+        try:
+            ouvinte(contexto, rota, status, segundos)
+        except Exception:
+            logger.exception("Erro ao processar o fim da requisição")
+
+
+class MiddlewareMetricas:
+    """Middleware ASGI: mede até o último byte do corpo (inclui streaming)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.METRICAS_HABILITADAS:
+            await self.app(scope, receive, send)
+            return
+
+        contexto = ContextoRequisicao(scope["method"], scope["path"])
+        token = requisicao_atual.set(contexto)
+        requisicoes_ativas.add(contexto)
+        inicio = contexto.inicio
+        status = 500
+        rotulo_andamento = _rotulos(metodo=contexto.metodo)
+        requisicoes_em_andamento.inc(rotulo_andamento)
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+                segundos = time.perf_counter() - inicio
+                cabecalhos = list(mensagem.get("headers", []))
+                cabecalhos.append((
+                    b"server-timing",
+                    f"app;dur={segundos * 1000:.1f}, sql;dur={contexto.segundos_sql * 1000:.1f};desc=\"{contexto.consultas}\"".encode()
+                ))
+                mensagem = {**mensagem, "headers": cabecalhos}
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            requisicao_atual.reset(token)
+            requisicoes_ativas.discard(contexto)
+            requisicoes_em_andamento.dec(rotulo_andamento)
+            finalizar_requisicao(contexto, _rota(scope), status, time.perf_counter() - inicio)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum as SQLEnum, UniqueConstraint, Date, Boolean, Index, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum as SQLEnum, UniqueConstraint, Date, Boolean, Index, JSON, LargeBinary, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -87,6 +87,14 @@ class FormaPagamento(str, enum.Enum):
     CHEQUE = "cheque"
 
 
+class StatusJob(str, enum.Enum):
+    PENDENTE = "pendente"
+    EXECUTANDO = "executando"
+    CONCLUIDO = "concluido"
+    FALHOU = "falhou"
+    CANCELADO = "cancelado"
+
+
 # =============================================================================
 # MÓDULO DE COMPRAS
 # =============================================================================
@@ -123,6 +131,7 @@ class PedidoCompra(Base):
     status = Column(SQLEnum(StatusCompra), default=StatusCompra.RASCUNHO)
     valor_total = Column(Float, default=0.0)
     observacoes = Column(Text)
+    data_recebimento = Column(DateTime, nullable=True)  # Recebimento completo
     created_by = Column(Integer)  # ID do usuário que criou
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -143,12 +152,45 @@ class ItemPedidoCompra(Base):
     unidade = Column(String)
     preco_unitario = Column(Float, nullable=False)
     preco_total = Column(Float, nullable=False)
+    quantidade_recebida = Column(Float, default=0.0)
     
     # Relacionamentos
     pedido = relationship("PedidoCompra", back_populates="itens")
     material = relationship("Material")
 
 
+class HistoricoPreco(Base):
+    """
+    Resumo incremental dos preços praticados por (material, fornecedor)
+
+    Atualizado na mesma transação da aprovação do pedido de compra ou da
+    resposta de cotação; as consultas de preço leem só esta tabela.
+    """
+    __tablename__ = "historico_precos"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    material_id = Column(Integer, ForeignKey("materiais.id"), nullable=False)
+    fornecedor_id = Column(Integer, ForeignKey("fornecedores.id"), nullable=False)
+    ultimo_preco = Column(Float, nullable=False)
+    preco_minimo = Column(Float, nullable=False)
+    preco_maximo = Column(Float, nullable=False)
+    soma_precos = Column(Float, nullable=False, default=0.0)
+    observacoes = Column(Integer, nullable=False, default=0)
+    media_movel = Column(Float, nullable=False)  # média exponencial (peso maior aos preços recentes)
+    ultima_origem = Column(String)  # "pedido" ou "cotacao"
+    data_ultimo_preco = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relacionamentos
+    material = relationship("Material")
+    fornecedor = relationship("Fornecedor")
+    
+    __table_args__ = (
+        UniqueConstraint('material_id', 'fornecedor_id', name='uk_historico_preco_material_fornecedor'),
+        Index('ix_historico_precos_fornecedor', 'fornecedor_id'),
+    )
+
+
 class Cotacao(Base):
     __tablename__ = "cotacoes"
     
@@ -323,6 +365,10 @@ class ContaPagar(Base):
     # Campos financeiros
     juros = Column(Float, default=0.0)
     desconto = Column(Float, default=0.0)
+    # Encargos por atraso apurados pela varredura de vencimentos (já somados em juros)
+    multa_apurada = Column(Float, default=0.0)
+    juros_mora_apurados = Column(Float, default=0.0)
+    data_apuracao_encargos = Column(Date, nullable=True)
     forma_pagamento = Column(SQLEnum(FormaPagamento), nullable=True)
     numero_documento = Column(String, nullable=True)
     
@@ -369,6 +415,10 @@ class ContaReceber(Base):
     # Campos financeiros
     juros = Column(Float, default=0.0)
     desconto = Column(Float, default=0.0)
+    # Encargos por atraso apurados pela varredura de vencimentos (já somados em juros)
+    multa_apurada = Column(Float, default=0.0)
+    juros_mora_apurados = Column(Float, default=0.0)
+    data_apuracao_encargos = Column(Date, nullable=True)
     forma_pagamento = Column(SQLEnum(FormaPagamento), nullable=True)
     numero_documento = Column(String, nullable=True)
     
@@ -402,6 +452,10 @@ class ParcelaContaPagar(Base):
     valor_pago = Column(Float, default=0.0)
     juros = Column(Float, default=0.0)
     desconto = Column(Float, default=0.0)
+    # Encargos por atraso apurados pela varredura de vencimentos (já somados em juros)
+    multa_apurada = Column(Float, default=0.0)
+    juros_mora_apurados = Column(Float, default=0.0)
+    data_apuracao_encargos = Column(Date, nullable=True)
     status = Column(SQLEnum(StatusPagamento), default=StatusPagamento.PENDENTE)
     observacoes = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -409,6 +463,11 @@ class ParcelaContaPagar(Base):
     
     # Relacionamentos
     conta_pagar = relationship("ContaPagar", back_populates="parcelas")
+    
+    # Indexes
+    __table_args__ = (
+        Index('ix_parcelas_conta_pagar_conta', 'conta_pagar_id'),
+    )
 
 
 class ParcelaContaReceber(Base):
@@ -424,6 +483,10 @@ class ParcelaContaReceber(Base):
     valor_recebido = Column(Float, default=0.0)
     juros = Column(Float, default=0.0)
     desconto = Column(Float, default=0.0)
+    # Encargos por atraso apurados pela varredura de vencimentos (já somados em juros)
+    multa_apurada = Column(Float, default=0.0)
+    juros_mora_apurados = Column(Float, default=0.0)
+    data_apuracao_encargos = Column(Date, nullable=True)
     status = Column(SQLEnum(StatusPagamento), default=StatusPagamento.PENDENTE)
     observacoes = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -431,6 +494,11 @@ class ParcelaContaReceber(Base):
     
     # Relacionamentos
     conta_receber = relationship("ContaReceber", back_populates="parcelas")
+    
+    # Indexes
+    __table_args__ = (
+        Index('ix_parcelas_conta_receber_conta', 'conta_receber_id'),
+    )
 
 
 class ContaRecorrente(Base):
@@ -574,6 +642,11 @@ class MovimentoEstoque(Base):
     material = relationship("Material", back_populates="movimentos")
     local_origem = relationship("LocalEstoque", foreign_keys=[local_origem_id])
     local_destino = relationship("LocalEstoque", foreign_keys=[local_destino_id])
+    
+    # Indexes
+    __table_args__ = (
+        Index('ix_movimentos_estoque_origem_tipo_data', 'local_origem_id', 'tipo_movimento', 'data_movimento'),
+    )
 
 
 # =============================================================================
@@ -628,6 +701,21 @@ class Cliente(Base):
     pedidos_venda = relationship("PedidoVenda", back_populates="cliente")
 
 
+class ExposicaoCredito(Base):
+    """Saldo em aberto de contas a receber e pedidos aprovados, por cliente (mantido por app.credito)"""
+    __tablename__ = "exposicao_credito"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cliente_id = Column(Integer, ForeignKey("clientes.id"), nullable=False)
+    receber_aberto = Column(Float, default=0.0, nullable=False)
+    pedidos_aprovados = Column(Float, default=0.0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('cliente_id', name='uk_exposicao_credito_cliente'),
+    )
+
+
 # -----------------------------------------------------------------------------
 # PEDIDOS DE VENDA
 # -----------------------------------------------------------------------------
@@ -659,6 +747,9 @@ class PedidoVenda(Base):
     
     observacoes = Column(Text, nullable=True)
     
+    # Local onde o estoque do pedido foi reservado na aprovação
+    local_reserva_id = Column(Integer, ForeignKey("locais_estoque.id"), nullable=True)
+    
     # Controle
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -767,6 +858,26 @@ class EstoquePorLocal(Base):
     # Unique constraint
     __table_args__ = (
         UniqueConstraint('material_id', 'local_id', name='uk_material_local'),
+        Index('ix_estoque_por_local_local_quantidade', 'local_id', 'quantidade'),
+    )
+
+
+# -----------------------------------------------------------------------------
+# ESTOQUE RESERVADO
+# -----------------------------------------------------------------------------
+
+class EstoqueReservado(Base):
+    """Quantidade reservada por pedidos aprovados e ainda não faturados"""
+    __tablename__ = "estoque_reservado"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    material_id = Column(Integer, ForeignKey("materiais.id"), nullable=False)
+    local_id = Column(Integer, ForeignKey("locais_estoque.id"), nullable=False)
+    quantidade = Column(Float, default=0.0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint('material_id', 'local_id', name='uk_reserva_material_local'),
     )
 
 
@@ -811,11 +922,15 @@ class NotaFiscal(Base):
     # Fiscal
     chave_acesso = Column(String)  # Chave de 44 dígitos (NFe)
     protocolo_autorizacao = Column(String)
+    xml_nfe = Column(Text)  # XML assinado enviado à autorizadora
     
     # Natureza da operação
     natureza_operacao = Column(String, default="Venda de mercadoria")
     cfop = Column(String)  # Código Fiscal de Operações
     
+    # Local de estoque da baixa/entrada (vazio = local padrão)
+    local_estoque_id = Column(Integer, ForeignKey("locais_estoque.id"), nullable=True)
+    
     # Observações
     observacao = Column(Text)
     informacoes_adicionais = Column(Text)
@@ -830,6 +945,11 @@ class NotaFiscal(Base):
     cliente = relationship("Cliente")
     fornecedor = relationship("Fornecedor")
     itens = relationship("ItemNotaFiscal", back_populates="nota_fiscal", cascade="all, delete-orphan")
+    
+    # Indexes
+    __table_args__ = (
+        Index('ix_notas_fiscais_emissao_status', 'data_emissao', 'status'),
+    )
 
 
 class ItemNotaFiscal(Base):
@@ -858,6 +978,10 @@ class ItemNotaFiscal(Base):
     valor_icms = Column(Float, default=0.0)
     aliquota_ipi = Column(Float, default=0.0)
     valor_ipi = Column(Float, default=0.0)
+    aliquota_pis = Column(Float, default=0.0)
+    valor_pis = Column(Float, default=0.0)
+    aliquota_cofins = Column(Float, default=0.0)
+    valor_cofins = Column(Float, default=0.0)
     
     # Total
     valor_total = Column(Float, nullable=False)
@@ -868,3 +992,144 @@ class ItemNotaFiscal(Base):
     # Relacionamentos
     nota_fiscal = relationship("NotaFiscal", back_populates="itens")
     material = relationship("Material")
+
+
+# -----------------------------------------------------------------------------
+# ALÍQUOTAS TRIBUTÁRIAS
+# -----------------------------------------------------------------------------
+
+class AliquotaTributaria(Base):
+    """
+    Alíquotas de ICMS/IPI/PIS/COFINS por NCM, CFOP e UF de destino
+    
+    NCM/CFOP/UF vazios funcionam como curinga. Cada imposto é resolvido
+    separadamente pela regra mais específica que o define (alíquota nula =
+    herda da regra mais genérica).
+    """
+    __tablename__ = "aliquotas_tributarias"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    ncm = Column(String)
+    cfop = Column(String)
+    uf = Column(String(2))
+    aliquota_icms = Column(Float)
+    aliquota_ipi = Column(Float)
+    aliquota_pis = Column(Float)
+    aliquota_cofins = Column(Float)
+    ativo = Column(Integer, default=1)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint('ncm', 'cfop', 'uf', name='uk_aliquota_ncm_cfop_uf'),
+    )
+
+
+# =============================================================================
+# JOBS EM SEGUNDO PLANO
+# =============================================================================
+
+class Job(Base):
+    """Operação longa enfileirada para execução fora da requisição HTTP"""
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    tipo = Column(String, nullable=False)  # Nome da tarefa registrada
+    status = Column(SQLEnum(StatusJob), default=StatusJob.PENDENTE, nullable=False)
+    parametros = Column(JSON)
+    resultado = Column(JSON)
+    erro = Column(Text)
+    
+    # Progresso (0-100) e mensagem da etapa atual
+    progresso = Column(Float, default=0.0)
+    mensagem = Column(String)
+    
+    # Retentativas
+    tentativas = Column(Integer, default=0)
+    max_tentativas = Column(Integer, default=3)
+    disponivel_em = Column(DateTime, default=datetime.utcnow)  # Próxima execução (backoff)
+    
+    # Idempotência: a mesma chave do mesmo usuário devolve o job já criado
+    chave_idempotencia = Column(String, nullable=True)
+    
+    # Controle
+    worker = Column(String)
+    usuario_id = Column(Integer)
+    iniciado_em = Column(DateTime)
+    concluido_em = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Indexes
+    __table_args__ = (
+        Index('ix_jobs_status_disponivel', 'status', 'disponivel_em'),
+        Index('uk_jobs_usuario_chave', 'usuario_id', 'tipo', 'chave_idempotencia', unique=True),
+        # Jobs do sistema (usuario_id nulo, ex.: tarefas diárias): NULL não colide no índice acima
+        Index(
+            'uk_jobs_sistema_chave', 'tipo', 'chave_idempotencia', unique=True,
+            sqlite_where=text('usuario_id IS NULL'), postgresql_where=text('usuario_id IS NULL')
+        ),
+    )
+
+
+# =============================================================================
+# EVENTOS DE DOMÍNIO (OUTBOX)
+# =============================================================================
+
+class EventoDominio(Base):
+    """Evento gravado na mesma transação da alteração de negócio"""
+    __tablename__ = "eventos_dominio"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    tipo = Column(String, nullable=False, index=True)  # PedidoFaturado, NFEmitida...
+    agregado = Column(String, nullable=False)  # pedido_venda, nota_fiscal, conta_pagar...
+    agregado_id = Column(Integer, nullable=False)
+    dados = Column(JSON)
+    usuario_id = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Indexes
+    __table_args__ = (
+        Index('ix_eventos_dominio_agregado', 'agregado', 'agregado_id'),
+    )
+
+
+class ConsumoEvento(Base):
+    """Processamento de um evento por um consumidor (garante a idempotência)"""
+    __tablename__ = "consumos_evento"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    consumidor = Column(String, nullable=False)
+    evento_id = Column(Integer, ForeignKey("eventos_dominio.id", ondelete="CASCADE"), nullable=False)
+    concluido = Column(Integer, default=0)
+    tentativas = Column(Integer, default=0)
+    erro = Column(Text)
+    processado_em = Column(DateTime)
+    
+    __table_args__ = (
+        UniqueConstraint('consumidor', 'evento_id', name='uk_consumo_evento'),
+    )
+
+
+# =============================================================================
+# IDEMPOTÊNCIA
+# =============================================================================
+
+class RespostaIdempotente(Base):
+    """Resposta gravada para uma Idempotency-Key (removida ao expirar)"""
+    __tablename__ = "respostas_idempotentes"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    usuario = Column(String, nullable=False)  # Sujeito do token
+    chave = Column(String, nullable=False)
+    impressao = Column(String(64), nullable=False)  # sha256 de método, rota e corpo
+    status_code = Column(Integer)
+    tipo_conteudo = Column(String)
+    corpo = Column(LargeBinary)  # Corpo da resposta comprimido (zlib)
+    concluida = Column(Integer, default=0)  # 0 = requisição em andamento
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expira_em = Column(DateTime, nullable=False, index=True)
+    
+    __table_args__ = (
+        UniqueConstraint('usuario', 'chave', name='uk_resposta_idempotente'),
+    )
@@ -0,0 +1,762 @@
+"""
+Geração, assinatura e autorização de NF-e (modelo 55).
+
+Fluxo de uma nota EMITIDA até AUTORIZADA:
+
+1. chave de acesso de 44 dígitos com dígito verificador (módulo 11), gerada
+   uma única vez e gravada na nota;
+2. XML do leiaute 4.00 produzido em fragmentos (streaming): o digest SHA-1 do
+   infNFe é atualizado à medida que cada fragmento é escrito, sem montar uma
+   árvore DOM;
+3. assinatura XMLDSig enveloped (RSA-SHA1, C14N) com o certificado A1;
+4. envio por um transmissor plugável (TRANSMISSORES), com um transmissor
+   local que valida a assinatura e autoriza sem acessar a SEFAZ.
+
+Os passos 2 e 3 usam CPU e rodam em um pool de processos de tamanho limitado,
+para não ocupar os workers da API. Os workers recebem apenas dicts simples
+(sem sessão do banco) e carregam o certificado uma vez por processo.
+"""
+import base64
+import hashlib
+import os
+import re
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models_modules import (
+    Cliente, Fornecedor, ItemNotaFiscal, NotaFiscal, StatusNotaFiscal, TipoNotaFiscal
+)
+
+
+NAMESPACE_NFE = "http://www.portalfiscal.inf.br/nfe"
+NAMESPACE_DSIG = "http://www.w3.org/2000/09/xmldsig#"
+ALGORITMO_C14N = "http://www.w3.org/TR/2001/REC-xml-c14n-20010315"
+VERSAO_LEIAUTE = "4.00"
+MODELO_NFE = "55"
+
+# Códigos IBGE das UFs (primeiros dígitos da chave de acesso)
+UF_IBGE = {
+    "RO": "11", "AC": "12", "AM": "13", "RR": "14", "PA": "15", "AP": "16", "TO": "17",
+    "MA": "21", "PI": "22", "CE": "23", "RN": "24", "PB": "25", "PE": "26", "AL": "27",
+    "SE": "28", "BA": "29", "MG": "31", "ES": "32", "RJ": "33", "SP": "35", "PR": "41",
+    "SC": "42", "RS": "43", "MS": "50", "MT": "51", "GO": "52", "DF": "53",
+}
+
+# Códigos de retorno (cStat) tratados
+CSTAT_AUTORIZADA = "100"
+CSTAT_DENEGADA = ("110", "301", "302", "303")
+
+
+class ErroNFe(Exception):
+    """Configuração ou dados que impedem gerar a NF-e"""
+
+
+def _digitos(valor: Optional[str]) -> str:
+    return re.sub(r"\D", "", valor or "")
+
+
+# =============================================================================
+# CHAVE DE ACESSO
+# =============================================================================
+
+def calcular_digito_verificador(chave: str) -> str:
+    """
+    Dígito verificador módulo 11 dos 43 primeiros dígitos da chave
+
+    Pesos 2 a 9 da direita para a esquerda; resto 0 ou 1 resulta em DV 0.
+    """
+    if len(chave) != 43 or not chave.isdigit():
+        raise ErroNFe("A base da chave de acesso deve ter 43 dígitos")
+
+    soma = sum(int(digito) * (2 + i % 8) for i, digito in enumerate(reversed(chave)))
+    resto = soma % 11
+    return "0" if resto < 2 else str(11 - resto)
+
+
+def gerar_chave_acesso(
+    uf: str,
+    data_emissao: datetime,
+    cnpj: str,
+    serie: str,
+    numero: str,
+    codigo_numerico: str,
+    modelo: str = MODELO_NFE,
+    tipo_emissao: str = "1"
+) -> str:
+    """cUF + AAMM + CNPJ + mod + série + nNF + tpEmis + cNF + cDV (44 dígitos)"""
+    codigo_uf = UF_IBGE.get((uf or "").upper())
+    if not codigo_uf:
+        raise ErroNFe(f"UF do emitente inválida: {uf}")
+
+    cnpj = _digitos(cnpj)
+    if len(cnpj) != 14:
+        raise ErroNFe("CNPJ do emitente não configurado ou inválido")
+
+    base = (
+        codigo_uf
+        + data_emissao.strftime("%y%m")
+        + cnpj
+        + modelo.zfill(2)
+        + _digitos(serie).zfill(3)
+        + _digitos(numero).zfill(9)
+        + tipo_emissao
+        + _digitos(codigo_numerico).zfill(8)
+    )
+    return base + calcular_digito_verificador(base)
+
+
+def validar_chave_acesso(chave: Optional[str]) -> bool:
+    """Confere tamanho e dígito verificador"""
+    if not chave or len(chave) != 44 or not chave.isdigit():
+        return False
+    return calcular_digito_verificador(chave[:43]) == chave[43]
+
+
+def gerar_codigo_numerico(numero: str) -> str:
+    """cNF aleatório de 8 dígitos, diferente do número da nota"""
+    while True:
+        codigo = str(secrets.randbelow(10 ** 8)).zfill(8)
+        if codigo != _digitos(numero).zfill(8)[-8:]:
+            return codigo
+
+
+# =============================================================================
+# XML (STREAMING)
+# =============================================================================
+
+def _valor(numero, casas: int = 2) -> str:
+    """Formata valor decimal com arredondamento comercial"""
+    quantum = Decimal(1).scaleb(-casas)
+    return str(Decimal(str(numero or 0)).quantize(quantum, ROUND_HALF_UP))
+
+
+def _tag(nome: str, valor) -> str:
+    """Elemento simples já escapado; vazio não é gerado"""
+    if valor is None or valor == "":
+        return ""
+    return f"<{nome}>{escape(str(valor))}</{nome}>"
+
+
+def _documento(documento: Optional[str]) -> str:
+    numero = _digitos(documento)
+    return _tag("CPF", numero) if len(numero) == 11 else _tag("CNPJ", numero)
+
+
+def gerar_xml_nfe(dados: dict) -> Iterator[str]:
+    """
+    Gera o elemento infNFe em fragmentos, um por grupo e um por item
+
+    O texto produzido já está na forma canônica (C14N): sem declaração XML,
+    sem espaços entre elementos e sem elementos vazios abreviados.
+    """
+    chave = dados["chave_acesso"]
+    emit = dados["emitente"]
+    dest = dados["destinatario"]
+
+    yield f'<infNFe Id="NFe{chave}" versao="{VERSAO_LEIAUTE}">'
+
+    yield (
+        "<ide>"
+        + _tag("cUF", chave[:2])
+        + _tag("cNF", chave[35:43])
+        + _tag("natOp", dados["natureza_operacao"])
+        + _tag("mod", MODELO_NFE)
+        + _tag("serie", int(_digitos(dados["serie"]) or 0))
+        + _tag("nNF", int(_digitos(dados["numero"]) or 0))
+        + _tag("dhEmi", dados["data_emissao"].strftime("%Y-%m-%dT%H:%M:%S+00:00"))
+        + _tag("tpNF", "0" if dados["tipo"] == TipoNotaFiscal.ENTRADA.value else "1")
+        + _tag("idDest", "1" if (dest.get("uf") or emit["uf"]) == emit["uf"] else "2")
+        + _tag("tpImp", "1")
+        + _tag("tpEmis", chave[34])
+        + _tag("cDV", chave[43])
+        + _tag("tpAmb", dados["ambiente"])
+        + _tag("finNFe", "4" if dados["tipo"] == TipoNotaFiscal.DEVOLUCAO.value else "1")
+        + _tag("procEmi", "0")
+        + _tag("verProc", dados["versao_aplicativo"])
+        + "</ide>"
+    )
+
+    yield (
+        "<emit>"
+        + _documento(emit["cnpj"])
+        + _tag("xNome", emit["razao_social"])
+        + "<enderEmit>" + _tag("UF", emit["uf"]) + "</enderEmit>"
+        + "</emit>"
+    )
+
+    yield (
+        "<dest>"
+        + _documento(dest.get("documento"))
+        + _tag("xNome", dest.get("nome"))
+        + ("<enderDest>" + _tag("UF", dest["uf"]) + "</enderDest>" if dest.get("uf") else "")
+        + "</dest>"
+    )
+
+    totais = {campo: Decimal("0") for campo in ("vBC", "vICMS", "vProd", "vIPI", "vPIS", "vCOFINS")}
+
+    for n, item in enumerate(dados["itens"], start=1):
+        valor_produto = Decimal(_valor(
+            Decimal(str(item["quantidade"])) * Decimal(str(item["valor_unitario"]))
+        ))
+        base = Decimal(_valor(item["valor_total"]))
+        base_pis_cofins = max(base - Decimal(_valor(item["valor_icms"])), Decimal("0"))
+
+        totais["vProd"] += valor_produto
+        totais["vICMS"] += Decimal(_valor(item["valor_icms"]))
+        totais["vIPI"] += Decimal(_valor(item["valor_ipi"]))
+        totais["vPIS"] += Decimal(_valor(item["valor_pis"]))
+        totais["vCOFINS"] += Decimal(_valor(item["valor_cofins"]))
+        if item["valor_icms"]:
+            totais["vBC"] += base
+
+        yield (
+            f'<det nItem="{n}">'
+            "<prod>"
+            + _tag("cProd", item["codigo_produto"] or item["material_id"] or n)
+            + _tag("xProd", item["descricao"])
+            + _tag("NCM", _digitos(item["ncm"]) or "00000000")
+            + _tag("CFOP", _digitos(item["cfop"] or dados["cfop"]))
+            + _tag("uCom", item["unidade"])
+            + _tag("qCom", _valor(item["quantidade"], 4))
+            + _tag("vUnCom", _valor(item["valor_unitario"], 10))
+            + _tag("vProd", valor_produto)
+            + _tag("vFrete", _valor(item["valor_frete"]) if item["valor_frete"] else None)
+            + _tag("vSeg", _valor(item["valor_seguro"]) if item["valor_seguro"] else None)
+            + _tag("vDesc", _valor(item["valor_desconto"]) if item["valor_desconto"] else None)
+            + _tag("vOutro", _valor(item["valor_outras_despesas"]) if item["valor_outras_despesas"] else None)
+            + _tag("indTot", "1")
+            + "</prod>"
+            "<imposto>"
+            "<ICMS><ICMS00>"
+            + _tag("orig", "0") + _tag("CST", "00") + _tag("modBC", "3")
+            + _tag("vBC", base) + _tag("pICMS", _valor(item["aliquota_icms"], 4))
+            + _tag("vICMS", _valor(item["valor_icms"]))
+            + "</ICMS00></ICMS>"
+            "<IPI>" + _tag("cEnq", "999") + "<IPITrib>"
+            + _tag("CST", "50") + _tag("vBC", base)
+            + _tag("pIPI", _valor(item["aliquota_ipi"], 4)) + _tag("vIPI", _valor(item["valor_ipi"]))
+            + "</IPITrib></IPI>"
+            "<PIS><PISAliq>"
+            + _tag("CST", "01") + _tag("vBC", base_pis_cofins)
+            + _tag("pPIS", _valor(item["aliquota_pis"], 4)) + _tag("vPIS", _valor(item["valor_pis"]))
+            + "</PISAliq></PIS>"
+            "<COFINS><COFINSAliq>"
+            + _tag("CST", "01") + _tag("vBC", base_pis_cofins)
+            + _tag("pCOFINS", _valor(item["aliquota_cofins"], 4))
+            + _tag("vCOFINS", _valor(item["valor_cofins"]))
+            + "</COFINSAliq></COFINS>"
+            "</imposto>"
+            "</det>"
+        )
+
+    yield (
+        "<total><ICMSTot>"
+        + _tag("vBC", totais["vBC"])
+        + _tag("vICMS", totais["vICMS"])
+        + _tag("vProd", totais["vProd"])
+        + _tag("vFrete", _valor(dados["valor_frete"]))
+        + _tag("vSeg", _valor(dados["valor_seguro"]))
+        + _tag("vDesc", _valor(dados["valor_desconto"]))
+        + _tag("vIPI", totais["vIPI"])
+        + _tag("vPIS", totais["vPIS"])
+        + _tag("vCOFINS", totais["vCOFINS"])
+        + _tag("vOutro", _valor(dados["valor_outras_despesas"]))
+        + _tag("vNF", _valor(dados["valor_total"]))
+        + "</ICMSTot></total>"
+        "<transp>" + _tag("modFrete", "9") + "</transp>"
+    )
+
+    if dados.get("informacoes_adicionais"):
+        yield "<infAdic>" + _tag("infCpl", dados["informacoes_adicionais"]) + "</infAdic>"
+
+    yield "</infNFe>"
+
+
+# =============================================================================
+# ASSINATURA
+# =============================================================================
+
+def _signed_info(id_referencia: str, digest: str) -> str:
+    """SignedInfo sem namespace (herdado de Signature no documento)"""
+    return (
+        "<SignedInfo>"
+        f'<CanonicalizationMethod Algorithm="{ALGORITMO_C14N}"></CanonicalizationMethod>'
+        f'<SignatureMethod Algorithm="{NAMESPACE_DSIG}rsa-sha1"></SignatureMethod>'
+        f'<Reference URI="#{id_referencia}">'
+        "<Transforms>"
+        f'<Transform Algorithm="{NAMESPACE_DSIG}enveloped-signature"></Transform>'
+        f'<Transform Algorithm="{ALGORITMO_C14N}"></Transform>'
+        "</Transforms>"
+        f'<DigestMethod Algorithm="{NAMESPACE_DSIG}sha1"></DigestMethod>'
+        f"<DigestValue>{digest}</DigestValue>"
+        "</Reference>"
+        "</SignedInfo>"
+    )
+
+
+def _canonico(fragmento: str, elemento: str, namespace: str) -> bytes:
+    """Forma canônica de um elemento isolado: recebe o xmlns herdado do pai"""
+    return fragmento.replace(f"<{elemento}", f'<{elemento} xmlns="{namespace}"', 1).encode("utf-8")
+
+
+class AssinadorNFe:
+    """Assinatura XMLDSig enveloped com chave RSA e certificado X.509"""
+
+    def __init__(self, chave_privada, certificado):
+        self.chave_privada = chave_privada
+        self.certificado = certificado
+
+    @classmethod
+    def de_pkcs12(cls, caminho: str, senha: str = "") -> "AssinadorNFe":
+        """Carrega o certificado A1 (.pfx/.p12)"""
+        from cryptography.hazmat.primitives.serialization import pkcs12
+
+        with open(caminho, "rb") as arquivo:
+            chave, certificado, _ = pkcs12.load_key_and_certificates(
+                arquivo.read(), senha.encode() if senha else None
+            )
+        if chave is None or certificado is None:
+            raise ErroNFe("Certificado sem chave privada")
+        return cls(chave, certificado)
+
+    @classmethod
+    def local(cls) -> "AssinadorNFe":
+        """Certificado autoassinado temporário, apenas para homologação e testes"""
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from cryptography.x509.oid import NameOID
+
+        chave = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        nome = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "ERP Open - assinatura local")])
+        agora = datetime.utcnow()
+        certificado = (
+            x509.CertificateBuilder()
+            .subject_name(nome)
+            .issuer_name(nome)
+            .public_key(chave.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(agora - timedelta(minutes=1))
+            .not_valid_after(agora + timedelta(days=1))
+            .sign(chave, hashes.SHA256())
+        )
+        return cls(chave, certificado)
+
+    def assinar(self, fragmentos: Iterable[str], id_referencia: str) -> bytes:
+        """
+        Monta o XML assinado da NF-e a partir dos fragmentos do infNFe
+
+        O digest é atualizado fragmento a fragmento; o namespace herdado de NFe
+        entra apenas no primeiro fragmento, como exige a canonicalização.
+        """
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import padding
+
+        digest = hashlib.sha1()
+        partes: List[bytes] = [f'<NFe xmlns="{NAMESPACE_NFE}">'.encode("utf-8")]
+
+        for i, fragmento in enumerate(fragmentos):
+            dados = fragmento.encode("utf-8")
+            digest.update(_canonico(fragmento, "infNFe", NAMESPACE_NFE) if i == 0 else dados)
+            partes.append(dados)
+
+        signed_info = _signed_info(id_referencia, base64.b64encode(digest.digest()).decode())
+        assinatura = self.chave_privada.sign(
+            _canonico(signed_info, "SignedInfo", NAMESPACE_DSIG),
+            padding.PKCS1v15(),
+            hashes.SHA1()
+        )
+        certificado = base64.b64encode(
+            self.certificado.public_bytes(serialization.Encoding.DER)
+        ).decode()
+
+        partes.append((
+            f'<Signature xmlns="{NAMESPACE_DSIG}">'
+            + signed_info
+            + f"<SignatureValue>{base64.b64encode(assinatura).decode()}</SignatureValue>"
+            + f"<KeyInfo><X509Data><X509Certificate>{certificado}</X509Certificate></X509Data></KeyInfo>"
+            + "</Signature></NFe>"
+        ).encode("utf-8"))
+
+        return b"".join(partes)
+
+
+def verificar_assinatura(xml: bytes) -> bool:
+    """Confere o digest do infNFe e a assinatura do SignedInfo com o certificado embutido"""
+    from cryptography import x509
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import padding
+
+    texto = xml.decode("utf-8")
+    inf_nfe = re.search(r"<infNFe .*?</infNFe>", texto, re.S)
+    signed_info = re.search(r"<SignedInfo>.*?</SignedInfo>", texto, re.S)
+    digest = re.search(r"<DigestValue>(.*?)</DigestValue>", texto)
+    valor = re.search(r"<SignatureValue>(.*?)</SignatureValue>", texto)
+    certificado = re.search(r"<X509Certificate>(.*?)</X509Certificate>", texto)
+    if not all((inf_nfe, signed_info, digest, valor, certificado)):
+        return False
+
+    calculado = hashlib.sha1(_canonico(inf_nfe.group(0), "infNFe", NAMESPACE_NFE)).digest()
+    if base64.b64encode(calculado).decode() != digest.group(1):
+        return False
+
+    try:
+        chave_publica = x509.load_der_x509_certificate(
+            base64.b64decode(certificado.group(1))
+        ).public_key()
+        chave_publica.verify(
+            base64.b64decode(valor.group(1)),
+            _canonico(signed_info.group(0), "SignedInfo", NAMESPACE_DSIG),
+            padding.PKCS1v15(),
+            hashes.SHA1()
+        )
+    except (InvalidSignature, ValueError):
+        return False
+    return True
+
+
+# =============================================================================
+# POOL DE PROCESSOS
+# =============================================================================
+
+_assinador_processo: Optional[AssinadorNFe] = None
+
+
+def _criar_assinador(caminho_certificado: str, senha: str) -> AssinadorNFe:
+    if caminho_certificado:
+        return AssinadorNFe.de_pkcs12(caminho_certificado, senha)
+    return AssinadorNFe.local()
+
+
+def _inicializar_worker(caminho_certificado: str, senha: str) -> None:
+    """Carrega o certificado uma vez por processo do pool"""
+    global _assinador_processo
+    _assinador_processo = _criar_assinador(caminho_certificado, senha)
+
+
+def _gerar_e_assinar(dados: dict) -> Tuple[int, bytes]:
+    """Tarefa do pool: gera o XML da nota e assina"""
+    xml = _assinador_processo.assinar(gerar_xml_nfe(dados), f"NFe{dados['chave_acesso']}")
+    return dados["id"], xml
+
+
+class PipelineNFe:
+    """
+    Geração e assinatura em um pool de processos limitado
+
+    workers=0 executa no próprio processo (testes e ambientes sem fork). O pool
+    é criado sob demanda e reaproveitado entre requisições.
+    """
+
+    def __init__(self, workers: int, caminho_certificado: str = "", senha: str = ""):
+        self.workers = max(workers, 0)
+        self._certificado = (caminho_certificado, senha)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _obter_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_inicializar_worker,
+                    initargs=self._certificado
+                )
+            return self._executor
+
+    def processar(self, notas: Sequence[dict]) -> Dict[int, bytes]:
+        """{nf_id: xml assinado} para cada nota"""
+        if not notas:
+            return {}
+
+        if self.workers == 0:
+            global _assinador_processo
+            if _assinador_processo is None:
+                _inicializar_worker(*self._certificado)
+            return dict(_gerar_e_assinar(dados) for dados in notas)
+
+        tamanho_bloco = max(1, len(notas) // (self.workers * 4))
+        return dict(self._obter_executor().map(_gerar_e_assinar, notas, chunksize=tamanho_bloco))
+
+    def encerrar(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+_pipeline: Optional[PipelineNFe] = None
+_pipeline_lock = threading.Lock()
+
+
+def obter_pipeline() -> PipelineNFe:
+    """Pipeline do processo, dimensionado por NFE_WORKERS (padrão: núcleos - 1)"""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            workers = settings.NFE_WORKERS
+            if workers < 0:
+                workers = max((os.cpu_count() or 2) - 1, 1)
+            _pipeline = PipelineNFe(workers, settings.NFE_CERTIFICADO, settings.NFE_CERTIFICADO_SENHA)
+        return _pipeline
+
+
+def encerrar_pipeline() -> None:
+    """Finaliza o pool (shutdown da aplicação)"""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is not None:
+            _pipeline.encerrar()
+            _pipeline = None
+
+
+# =============================================================================
+# TRANSMISSÃO
+# =============================================================================
+
+class RetornoAutorizacao(NamedTuple):
+    codigo: str  # cStat
+    motivo: str  # xMotivo
+    protocolo: Optional[str] = None
+
+    @property
+    def autorizada(self) -> bool:
+        return self.codigo == CSTAT_AUTORIZADA
+
+    @property
+    def denegada(self) -> bool:
+        return self.codigo in CSTAT_DENEGADA
+
+
+class TransmissorNFe(ABC):
+    """Interface de envio à autorizadora (SEFAZ, SVRS, contingência...)"""
+
+    @abstractmethod
+    def autorizar(self, chave_acesso: str, xml: bytes) -> RetornoAutorizacao:
+        """Envia o XML assinado e devolve o retorno da autorizadora (cStat/xMotivo/protocolo)"""
+
+
+class TransmissorLocal(TransmissorNFe):
+    """
+    Autorizadora local para desenvolvimento e testes
+
+    Valida chave e assinatura como a SEFAZ faria e devolve um protocolo
+    sequencial; nada sai da máquina.
+    """
+
+    def __init__(self):
+        self._sequencia = 0
+        self._lock = threading.Lock()
+
+    def autorizar(self, chave_acesso: str, xml: bytes) -> RetornoAutorizacao:
+        if not validar_chave_acesso(chave_acesso):
+            return RetornoAutorizacao("236", "Rejeição: Chave de Acesso com dígito verificador inválido")
+        if not verificar_assinatura(xml):
+            return RetornoAutorizacao("297", "Rejeição: Assinatura difere do calculado")
+
+        with self._lock:
+            self._sequencia += 1
+            sequencia = self._sequencia
+
+        protocolo = f"{chave_acesso[:2]}{datetime.utcnow():%y}{sequencia:011d}"
+        return RetornoAutorizacao(CSTAT_AUTORIZADA, "Autorizado o uso da NF-e", protocolo)
+
+
+TRANSMISSORES: Dict[str, Callable[[], TransmissorNFe]] = {
+    "local": TransmissorLocal,
+}
+
+_transmissores_ativos: Dict[str, TransmissorNFe] = {}
+
+
+def registrar_transmissor(nome: str, fabrica: Callable[[], TransmissorNFe]) -> None:
+    """Registra um transmissor selecionável por NFE_TRANSMISSOR"""
+    TRANSMISSORES[nome] = fabrica
+    _transmissores_ativos.pop(nome, None)
+
+
+def obter_transmissor(nome: Optional[str] = None) -> TransmissorNFe:
+    nome = nome or settings.NFE_TRANSMISSOR
+    if nome not in TRANSMISSORES:
+        raise ErroNFe(f"Transmissor de NF-e desconhecido: {nome}")
+    if nome not in _transmissores_ativos:
+        _transmissores_ativos[nome] = TRANSMISSORES[nome]()
+    return _transmissores_ativos[nome]
+
+
+# =============================================================================
+# AUTORIZAÇÃO DE NOTAS
+# =============================================================================
+
+CAMPOS_ITEM = (
+    "nota_fiscal_id", "material_id", "codigo_produto", "descricao", "ncm", "cfop", "unidade",
+    "quantidade", "valor_unitario", "valor_desconto", "valor_frete", "valor_seguro",
+    "valor_outras_despesas", "aliquota_icms", "valor_icms", "aliquota_ipi", "valor_ipi",
+    "aliquota_pis", "valor_pis", "aliquota_cofins", "valor_cofins", "valor_total",
+)
+
+
+def _emitente() -> dict:
+    if not UF_IBGE.get(settings.NFE_UF_EMITENTE.upper()):
+        raise ErroNFe(f"UF do emitente inválida: {settings.NFE_UF_EMITENTE}")
+    if len(_digitos(settings.NFE_CNPJ_EMITENTE)) != 14:
+        raise ErroNFe("CNPJ do emitente não configurado (NFE_CNPJ_EMITENTE)")
+    if settings.NFE_AMBIENTE == 1 and not settings.NFE_CERTIFICADO:
+        raise ErroNFe("Certificado digital obrigatório no ambiente de produção")
+    return {
+        "cnpj": _digitos(settings.NFE_CNPJ_EMITENTE),
+        "razao_social": settings.NFE_RAZAO_SOCIAL or settings.APP_NAME,
+        "uf": settings.NFE_UF_EMITENTE.upper(),
+    }
+
+
+def _carregar_dados(session: Session, notas: Sequence[NotaFiscal], emitente: dict) -> List[dict]:
+    """Dicts autocontidos (cabeçalho, destinatário e itens) para os workers"""
+    ids = [nf.id for nf in notas]
+
+    itens: Dict[int, List[dict]] = {nf_id: [] for nf_id in ids}
+    for linha in session.execute(
+        select(*(getattr(ItemNotaFiscal, campo) for campo in CAMPOS_ITEM)).where(
+            ItemNotaFiscal.nota_fiscal_id.in_(ids)
+        ).order_by(ItemNotaFiscal.nota_fiscal_id, ItemNotaFiscal.id)
+    ):
+        item = dict(linha._mapping)
+        for campo in CAMPOS_ITEM:
+            if item[campo] is None and campo.startswith(("valor_", "aliquota_")):
+                item[campo] = 0.0
+        itens[linha.nota_fiscal_id].append(item)
+
+    clientes = {
+        c.id: {"documento": c.cpf_cnpj, "nome": c.razao_social or c.nome, "uf": c.estado}
+        for c in session.execute(
+            select(Cliente.id, Cliente.cpf_cnpj, Cliente.razao_social, Cliente.nome, Cliente.estado)
+            .where(Cliente.id.in_({nf.cliente_id for nf in notas if nf.cliente_id}))
+        )
+    }
+    fornecedores = {
+        f.id: {"documento": f.cnpj, "nome": f.razao_social or f.nome, "uf": f.estado}
+        for f in session.execute(
+            select(Fornecedor.id, Fornecedor.cnpj, Fornecedor.razao_social, Fornecedor.nome, Fornecedor.estado)
+            .where(Fornecedor.id.in_({nf.fornecedor_id for nf in notas if nf.fornecedor_id}))
+        )
+    }
+
+    return [
+        {
+            "id": nf.id,
+            "chave_acesso": nf.chave_acesso,
+            "numero": nf.numero,
+            "serie": nf.serie or "1",
+            "tipo": nf.tipo.value,
+            "data_emissao": nf.data_emissao,
+            "natureza_operacao": nf.natureza_operacao or "Venda de mercadoria",
+            "cfop": nf.cfop,
+            "ambiente": settings.NFE_AMBIENTE,
+            "versao_aplicativo": f"{settings.APP_NAME} {settings.API_VERSION}",
+            "emitente": emitente,
+            "destinatario": (
+                clientes.get(nf.cliente_id) or fornecedores.get(nf.fornecedor_id) or {}
+            ),
+            "valor_frete": nf.valor_frete or 0.0,
+            "valor_seguro": nf.valor_seguro or 0.0,
+            "valor_desconto": nf.valor_desconto or 0.0,
+            "valor_outras_despesas": nf.valor_outras_despesas or 0.0,
+            "valor_total": nf.valor_total or 0.0,
+            "informacoes_adicionais": nf.informacoes_adicionais,
+            "itens": itens[nf.id],
+        }
+        for nf in notas
+    ]
+
+
+def autorizar_notas(
+    session: Session,
+    notas: Sequence[NotaFiscal],
+    pipeline: Optional[PipelineNFe] = None,
+    transmissor: Optional[TransmissorNFe] = None
+) -> dict:
+    """
+    Gera, assina e transmite as notas emitidas
+
+    A chave de acesso é atribuída (uma vez) antes de gerar o XML. Notas
+    autorizadas recebem protocolo, XML e status AUTORIZADA; denegadas ficam
+    DENEGADA; rejeições mantêm a nota EMITIDA para correção. Não faz commit.
+
+    Returns:
+        {"autorizadas": [NotaFiscal], "rejeitadas": [{"id", "numero", "motivo"}],
+         "metricas": {...}}
+
+    Raises:
+        ErroNFe: emitente não configurado
+    """
+    emitente = _emitente()
+    pipeline = pipeline or obter_pipeline()
+    transmissor = transmissor or obter_transmissor()
+
+    rejeitadas: List[dict] = []
+    candidatas: List[NotaFiscal] = []
+    for nf in sorted(notas, key=lambda n: n.id):
+        if nf.status != StatusNotaFiscal.EMITIDA:
+            rejeitadas.append({
+                "id": nf.id, "numero": nf.numero,
+                "motivo": "Apenas notas emitidas podem ser autorizadas"
+            })
+            continue
+        if not nf.chave_acesso:
+            nf.chave_acesso = gerar_chave_acesso(
+                emitente["uf"], nf.data_emissao or datetime.utcnow(), emitente["cnpj"],
+                nf.serie or "1", nf.numero, gerar_codigo_numerico(nf.numero)
+            )
+        candidatas.append(nf)
+
+    inicio = time.perf_counter()
+    xmls = pipeline.processar(_carregar_dados(session, candidatas, emitente)) if candidatas else {}
+    tempo_assinatura = time.perf_counter() - inicio
+
+    autorizadas: List[NotaFiscal] = []
+    for nf in candidatas:
+        retorno = transmissor.autorizar(nf.chave_acesso, xmls[nf.id])
+        if retorno.autorizada:
+            nf.status = StatusNotaFiscal.AUTORIZADA
+            nf.protocolo_autorizacao = retorno.protocolo
+            nf.xml_nfe = xmls[nf.id].decode("utf-8")
+            autorizadas.append(nf)
+            continue
+
+        if retorno.denegada:
+            nf.status = StatusNotaFiscal.DENEGADA
+            nf.protocolo_autorizacao = retorno.protocolo
+            nf.xml_nfe = xmls[nf.id].decode("utf-8")
+        rejeitadas.append({
+            "id": nf.id, "numero": nf.numero,
+            "motivo": f"{retorno.codigo} - {retorno.motivo}"
+        })
+
+    tempo_total = time.perf_counter() - inicio
+    nucleos = max(pipeline.workers, 1)
+    por_segundo = len(candidatas) / tempo_assinatura if tempo_assinatura > 0 else 0.0
+
+    return {
+        "autorizadas": autorizadas,
+        "rejeitadas": rejeitadas,
+        "metricas": {
+            "notas": len(candidatas),
+            "workers": pipeline.workers,
+            "segundos_assinatura": round(tempo_assinatura, 4),
+            "segundos_total": round(tempo_total, 4),
+            "notas_por_segundo": round(por_segundo, 2),
+            "notas_por_segundo_por_core": round(por_segundo / nucleos, 2),
+        },
+    }
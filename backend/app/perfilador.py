@@ -0,0 +1,205 @@
+"""
+Perfilador por amostragem e captura de requisições lentas.
+
+- perfilar(segundos): amostra as pilhas de todas as threads em intervalos
+  fixos e devolve o formato "collapsed" (uma linha por pilha, quadros
+  separados por ";" seguidos da contagem), aceito por flamegraph.pl e
+  speedscope.
+- Vigia: thread que acompanha as requisições em execução
+  (app.metricas.requisicoes_ativas); as que passam de PERFIL_LIMITE_LENTO_MS
+  têm a pilha da sua thread amostrada até terminar. Ao fim, a requisição
+  lenta vai para um buffer circular com pilhas, SQL agregado e tempos.
+"""
+import itertools
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core.config import settings
+from app.metricas import OUVINTES_FIM_REQUISICAO, ContextoRequisicao, requisicoes_ativas
+
+
+MAX_QUADROS = 128
+MAX_PILHAS_CAPTURA = 30
+MAX_SQL_CAPTURA = 15
+
+
+class PerfilEmAndamento(Exception):
+    """Já existe uma sessão de perfil sob demanda rodando"""
+
+
+def _rotulo_quadro(quadro) -> str:
+    modulo = quadro.f_globals.get("__name__", "?")
+    return f"{modulo}:{quadro.f_code.co_name}:{quadro.f_lineno}"
+
+
+def pilha_colapsada(quadro) -> str:
+    """Pilha da raiz até o quadro, no formato collapsed"""
+    rotulos: List[str] = []
+    while quadro is not None and len(rotulos) < MAX_QUADROS:
+        rotulos.append(_rotulo_quadro(quadro))
+        quadro = quadro.f_back
+    return ";".join(reversed(rotulos))
+
+
+def formatar_colapsado(amostras: Counter) -> str:
+    return "".join(f"{pilha} {quantidade}\n" for pilha, quantidade in amostras.most_common())
+
+
+# =============================================================================
+# PERFIL SOB DEMANDA
+# =============================================================================
+
+_lock_perfil = threading.Lock()
+
+
+def perfilar(segundos: float, intervalo_ms: float = 5.0, apenas_app: bool = True) -> Counter:
+    """
+    Amostra as threads do processo durante `segundos`
+
+    Args:
+        apenas_app: descarta pilhas sem nenhum quadro do pacote app
+            (threads ociosas do servidor e do pool)
+
+    Raises:
+        PerfilEmAndamento: outra sessão já está rodando
+    """
+    if not _lock_perfil.acquire(blocking=False):
+        raise PerfilEmAndamento()
+
+    try:
+        propria = threading.get_ident()
+        amostras: Counter = Counter()
+        intervalo = max(intervalo_ms, 1.0) / 1000
+        fim = time.perf_counter() + segundos
+
+        while time.perf_counter() < fim:
+            for thread_id, quadro in sys._current_frames().items():
+                if thread_id == propria:
+                    continue
+                pilha = pilha_colapsada(quadro)
+                if apenas_app and not (pilha.startswith("app.") or ";app." in pilha):
+                    continue
+                amostras[pilha] += 1
+            time.sleep(intervalo)
+
+        return amostras
+    finally:
+        _lock_perfil.release()
+
+
+# =============================================================================
+# REQUISIÇÕES LENTAS
+# =============================================================================
+
+_sequencia = itertools.count(1)
+capturas: Deque[Dict[str, Any]] = deque(maxlen=settings.PERFIL_CAPTURAS_MAX)
+_lock_capturas = threading.Lock()
+
+
+def registrar_requisicao_lenta(contexto: ContextoRequisicao, rota: str, status: int, segundos: float) -> None:
+    """Ouvinte de fim de requisição: guarda as que passaram do limite"""
+    limite_ms = settings.PERFIL_LIMITE_LENTO_MS
+    if limite_ms <= 0 or segundos * 1000 < limite_ms:
+        return
+
+    sql = sorted(
+        (
+            {"forma": forma, "vezes": vezes, "ms": round(contexto.segundos_por_forma.get(forma, 0.0) * 1000, 2)}
+            for forma, vezes in contexto.formas.items()
+        ),
+        key=lambda item: item["ms"],
+        reverse=True
+    )
+    captura = {
+        "id": next(_sequencia),
+        "capturada_em": datetime.utcnow().isoformat(),
+        "metodo": contexto.metodo,
+        "caminho": contexto.caminho,
+        "rota": rota,
+        "status": status,
+        "duracao_ms": round(segundos * 1000, 2),
+        "consultas": contexto.consultas,
+        "sql_ms": round(contexto.segundos_sql * 1000, 2),
+        "sql": sql[:MAX_SQL_CAPTURA],
+        "amostras": sum(contexto.amostras.values()),
+        "pilhas": dict(contexto.amostras.most_common(MAX_PILHAS_CAPTURA)),
+    }
+    with _lock_capturas:
+        capturas.append(captura)
+
+
+def listar_capturas() -> List[Dict[str, Any]]:
+    """Resumo das capturas, da mais recente para a mais antiga"""
+    with _lock_capturas:
+        itens = list(capturas)
+    campos = ("id", "capturada_em", "metodo", "rota", "status", "duracao_ms", "consultas", "sql_ms", "amostras")
+    return [{campo: item[campo] for campo in campos} for item in reversed(itens)]
+
+
+def obter_captura(captura_id: int) -> Optional[Dict[str, Any]]:
+    with _lock_capturas:
+        return next((item for item in capturas if item["id"] == captura_id), None)
+
+
+def limpar_capturas() -> None:
+    with _lock_capturas:
+        capturas.clear()
+
+
+class Vigia:
+    """Amostra a pilha das requisições que passaram do limite enquanto rodam"""
+
+    def __init__(self, limite_ms: int, intervalo_ms: int):
+        self.limite = limite_ms / 1000
+        self.intervalo = max(intervalo_ms, 1) / 1000
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def iniciar(self) -> None:
+        self._thread = threading.Thread(target=self._laco, name="vigia-requisicoes", daemon=True)
+        self._thread.start()
+
+    def parar(self) -> None:
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def amostrar(self) -> None:
+        agora = time.perf_counter()
+        lentas = [c for c in list(requisicoes_ativas) if agora - c.inicio >= self.limite]
+        if not lentas:
+            return
+        quadros = sys._current_frames()
+        for contexto in lentas:
+            quadro = quadros.get(contexto.thread_id)
+            if quadro is not None:
+                contexto.amostras[pilha_colapsada(quadro)] += 1
+
+    def _laco(self) -> None:
+        while not self._parar.wait(self.intervalo):
+            self.amostrar()
+
+
+_vigia: Optional[Vigia] = None
+
+
+def iniciar_vigia() -> None:
+    """Inicia a captura de requisições lentas se PERFIL_LIMITE_LENTO_MS > 0"""
+    global _vigia
+    if _vigia is None and settings.PERFIL_LIMITE_LENTO_MS > 0:
+        _vigia = Vigia(settings.PERFIL_LIMITE_LENTO_MS, settings.PERFIL_INTERVALO_AMOSTRA_MS)
+        _vigia.iniciar()
+
+
+def parar_vigia() -> None:
+    global _vigia
+    if _vigia is not None:
+        _vigia.parar()
+        _vigia = None
+
+
+OUVINTES_FIM_REQUISICAO.append(registrar_requisicao_lenta)
@@ -0,0 +1,452 @@
+"""
+Histórico de preços de compra por (material, fornecedor).
+
+A tabela historico_precos guarda um resumo incremental (último, mínimo,
+máximo, soma e quantidade de observações, média móvel exponencial) e é
+atualizada na mesma transação que origina o preço:
+
+- aprovação de pedido de compra (origem "pedido")
+- gravação de resposta de fornecedor em cotação (origem "cotacao")
+
+Cada documento conta como uma observação por (material, fornecedor): itens
+repetidos do mesmo material entram pela média ponderada pela quantidade. As
+consultas de referência, tendência e ranking leem só o resumo, sem varrer
+pedidos e respostas. reconstruir_historico_precos() refaz o resumo a partir
+do histórico completo (carga inicial ou correção).
+"""
+from collections import defaultdict
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models_modules import (
+    Fornecedor, HistoricoPreco, ItemCotacao, ItemPedidoCompra, ItemRespostaFornecedor,
+    Material, PedidoCompra, RespostaFornecedor, StatusCompra
+)
+
+
+ORIGEM_PEDIDO = "pedido"
+ORIGEM_COTACAO = "cotacao"
+
+# Peso do preço novo na média móvel exponencial
+PESO_MEDIA_MOVEL = 0.3
+
+STATUS_PEDIDO_COM_PRECO = (
+    StatusCompra.APROVADO,
+    StatusCompra.PEDIDO_ENVIADO,
+    StatusCompra.RECEBIDO,
+)
+
+
+class ObservacaoPreco(NamedTuple):
+    material_id: int
+    fornecedor_id: int
+    preco_unitario: float
+    quantidade: float = 1.0
+
+
+def _consolidar(observacoes: Iterable[ObservacaoPreco]) -> Dict[Tuple[int, int], float]:
+    """Um preço por (material, fornecedor): média ponderada pela quantidade"""
+    valores: Dict[Tuple[int, int], List[float]] = defaultdict(lambda: [0.0, 0.0, 0.0, 0])
+    for obs in observacoes:
+        if obs.material_id is None or obs.preco_unitario is None:
+            continue
+        acumulado = valores[(obs.material_id, obs.fornecedor_id)]
+        peso = obs.quantidade if obs.quantidade and obs.quantidade > 0 else 0.0
+        acumulado[0] += obs.preco_unitario * peso
+        acumulado[1] += peso
+        acumulado[2] += obs.preco_unitario
+        acumulado[3] += 1
+    return {
+        chave: (valor / peso if peso else soma / contagem)
+        for chave, (valor, peso, soma, contagem) in valores.items()
+    }
+
+
+def registrar_precos(
+    session: Session,
+    observacoes: Iterable[ObservacaoPreco],
+    origem: str,
+    data: Optional[datetime] = None
+) -> int:
+    """
+    Incorpora os preços de um documento ao histórico (não faz commit)
+
+    Em SQLite e PostgreSQL é um único INSERT ... ON CONFLICT DO UPDATE sobre
+    uk_historico_preco_material_fornecedor; nos demais dialetos, UPDATE e,
+    se nenhuma linha for afetada, INSERT.
+
+    Returns:
+        Quantidade de pares (material, fornecedor) atualizados
+    """
+    precos = _consolidar(observacoes)
+    if not precos:
+        return 0
+
+    tabela = HistoricoPreco.__table__
+    agora = datetime.utcnow()
+    data = data or agora
+    linhas = [
+        {
+            "material_id": material_id,
+            "fornecedor_id": fornecedor_id,
+            "ultimo_preco": preco,
+            "preco_minimo": preco,
+            "preco_maximo": preco,
+            "soma_precos": preco,
+            "observacoes": 1,
+            "media_movel": preco,
+            "ultima_origem": origem,
+            "data_ultimo_preco": data,
+            "updated_at": agora
+        }
+        for (material_id, fornecedor_id), preco in sorted(precos.items())
+    ]
+
+    def _valores_atualizados(novo):
+        return {
+            "ultimo_preco": novo.ultimo_preco,
+            "preco_minimo": case(
+                (tabela.c.preco_minimo <= novo.ultimo_preco, tabela.c.preco_minimo), else_=novo.ultimo_preco
+            ),
+            "preco_maximo": case(
+                (tabela.c.preco_maximo >= novo.ultimo_preco, tabela.c.preco_maximo), else_=novo.ultimo_preco
+            ),
+            "soma_precos": tabela.c.soma_precos + novo.ultimo_preco,
+            "observacoes": tabela.c.observacoes + 1,
+            "media_movel": tabela.c.media_movel + PESO_MEDIA_MOVEL * (novo.ultimo_preco - tabela.c.media_movel),
+            "ultima_origem": novo.ultima_origem,
+            "data_ultimo_preco": novo.data_ultimo_preco,
+            "updated_at": novo.updated_at
+        }
+
+    dialeto = session.get_bind().dialect.name
+    if dialeto in ("sqlite", "postgresql"):
+        if dialeto == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as insert_dialeto
+        else:
+            from sqlalchemy.dialects.postgresql import insert as insert_dialeto
+
+        stmt = insert_dialeto(tabela).values(linhas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[tabela.c.material_id, tabela.c.fornecedor_id],
+            set_=_valores_atualizados(stmt.excluded)
+        )
+        session.execute(stmt)
+        return len(linhas)
+
+    for linha in linhas:
+        resultado = session.execute(
+            update(tabela).where(
+                tabela.c.material_id == linha["material_id"],
+                tabela.c.fornecedor_id == linha["fornecedor_id"]
+            ).values(_valores_atualizados(SimpleNamespace(**linha)))
+        )
+        if resultado.rowcount == 0:
+            session.execute(insert(tabela).values(linha))
+    return len(linhas)
+
+
+def registrar_precos_pedido(session: Session, pedido: PedidoCompra) -> int:
+    """Preços de um pedido de compra aprovado"""
+    return registrar_precos(
+        session,
+        (
+            ObservacaoPreco(item.material_id, pedido.fornecedor_id, item.preco_unitario, item.quantidade)
+            for item in pedido.itens
+        ),
+        ORIGEM_PEDIDO,
+        pedido.data_pedido
+    )
+
+
+# =============================================================================
+# CONSULTAS
+# =============================================================================
+
+def _tendencia_percentual():
+    """Média móvel recente contra a média simples de todas as observações"""
+    media = HistoricoPreco.soma_precos / HistoricoPreco.observacoes
+    return ((HistoricoPreco.media_movel - media) / media * 100).label("tendencia_percentual")
+
+
+def _linha_historico(linha) -> dict:
+    media = linha.soma_precos / linha.observacoes if linha.observacoes else linha.ultimo_preco
+    return {
+        "material_id": linha.material_id,
+        "fornecedor_id": linha.fornecedor_id,
+        "fornecedor_nome": linha.fornecedor_nome,
+        "ultimo_preco": linha.ultimo_preco,
+        "preco_minimo": linha.preco_minimo,
+        "preco_maximo": linha.preco_maximo,
+        "preco_medio": round(media, 4),
+        "media_movel": round(linha.media_movel, 4),
+        "tendencia_percentual": round((linha.media_movel - media) / media * 100, 2) if media else 0.0,
+        "observacoes": linha.observacoes,
+        "ultima_origem": linha.ultima_origem,
+        "data_ultimo_preco": linha.data_ultimo_preco
+    }
+
+
+def _consultar_historico(session: Session, material_ids: Sequence[int]):
+    stmt = select(
+        HistoricoPreco.material_id,
+        HistoricoPreco.fornecedor_id,
+        Fornecedor.nome.label("fornecedor_nome"),
+        HistoricoPreco.ultimo_preco,
+        HistoricoPreco.preco_minimo,
+        HistoricoPreco.preco_maximo,
+        HistoricoPreco.soma_precos,
+        HistoricoPreco.observacoes,
+        HistoricoPreco.media_movel,
+        HistoricoPreco.ultima_origem,
+        HistoricoPreco.data_ultimo_preco
+    ).join(
+        Fornecedor, Fornecedor.id == HistoricoPreco.fornecedor_id
+    ).where(
+        HistoricoPreco.material_id.in_(list(material_ids))
+    ).order_by(
+        HistoricoPreco.material_id, HistoricoPreco.ultimo_preco, HistoricoPreco.fornecedor_id
+    )
+    return session.execute(stmt).all()
+
+
+def historico_material(session: Session, material_id: int) -> List[dict]:
+    """Fornecedores do material ordenados pelo último preço (menor primeiro)"""
+    return [_linha_historico(linha) for linha in _consultar_historico(session, [material_id])]
+
+
+def precos_referencia(session: Session, material_ids: Sequence[int]) -> Dict[int, dict]:
+    """
+    Preço de referência por material para digitação de cotações
+
+    - menor_ultimo_preco / melhor_fornecedor: menor último preço entre os fornecedores
+    - preco_medio: média de todas as observações de todos os fornecedores
+    - preco_minimo: menor preço já registrado
+    Materiais sem histórico ficam de fora.
+    """
+    referencias: Dict[int, dict] = {}
+    for linha in _consultar_historico(session, material_ids):
+        referencia = referencias.get(linha.material_id)
+        if referencia is None:
+            # Linhas ordenadas por último preço: a primeira é a melhor
+            referencia = referencias[linha.material_id] = {
+                "material_id": linha.material_id,
+                "menor_ultimo_preco": linha.ultimo_preco,
+                "melhor_fornecedor_id": linha.fornecedor_id,
+                "melhor_fornecedor_nome": linha.fornecedor_nome,
+                "preco_minimo": linha.preco_minimo,
+                "preco_maximo": linha.preco_maximo,
+                "_soma": 0.0,
+                "observacoes": 0,
+                "fornecedores": 0,
+                "data_ultimo_preco": linha.data_ultimo_preco
+            }
+        referencia["preco_minimo"] = min(referencia["preco_minimo"], linha.preco_minimo)
+        referencia["preco_maximo"] = max(referencia["preco_maximo"], linha.preco_maximo)
+        referencia["_soma"] += linha.soma_precos
+        referencia["observacoes"] += linha.observacoes
+        referencia["fornecedores"] += 1
+        if linha.data_ultimo_preco and (
+            referencia["data_ultimo_preco"] is None or linha.data_ultimo_preco > referencia["data_ultimo_preco"]
+        ):
+            referencia["data_ultimo_preco"] = linha.data_ultimo_preco
+
+    for referencia in referencias.values():
+        soma = referencia.pop("_soma")
+        referencia["preco_medio"] = round(soma / referencia["observacoes"], 4) if referencia["observacoes"] else None
+    return referencias
+
+
+def tendencias_precos(
+    session: Session,
+    material_id: Optional[int] = None,
+    fornecedor_id: Optional[int] = None,
+    minimo_observacoes: int = 2,
+    limite: int = 50,
+    alta: bool = True
+) -> List[dict]:
+    """Pares (material, fornecedor) com maior alta (ou queda) recente de preço"""
+    tendencia = _tendencia_percentual()
+    stmt = select(
+        HistoricoPreco.material_id,
+        Material.codigo.label("material_codigo"),
+        Material.nome.label("material_nome"),
+        HistoricoPreco.fornecedor_id,
+        Fornecedor.nome.label("fornecedor_nome"),
+        HistoricoPreco.ultimo_preco,
+        HistoricoPreco.preco_minimo,
+        HistoricoPreco.preco_maximo,
+        HistoricoPreco.soma_precos,
+        HistoricoPreco.observacoes,
+        HistoricoPreco.media_movel,
+        HistoricoPreco.ultima_origem,
+        HistoricoPreco.data_ultimo_preco,
+        tendencia
+    ).join(
+        Material, Material.id == HistoricoPreco.material_id
+    ).join(
+        Fornecedor, Fornecedor.id == HistoricoPreco.fornecedor_id
+    ).where(
+        HistoricoPreco.observacoes >= max(minimo_observacoes, 1)
+    )
+
+    if material_id:
+        stmt = stmt.where(HistoricoPreco.material_id == material_id)
+    if fornecedor_id:
+        stmt = stmt.where(HistoricoPreco.fornecedor_id == fornecedor_id)
+
+    ordem = tendencia.desc() if alta else tendencia.asc()
+    stmt = stmt.order_by(ordem, HistoricoPreco.id).limit(limite)
+
+    return [
+        {
+            **_linha_historico(linha),
+            "material_codigo": linha.material_codigo,
+            "material_nome": linha.material_nome
+        }
+        for linha in session.execute(stmt)
+    ]
+
+
+def ranking_fornecedores(
+    session: Session,
+    categoria_id: Optional[int] = None,
+    minimo_materiais: int = 1,
+    limite: int = 50
+) -> List[dict]:
+    """
+    Fornecedores ordenados pelo índice de preço
+
+    Para cada material, o preço médio de cada fornecedor é dividido pelo
+    menor preço médio entre os fornecedores do material; o índice do
+    fornecedor é a média dessas razões (1.0 = sempre o mais barato).
+    """
+    media = (HistoricoPreco.soma_precos / HistoricoPreco.observacoes)
+
+    filtro_categoria = []
+    if categoria_id:
+        filtro_categoria = [HistoricoPreco.material_id.in_(
+            select(Material.id).where(Material.categoria_id == categoria_id)
+        )]
+
+    melhores = select(
+        HistoricoPreco.material_id,
+        func.min(media).label("melhor_media")
+    ).where(
+        HistoricoPreco.observacoes > 0, *filtro_categoria
+    ).group_by(HistoricoPreco.material_id).subquery()
+
+    indice = func.avg(media / melhores.c.melhor_media).label("indice_preco")
+    stmt = select(
+        HistoricoPreco.fornecedor_id,
+        Fornecedor.nome.label("fornecedor_nome"),
+        indice,
+        func.count(HistoricoPreco.material_id).label("materiais"),
+        func.sum(case((media <= melhores.c.melhor_media, 1), else_=0)).label("materiais_mais_barato"),
+        func.sum(HistoricoPreco.observacoes).label("observacoes"),
+        func.max(HistoricoPreco.data_ultimo_preco).label("data_ultimo_preco")
+    ).join(
+        melhores, melhores.c.material_id == HistoricoPreco.material_id
+    ).join(
+        Fornecedor, Fornecedor.id == HistoricoPreco.fornecedor_id
+    ).where(
+        HistoricoPreco.observacoes > 0, melhores.c.melhor_media > 0
+    ).group_by(
+        HistoricoPreco.fornecedor_id, Fornecedor.nome
+    ).having(
+        func.count(HistoricoPreco.material_id) >= minimo_materiais
+    ).order_by(indice, HistoricoPreco.fornecedor_id).limit(limite)
+
+    return [
+        {
+            "posicao": posicao,
+            "fornecedor_id": linha.fornecedor_id,
+            "fornecedor_nome": linha.fornecedor_nome,
+            "indice_preco": round(linha.indice_preco, 4),
+            "materiais": linha.materiais,
+            "materiais_mais_barato": linha.materiais_mais_barato,
+            "observacoes": linha.observacoes,
+            "data_ultimo_preco": linha.data_ultimo_preco
+        }
+        for posicao, linha in enumerate(session.execute(stmt), start=1)
+    ]
+
+
+# =============================================================================
+# RECONSTRUÇÃO
+# =============================================================================
+
+def reconstruir_historico_precos(session: Session) -> dict:
+    """
+    Refaz historico_precos a partir dos pedidos aprovados e das respostas de
+    cotação, em ordem cronológica (não faz commit)
+    """
+    pedidos = session.execute(
+        select(
+            PedidoCompra.data_pedido.label("data"),
+            PedidoCompra.id.label("documento"),
+            ItemPedidoCompra.material_id,
+            PedidoCompra.fornecedor_id,
+            ItemPedidoCompra.preco_unitario,
+            ItemPedidoCompra.quantidade
+        ).join(
+            ItemPedidoCompra, ItemPedidoCompra.pedido_id == PedidoCompra.id
+        ).where(PedidoCompra.status.in_(STATUS_PEDIDO_COM_PRECO))
+    ).all()
+    respostas = session.execute(
+        select(
+            RespostaFornecedor.data_resposta.label("data"),
+            RespostaFornecedor.id.label("documento"),
+            ItemCotacao.material_id,
+            RespostaFornecedor.fornecedor_id,
+            ItemRespostaFornecedor.preco_unitario,
+            ItemCotacao.quantidade
+        ).join(
+            ItemRespostaFornecedor, ItemRespostaFornecedor.resposta_id == RespostaFornecedor.id
+        ).join(
+            ItemCotacao, ItemCotacao.id == ItemRespostaFornecedor.item_cotacao_id
+        ).where(ItemCotacao.material_id.isnot(None))
+    ).all()
+
+    # Agrupa por documento e reaplica em ordem cronológica em memória
+    documentos: Dict[Tuple[str, int], dict] = {}
+    for origem, linhas in ((ORIGEM_PEDIDO, pedidos), (ORIGEM_COTACAO, respostas)):
+        for linha in linhas:
+            documento = documentos.setdefault((origem, linha.documento), {"data": linha.data, "observacoes": []})
+            documento["observacoes"].append(ObservacaoPreco(
+                linha.material_id, linha.fornecedor_id, linha.preco_unitario, linha.quantidade
+            ))
+    ordem = sorted(documentos.items(), key=lambda d: (d[1]["data"] or datetime.min, d[0]))
+
+    resumo: Dict[Tuple[int, int], dict] = {}
+    for (origem, _documento), documento in ordem:
+        data = documento["data"]
+        for chave, preco in _consolidar(documento["observacoes"]).items():
+            atual = resumo.get(chave)
+            if atual is None:
+                resumo[chave] = {
+                    "material_id": chave[0], "fornecedor_id": chave[1],
+                    "ultimo_preco": preco, "preco_minimo": preco, "preco_maximo": preco,
+                    "soma_precos": preco, "observacoes": 1, "media_movel": preco,
+                    "ultima_origem": origem, "data_ultimo_preco": data
+                }
+                continue
+            atual["ultimo_preco"] = preco
+            atual["preco_minimo"] = min(atual["preco_minimo"], preco)
+            atual["preco_maximo"] = max(atual["preco_maximo"], preco)
+            atual["soma_precos"] += preco
+            atual["observacoes"] += 1
+            atual["media_movel"] += PESO_MEDIA_MOVEL * (preco - atual["media_movel"])
+            atual["ultima_origem"] = origem
+            atual["data_ultimo_preco"] = data
+
+    agora = datetime.utcnow()
+    session.execute(delete(HistoricoPreco))
+    if resumo:
+        session.execute(insert(HistoricoPreco), [{**linha, "updated_at": agora} for linha in resumo.values()])
+
+    return {"pares": len(resumo), "documentos": len(documentos)}
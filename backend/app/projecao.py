@@ -0,0 +1,65 @@
+"""
+Projeções leves para listagens.
+
+Com ?view=summary (colunas de resumo definidas pelo endpoint) ou
+?fields=a,b,c, a listagem seleciona só essas colunas com um select() e
+devolve as linhas direto em JSON: sem montar entidades ORM (identity map)
+nem validar o schema *Read completo de cada linha. Sem esses parâmetros o
+endpoint mantém a resposta completa.
+"""
+from enum import Enum
+from typing import List, Optional, Sequence, Type
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from pydantic import BaseModel
+from sqlalchemy.orm import Query, Session
+
+from app.respostas import serializar_json
+
+
+class VisaoListagem(str, Enum):
+    FULL = "full"
+    SUMMARY = "summary"
+
+
+def colunas_projecao(
+    schema: Type[BaseModel],
+    modelo,
+    fields: Optional[str],
+    view: VisaoListagem,
+    resumo: Sequence[str]
+) -> Optional[List[str]]:
+    """
+    Colunas a selecionar, ou None para a resposta completa
+
+    Só são aceitos campos do schema de leitura que sejam colunas do modelo;
+    o id vem sempre primeiro.
+
+    Raises:
+        HTTPException 400: campo desconhecido em `fields`
+    """
+    if fields:
+        nomes = [nome.strip() for nome in fields.split(",") if nome.strip()]
+    elif view == VisaoListagem.SUMMARY:
+        nomes = list(resumo)
+    else:
+        return None
+
+    permitidos = [nome for nome in schema.model_fields if nome in modelo.__table__.columns]
+    invalidos = [nome for nome in nomes if nome not in permitidos]
+    if invalidos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campos inválidos: {', '.join(invalidos)}. Disponíveis: {', '.join(permitidos)}"
+        )
+
+    return list(dict.fromkeys(["id", *nomes]))
+
+
+def resposta_projecao(session: Session, query: Query, modelo, colunas: Sequence[str]) -> Response:
+    """Executa a consulta (filtros, ordem e paginação já aplicados) só com as colunas pedidas"""
+    stmt = query.with_entities(*(getattr(modelo, nome) for nome in colunas)).statement
+    linhas = session.execute(stmt).all()
+    corpo = serializar_json([dict(zip(colunas, linha)) for linha in linhas])
+    return Response(content=corpo, media_type="application/json")
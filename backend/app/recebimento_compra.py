@@ -0,0 +1,412 @@
+"""
+Recebimento de pedidos de compra com entrada de estoque em lote.
+
+Um ou vários pedidos aprovados (ou enviados) são recebidos de uma vez, total
+ou parcialmente por item, com operações de conjunto; a quantidade de
+consultas não cresce com o número de itens:
+
+- pedidos e itens carregados em duas consultas
+- custo médio dos materiais recalculado em um único UPDATE (CASE por
+  material) com o saldo anterior à entrada
+- entrada de estoque pelo lancar_estoque_em_lote e linhas de
+  MovimentoEstoque em um único INSERT
+- quantidade_recebida dos itens em um único UPDATE; pedido com todos os
+  itens recebidos passa a RECEBIDO
+- uma ContaPagar por pedido com o valor recebido, parcelada se pedido
+
+Pedidos com problema (status, item, quantidade acima do saldo) são
+rejeitados individualmente e os demais são recebidos juntos. Cada pedido
+recebido publica EstoqueMovimentado no outbox. Não faz commit.
+"""
+import csv
+import io
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.orm import Session, selectinload
+
+from app.eventos import ESTOQUE_MOVIMENTADO, publicar
+from app.helpers import lancar_estoque_em_lote, obter_local_padrao
+from app.models_modules import (
+    ContaPagar, ItemPedidoCompra, LocalEstoque, Material, MovimentoEstoque,
+    ParcelaContaPagar, PedidoCompra, StatusCompra, StatusPagamento, TipoMovimento,
+    TipoParcelamento
+)
+
+
+STATUS_RECEBIVEIS = (StatusCompra.APROVADO, StatusCompra.PEDIDO_ENVIADO)
+
+# Folga para comparações de quantidade em ponto flutuante
+TOLERANCIA = 1e-6
+
+
+class ErroRecebimento(Exception):
+    """Falha que impede o recebimento do lote inteiro"""
+
+
+class RecebimentoPedido(NamedTuple):
+    pedido_id: int
+    itens: Optional[Dict[int, float]] = None  # {item_id: quantidade}; None = todo o saldo pendente
+    numero_documento: Optional[str] = None  # NF do fornecedor
+
+
+def _consolidar_recebimentos(recebimentos: Sequence[RecebimentoPedido]) -> Dict[int, RecebimentoPedido]:
+    """Junta leituras repetidas do mesmo pedido (None em qualquer uma = todo o saldo)"""
+    consolidados: Dict[int, RecebimentoPedido] = {}
+    for recebimento in recebimentos:
+        anterior = consolidados.get(recebimento.pedido_id)
+        if anterior is None:
+            itens = dict(recebimento.itens) if recebimento.itens is not None else None
+            consolidados[recebimento.pedido_id] = recebimento._replace(itens=itens)
+            continue
+
+        itens = None
+        if anterior.itens is not None and recebimento.itens is not None:
+            itens = dict(anterior.itens)
+            for item_id, quantidade in recebimento.itens.items():
+                itens[item_id] = itens.get(item_id, 0.0) + quantidade
+        consolidados[recebimento.pedido_id] = anterior._replace(
+            itens=itens,
+            numero_documento=anterior.numero_documento or recebimento.numero_documento
+        )
+    return consolidados
+
+
+def _validar_pedido(pedido: PedidoCompra, itens: Optional[Dict[int, float]]) -> Tuple[Optional[str], List[Tuple[ItemPedidoCompra, float]]]:
+    """(motivo da rejeição ou None, [(item, quantidade a receber)])"""
+    if pedido.status not in STATUS_RECEBIVEIS:
+        return "Apenas pedidos aprovados ou enviados podem ser recebidos", []
+
+    por_id = {item.id: item for item in pedido.itens}
+    saldos = {item.id: item.quantidade - (item.quantidade_recebida or 0.0) for item in pedido.itens}
+
+    if itens is None:
+        linhas = [(por_id[item_id], saldo) for item_id, saldo in saldos.items() if saldo > TOLERANCIA]
+    else:
+        estranhos = sorted(item_id for item_id in itens if item_id not in por_id)
+        if estranhos:
+            return f"Itens não pertencem ao pedido: {estranhos}", []
+        excedentes = sorted(
+            item_id for item_id, quantidade in itens.items() if quantidade > saldos[item_id] + TOLERANCIA
+        )
+        if excedentes:
+            return f"Quantidade acima do saldo pendente nos itens {excedentes}", []
+        linhas = [(por_id[item_id], quantidade) for item_id, quantidade in itens.items() if quantidade > 0]
+
+    if not linhas:
+        return "Nada a receber: todos os itens já foram recebidos", []
+    return None, sorted(linhas, key=lambda linha: linha[0].id)
+
+
+def _parcelas(valor: float, quantidade: int, primeira: datetime, intervalo_dias: int) -> List[Tuple[datetime, float]]:
+    """Vencimentos e valores; a última parcela absorve a diferença de arredondamento"""
+    valor_parcela = round(valor / quantidade, 2)
+    parcelas = [
+        (primeira + timedelta(days=i * intervalo_dias), valor_parcela)
+        for i in range(quantidade)
+    ]
+    vencimento, _ = parcelas[-1]
+    parcelas[-1] = (vencimento, round(valor - valor_parcela * (quantidade - 1), 2))
+    return parcelas
+
+
+def receber_pedidos(
+    session: Session,
+    recebimentos: Sequence[RecebimentoPedido],
+    local_id: Optional[int] = None,
+    data_recebimento: Optional[datetime] = None,
+    gerar_conta_pagar: bool = True,
+    quantidade_parcelas: int = 1,
+    intervalo_dias: int = 30,
+    data_primeira_parcela: Optional[datetime] = None,
+    forma_pagamento=None,
+    usuario_id: Optional[int] = None
+) -> dict:
+    """
+    Recebe os pedidos informados, lançando a entrada de estoque em lote
+
+    Returns:
+        {"recebidos": [dict por pedido], "rejeitadas": [{"pedido_id", "numero", "motivo"}]}
+
+    Raises:
+        ErroRecebimento: local de estoque inexistente ou nenhum local ativo
+    """
+    agora = datetime.utcnow()
+    data_recebimento = data_recebimento or agora
+    consolidados = _consolidar_recebimentos(recebimentos)
+
+    pedidos = {
+        pedido.id: pedido for pedido in session.query(PedidoCompra).options(
+            selectinload(PedidoCompra.itens)
+        ).filter(PedidoCompra.id.in_(list(consolidados)))
+    }
+
+    rejeitadas: List[dict] = []
+    aceitos: List[Tuple[PedidoCompra, RecebimentoPedido, List[Tuple[ItemPedidoCompra, float]]]] = []
+    for pedido_id in sorted(consolidados):
+        pedido = pedidos.get(pedido_id)
+        if pedido is None:
+            rejeitadas.append({"pedido_id": pedido_id, "numero": None, "motivo": "Pedido não encontrado"})
+            continue
+        motivo, linhas = _validar_pedido(pedido, consolidados[pedido_id].itens)
+        if motivo:
+            rejeitadas.append({"pedido_id": pedido.id, "numero": pedido.numero, "motivo": motivo})
+            continue
+        aceitos.append((pedido, consolidados[pedido_id], linhas))
+
+    if not aceitos:
+        return {"recebidos": [], "rejeitadas": rejeitadas}
+
+    if local_id:
+        if session.get(LocalEstoque, local_id) is None:
+            raise ErroRecebimento("Local de estoque não encontrado")
+    else:
+        local_padrao = obter_local_padrao(session)
+        if not local_padrao:
+            raise ErroRecebimento("Nenhum local de estoque ativo encontrado")
+        local_id = local_padrao.id
+
+    deltas: Dict[Tuple[int, int], float] = defaultdict(float)
+    quantidades_material: Dict[int, float] = defaultdict(float)
+    valores_material: Dict[int, float] = defaultdict(float)
+    recebidas_item: Dict[int, float] = {}
+    movimentos: List[dict] = []
+
+    for pedido, recebimento, linhas in aceitos:
+        documento = f"PC {pedido.numero}"
+        observacao = f"Recebimento do pedido {pedido.numero}"
+        if recebimento.numero_documento:
+            observacao += f" (NF {recebimento.numero_documento})"
+        for item, quantidade in linhas:
+            deltas[(item.material_id, local_id)] += quantidade
+            quantidades_material[item.material_id] += quantidade
+            valores_material[item.material_id] += quantidade * item.preco_unitario
+            recebidas_item[item.id] = quantidade
+            movimentos.append({
+                "material_id": item.material_id,
+                "tipo_movimento": TipoMovimento.ENTRADA,
+                "quantidade": quantidade,
+                "data_movimento": data_recebimento,
+                "documento": documento,
+                "observacao": observacao,
+                "usuario_id": usuario_id,
+                "local_origem_id": None,
+                "local_destino_id": local_id,
+            })
+
+    # Custo médio ponderado com o saldo anterior (antes de lançar a entrada)
+    materiais = Material.__table__
+    saldo_anterior = case((materiais.c.estoque_atual > 0, materiais.c.estoque_atual), else_=0.0)
+    quantidade_entrada = case(dict(quantidades_material), value=materiais.c.id, else_=0.0)
+    valor_entrada = case(dict(valores_material), value=materiais.c.id, else_=0.0)
+    session.execute(
+        update(materiais).where(
+            materiais.c.id.in_(list(quantidades_material))
+        ).values(
+            preco_medio=(
+                saldo_anterior * func.coalesce(materiais.c.preco_medio, 0.0) + valor_entrada
+            ) / (saldo_anterior + quantidade_entrada),
+            updated_at=agora
+        )
+    )
+
+    resultado = lancar_estoque_em_lote(dict(deltas), session)
+    if not resultado["sucesso"]:
+        raise ErroRecebimento(resultado["mensagem"])
+
+    session.execute(insert(MovimentoEstoque), movimentos)
+
+    itens_tabela = ItemPedidoCompra.__table__
+    session.execute(
+        update(itens_tabela).where(
+            itens_tabela.c.id.in_(list(recebidas_item))
+        ).values(
+            quantidade_recebida=func.coalesce(itens_tabela.c.quantidade_recebida, 0.0)
+            + case(recebidas_item, value=itens_tabela.c.id, else_=0.0)
+        )
+    )
+
+    primeira_parcela = data_primeira_parcela or data_recebimento + timedelta(days=intervalo_dias)
+    recebidos: List[dict] = []
+    contas: List[Tuple[int, ContaPagar]] = []
+
+    for pedido, recebimento, linhas in aceitos:
+        itens_resposta = []
+        completo = True
+        for item in pedido.itens:
+            agora_recebida = recebidas_item.get(item.id, 0.0)
+            total_recebida = (item.quantidade_recebida or 0.0) + agora_recebida
+            saldo = max(item.quantidade - total_recebida, 0.0)
+            completo = completo and saldo <= TOLERANCIA
+            if agora_recebida:
+                itens_resposta.append({
+                    "item_id": item.id,
+                    "material_id": item.material_id,
+                    "quantidade": agora_recebida,
+                    "quantidade_recebida": total_recebida,
+                    "saldo": saldo
+                })
+
+        if completo:
+            pedido.status = StatusCompra.RECEBIDO
+            pedido.data_recebimento = data_recebimento
+
+        valor_recebido = round(sum(quantidade * item.preco_unitario for item, quantidade in linhas), 2)
+        if gerar_conta_pagar and valor_recebido > 0:
+            parcelas = _parcelas(valor_recebido, quantidade_parcelas, primeira_parcela, intervalo_dias)
+            conta = ContaPagar(
+                descricao=f"Pedido de compra {pedido.numero}",
+                fornecedor_id=pedido.fornecedor_id,
+                pedido_compra_id=pedido.id,
+                data_emissao=data_recebimento,
+                data_vencimento=primeira_parcela,
+                valor_original=valor_recebido,
+                tipo_parcelamento=(
+                    TipoParcelamento.PARCELADO if quantidade_parcelas > 1 else TipoParcelamento.AVISTA
+                ),
+                quantidade_parcelas=quantidade_parcelas,
+                forma_pagamento=forma_pagamento,
+                numero_documento=recebimento.numero_documento,
+                status=StatusPagamento.PENDENTE
+            )
+            if quantidade_parcelas > 1:
+                conta.parcelas = [
+                    ParcelaContaPagar(
+                        numero_parcela=i + 1,
+                        total_parcelas=quantidade_parcelas,
+                        data_vencimento=vencimento,
+                        valor=valor,
+                        status=StatusPagamento.PENDENTE
+                    )
+                    for i, (vencimento, valor) in enumerate(parcelas)
+                ]
+            session.add(conta)
+            contas.append((pedido.id, conta))
+
+        publicar(session, ESTOQUE_MOVIMENTADO, "pedido_compra", pedido.id, {
+            "documento": f"PC {pedido.numero}",
+            "local_id": local_id,
+            "sinal": 1,
+            "itens": [
+                {"material_id": item.material_id, "quantidade": quantidade}
+                for item, quantidade in linhas
+            ]
+        }, usuario_id=usuario_id)
+
+        recebidos.append({
+            "pedido_id": pedido.id,
+            "numero": pedido.numero,
+            "status": pedido.status.value,
+            "completo": completo,
+            "valor_recebido": valor_recebido,
+            "conta_pagar_id": None,
+            "itens": itens_resposta
+        })
+
+    session.flush()
+    ids_conta = {pedido_id: conta.id for pedido_id, conta in contas}
+    for recebido in recebidos:
+        recebido["conta_pagar_id"] = ids_conta.get(recebido["pedido_id"])
+
+    return {"recebidos": recebidos, "rejeitadas": rejeitadas}
+
+
+# =============================================================================
+# ARQUIVO DE LEITURA DA DOCA
+# =============================================================================
+
+def interpretar_arquivo_doca(session: Session, conteudo: str) -> Tuple[List[RecebimentoPedido], List[dict]]:
+    """
+    Converte o arquivo do coletor da doca em recebimentos
+
+    Uma leitura por linha: numero_pedido;codigo_material[;quantidade[;numero_documento]]
+    (separador ";" ou ","; cabeçalho opcional). Sem quantidade, cada linha vale
+    uma unidade. As quantidades do mesmo material são distribuídas pelos itens
+    do pedido em ordem, até o saldo de cada um.
+
+    Returns:
+        (recebimentos, rejeitadas) - pedido com leitura inválida é rejeitado inteiro
+    """
+    dialeto = ";" if conteudo.count(";") >= conteudo.count(",") else ","
+    leituras: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    documentos: Dict[str, str] = {}
+    erros: Dict[str, str] = {}
+
+    for numero_linha, campos in enumerate(csv.reader(io.StringIO(conteudo), delimiter=dialeto), start=1):
+        campos = [campo.strip() for campo in campos]
+        if not any(campos):
+            continue
+        if numero_linha == 1 and campos[0].lower() in ("numero_pedido", "pedido"):
+            continue
+        if len(campos) < 2 or not campos[0] or not campos[1]:
+            erros.setdefault(campos[0] or f"linha {numero_linha}", f"Linha {numero_linha} inválida")
+            continue
+
+        numero, codigo = campos[0], campos[1]
+        try:
+            quantidade = float(campos[2].replace(",", ".")) if len(campos) > 2 and campos[2] else 1.0
+        except ValueError:
+            erros.setdefault(numero, f"Quantidade inválida na linha {numero_linha}")
+            continue
+        leituras[numero][codigo] += quantidade
+        if len(campos) > 3 and campos[3]:
+            documentos.setdefault(numero, campos[3])
+
+    linhas = session.execute(
+        select(
+            PedidoCompra.numero,
+            PedidoCompra.id.label("pedido_id"),
+            ItemPedidoCompra.id.label("item_id"),
+            Material.codigo,
+            ItemPedidoCompra.quantidade,
+            func.coalesce(ItemPedidoCompra.quantidade_recebida, 0.0).label("quantidade_recebida")
+        ).join(
+            ItemPedidoCompra, ItemPedidoCompra.pedido_id == PedidoCompra.id
+        ).join(
+            Material, Material.id == ItemPedidoCompra.material_id
+        ).where(
+            PedidoCompra.numero.in_(list(leituras) + list(erros))
+        ).order_by(PedidoCompra.numero, ItemPedidoCompra.id)
+    ).all()
+
+    pedidos: Dict[str, int] = {}
+    itens_por_codigo: Dict[Tuple[str, str], list] = defaultdict(list)
+    for linha in linhas:
+        pedidos[linha.numero] = linha.pedido_id
+        itens_por_codigo[(linha.numero, linha.codigo)].append(linha)
+
+    recebimentos: List[RecebimentoPedido] = []
+    rejeitadas: List[dict] = []
+    for numero in sorted(set(leituras) | set(erros)):
+        pedido_id = pedidos.get(numero)
+        if numero in erros:
+            rejeitadas.append({"pedido_id": pedido_id, "numero": numero, "motivo": erros[numero]})
+            continue
+        if pedido_id is None:
+            rejeitadas.append({"pedido_id": None, "numero": numero, "motivo": "Pedido não encontrado"})
+            continue
+
+        itens: Dict[int, float] = {}
+        problemas = []
+        for codigo, quantidade in leituras[numero].items():
+            candidatos = itens_por_codigo.get((numero, codigo))
+            if not candidatos:
+                problemas.append(f"material {codigo} não está no pedido")
+                continue
+            restante = quantidade
+            for candidato in candidatos:
+                parte = min(restante, max(candidato.quantidade - candidato.quantidade_recebida, 0.0))
+                if parte > 0:
+                    itens[candidato.item_id] = itens.get(candidato.item_id, 0.0) + parte
+                    restante -= parte
+            if restante > TOLERANCIA:
+                problemas.append(f"quantidade de {codigo} acima do saldo pendente")
+
+        if problemas:
+            rejeitadas.append({"pedido_id": pedido_id, "numero": numero, "motivo": "; ".join(problemas).capitalize()})
+        else:
+            recebimentos.append(RecebimentoPedido(pedido_id, itens, documentos.get(numero)))
+
+    return recebimentos, rejeitadas
@@ -0,0 +1,316 @@
+"""
+Planejamento de reposição de estoque (ponto de pedido).
+
+A demanda diária por material e local vem das saídas (MovimentoEstoque SAIDA)
+em duas janelas móveis, calculadas em uma única agregação no banco. Os
+saldos a receber dos pedidos de compra em aberto são abatidos por material e a quantidade sugerida
+cobre o lead time mais os dias de cobertura desejados.
+
+Todo material ativo tem posição no local padrão, mesmo sem saldo lançado;
+nos demais locais só há posição onde existe linha de estoque. O mínimo e o
+máximo do cadastro do material são da empresa e valem só no local padrão.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.orm import Session
+
+from app.helpers import gerar_numero_pedido_compra, gerar_proximo_codigo, obter_local_padrao
+from app.models_modules import (
+    Cotacao, EstoquePorLocal, Fornecedor, ItemCotacao, ItemPedidoCompra,
+    LocalEstoque, Material, MovimentoEstoque, PedidoCompra, StatusCompra,
+    StatusCotacao, TipoMovimento
+)
+
+
+JANELA_CURTA_DIAS = 30
+JANELA_LONGA_DIAS = 90
+PESO_JANELA_CURTA = 0.6
+
+STATUS_PEDIDO_ABERTO = (
+    StatusCompra.SOLICITADO,
+    StatusCompra.APROVADO,
+    StatusCompra.PEDIDO_ENVIADO,
+)
+
+
+def _limite_local(do_local, do_material, no_padrao):
+    """Limite definido no local ou, se vazio/zero, o do cadastro do material (só no local padrão)"""
+    return case(
+        (do_local > 0, do_local),
+        (no_padrao, func.coalesce(do_material, 0.0)),
+        else_=0.0
+    )
+
+
+def _consultar_posicoes(
+    session: Session,
+    local_id: Optional[int],
+    categoria_id: Optional[int],
+    material_ids: Optional[Sequence[int]]
+):
+    """Posição por (material, local) com as saídas das duas janelas agregadas"""
+    local_padrao = obter_local_padrao(session)
+    no_padrao = LocalEstoque.id == (local_padrao.id if local_padrao else None)
+
+    agora = datetime.utcnow()
+    inicio_curta = agora - timedelta(days=JANELA_CURTA_DIAS)
+    inicio_longa = agora - timedelta(days=JANELA_LONGA_DIAS)
+
+    demanda = select(
+        MovimentoEstoque.material_id,
+        MovimentoEstoque.local_origem_id.label("local_id"),
+        func.sum(case(
+            (MovimentoEstoque.data_movimento >= inicio_curta, MovimentoEstoque.quantidade),
+            else_=0.0
+        )).label("saida_curta"),
+        func.sum(MovimentoEstoque.quantidade).label("saida_longa")
+    ).where(
+        MovimentoEstoque.tipo_movimento == TipoMovimento.SAIDA,
+        MovimentoEstoque.data_movimento >= inicio_longa,
+        MovimentoEstoque.local_origem_id.isnot(None)
+    ).group_by(
+        MovimentoEstoque.material_id, MovimentoEstoque.local_origem_id
+    ).subquery()
+
+    stmt = select(
+        Material.id.label("material_id"),
+        LocalEstoque.id.label("local_id"),
+        Material.codigo,
+        Material.nome,
+        Material.unidade_medida,
+        func.coalesce(Material.preco_medio, 0.0).label("preco_medio"),
+        LocalEstoque.nome.label("local_nome"),
+        func.coalesce(EstoquePorLocal.quantidade, 0.0).label("quantidade"),
+        _limite_local(EstoquePorLocal.estoque_minimo, Material.estoque_minimo, no_padrao).label("estoque_minimo"),
+        _limite_local(EstoquePorLocal.estoque_maximo, Material.estoque_maximo, no_padrao).label("estoque_maximo"),
+        func.coalesce(demanda.c.saida_curta, 0.0).label("saida_curta"),
+        func.coalesce(demanda.c.saida_longa, 0.0).label("saida_longa")
+    ).select_from(
+        Material
+    ).join(
+        LocalEstoque, LocalEstoque.ativo == 1
+    ).outerjoin(
+        EstoquePorLocal,
+        and_(
+            EstoquePorLocal.material_id == Material.id,
+            EstoquePorLocal.local_id == LocalEstoque.id
+        )
+    ).outerjoin(
+        demanda,
+        and_(
+            demanda.c.material_id == Material.id,
+            demanda.c.local_id == LocalEstoque.id
+        )
+    ).where(
+        Material.ativo == 1,
+        # Local padrão para todo material (mesmo nunca estocado); demais só com linha de estoque
+        or_(EstoquePorLocal.id.isnot(None), no_padrao)
+    )
+
+    if local_id:
+        stmt = stmt.where(LocalEstoque.id == local_id)
+    if categoria_id:
+        stmt = stmt.where(Material.categoria_id == categoria_id)
+    if material_ids:
+        stmt = stmt.where(Material.id.in_(material_ids))
+
+    return session.execute(stmt).all()
+
+
+def _consultar_pedidos_abertos(
+    session: Session,
+    material_ids: Optional[Sequence[int]]
+) -> Dict[int, float]:
+    """Saldo a receber dos pedidos de compra em aberto, por material"""
+    # Recebimentos parciais já estão no estoque físico: só o saldo é suprimento futuro
+    saldo = ItemPedidoCompra.quantidade - func.coalesce(ItemPedidoCompra.quantidade_recebida, 0.0)
+    stmt = select(
+        ItemPedidoCompra.material_id,
+        func.sum(case((saldo > 0, saldo), else_=0.0))
+    ).join(
+        PedidoCompra, PedidoCompra.id == ItemPedidoCompra.pedido_id
+    ).where(
+        PedidoCompra.status.in_(STATUS_PEDIDO_ABERTO)
+    ).group_by(ItemPedidoCompra.material_id)
+
+    if material_ids:
+        stmt = stmt.where(ItemPedidoCompra.material_id.in_(material_ids))
+
+    return {material_id: quantidade or 0.0 for material_id, quantidade in session.execute(stmt)}
+
+
+def calcular_sugestoes_reposicao(
+    session: Session,
+    lead_time_dias: int = 7,
+    dias_cobertura: int = 30,
+    local_id: Optional[int] = None,
+    categoria_id: Optional[int] = None,
+    material_ids: Optional[Sequence[int]] = None,
+    apenas_necessarios: bool = True
+) -> List[dict]:
+    """
+    Calcula as sugestões de compra por material e local
+
+    - demanda diária: média ponderada das janelas de 30 e 90 dias
+    - ponto de pedido: demanda x lead time + estoque mínimo (do local; no local
+      padrão, o do material quando o local não define)
+    - estoque alvo: demanda x (lead time + cobertura) + mínimo, limitado ao máximo
+    - pedidos em aberto são alocados primeiro aos locais com maior necessidade
+
+    Retorna uma lista de dicts ordenada por valor estimado decrescente.
+    """
+    posicoes = _consultar_posicoes(session, local_id, categoria_id, material_ids)
+    abertos = _consultar_pedidos_abertos(session, material_ids)
+
+    por_material: Dict[int, List[dict]] = defaultdict(list)
+
+    for p in posicoes:
+        demanda_diaria = (
+            PESO_JANELA_CURTA * p.saida_curta / JANELA_CURTA_DIAS
+            + (1 - PESO_JANELA_CURTA) * p.saida_longa / JANELA_LONGA_DIAS
+        )
+        ponto_pedido = demanda_diaria * lead_time_dias + p.estoque_minimo
+        estoque_alvo = demanda_diaria * (lead_time_dias + dias_cobertura) + p.estoque_minimo
+        if p.estoque_maximo > 0:
+            estoque_alvo = max(min(estoque_alvo, p.estoque_maximo), ponto_pedido)
+
+        por_material[p.material_id].append({
+            "material_id": p.material_id,
+            "material_codigo": p.codigo,
+            "material_nome": p.nome,
+            "unidade": p.unidade_medida,
+            "local_id": p.local_id,
+            "local_nome": p.local_nome,
+            "quantidade": p.quantidade,
+            "estoque_minimo": p.estoque_minimo,
+            "demanda_diaria": round(demanda_diaria, 4),
+            "dias_cobertura_atual": (
+                round(p.quantidade / demanda_diaria, 1) if demanda_diaria > 0 else None
+            ),
+            "ponto_pedido": round(ponto_pedido, 4),
+            "estoque_alvo": round(estoque_alvo, 4),
+            "_necessidade": max(estoque_alvo - p.quantidade, 0.0),
+            "_preco_medio": p.preco_medio,
+        })
+
+    sugestoes = []
+    for material_id, linhas in por_material.items():
+        saldo_aberto = abertos.get(material_id, 0.0)
+
+        for linha in sorted(linhas, key=lambda l: l["_necessidade"], reverse=True):
+            alocado = min(saldo_aberto, linha["_necessidade"])
+            saldo_aberto -= alocado
+
+            posicao_projetada = linha["quantidade"] + alocado
+            sugerida = 0.0
+            if posicao_projetada <= linha["ponto_pedido"]:
+                sugerida = math.ceil(max(linha["estoque_alvo"] - posicao_projetada, 0.0))
+
+            preco_medio = linha.pop("_preco_medio")
+            linha.pop("_necessidade")
+            linha["pedidos_abertos"] = round(alocado, 4)
+            linha["quantidade_sugerida"] = sugerida
+            linha["valor_estimado"] = round(sugerida * preco_medio, 2)
+
+            if sugerida > 0 or not apenas_necessarios:
+                sugestoes.append(linha)
+
+    sugestoes.sort(key=lambda l: l["valor_estimado"], reverse=True)
+    return sugestoes
+
+
+def gerar_documento_reposicao(
+    session: Session,
+    destino: str,
+    itens: Sequence[Tuple[int, float]],
+    fornecedor_id: Optional[int] = None,
+    observacoes: Optional[str] = None,
+    usuario_id: Optional[int] = None
+):
+    """
+    Converte sugestões em uma cotação ou pedido de compra em rascunho
+
+    Args:
+        destino: "cotacao" ou "pedido"
+        itens: pares (material_id, quantidade); quantidades do mesmo material
+            em locais diferentes são somadas em um único item
+        fornecedor_id: obrigatório para pedido
+
+    Returns:
+        Cotacao ou PedidoCompra adicionado à sessão (sem commit)
+
+    Raises:
+        ValueError: destino inválido, lista vazia ou fornecedor ausente
+    """
+    quantidades: Dict[int, float] = defaultdict(float)
+    for material_id, quantidade in itens:
+        if quantidade > 0:
+            quantidades[material_id] += quantidade
+
+    if not quantidades:
+        raise ValueError("Nenhum item com quantidade a comprar")
+
+    materiais = {
+        m.id: m for m in session.query(Material).filter(Material.id.in_(list(quantidades)))
+    }
+    faltando = set(quantidades) - set(materiais)
+    if faltando:
+        raise ValueError(f"Materiais não encontrados: {sorted(faltando)}")
+
+    observacao = observacoes or "Gerado pelo planejamento de reposição"
+
+    if destino == "cotacao":
+        documento = Cotacao(
+            numero=gerar_proximo_codigo(session, Cotacao, "COT"),
+            descricao=f"Reposição de estoque - {datetime.now():%d/%m/%Y}",
+            observacoes=observacao,
+            status=StatusCotacao.RASCUNHO,
+            created_by=usuario_id
+        )
+        for material_id, quantidade in quantidades.items():
+            material = materiais[material_id]
+            documento.itens.append(ItemCotacao(
+                material_id=material_id,
+                descricao=material.nome,
+                quantidade=quantidade,
+                unidade=material.unidade_medida
+            ))
+
+    elif destino == "pedido":
+        if not fornecedor_id:
+            raise ValueError("Fornecedor é obrigatório para gerar pedido de compra")
+        if not session.query(Fornecedor.id).filter(Fornecedor.id == fornecedor_id).first():
+            raise ValueError("Fornecedor não encontrado")
+
+        documento = PedidoCompra(
+            numero=gerar_numero_pedido_compra(session),
+            fornecedor_id=fornecedor_id,
+            status=StatusCompra.RASCUNHO,
+            observacoes=observacao,
+            created_by=usuario_id
+        )
+        valor_total = 0.0
+        for material_id, quantidade in quantidades.items():
+            material = materiais[material_id]
+            preco_unitario = material.preco_medio or 0.0
+            preco_total = quantidade * preco_unitario
+            valor_total += preco_total
+            documento.itens.append(ItemPedidoCompra(
+                material_id=material_id,
+                descricao=material.nome,
+                quantidade=quantidade,
+                unidade=material.unidade_medida,
+                preco_unitario=preco_unitario,
+                preco_total=preco_total
+            ))
+        documento.valor_total = valor_total
+
+    else:
+        raise ValueError(f"Destino inválido: {destino}")
+
+    session.add(documento)
+    return documento
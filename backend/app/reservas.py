@@ -0,0 +1,202 @@
+"""
+Reserva de estoque para pedidos de venda aprovados.
+
+A tabela estoque_reservado guarda um único total por (material, local). A
+reserva é um UPDATE condicional que só soma se o saldo físico do local cobrir
+o total reservado, então aprovações concorrentes não conseguem prometer a
+mesma quantidade duas vezes. O disponível para promessa (ATP) é
+estoque - reservado, lido pelas chaves únicas das duas tabelas.
+
+As demais saídas (movimentos manuais, transferências, emissão de NF) também
+só consomem o disponível: a baixa por local em app.helpers usa a mesma
+condição no UPDATE. O faturamento libera a reserva do pedido antes da baixa.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy import and_, case, func, select, update
+from sqlalchemy.orm import Session
+
+from app.models_modules import EstoquePorLocal, EstoqueReservado, Material, PedidoVenda
+
+
+class ReservaInsuficienteError(Exception):
+    """Saldo disponível insuficiente para reservar um material"""
+
+    def __init__(self, material_id: int, disponivel: float, solicitado: float):
+        self.material_id = material_id
+        self.disponivel = disponivel
+        self.solicitado = solicitado
+        super().__init__(
+            f"Estoque disponível insuficiente. Disponível: {disponivel}, Solicitado: {solicitado}"
+        )
+
+
+def _garantir_linha_reserva(db: Session, material_id: int, local_id: int) -> None:
+    """Cria a linha de reserva zerada se ainda não existir (sem alterar a existente)"""
+    tabela = EstoqueReservado.__table__
+    dialeto = db.get_bind().dialect.name
+
+    if dialeto in ("sqlite", "postgresql"):
+        if dialeto == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+
+        db.execute(
+            insert(tabela).values(
+                material_id=material_id, local_id=local_id, quantidade=0.0
+            ).on_conflict_do_nothing(index_elements=[tabela.c.material_id, tabela.c.local_id])
+        )
+        return
+
+    existe = db.execute(
+        select(tabela.c.id).where(
+            tabela.c.material_id == material_id,
+            tabela.c.local_id == local_id
+        )
+    ).first()
+    if not existe:
+        from sqlalchemy import insert
+        db.execute(insert(tabela).values(material_id=material_id, local_id=local_id, quantidade=0.0))
+
+
+def obter_disponivel(db: Session, material_id: int, local_id: int) -> float:
+    """Disponível para promessa de um material em um local (estoque - reservado)"""
+    linha = consultar_disponibilidade(db, material_ids=[material_id], local_id=local_id)
+    return linha[0].disponivel if linha else 0.0
+
+
+def total_reservado(db: Session, material_id: int) -> float:
+    """Reservado para pedidos aprovados de um material somando todos os locais"""
+    return db.execute(
+        select(func.coalesce(func.sum(EstoqueReservado.quantidade), 0.0)).where(
+            EstoqueReservado.material_id == material_id
+        )
+    ).scalar()
+
+
+def reservar_estoque(db: Session, material_id: int, local_id: int, quantidade: float) -> None:
+    """
+    Reserva quantidade de um material no local de forma atômica
+
+    Raises:
+        ReservaInsuficienteError: se estoque - reservado < quantidade
+    """
+    _garantir_linha_reserva(db, material_id, local_id)
+
+    reservado = EstoqueReservado.__table__
+    estoque = EstoquePorLocal.__table__
+
+    saldo_fisico = select(func.coalesce(func.max(estoque.c.quantidade), 0.0)).where(
+        estoque.c.material_id == material_id,
+        estoque.c.local_id == local_id
+    ).scalar_subquery()
+
+    resultado = db.execute(
+        update(reservado).where(
+            reservado.c.material_id == material_id,
+            reservado.c.local_id == local_id,
+            reservado.c.quantidade + quantidade <= saldo_fisico
+        ).values(
+            quantidade=reservado.c.quantidade + quantidade,
+            updated_at=datetime.utcnow()
+        )
+    )
+
+    if resultado.rowcount == 0:
+        raise ReservaInsuficienteError(
+            material_id, obter_disponivel(db, material_id, local_id), quantidade
+        )
+
+
+def liberar_reserva(db: Session, material_id: int, local_id: int, quantidade: float) -> None:
+    """Libera quantidade reservada (nunca deixa a reserva negativa)"""
+    reservado = EstoqueReservado.__table__
+
+    db.execute(
+        update(reservado).where(
+            reservado.c.material_id == material_id,
+            reservado.c.local_id == local_id
+        ).values(
+            quantidade=case(
+                (reservado.c.quantidade > quantidade, reservado.c.quantidade - quantidade),
+                else_=0.0
+            ),
+            updated_at=datetime.utcnow()
+        )
+    )
+
+
+def _quantidades_pedido(pedido: PedidoVenda) -> Dict[int, float]:
+    """Soma as quantidades do pedido por material"""
+    quantidades: Dict[int, float] = defaultdict(float)
+    for item in pedido.itens:
+        quantidades[item.material_id] += item.quantidade
+    return quantidades
+
+
+def reservar_pedido(db: Session, pedido: PedidoVenda, local_id: int) -> None:
+    """
+    Reserva todos os itens do pedido no local e registra o local no pedido
+
+    Em caso de falha nada é desfeito aqui; o chamador deve fazer rollback.
+    """
+    for material_id, quantidade in sorted(_quantidades_pedido(pedido).items()):
+        reservar_estoque(db, material_id, local_id, quantidade)
+
+    pedido.local_reserva_id = local_id
+
+
+def liberar_reservas_pedido(db: Session, pedido: PedidoVenda) -> None:
+    """Libera as reservas do pedido (cancelamento ou faturamento)"""
+    if not pedido.local_reserva_id:
+        return
+
+    for material_id, quantidade in _quantidades_pedido(pedido).items():
+        liberar_reserva(db, material_id, pedido.local_reserva_id, quantidade)
+
+    pedido.local_reserva_id = None
+
+
+def consultar_disponibilidade(
+    db: Session,
+    material_ids: Optional[Sequence[int]] = None,
+    local_id: Optional[int] = None
+):
+    """
+    Estoque, reservado e disponível por (material, local)
+
+    Junta estoque_por_local e estoque_reservado pelas chaves únicas
+    (material_id, local_id), sem tocar em movimentações ou pedidos.
+    """
+    reservado = func.coalesce(EstoqueReservado.quantidade, 0.0)
+    estoque = func.coalesce(EstoquePorLocal.quantidade, 0.0)
+
+    stmt = select(
+        EstoquePorLocal.material_id,
+        EstoquePorLocal.local_id,
+        Material.codigo,
+        Material.nome,
+        estoque.label("estoque"),
+        reservado.label("reservado"),
+        (estoque - reservado).label("disponivel")
+    ).join(
+        Material, Material.id == EstoquePorLocal.material_id
+    ).outerjoin(
+        EstoqueReservado,
+        and_(
+            EstoqueReservado.material_id == EstoquePorLocal.material_id,
+            EstoqueReservado.local_id == EstoquePorLocal.local_id
+        )
+    )
+
+    if material_ids:
+        stmt = stmt.where(EstoquePorLocal.material_id.in_(material_ids))
+    if local_id:
+        stmt = stmt.where(EstoquePorLocal.local_id == local_id)
+
+    return db.execute(
+        stmt.order_by(EstoquePorLocal.material_id, EstoquePorLocal.local_id)
+    ).all()
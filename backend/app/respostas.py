@@ -0,0 +1,49 @@
+"""
+Resposta JSON rápida para endpoints que devolvem dicionários grandes.
+
+Rotas com response_model já são serializadas direto para bytes pelo
+Pydantic. As que devolvem dict/list passam por jsonable_encoder + json,
+que domina o tempo nas listagens grandes (extrato, posição de estoque).
+Devolvendo RespostaJSON(conteudo) o endpoint pula o jsonable_encoder e o
+conteúdo vai direto para bytes com orjson (datetime, date, Enum e UUID
+nativos). Sem orjson instalado, cai no json da biblioteca padrão.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependência opcional
+    orjson = None
+
+
+def _padrao(valor: Any) -> Any:
+    """Tipos que o orjson (ou o json padrão) não serializa sozinho"""
+    if isinstance(valor, BaseModel):
+        return valor.model_dump(mode="json")
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Enum):
+        return valor.value
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def serializar_json(conteudo: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(conteudo, default=_padrao, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(conteudo, default=_padrao, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class RespostaJSON(JSONResponse):
+    """JSONResponse serializada com orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return serializar_json(content)
@@ -1,13 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
 from app.db import get_session
 from app.dependencies import require_permission
 from app.schemas_modules import (
     FornecedorCreate, FornecedorRead, FornecedorUpdate,
-    PedidoCompraCreate, PedidoCompraRead, PedidoCompraUpdate
+    PedidoCompraCreate, PedidoCompraRead, PedidoCompraUpdate,
+    CondicoesRecebimentoCompra, RecebimentoLoteRequest, RecebimentoPedidoCompraRequest
 )
 from app.models_modules import Fornecedor, PedidoCompra, ItemPedidoCompra
+from app.helpers import gerar_numero_pedido_compra
+from app.dependencies import get_current_user
+from app.jobs import ErroDefinitivo, enfileirar, resposta_job, tarefa
+from app.precos_compra import (
+    historico_material, precos_referencia, ranking_fornecedores,
+    reconstruir_historico_precos, registrar_precos_pedido, tendencias_precos
+)
+from app.recebimento_compra import (
+    ErroRecebimento, RecebimentoPedido, interpretar_arquivo_doca, receber_pedidos
+)
+from app.respostas import RespostaJSON
 from datetime import datetime
 
 router = APIRouter()
@@ -102,6 +114,9 @@ def delete_fornecedor(
 # PEDIDOS DE COMPRA
 # =============================================================================
 
+# Itens da página inteira em uma consulta (evita uma consulta por pedido)
+CARREGAMENTO_PEDIDO_COMPRA = (selectinload(PedidoCompra.itens),)
+
 @router.get("/pedidos", response_model=List[PedidoCompraRead])
 def list_pedidos(
     skip: int = 0,
@@ -112,7 +127,7 @@ def list_pedidos(
     _: bool = Depends(require_permission("compras:read"))
 ):
     """Lista todos os pedidos de compra"""
-    query = session.query(PedidoCompra)
+    query = session.query(PedidoCompra).options(*CARREGAMENTO_PEDIDO_COMPRA)
     
     if fornecedor_id:
         query = query.filter(PedidoCompra.fornecedor_id == fornecedor_id)
@@ -137,9 +152,7 @@ def create_pedido(
         raise HTTPException(status_code=404, detail="Fornecedor não encontrado")
     
     # Gerar número do pedido
-    ultimo_pedido = session.query(PedidoCompra).order_by(PedidoCompra.id.desc()).first()
-    proximo_numero = 1 if not ultimo_pedido else int(ultimo_pedido.numero.split('-')[-1]) + 1
-    numero_pedido = f"PC-{datetime.now().year}-{proximo_numero:05d}"
+    numero_pedido = gerar_numero_pedido_compra(session)
     
     # Criar pedido
     db_pedido = PedidoCompra(
@@ -234,5 +247,283 @@ def aprovar_pedido(
         raise HTTPException(status_code=400, detail="Apenas pedidos solicitados podem ser aprovados")
     
     pedido.status = "aprovado"
+    registrar_precos_pedido(session, pedido)
     session.commit()
     return {"message": "Pedido aprovado com sucesso"}
+
+
+# =============================================================================
+# RECEBIMENTO
+# =============================================================================
+
+def _receber(
+    session: Session,
+    recebimentos: List[RecebimentoPedido],
+    condicoes: CondicoesRecebimentoCompra,
+    usuario_id: Optional[int] = None
+) -> dict:
+    """
+    Recebe os pedidos com as condições informadas (não faz commit)
+
+    Raises:
+        ErroRecebimento: o lote inteiro não pode ser recebido
+    """
+    return receber_pedidos(
+        session,
+        recebimentos,
+        local_id=condicoes.local_id,
+        data_recebimento=condicoes.data_recebimento,
+        gerar_conta_pagar=condicoes.gerar_conta_pagar,
+        quantidade_parcelas=condicoes.quantidade_parcelas,
+        intervalo_dias=condicoes.intervalo_dias,
+        data_primeira_parcela=condicoes.data_primeira_parcela,
+        forma_pagamento=condicoes.forma_pagamento,
+        usuario_id=usuario_id
+    )
+
+
+def _recebimentos_lote(dados: RecebimentoLoteRequest) -> List[RecebimentoPedido]:
+    return [
+        RecebimentoPedido(
+            recebimento.pedido_id,
+            _quantidades_itens(recebimento.itens),
+            recebimento.numero_documento
+        )
+        for recebimento in dados.recebimentos
+    ]
+
+
+def _quantidades_itens(itens) -> Optional[dict]:
+    """{item_id: quantidade} somando itens repetidos; None = todo o saldo"""
+    if itens is None:
+        return None
+    quantidades = {}
+    for item in itens:
+        quantidades[item.item_id] = quantidades.get(item.item_id, 0.0) + item.quantidade
+    return quantidades
+
+
+def _resultado_lote(resultado: dict, rejeitadas_arquivo: Optional[list] = None) -> dict:
+    rejeitadas = (rejeitadas_arquivo or []) + resultado["rejeitadas"]
+    return {
+        "message": f"{len(resultado['recebidos'])} pedido(s) recebido(s)",
+        "recebidos": resultado["recebidos"],
+        "rejeitadas": rejeitadas
+    }
+
+
+@router.post("/pedidos/{pedido_id}/receber")
+def receber_pedido(
+    pedido_id: int,
+    dados: RecebimentoPedidoCompraRequest,
+    session: Session = Depends(get_session),
+    usuario = Depends(get_current_user),
+    _: bool = Depends(require_permission("compras:update"))
+):
+    """
+    Recebe um pedido de compra (total ou parcial por item)
+    
+    Lança a entrada de estoque de todos os itens, atualiza o custo médio dos
+    materiais e gera a conta a pagar do valor recebido (parcelada quando
+    quantidade_parcelas > 1), tudo na mesma transação.
+    """
+    recebimento = RecebimentoPedido(pedido_id, _quantidades_itens(dados.itens), dados.numero_documento)
+    try:
+        resultado = _receber(session, [recebimento], dados, usuario.id)
+    except ErroRecebimento as e:
+        session.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if resultado["rejeitadas"]:
+        session.rollback()
+        rejeicao = resultado["rejeitadas"][0]
+        status_code = 404 if rejeicao["numero"] is None else 400
+        raise HTTPException(status_code=status_code, detail=rejeicao["motivo"])
+    
+    session.commit()
+    return {"message": "Pedido recebido com sucesso", **resultado["recebidos"][0]}
+
+
+@tarefa("compras.receber_pedidos_lote")
+def tarefa_receber_pedidos_lote(session: Session, parametros: dict, progresso) -> dict:
+    usuario_id = parametros.get("usuario_id")
+    if "arquivo" in parametros:
+        condicoes = CondicoesRecebimentoCompra(**parametros["condicoes"])
+        recebimentos, rejeitadas_arquivo = interpretar_arquivo_doca(session, parametros["arquivo"])
+    else:
+        condicoes = RecebimentoLoteRequest(**parametros["dados"])
+        recebimentos, rejeitadas_arquivo = _recebimentos_lote(condicoes), []
+    try:
+        resultado = _receber(session, recebimentos, condicoes, usuario_id)
+    except ErroRecebimento as e:
+        raise ErroDefinitivo(str(e))
+    return _resultado_lote(resultado, rejeitadas_arquivo)
+
+
+@router.post("/pedidos/receber-lote")
+def receber_pedidos_lote(
+    dados: RecebimentoLoteRequest,
+    assincrono: bool = Query(False, description="Enfileira como job e responde 202"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    session: Session = Depends(get_session),
+    usuario = Depends(get_current_user),
+    _: bool = Depends(require_permission("compras:update"))
+):
+    """
+    Recebe vários pedidos de compra de uma vez
+    
+    Os pedidos com problema são devolvidos em "rejeitadas" e os demais são
+    recebidos juntos, com a entrada de estoque em lote.
+    """
+    if assincrono:
+        job, _criado = enfileirar(
+            session, "compras.receber_pedidos_lote",
+            {"dados": dados.model_dump(mode="json"), "usuario_id": usuario.id},
+            chave_idempotencia=idempotency_key, usuario_id=usuario.id
+        )
+        return resposta_job(job)
+    
+    try:
+        resultado = _receber(session, _recebimentos_lote(dados), dados, usuario.id)
+    except ErroRecebimento as e:
+        session.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    session.commit()
+    return _resultado_lote(resultado)
+
+
+@router.post("/pedidos/receber-lote/arquivo")
+def receber_pedidos_arquivo_doca(
+    conteudo: str = Body(..., media_type="text/csv", description="numero_pedido;codigo_material[;quantidade[;numero_documento]]"),
+    local_id: Optional[int] = Query(None),
+    gerar_conta_pagar: bool = Query(True),
+    quantidade_parcelas: int = Query(1, ge=1, le=120),
+    intervalo_dias: int = Query(30, ge=0),
+    assincrono: bool = Query(False, description="Enfileira como job e responde 202"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    session: Session = Depends(get_session),
+    usuario = Depends(get_current_user),
+    _: bool = Depends(require_permission("compras:update"))
+):
+    """
+    Recebe os pedidos lidos pelo coletor da doca (arquivo texto/CSV)
+    
+    Uma leitura por linha; sem quantidade, cada linha vale uma unidade.
+    """
+    condicoes = CondicoesRecebimentoCompra(
+        local_id=local_id,
+        gerar_conta_pagar=gerar_conta_pagar,
+        quantidade_parcelas=quantidade_parcelas,
+        intervalo_dias=intervalo_dias
+    )
+    if assincrono:
+        job, _criado = enfileirar(
+            session, "compras.receber_pedidos_lote",
+            {"arquivo": conteudo, "condicoes": condicoes.model_dump(mode="json"), "usuario_id": usuario.id},
+            chave_idempotencia=idempotency_key, usuario_id=usuario.id
+        )
+        return resposta_job(job)
+    
+    recebimentos, rejeitadas_arquivo = interpretar_arquivo_doca(session, conteudo)
+    try:
+        resultado = _receber(session, recebimentos, condicoes, usuario.id)
+    except ErroRecebimento as e:
+        session.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    session.commit()
+    return _resultado_lote(resultado, rejeitadas_arquivo)
+
+# =============================================================================
+# PREÇOS DE COMPRA
+# =============================================================================
+
+@router.get("/precos/referencia")
+def get_precos_referencia(
+    material_id: List[int] = Query(..., description="Materiais (repita o parâmetro)"),
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("compras:read"))
+):
+    """Preços de referência por material (menor último preço, média e mínimo histórico)"""
+    referencias = precos_referencia(session, material_id)
+    return RespostaJSON({
+        "referencias": [referencias[m] for m in dict.fromkeys(material_id) if m in referencias],
+        "sem_historico": [m for m in dict.fromkeys(material_id) if m not in referencias]
+    })
+
+
+@router.get("/precos/materiais/{material_id}")
+def get_historico_precos_material(
+    material_id: int,
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("compras:read"))
+):
+    """Preços do material por fornecedor, do menor último preço para o maior"""
+    return RespostaJSON({
+        "material_id": material_id,
+        "fornecedores": historico_material(session, material_id)
+    })
+
+
+@router.get("/precos/tendencias")
+def list_tendencias_precos(
+    material_id: Optional[int] = Query(None),
+    fornecedor_id: Optional[int] = Query(None),
+    minimo_observacoes: int = Query(2, ge=1),
+    alta: bool = Query(True, description="True: maiores altas; False: maiores quedas"),
+    limit: int = Query(50, ge=1, le=500),
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("compras:read"))
+):
+    """
+    Tendência de preço por material e fornecedor
+    
+    Compara a média móvel (peso maior aos preços recentes) com a média de
+    todas as observações.
+    """
+    return RespostaJSON(tendencias_precos(
+        session,
+        material_id=material_id,
+        fornecedor_id=fornecedor_id,
+        minimo_observacoes=minimo_observacoes,
+        limite=limit,
+        alta=alta
+    ))
+
+
+@router.get("/precos/ranking-fornecedores")
+def list_ranking_fornecedores(
+    categoria_id: Optional[int] = Query(None),
+    minimo_materiais: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1, le=500),
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("compras:read"))
+):
+    """Fornecedores ordenados pelo índice de preço (1.0 = sempre o mais barato)"""
+    return RespostaJSON(ranking_fornecedores(
+        session,
+        categoria_id=categoria_id,
+        minimo_materiais=minimo_materiais,
+        limite=limit
+    ))
+
+
+@tarefa("compras.reconstruir_historico_precos", max_tentativas=1)
+def tarefa_reconstruir_historico_precos(session: Session, parametros: dict, progresso) -> dict:
+    return reconstruir_historico_precos(session)
+
+
+@router.post("/precos/reconstruir")
+def reconstruir_precos(
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    session: Session = Depends(get_session),
+    usuario = Depends(get_current_user),
+    _: bool = Depends(require_permission("compras:update"))
+):
+    """Refaz o histórico de preços a partir dos pedidos aprovados e das respostas de cotação (job)"""
+    job, _criado = enfileirar(
+        session, "compras.reconstruir_historico_precos",
+        chave_idempotencia=idempotency_key, usuario_id=usuario.id
+    )
+    return resposta_job(job)
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, joinedload, selectinload
+from typing import Dict, List, Optional
 from datetime import datetime
 from app.db import get_session
 from app.dependencies import require_permission
@@ -14,6 +15,9 @@ from app.models_modules import (
     PedidoCompra, ItemPedidoCompra, Fornecedor
 )
 from app.helpers import gerar_proximo_codigo
+from app.adjudicacao import AdjudicacaoInviavel, calcular_adjudicacao
+from app.precos_compra import ORIGEM_COTACAO, ObservacaoPreco, precos_referencia, registrar_precos
+from app.respostas import RespostaJSON
 
 router = APIRouter()
 
@@ -22,6 +26,13 @@ router = APIRouter()
 # COTAÇÕES
 # =============================================================================
 
+# Itens, respostas e itens das respostas da página inteira em uma consulta por
+# nível (a serialização de CotacaoRead percorre as três coleções)
+CARREGAMENTO_COTACAO = (
+    selectinload(Cotacao.itens),
+    selectinload(Cotacao.respostas).selectinload(RespostaFornecedor.itens_resposta),
+)
+
 @router.get("/cotacoes", response_model=List[CotacaoRead])
 def list_cotacoes(
     skip: int = 0,
@@ -31,7 +42,7 @@ def list_cotacoes(
     _: bool = Depends(require_permission("compras:read"))
 ):
     """Lista todas as cotações com filtros opcionais"""
-    query = session.query(Cotacao)
+    query = session.query(Cotacao).options(*CARREGAMENTO_COTACAO)
     
     if status:
         query = query.filter(Cotacao.status == status)
@@ -87,6 +98,31 @@ def get_cotacao(
     return cotacao
 
 
+@router.get("/cotacoes/{cotacao_id}/precos-referencia")
+def get_precos_referencia_cotacao(
+    cotacao_id: int,
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("compras:read"))
+):
+    """Preço de referência do histórico de compras para cada item da cotação"""
+    _buscar_cotacao(session, cotacao_id)
+    itens = _itens_cotacao(session, cotacao_id)
+    referencias = precos_referencia(
+        session, sorted({item.material_id for item in itens.values() if item.material_id})
+    )
+    
+    return RespostaJSON([
+        {
+            "item_cotacao_id": item.id,
+            "material_id": item.material_id,
+            "descricao": item.descricao,
+            "quantidade": item.quantidade,
+            "referencia": referencias.get(item.material_id)
+        }
+        for item in itens.values()
+    ])
+
+
 @router.put("/cotacoes/{cotacao_id}", response_model=CotacaoRead)
 def update_cotacao(
     cotacao_id: int,
@@ -129,6 +165,123 @@ def delete_cotacao(
 # RESPOSTAS DE FORNECEDORES
 # =============================================================================
 
+def _itens_cotacao(session: Session, cotacao_id: int) -> Dict[int, ItemCotacao]:
+    """Itens da cotação indexados por id, carregados em uma única consulta"""
+    itens = session.query(ItemCotacao).filter(ItemCotacao.cotacao_id == cotacao_id).order_by(ItemCotacao.id).all()
+    return {item.id: item for item in itens}
+
+
+def _validar_fornecedores(session: Session, fornecedor_ids: List[int]) -> None:
+    """Confere em uma consulta se todos os fornecedores existem"""
+    ids = set(fornecedor_ids)
+    existentes = {
+        fornecedor_id for (fornecedor_id,) in
+        session.query(Fornecedor.id).filter(Fornecedor.id.in_(ids))
+    }
+    faltantes = ids - existentes
+    if faltantes:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Fornecedor não encontrado: {', '.join(str(i) for i in sorted(faltantes))}"
+        )
+
+
+def _gravar_respostas(
+    session: Session,
+    cotacao: Cotacao,
+    respostas: List[RespostaFornecedorCreate]
+) -> List[int]:
+    """
+    Grava as respostas e seus itens, devolvendo os ids das respostas
+
+    As quantidades vêm do mapa de itens da cotação (uma consulta), os totais
+    são calculados em memória e os itens de todas as respostas entram em um
+    único INSERT em lote.
+
+    Raises:
+        HTTPException 404: fornecedor inexistente
+        HTTPException 400: item que não pertence à cotação
+    """
+    _validar_fornecedores(session, [resposta.fornecedor_id for resposta in respostas])
+    itens_cotacao = _itens_cotacao(session, cotacao.id)
+
+    invalidos = sorted({
+        item.item_cotacao_id
+        for resposta in respostas for item in resposta.itens
+        if item.item_cotacao_id not in itens_cotacao
+    })
+    if invalidos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Itens não pertencem à cotação: {', '.join(str(i) for i in invalidos)}"
+        )
+
+    db_respostas = []
+    for resposta in respostas:
+        linhas = [
+            {
+                "item_cotacao_id": item.item_cotacao_id,
+                "preco_unitario": item.preco_unitario,
+                "preco_total": item.preco_unitario * itens_cotacao[item.item_cotacao_id].quantidade,
+                "marca": item.marca,
+                "observacoes": item.observacoes
+            }
+            for item in resposta.itens
+        ]
+        db_resposta = RespostaFornecedor(
+            cotacao_id=cotacao.id,
+            fornecedor_id=resposta.fornecedor_id,
+            prazo_entrega_dias=resposta.prazo_entrega_dias,
+            condicao_pagamento=resposta.condicao_pagamento,
+            observacoes=resposta.observacoes,
+            valor_total=sum(linha["preco_total"] for linha in linhas)
+        )
+        session.add(db_resposta)
+        db_respostas.append((db_resposta, linhas))
+
+    # Um flush para as respostas; os ids alimentam o INSERT em lote dos itens
+    session.flush()
+    linhas_itens = [
+        {**linha, "resposta_id": db_resposta.id}
+        for db_resposta, linhas in db_respostas
+        for linha in linhas
+    ]
+    if linhas_itens:
+        session.execute(insert(ItemRespostaFornecedor), linhas_itens)
+
+    # Histórico de preços na mesma transação (itens sem material ficam de fora)
+    registrar_precos(session, (
+        ObservacaoPreco(
+            itens_cotacao[item.item_cotacao_id].material_id,
+            resposta.fornecedor_id,
+            item.preco_unitario,
+            itens_cotacao[item.item_cotacao_id].quantidade
+        )
+        for resposta in respostas for item in resposta.itens
+    ), ORIGEM_COTACAO)
+
+    # Atualizar status da cotação
+    if cotacao.status == StatusCotacao.RASCUNHO or cotacao.status == StatusCotacao.ENVIADA:
+        cotacao.status = StatusCotacao.RESPONDIDA
+
+    return [db_resposta.id for db_resposta, _ in db_respostas]
+
+
+def _buscar_cotacao(session: Session, cotacao_id: int) -> Cotacao:
+    cotacao = session.query(Cotacao).filter(Cotacao.id == cotacao_id).first()
+    if not cotacao:
+        raise HTTPException(status_code=404, detail="Cotação não encontrada")
+    return cotacao
+
+
+def _respostas_por_id(session: Session, resposta_ids: List[int]) -> List[RespostaFornecedor]:
+    respostas = session.query(RespostaFornecedor).options(
+        selectinload(RespostaFornecedor.itens_resposta)
+    ).filter(RespostaFornecedor.id.in_(resposta_ids)).all()
+    por_id = {resposta.id: resposta for resposta in respostas}
+    return [por_id[resposta_id] for resposta_id in resposta_ids]
+
+
 @router.post("/cotacoes/{cotacao_id}/respostas", response_model=RespostaFornecedorRead)
 def create_resposta_fornecedor(
     cotacao_id: int,
@@ -137,54 +290,33 @@ def create_resposta_fornecedor(
     _: bool = Depends(require_permission("compras:create"))
 ):
     """Adiciona resposta de um fornecedor a uma cotação"""
-    # Verificar se cotação existe
-    cotacao = session.query(Cotacao).filter(Cotacao.id == cotacao_id).first()
-    if not cotacao:
-        raise HTTPException(status_code=404, detail="Cotação não encontrada")
-    
-    # Verificar se fornecedor existe
-    fornecedor = session.query(Fornecedor).filter(Fornecedor.id == resposta.fornecedor_id).first()
-    if not fornecedor:
-        raise HTTPException(status_code=404, detail="Fornecedor não encontrado")
-    
-    # Criar resposta
-    db_resposta = RespostaFornecedor(
-        cotacao_id=cotacao_id,
-        fornecedor_id=resposta.fornecedor_id,
-        prazo_entrega_dias=resposta.prazo_entrega_dias,
-        condicao_pagamento=resposta.condicao_pagamento,
-        observacoes=resposta.observacoes
-    )
-    session.add(db_resposta)
-    session.flush()
-    
-    # Adicionar itens da resposta e calcular total
-    valor_total = 0.0
-    for item in resposta.itens:
-        preco_total = item.preco_unitario * session.query(ItemCotacao).filter(
-            ItemCotacao.id == item.item_cotacao_id
-        ).first().quantidade
-        
-        db_item = ItemRespostaFornecedor(
-            resposta_id=db_resposta.id,
-            item_cotacao_id=item.item_cotacao_id,
-            preco_unitario=item.preco_unitario,
-            preco_total=preco_total,
-            marca=item.marca,
-            observacoes=item.observacoes
-        )
-        session.add(db_item)
-        valor_total += preco_total
-    
-    db_resposta.valor_total = valor_total
-    
-    # Atualizar status da cotação
-    if cotacao.status == StatusCotacao.RASCUNHO or cotacao.status == StatusCotacao.ENVIADA:
-        cotacao.status = StatusCotacao.RESPONDIDA
-    
+    cotacao = _buscar_cotacao(session, cotacao_id)
+    resposta_ids = _gravar_respostas(session, cotacao, [resposta])
+    session.commit()
+    return _respostas_por_id(session, resposta_ids)[0]
+
+
+@router.post("/cotacoes/{cotacao_id}/respostas/lote", response_model=List[RespostaFornecedorRead])
+def create_respostas_fornecedor_lote(
+    cotacao_id: int,
+    respostas: List[RespostaFornecedorCreate],
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("compras:create"))
+):
+    """
+    Adiciona respostas de vários fornecedores a uma cotação de uma vez
+
+    Tudo ou nada: se um fornecedor ou item for inválido, nenhuma resposta é
+    gravada. A quantidade de consultas não depende do número de respostas
+    nem de itens.
+    """
+    if not respostas:
+        raise HTTPException(status_code=400, detail="Nenhuma resposta informada")
+
+    cotacao = _buscar_cotacao(session, cotacao_id)
+    resposta_ids = _gravar_respostas(session, cotacao, respostas)
     session.commit()
-    session.refresh(db_resposta)
-    return db_resposta
+    return _respostas_por_id(session, resposta_ids)
 
 
 @router.get("/cotacoes/{cotacao_id}/respostas", response_model=List[RespostaFornecedorRead])
@@ -279,22 +411,22 @@ def converter_cotacao_para_pedido(
     session.add(db_pedido)
     session.flush()
     
-    # Adicionar itens do pedido
+    # Adicionar itens do pedido (itens da cotação pré-carregados, INSERT em lote)
+    itens_cotacao = _itens_cotacao(session, cotacao_id)
+    linhas_itens = []
     for item_resposta in resposta_selecionada.itens_resposta:
-        item_cotacao = session.query(ItemCotacao).filter(
-            ItemCotacao.id == item_resposta.item_cotacao_id
-        ).first()
-        
-        db_item = ItemPedidoCompra(
-            pedido_id=db_pedido.id,
-            material_id=item_cotacao.material_id,
-            descricao=item_cotacao.descricao,
-            quantidade=item_cotacao.quantidade,
-            unidade=item_cotacao.unidade,
-            preco_unitario=item_resposta.preco_unitario,
-            preco_total=item_resposta.preco_total
-        )
-        session.add(db_item)
+        item_cotacao = itens_cotacao[item_resposta.item_cotacao_id]
+        linhas_itens.append({
+            "pedido_id": db_pedido.id,
+            "material_id": item_cotacao.material_id,
+            "descricao": item_cotacao.descricao,
+            "quantidade": item_cotacao.quantidade,
+            "unidade": item_cotacao.unidade,
+            "preco_unitario": item_resposta.preco_unitario,
+            "preco_total": item_resposta.preco_total
+        })
+    if linhas_itens:
+        session.execute(insert(ItemPedidoCompra), linhas_itens)
     
     # Atualizar cotação
     cotacao.convertida_pedido_id = db_pedido.id
@@ -325,7 +457,10 @@ def comparativo_fornecedores(
     if not cotacao:
         raise HTTPException(status_code=404, detail="Cotação não encontrada")
     
-    respostas = session.query(RespostaFornecedor).filter(
+    respostas = session.query(RespostaFornecedor).options(
+        joinedload(RespostaFornecedor.fornecedor),
+        selectinload(RespostaFornecedor.itens_resposta).joinedload(ItemRespostaFornecedor.item_cotacao)
+    ).filter(
         RespostaFornecedor.cotacao_id == cotacao_id
     ).all()
     
@@ -369,3 +504,40 @@ def comparativo_fornecedores(
     comparativo["fornecedores"].sort(key=lambda x: x["valor_total"])
     
     return comparativo
+
+
+@router.get("/cotacoes/{cotacao_id}/adjudicacao")
+def adjudicacao_por_item(
+    cotacao_id: int,
+    prazo_maximo_dias: Optional[int] = Query(None, ge=0),
+    max_fornecedores: Optional[int] = Query(None, ge=1),
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("compras:read"))
+):
+    """
+    Adjudicação de menor custo item a item entre os fornecedores
+
+    Cada item vai para o fornecedor mais barato, respeitando o prazo de
+    entrega máximo e o limite de fornecedores vencedores, quando
+    informados. Inclui a economia em relação ao melhor fornecedor único.
+    """
+    cotacao = _buscar_cotacao(session, cotacao_id)
+
+    try:
+        adjudicacao = calcular_adjudicacao(
+            session,
+            cotacao_id,
+            prazo_maximo_dias=prazo_maximo_dias,
+            max_fornecedores=max_fornecedores
+        )
+    except AdjudicacaoInviavel as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return RespostaJSON({
+        "cotacao": {
+            "id": cotacao.id,
+            "numero": cotacao.numero,
+            "descricao": cotacao.descricao
+        },
+        **adjudicacao
+    })
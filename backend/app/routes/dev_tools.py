@@ -2,9 +2,18 @@
 Dev Tools API - Endpoints para monitoramento de qualidade e completude de features.
 Apenas acessível para administradores com permissão admin:read.
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
 from typing import List, Optional
+from app.db import get_session
 from app.dependencies import require_permission
+from app.core.config import settings
+from app.eventos import resumo_consumidores
+from app.perfilador import (
+    PerfilEmAndamento, formatar_colapsado, limpar_capturas, listar_capturas,
+    obter_captura, perfilar
+)
 from app.feature_flags import (
     get_all_features,
     get_feature_by_id,
@@ -192,3 +201,85 @@ def health_check():
         "critical_gaps": backend_only,
         "completion_rate": stats["completion_rate"]
     }
+
+
+@router.get("/eventos/consumidores")
+def get_consumidores_eventos(
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("admin:read"))
+):
+    """
+    Situação do outbox de eventos de domínio por consumidor.
+    Falhos = eventos que esgotaram as tentativas e não serão mais entregues.
+    """
+    return resumo_consumidores(session)
+
+
+# =============================================================================
+# PERFILADOR
+# =============================================================================
+
+@router.get("/perfil", response_class=PlainTextResponse)
+def get_perfil(
+    segundos: float = Query(5.0, gt=0),
+    intervalo_ms: float = Query(5.0, ge=1, le=1000),
+    apenas_app: bool = Query(True, description="Só pilhas com código da aplicação"),
+    _: bool = Depends(require_permission("admin:read"))
+):
+    """
+    Perfil por amostragem do processo durante `segundos`.
+    Saída no formato collapsed (flamegraph.pl, speedscope).
+    """
+    if segundos > settings.PERFIL_DURACAO_MAXIMA_SEGUNDOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Duração máxima: {settings.PERFIL_DURACAO_MAXIMA_SEGUNDOS} segundos"
+        )
+    
+    try:
+        amostras = perfilar(segundos, intervalo_ms, apenas_app)
+    except PerfilEmAndamento:
+        raise HTTPException(status_code=409, detail="Já existe um perfil em andamento")
+    
+    return formatar_colapsado(amostras)
+
+
+@router.get("/requisicoes-lentas")
+def get_requisicoes_lentas(
+    _: bool = Depends(require_permission("admin:read"))
+):
+    """
+    Requisições que passaram de PERFIL_LIMITE_LENTO_MS (mais recentes primeiro).
+    """
+    return {
+        "limite_ms": settings.PERFIL_LIMITE_LENTO_MS,
+        "capturas": listar_capturas()
+    }
+
+
+@router.get("/requisicoes-lentas/{captura_id}")
+def get_requisicao_lenta(
+    captura_id: int,
+    formato: str = Query("json", pattern="^(json|collapsed)$"),
+    _: bool = Depends(require_permission("admin:read"))
+):
+    """
+    Pilhas amostradas, SQL agregado por forma e tempos de uma requisição lenta.
+    formato=collapsed devolve só as pilhas para gerar o flamegraph.
+    """
+    captura = obter_captura(captura_id)
+    if not captura:
+        raise HTTPException(status_code=404, detail="Captura não encontrada")
+    
+    if formato == "collapsed":
+        return PlainTextResponse("".join(f"{pilha} {n}\n" for pilha, n in captura["pilhas"].items()))
+    return captura
+
+
+@router.delete("/requisicoes-lentas")
+def delete_requisicoes_lentas(
+    _: bool = Depends(require_permission("admin:read"))
+):
+    """Esvazia o buffer de requisições lentas"""
+    limpar_capturas()
+    return {"message": "Capturas removidas"}
@@ -1,15 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
+from collections import defaultdict
 from datetime import datetime
 from app.db import get_session
-from app.dependencies import require_permission
+from app.dependencies import get_current_user, require_permission
 from app.schemas_modules import (
     NotaFiscalCreate, NotaFiscalRead, NotaFiscalUpdate,
-    StatusNotaFiscal, TipoNotaFiscal
+    StatusNotaFiscal, TipoNotaFiscal, EmissaoLoteRequest, RecalculoImpostosRequest, AutorizacaoLoteRequest,
+    AliquotaTributariaCreate, AliquotaTributariaRead
 )
-from app.models_modules import NotaFiscal, ItemNotaFiscal, Cliente, Fornecedor, Material, MovimentoEstoque
-from app.helpers import processar_movimentacao_estoque
+from app.models_modules import (
+    NotaFiscal, ItemNotaFiscal, Cliente, Fornecedor, Material, MovimentoEstoque, AliquotaTributaria
+)
+from app.emissao_nf import ErroEmissaoNF, emitir_notas
+from app.nfe import ErroNFe, autorizar_notas
+from app.impostos_nf import (
+    calcular_nota, invalidar_cache_aliquotas, normalizar_codigo,
+    obter_uf_destinatario, recalcular_notas
+)
+from app.exportacao import FormatoExportacao, iterar_consulta, resposta_exportacao
+from app.jobs import ErroDefinitivo, enfileirar, resposta_job, tarefa
 
 router = APIRouter()
 
@@ -34,32 +46,8 @@ def gerar_numero_nf(db: Session, serie: str = "1") -> str:
     return "000000001"
 
 
-def calcular_totais_nf(nf_data: dict, itens: list) -> dict:
-    """Calcula os totais da nota fiscal"""
-    valor_produtos = sum(item.get('valor_total', 0) for item in itens)
-    valor_icms = sum(item.get('valor_icms', 0) for item in itens)
-    valor_ipi = sum(item.get('valor_ipi', 0) for item in itens)
-    
-    # Valores adicionais da NF
-    valor_frete = nf_data.get('valor_frete', 0)
-    valor_seguro = nf_data.get('valor_seguro', 0)
-    valor_desconto = nf_data.get('valor_desconto', 0)
-    valor_outras_despesas = nf_data.get('valor_outras_despesas', 0)
-    
-    # Total = Produtos + IPI + Frete + Seguro + Outras - Desconto
-    valor_total = (
-        valor_produtos + valor_ipi + valor_frete + 
-        valor_seguro + valor_outras_despesas - valor_desconto
-    )
-    
-    return {
-        'valor_produtos': valor_produtos,
-        'valor_icms': valor_icms,
-        'valor_ipi': valor_ipi,
-        'valor_pis': 0.0,  # Implementar quando necessário
-        'valor_cofins': 0.0,  # Implementar quando necessário
-        'valor_total': valor_total
-    }
+# Itens da página inteira em uma consulta (evita uma consulta por nota)
+CARREGAMENTO_NOTA_FISCAL = (selectinload(NotaFiscal.itens),)
 
 
 @router.get("/notas-fiscais", response_model=List[NotaFiscalRead])
@@ -75,7 +63,7 @@ def list_notas_fiscais(
     _: bool = Depends(require_permission("vendas:read"))
 ):
     """Lista todas as notas fiscais com filtros"""
-    query = session.query(NotaFiscal)
+    query = session.query(NotaFiscal).options(*CARREGAMENTO_NOTA_FISCAL)
     
     if tipo:
         query = query.filter(NotaFiscal.tipo == tipo)
@@ -96,6 +84,65 @@ def list_notas_fiscais(
     return notas
 
 
+@router.get("/notas-fiscais/exportar")
+def exportar_notas_fiscais(
+    formato: FormatoExportacao = Query(FormatoExportacao.CSV),
+    tipo: Optional[TipoNotaFiscal] = Query(None),
+    status: Optional[StatusNotaFiscal] = Query(None),
+    cliente_id: Optional[int] = Query(None),
+    data_inicial: Optional[str] = Query(None),
+    data_final: Optional[str] = Query(None),
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("vendas:read"))
+):
+    """Exporta o registro de notas fiscais filtrado em streaming"""
+    stmt = select(
+        NotaFiscal.id,
+        NotaFiscal.numero,
+        NotaFiscal.serie,
+        NotaFiscal.tipo,
+        NotaFiscal.status,
+        NotaFiscal.data_emissao,
+        NotaFiscal.cliente_id,
+        NotaFiscal.fornecedor_id,
+        NotaFiscal.cfop,
+        NotaFiscal.chave_acesso,
+        NotaFiscal.valor_produtos,
+        NotaFiscal.valor_icms,
+        NotaFiscal.valor_ipi,
+        NotaFiscal.valor_pis,
+        NotaFiscal.valor_cofins,
+        NotaFiscal.valor_total
+    )
+    
+    if tipo:
+        stmt = stmt.where(NotaFiscal.tipo == tipo)
+    
+    if status:
+        stmt = stmt.where(NotaFiscal.status == status)
+    
+    if cliente_id:
+        stmt = stmt.where(NotaFiscal.cliente_id == cliente_id)
+    
+    if data_inicial:
+        stmt = stmt.where(NotaFiscal.data_emissao >= data_inicial)
+    
+    if data_final:
+        stmt = stmt.where(NotaFiscal.data_emissao <= data_final)
+    
+    return resposta_exportacao(
+        colunas=[
+            "id", "numero", "serie", "tipo", "status", "data_emissao",
+            "cliente_id", "fornecedor_id", "cfop", "chave_acesso",
+            "valor_produtos", "valor_icms", "valor_ipi", "valor_pis",
+            "valor_cofins", "valor_total"
+        ],
+        linhas=iterar_consulta(session, stmt.order_by(NotaFiscal.data_emissao.desc())),
+        formato=formato,
+        nome_arquivo="notas_fiscais"
+    )
+
+
 @router.post("/notas-fiscais", response_model=NotaFiscalRead)
 def create_nota_fiscal(
     nf: NotaFiscalCreate,
@@ -117,35 +164,12 @@ def create_nota_fiscal(
     # Gerar número da NF se não informado
     numero_nf = nf.numero or gerar_numero_nf(session, nf.serie)
     
-    # Preparar itens com totais calculados
-    itens_data = []
-    for item_input in nf.itens:
-        item_dict = item_input.dict()
-        
-        # Calcular valor total do item
-        valor_base = item_dict['quantidade'] * item_dict['valor_unitario']
-        valor_total = (
-            valor_base +
-            item_dict.get('valor_frete', 0) +
-            item_dict.get('valor_seguro', 0) +
-            item_dict.get('valor_outras_despesas', 0) -
-            item_dict.get('valor_desconto', 0)
-        )
-        item_dict['valor_total'] = valor_total
-        
-        # Se não informou valor_icms, calcular
-        if item_dict.get('aliquota_icms', 0) > 0 and item_dict.get('valor_icms', 0) == 0:
-            item_dict['valor_icms'] = valor_base * (item_dict['aliquota_icms'] / 100)
-        
-        # Se não informou valor_ipi, calcular
-        if item_dict.get('aliquota_ipi', 0) > 0 and item_dict.get('valor_ipi', 0) == 0:
-            item_dict['valor_ipi'] = valor_base * (item_dict['aliquota_ipi'] / 100)
-        
-        itens_data.append(item_dict)
-    
-    # Calcular totais da NF
+    # Calcular itens e totais (alíquotas da tabela por NCM/CFOP/UF)
     nf_dict = nf.dict(exclude={'itens'})
-    totais = calcular_totais_nf(nf_dict, itens_data)
+    uf = obter_uf_destinatario(session, nf.cliente_id, nf.fornecedor_id)
+    itens_data, totais = calcular_nota(session, nf_dict, [item.dict() for item in nf.itens], uf)
+    nf_dict.pop('numero', None)
+    nf_dict.pop('data_emissao', None)
     
     # Criar NF
     db_nf = NotaFiscal(
@@ -240,77 +264,27 @@ def delete_nota_fiscal(
 def emitir_nota_fiscal(
     nf_id: int,
     baixar_estoque: bool = Query(True),
+    local_id: Optional[int] = Query(None),
     session: Session = Depends(get_session),
+    usuario = Depends(get_current_user),
     _: bool = Depends(require_permission("vendas:update"))
 ):
-    """Emite a nota fiscal e opcionalmente baixa o estoque"""
+    """Emite a nota fiscal e opcionalmente baixa (ou dá entrada) no estoque"""
     db_nf = session.query(NotaFiscal).filter(NotaFiscal.id == nf_id).first()
     if not db_nf:
         raise HTTPException(status_code=404, detail="Nota fiscal não encontrada")
     
-    if db_nf.status != StatusNotaFiscal.RASCUNHO:
-        raise HTTPException(
-            status_code=400,
-            detail="Apenas notas em rascunho podem ser emitidas"
+    try:
+        resultado = emitir_notas(
+            session, [db_nf], baixar_estoque=baixar_estoque, local_id=local_id, usuario_id=usuario.id
         )
+    except ErroEmissaoNF as e:
+        session.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Baixar estoque (se for NF de saída)
-    if baixar_estoque and db_nf.tipo == TipoNotaFiscal.SAIDA:
-        for item in db_nf.itens:
-            if item.material_id:
-                # Processar saída de estoque
-                resultado = processar_movimentacao_estoque(
-                    material_id=item.material_id,
-                    tipo_movimento="SAIDA",
-                    quantidade=item.quantidade,
-                    db=session
-                )
-                
-                if not resultado["sucesso"]:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Erro ao baixar estoque: {resultado['mensagem']}"
-                    )
-                
-                # Registrar movimento
-                movimento = MovimentoEstoque(
-                    material_id=item.material_id,
-                    tipo_movimento="SAIDA",
-                    quantidade=item.quantidade,
-                    documento=f"NF {db_nf.numero}",
-                    observacao=f"Emissão da NF {db_nf.numero} - {item.descricao}"
-                )
-                session.add(movimento)
-    
-    # Dar entrada no estoque (se for NF de entrada)
-    if baixar_estoque and db_nf.tipo == TipoNotaFiscal.ENTRADA:
-        for item in db_nf.itens:
-            if item.material_id:
-                resultado = processar_movimentacao_estoque(
-                    material_id=item.material_id,
-                    tipo_movimento="ENTRADA",
-                    quantidade=item.quantidade,
-                    db=session
-                )
-                
-                if not resultado["sucesso"]:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Erro ao dar entrada no estoque: {resultado['mensagem']}"
-                    )
-                
-                movimento = MovimentoEstoque(
-                    material_id=item.material_id,
-                    tipo_movimento="ENTRADA",
-                    quantidade=item.quantidade,
-                    documento=f"NF {db_nf.numero}",
-                    observacao=f"Recebimento da NF {db_nf.numero} - {item.descricao}"
-                )
-                session.add(movimento)
-    
-    # Atualizar status
-    db_nf.status = StatusNotaFiscal.EMITIDA
-    db_nf.data_emissao = datetime.utcnow()
+    if resultado["rejeitadas"]:
+        session.rollback()
+        raise HTTPException(status_code=400, detail=resultado["rejeitadas"][0]["motivo"])
     
     session.commit()
     session.refresh(db_nf)
@@ -323,41 +297,436 @@ def emitir_nota_fiscal(
     }
 
 
+def emitir_notas_lote(session: Session, dados: EmissaoLoteRequest, usuario_id: Optional[int] = None) -> dict:
+    """
+    Emite as notas do lote e monta a resposta (sem commit)
+    
+    Raises:
+        ErroEmissaoNF: o lote inteiro não pode ser emitido
+    """
+    query = session.query(NotaFiscal).filter(NotaFiscal.status == StatusNotaFiscal.RASCUNHO)
+    if dados.nf_ids:
+        query = session.query(NotaFiscal).filter(NotaFiscal.id.in_(dados.nf_ids))
+    
+    notas = query.order_by(NotaFiscal.id).all()
+    
+    resultado = emitir_notas(
+        session, notas,
+        baixar_estoque=dados.baixar_estoque,
+        local_id=dados.local_id,
+        usuario_id=usuario_id
+    )
+    
+    encontradas = {nf.id for nf in notas}
+    nao_encontradas = [
+        {"id": nf_id, "numero": None, "motivo": "Nota fiscal não encontrada"}
+        for nf_id in (dados.nf_ids or []) if nf_id not in encontradas
+    ]
+    
+    return {
+        "message": f"{len(resultado['emitidas'])} nota(s) emitida(s)",
+        "emitidas": [{"id": nf.id, "numero": nf.numero} for nf in resultado["emitidas"]],
+        "rejeitadas": resultado["rejeitadas"] + nao_encontradas,
+        "estoque_baixado": dados.baixar_estoque
+    }
+
+
+@tarefa("faturamento.emitir_notas_lote")
+def tarefa_emitir_notas_lote(session: Session, parametros: dict, progresso) -> dict:
+    dados = EmissaoLoteRequest(**parametros["dados"])
+    try:
+        return emitir_notas_lote(session, dados, parametros.get("usuario_id"))
+    except ErroEmissaoNF as e:
+        raise ErroDefinitivo(str(e))
+
+
+@router.post("/notas-fiscais/emitir-lote")
+def emitir_notas_fiscais_lote(
+    dados: EmissaoLoteRequest,
+    assincrono: bool = Query(False, description="Enfileira como job e responde 202"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    session: Session = Depends(get_session),
+    usuario = Depends(get_current_user),
+    _: bool = Depends(require_permission("vendas:update"))
+):
+    """
+    Emite várias notas fiscais em rascunho de uma só vez (fechamento do dia)
+    
+    As notas com problema (status ou estoque) são devolvidas em "rejeitadas"
+    e as demais são emitidas com o estoque lançado em lote. Com
+    assincrono=true o lote é processado por um job (resposta 202).
+    """
+    if assincrono:
+        job, _criado = enfileirar(
+            session, "faturamento.emitir_notas_lote",
+            {"dados": dados.model_dump(mode="json"), "usuario_id": usuario.id},
+            chave_idempotencia=idempotency_key, usuario_id=usuario.id
+        )
+        return resposta_job(job)
+    
+    try:
+        resultado = emitir_notas_lote(session, dados, usuario.id)
+    except ErroEmissaoNF as e:
+        session.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    session.commit()
+    return resultado
+
+
+@router.post("/notas-fiscais/autorizar-lote")
+def autorizar_notas_fiscais_lote(
+    dados: AutorizacaoLoteRequest,
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("vendas:update"))
+):
+    """
+    Gera, assina e transmite as NF-e emitidas
+    
+    A geração do XML e a assinatura rodam no pool de processos; a resposta
+    traz as métricas de vazão (notas/s e notas/s por núcleo).
+    """
+    query = session.query(NotaFiscal).filter(NotaFiscal.status == StatusNotaFiscal.EMITIDA)
+    if dados.nf_ids:
+        query = session.query(NotaFiscal).filter(NotaFiscal.id.in_(dados.nf_ids))
+    
+    notas = query.order_by(NotaFiscal.id).all()
+    
+    try:
+        resultado = autorizar_notas(session, notas)
+    except ErroNFe as e:
+        session.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    session.commit()
+    
+    encontradas = {nf.id for nf in notas}
+    nao_encontradas = [
+        {"id": nf_id, "numero": None, "motivo": "Nota fiscal não encontrada"}
+        for nf_id in (dados.nf_ids or []) if nf_id not in encontradas
+    ]
+    
+    return {
+        "message": f"{len(resultado['autorizadas'])} nota(s) autorizada(s)",
+        "autorizadas": [
+            {
+                "id": nf.id,
+                "numero": nf.numero,
+                "chave_acesso": nf.chave_acesso,
+                "protocolo_autorizacao": nf.protocolo_autorizacao
+            }
+            for nf in resultado["autorizadas"]
+        ],
+        "rejeitadas": resultado["rejeitadas"] + nao_encontradas,
+        "metricas": resultado["metricas"]
+    }
+
+
+@router.post("/notas-fiscais/{nf_id}/autorizar")
+def autorizar_nota_fiscal(
+    nf_id: int,
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("vendas:update"))
+):
+    """Gera, assina e transmite a NF-e de uma nota emitida"""
+    db_nf = session.query(NotaFiscal).filter(NotaFiscal.id == nf_id).first()
+    if not db_nf:
+        raise HTTPException(status_code=404, detail="Nota fiscal não encontrada")
+    
+    try:
+        resultado = autorizar_notas(session, [db_nf])
+    except ErroNFe as e:
+        session.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Chave de acesso e denegação ficam gravadas mesmo sem autorização
+    session.commit()
+    
+    if resultado["rejeitadas"]:
+        raise HTTPException(status_code=400, detail=resultado["rejeitadas"][0]["motivo"])
+    
+    return {
+        "message": "Nota fiscal autorizada com sucesso",
+        "numero": db_nf.numero,
+        "status": db_nf.status,
+        "chave_acesso": db_nf.chave_acesso,
+        "protocolo_autorizacao": db_nf.protocolo_autorizacao
+    }
+
+
+@router.get("/notas-fiscais/{nf_id}/xml")
+def get_xml_nota_fiscal(
+    nf_id: int,
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("vendas:read"))
+):
+    """Baixa o XML assinado da NF-e"""
+    db_nf = session.query(NotaFiscal).filter(NotaFiscal.id == nf_id).first()
+    if not db_nf:
+        raise HTTPException(status_code=404, detail="Nota fiscal não encontrada")
+    if not db_nf.xml_nfe:
+        raise HTTPException(status_code=404, detail="Nota fiscal ainda não possui XML")
+    
+    return Response(
+        content=db_nf.xml_nfe,
+        media_type="application/xml",
+        headers={"Content-Disposition": f'attachment; filename="{db_nf.chave_acesso}-nfe.xml"'}
+    )
+
+
+def _expressao_periodo(session: Session, agrupar_por: str):
+    """Expressão SQL que trunca data_emissao no dia ou no mês, conforme o banco"""
+    formato_sqlite = "%Y-%m-%d" if agrupar_por == "dia" else "%Y-%m"
+    formato_pg = "YYYY-MM-DD" if agrupar_por == "dia" else "YYYY-MM"
+    
+    if session.get_bind().dialect.name == "postgresql":
+        return func.to_char(NotaFiscal.data_emissao, formato_pg)
+    return func.strftime(formato_sqlite, NotaFiscal.data_emissao)
+
+
 @router.get("/notas-fiscais/estatisticas/resumo")
 def get_estatisticas_nf(
     data_inicial: Optional[str] = Query(None),
     data_final: Optional[str] = Query(None),
+    agrupar_por: Optional[str] = Query(None, pattern="^(dia|mes)$"),
+    incluir_clientes: bool = False,
+    incluir_cfop: bool = False,
+    limite: int = Query(20, ge=1, le=500),
     session: Session = Depends(get_session),
     _: bool = Depends(require_permission("vendas:read"))
 ):
-    """Retorna estatísticas das notas fiscais"""
-    query = session.query(NotaFiscal)
-    
+    """
+    Retorna estatísticas das notas fiscais agregadas no banco
+    
+    - Totais por status e tipo (um GROUP BY status, tipo)
+    - agrupar_por=dia|mes: série temporal de quantidade e valor
+    - incluir_clientes / incluir_cfop: maiores clientes e valores por CFOP
+    """
+    filtros = []
     if data_inicial:
-        query = query.filter(NotaFiscal.data_emissao >= data_inicial)
+        filtros.append(NotaFiscal.data_emissao >= data_inicial)
     if data_final:
-        query = query.filter(NotaFiscal.data_emissao <= data_final)
+        filtros.append(NotaFiscal.data_emissao <= data_final)
+    
+    nao_cancelada = NotaFiscal.status != StatusNotaFiscal.CANCELADA
+    valor_valido = case((nao_cancelada, NotaFiscal.valor_total), else_=0.0)
+    
+    linhas = session.execute(
+        select(
+            NotaFiscal.status,
+            NotaFiscal.tipo,
+            func.count(NotaFiscal.id),
+            func.coalesce(func.sum(NotaFiscal.valor_total), 0.0),
+            func.coalesce(func.sum(NotaFiscal.valor_icms), 0.0),
+            func.coalesce(func.sum(NotaFiscal.valor_ipi), 0.0)
+        ).where(*filtros).group_by(NotaFiscal.status, NotaFiscal.tipo)
+    ).all()
+    
+    por_status = defaultdict(int)
+    por_tipo = defaultdict(int)
+    valor_total = 0.0
+    por_status_tipo = []
+    
+    for status, tipo, quantidade, valor, icms, ipi in linhas:
+        por_status[status] += quantidade
+        por_tipo[tipo] += quantidade
+        if status != StatusNotaFiscal.CANCELADA:
+            valor_total += valor
+        por_status_tipo.append({
+            "status": status,
+            "tipo": tipo,
+            "quantidade": quantidade,
+            "valor_total": valor,
+            "valor_icms": icms,
+            "valor_ipi": ipi
+        })
+    
+    resultado = {
+        "total_notas": sum(por_status.values()),
+        "emitidas": por_status[StatusNotaFiscal.EMITIDA],
+        "autorizadas": por_status[StatusNotaFiscal.AUTORIZADA],
+        "canceladas": por_status[StatusNotaFiscal.CANCELADA],
+        "valor_total": valor_total,
+        "notas_saida": por_tipo[TipoNotaFiscal.SAIDA],
+        "notas_entrada": por_tipo[TipoNotaFiscal.ENTRADA],
+        "por_status_tipo": por_status_tipo
+    }
+    
+    if agrupar_por:
+        periodo = _expressao_periodo(session, agrupar_por).label("periodo")
+        resultado["serie"] = [
+            {"periodo": p, "quantidade": q, "valor_total": v}
+            for p, q, v in session.execute(
+                select(
+                    periodo,
+                    func.count(NotaFiscal.id),
+                    func.coalesce(func.sum(valor_valido), 0.0)
+                ).where(*filtros).group_by(periodo).order_by(periodo)
+            )
+        ]
+    
+    if incluir_clientes:
+        resultado["por_cliente"] = [
+            {"cliente_id": cliente_id, "cliente_nome": nome, "quantidade": q, "valor_total": v}
+            for cliente_id, nome, q, v in session.execute(
+                select(
+                    NotaFiscal.cliente_id,
+                    Cliente.nome,
+                    func.count(NotaFiscal.id),
+                    func.coalesce(func.sum(NotaFiscal.valor_total), 0.0).label("valor")
+                ).join(
+                    Cliente, Cliente.id == NotaFiscal.cliente_id
+                ).where(
+                    nao_cancelada, *filtros
+                ).group_by(
+                    NotaFiscal.cliente_id, Cliente.nome
+                ).order_by(func.sum(NotaFiscal.valor_total).desc()).limit(limite)
+            )
+        ]
+    
+    if incluir_cfop:
+        cfop = func.coalesce(ItemNotaFiscal.cfop, NotaFiscal.cfop).label("cfop")
+        resultado["por_cfop"] = [
+            {"cfop": c, "quantidade_notas": q, "valor_total": v}
+            for c, q, v in session.execute(
+                select(
+                    cfop,
+                    func.count(func.distinct(NotaFiscal.id)),
+                    func.coalesce(func.sum(ItemNotaFiscal.valor_total), 0.0)
+                ).join(
+                    ItemNotaFiscal, ItemNotaFiscal.nota_fiscal_id == NotaFiscal.id
+                ).where(
+                    nao_cancelada, *filtros
+                ).group_by(cfop).order_by(cfop)
+            )
+        ]
+    
+    return resultado
+
+
+@router.post("/notas-fiscais/recalcular-impostos")
+def recalcular_impostos_notas(
+    request: RecalculoImpostosRequest,
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("vendas:update"))
+):
+    """
+    Recalcula impostos e totais com a tabela de alíquotas atual
+    
+    Apenas rascunhos; notas de nf_ids em outro status voltam em "ignoradas".
+    """
+    resultado = recalcular_notas(session, request.nf_ids)
+    session.commit()
+    return resultado
+
+
+# =============================================================================
+# ALÍQUOTAS TRIBUTÁRIAS
+# =============================================================================
+
+def _filtro_regra(campo, valor):
+    """Igualdade que trata vazio como curinga (IS NULL)"""
+    return campo.is_(None) if valor is None else campo == valor
+
+
+def _normalizar_regra(dados: dict) -> dict:
+    """Padroniza NCM/CFOP/UF como gravados e resolvidos pelo cálculo"""
+    for campo in ("ncm", "cfop", "uf"):
+        dados[campo] = normalizar_codigo(dados.get(campo))
+    return dados
+
+
+def _regra_duplicada(session: Session, dados: dict, ignorar_id: Optional[int] = None) -> bool:
+    """Já existe regra para a mesma combinação NCM/CFOP/UF?"""
+    query = session.query(AliquotaTributaria.id).filter(
+        _filtro_regra(AliquotaTributaria.ncm, dados["ncm"]),
+        _filtro_regra(AliquotaTributaria.cfop, dados["cfop"]),
+        _filtro_regra(AliquotaTributaria.uf, dados["uf"])
+    )
+    if ignorar_id:
+        query = query.filter(AliquotaTributaria.id != ignorar_id)
+    return query.first() is not None
+
+
+@router.get("/aliquotas", response_model=List[AliquotaTributariaRead])
+def list_aliquotas(
+    ncm: Optional[str] = None,
+    cfop: Optional[str] = None,
+    uf: Optional[str] = None,
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("vendas:read"))
+):
+    """Lista as regras de alíquota"""
+    query = session.query(AliquotaTributaria)
+    
+    if ncm:
+        query = query.filter(AliquotaTributaria.ncm == normalizar_codigo(ncm))
+    if cfop:
+        query = query.filter(AliquotaTributaria.cfop == normalizar_codigo(cfop))
+    if uf:
+        query = query.filter(AliquotaTributaria.uf == normalizar_codigo(uf))
+    
+    return query.order_by(
+        AliquotaTributaria.ncm, AliquotaTributaria.cfop, AliquotaTributaria.uf
+    ).all()
+
+
+@router.post("/aliquotas", response_model=AliquotaTributariaRead)
+def create_aliquota(
+    aliquota: AliquotaTributariaCreate,
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("vendas:create"))
+):
+    """Cria uma regra de alíquota (campos vazios valem para qualquer valor)"""
+    dados = _normalizar_regra(aliquota.dict())
+    if _regra_duplicada(session, dados):
+        raise HTTPException(status_code=400, detail="Já existe regra para este NCM/CFOP/UF")
     
-    notas = query.all()
+    db_aliquota = AliquotaTributaria(**dados)
+    session.add(db_aliquota)
+    session.commit()
+    session.refresh(db_aliquota)
+    invalidar_cache_aliquotas()
+    return db_aliquota
+
+
+@router.put("/aliquotas/{aliquota_id}", response_model=AliquotaTributariaRead)
+def update_aliquota(
+    aliquota_id: int,
+    aliquota: AliquotaTributariaCreate,
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("vendas:update"))
+):
+    """Atualiza uma regra de alíquota"""
+    db_aliquota = session.query(AliquotaTributaria).filter(AliquotaTributaria.id == aliquota_id).first()
+    if not db_aliquota:
+        raise HTTPException(status_code=404, detail="Alíquota não encontrada")
     
-    # Estatísticas
-    total_nfs = len(notas)
-    nfs_emitidas = len([nf for nf in notas if nf.status == StatusNotaFiscal.EMITIDA])
-    nfs_autorizadas = len([nf for nf in notas if nf.status == StatusNotaFiscal.AUTORIZADA])
-    nfs_canceladas = len([nf for nf in notas if nf.status == StatusNotaFiscal.CANCELADA])
+    dados = _normalizar_regra(aliquota.dict())
+    if _regra_duplicada(session, dados, ignorar_id=aliquota_id):
+        raise HTTPException(status_code=400, detail="Já existe regra para este NCM/CFOP/UF")
     
-    valor_total = sum(nf.valor_total for nf in notas if nf.status != StatusNotaFiscal.CANCELADA)
+    for key, value in dados.items():
+        setattr(db_aliquota, key, value)
     
-    # Por tipo
-    nfs_saida = len([nf for nf in notas if nf.tipo == TipoNotaFiscal.SAIDA])
-    nfs_entrada = len([nf for nf in notas if nf.tipo == TipoNotaFiscal.ENTRADA])
+    session.commit()
+    session.refresh(db_aliquota)
+    invalidar_cache_aliquotas()
+    return db_aliquota
+
+
+@router.delete("/aliquotas/{aliquota_id}")
+def delete_aliquota(
+    aliquota_id: int,
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("vendas:delete"))
+):
+    """Exclui uma regra de alíquota"""
+    db_aliquota = session.query(AliquotaTributaria).filter(AliquotaTributaria.id == aliquota_id).first()
+    if not db_aliquota:
+        raise HTTPException(status_code=404, detail="Alíquota não encontrada")
     
-    return {
-        "total_notas": total_nfs,
-        "emitidas": nfs_emitidas,
-        "autorizadas": nfs_autorizadas,
-        "canceladas": nfs_canceladas,
-        "valor_total": valor_total,
-        "notas_saida": nfs_saida,
-        "notas_entrada": nfs_entrada
-    }
+    session.delete(db_aliquota)
+    session.commit()
+    invalidar_cache_aliquotas()
+    return {"message": "Alíquota excluída com sucesso"}
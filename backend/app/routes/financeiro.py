@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlalchemy import case, func, select
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, date, timedelta
+from app.core.config import settings
 from app.db import get_session
-from app.dependencies import require_permission
+from app.dependencies import get_current_user, require_permission
 from app.schemas_modules import (
     ContaBancariaCreate, ContaBancariaRead, ContaBancariaUpdate,
     CentroCustoCreate, CentroCustoRead,
@@ -28,6 +30,17 @@ from app.models_modules import (
     ContaRecorrente, CategoriaFinanceira, TipoParcelamento,
     CompensacaoContas, HistoricoLiquidacao
 )
+from app.exportacao import FormatoExportacao, iterar_consulta, resposta_exportacao
+from app.jobs import enfileirar, resposta_job, tarefa
+from app.eventos import TITULO_BAIXADO, publicar
+from app.projecao import VisaoListagem, colunas_projecao, resposta_projecao
+from app.respostas import RespostaJSON
+from app.aging import (
+    TipoAging, calcular_aging, colunas_exportacao, consulta_detalhe, consulta_resumo,
+    interpretar_faixas, transformar_detalhe, transformar_resumo
+)
+from app.vencimentos import regras_padrao, varrer_vencidos
+import app.credito  # noqa: F401 - registra o ouvinte que mantém exposicao_credito
 
 router = APIRouter()
 
@@ -191,19 +204,9 @@ def get_extrato(
     total_saidas = sum(m.valor for m in movimentacoes if m.natureza == "SAIDA")
     
     # Calcular saldo inicial do período
-    movimentacoes_anteriores = session.query(MovimentacaoBancaria).filter(
-        MovimentacaoBancaria.conta_bancaria_id == conta_id,
-        MovimentacaoBancaria.data_competencia < data_inicio
-    ).all()
+    saldo_inicial_periodo = _saldo_antes_de(session, conta, data_inicio)
     
-    saldo_inicial_periodo = conta.saldo_inicial
-    for m in movimentacoes_anteriores:
-        if m.natureza == "ENTRADA":
-            saldo_inicial_periodo += m.valor
-        else:
-            saldo_inicial_periodo -= m.valor
-    
-    return {
+    return RespostaJSON({
         "conta": {
             "id": conta.id,
             "nome": conta.nome,
@@ -231,7 +234,69 @@ def get_extrato(
             }
             for m in movimentacoes
         ]
-    }
+    })
+
+
+def _saldo_antes_de(session: Session, conta: ContaBancaria, data_limite: date) -> float:
+    """Saldo da conta antes de uma data, agregado no banco (entradas - saídas)"""
+    variacao = session.query(
+        func.coalesce(func.sum(case(
+            (MovimentacaoBancaria.natureza == "ENTRADA", MovimentacaoBancaria.valor),
+            else_=-MovimentacaoBancaria.valor
+        )), 0.0)
+    ).filter(
+        MovimentacaoBancaria.conta_bancaria_id == conta.id,
+        MovimentacaoBancaria.data_competencia < data_limite
+    ).scalar()
+    
+    return (conta.saldo_inicial or 0.0) + variacao
+
+
+@router.get("/contas-bancarias/{conta_id}/extrato/exportar")
+def exportar_extrato(
+    conta_id: int,
+    data_inicio: date = Query(...),
+    data_fim: date = Query(...),
+    formato: FormatoExportacao = Query(FormatoExportacao.CSV),
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("financeiro:read"))
+):
+    """Exporta o extrato do período em streaming, com saldo acumulado por linha"""
+    conta = session.query(ContaBancaria).filter(ContaBancaria.id == conta_id).first()
+    if not conta:
+        raise HTTPException(status_code=404, detail="Conta bancária não encontrada")
+    
+    saldo = _saldo_antes_de(session, conta, data_inicio)
+    
+    stmt = select(
+        MovimentacaoBancaria.id,
+        MovimentacaoBancaria.data_competencia,
+        MovimentacaoBancaria.tipo,
+        MovimentacaoBancaria.natureza,
+        MovimentacaoBancaria.descricao,
+        MovimentacaoBancaria.valor,
+        MovimentacaoBancaria.conciliado
+    ).where(
+        MovimentacaoBancaria.conta_bancaria_id == conta_id,
+        MovimentacaoBancaria.data_competencia >= data_inicio,
+        MovimentacaoBancaria.data_competencia <= data_fim
+    ).order_by(MovimentacaoBancaria.data_competencia, MovimentacaoBancaria.created_at)
+    
+    def acumular_saldo(row):
+        nonlocal saldo
+        saldo += row.valor if row.natureza == "ENTRADA" else -row.valor
+        return (*row, round(saldo, 2))
+    
+    return resposta_exportacao(
+        colunas=[
+            "id", "data", "tipo", "natureza", "descricao", "valor",
+            "conciliado", "saldo"
+        ],
+        linhas=iterar_consulta(session, stmt),
+        formato=formato,
+        nome_arquivo=f"extrato_{conta.id}_{data_inicio.isoformat()}_{data_fim.isoformat()}",
+        transformar=acumular_saldo
+    )
 
 
 # =============================================================================
@@ -265,12 +330,17 @@ def create_centro_custo(
 # CONTAS A PAGAR
 # =============================================================================
 
+RESUMO_CONTA_PAGAR = ("descricao", "fornecedor_id", "data_vencimento", "valor_original", "valor_pago", "status")
+
+
 @router.get("/contas-pagar", response_model=List[ContaPagarRead])
 def list_contas_pagar(
     skip: int = 0,
     limit: int = 100,
     status: str = Query(None),
     fornecedor_id: int = Query(None),
+    fields: Optional[str] = Query(None, description="Colunas separadas por vírgula (resposta enxuta)"),
+    view: VisaoListagem = Query(VisaoListagem.FULL, description="summary: só as colunas de resumo"),
     session: Session = Depends(get_session),
     _: bool = Depends(require_permission("financeiro:read"))
 ):
@@ -283,7 +353,53 @@ def list_contas_pagar(
     if fornecedor_id:
         query = query.filter(ContaPagar.fornecedor_id == fornecedor_id)
     
-    return query.order_by(ContaPagar.data_vencimento).offset(skip).limit(limit).all()
+    query = query.order_by(ContaPagar.data_vencimento).offset(skip).limit(limit)
+    colunas = colunas_projecao(ContaPagarRead, ContaPagar, fields, view, RESUMO_CONTA_PAGAR)
+    if colunas:
+        return resposta_projecao(session, query, ContaPagar, colunas)
+    return query.all()
+
+
+@router.get("/contas-pagar/exportar")
+def exportar_contas_pagar(
+    formato: FormatoExportacao = Query(FormatoExportacao.CSV),
+    status: str = Query(None),
+    fornecedor_id: int = Query(None),
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("financeiro:read"))
+):
+    """Exporta todas as contas a pagar filtradas em streaming"""
+    stmt = select(
+        ContaPagar.id,
+        ContaPagar.descricao,
+        ContaPagar.fornecedor_id,
+        ContaPagar.numero_documento,
+        ContaPagar.data_emissao,
+        ContaPagar.data_vencimento,
+        ContaPagar.data_pagamento,
+        ContaPagar.valor_original,
+        ContaPagar.valor_pago,
+        ContaPagar.juros,
+        ContaPagar.desconto,
+        ContaPagar.status
+    )
+    
+    if status:
+        stmt = stmt.where(ContaPagar.status == status)
+    
+    if fornecedor_id:
+        stmt = stmt.where(ContaPagar.fornecedor_id == fornecedor_id)
+    
+    return resposta_exportacao(
+        colunas=[
+            "id", "descricao", "fornecedor_id", "numero_documento",
+            "data_emissao", "data_vencimento", "data_pagamento",
+            "valor_original", "valor_pago", "juros", "desconto", "status"
+        ],
+        linhas=iterar_consulta(session, stmt.order_by(ContaPagar.data_vencimento)),
+        formato=formato,
+        nome_arquivo="contas_pagar"
+    )
 
 
 @router.post("/contas-pagar", response_model=ContaPagarRead)
@@ -326,6 +442,18 @@ def update_conta_pagar(
     return conta
 
 
+def publicar_baixa_titulo(session: Session, tipo_conta: str, conta, valor: float, parcela_id: Optional[int] = None):
+    """Evento TituloBaixado na transação da baixa"""
+    publicar(session, TITULO_BAIXADO, f"conta_{tipo_conta}", conta.id, {
+        "tipo_conta": tipo_conta,
+        "parcela_id": parcela_id,
+        "valor": valor,
+        "status": conta.status.value if conta.status else None,
+        "fornecedor_id": getattr(conta, "fornecedor_id", None),
+        "cliente_id": getattr(conta, "cliente_id", None)
+    })
+
+
 @router.post("/contas-pagar/{conta_id}/baixar", response_model=ContaPagarRead)
 def baixar_conta_pagar(
     conta_id: int,
@@ -420,6 +548,7 @@ def baixar_conta_pagar(
         # Atualizar saldo da conta bancária
         conta_bancaria.saldo_atual -= baixa.valor_pago
         
+        publicar_baixa_titulo(session, "pagar", conta, baixa.valor_pago)
         session.commit()
         session.refresh(conta)
         
@@ -434,11 +563,16 @@ def baixar_conta_pagar(
 # CONTAS A RECEBER
 # =============================================================================
 
+RESUMO_CONTA_RECEBER = ("descricao", "cliente_id", "data_vencimento", "valor_original", "valor_recebido", "status")
+
+
 @router.get("/contas-receber", response_model=List[ContaReceberRead])
 def list_contas_receber(
     skip: int = 0,
     limit: int = 100,
     status: str = Query(None),
+    fields: Optional[str] = Query(None, description="Colunas separadas por vírgula (resposta enxuta)"),
+    view: VisaoListagem = Query(VisaoListagem.FULL, description="summary: só as colunas de resumo"),
     session: Session = Depends(get_session),
     _: bool = Depends(require_permission("financeiro:read"))
 ):
@@ -448,7 +582,53 @@ def list_contas_receber(
     if status:
         query = query.filter(ContaReceber.status == status)
     
-    return query.order_by(ContaReceber.data_vencimento).offset(skip).limit(limit).all()
+    query = query.order_by(ContaReceber.data_vencimento).offset(skip).limit(limit)
+    colunas = colunas_projecao(ContaReceberRead, ContaReceber, fields, view, RESUMO_CONTA_RECEBER)
+    if colunas:
+        return resposta_projecao(session, query, ContaReceber, colunas)
+    return query.all()
+
+
+@router.get("/contas-receber/exportar")
+def exportar_contas_receber(
+    formato: FormatoExportacao = Query(FormatoExportacao.CSV),
+    status: str = Query(None),
+    cliente_id: int = Query(None),
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("financeiro:read"))
+):
+    """Exporta todas as contas a receber filtradas em streaming"""
+    stmt = select(
+        ContaReceber.id,
+        ContaReceber.descricao,
+        ContaReceber.cliente_id,
+        ContaReceber.numero_documento,
+        ContaReceber.data_emissao,
+        ContaReceber.data_vencimento,
+        ContaReceber.data_recebimento,
+        ContaReceber.valor_original,
+        ContaReceber.valor_recebido,
+        ContaReceber.juros,
+        ContaReceber.desconto,
+        ContaReceber.status
+    )
+    
+    if status:
+        stmt = stmt.where(ContaReceber.status == status)
+    
+    if cliente_id:
+        stmt = stmt.where(ContaReceber.cliente_id == cliente_id)
+    
+    return resposta_exportacao(
+        colunas=[
+            "id", "descricao", "cliente_id", "numero_documento",
+            "data_emissao", "data_vencimento", "data_recebimento",
+            "valor_original", "valor_recebido", "juros", "desconto", "status"
+        ],
+        linhas=iterar_consulta(session, stmt.order_by(ContaReceber.data_vencimento)),
+        formato=formato,
+        nome_arquivo="contas_receber"
+    )
 
 
 @router.post("/contas-receber", response_model=ContaReceberRead)
@@ -578,6 +758,7 @@ def baixar_conta_receber(
         # Atualizar saldo da conta bancária
         conta_bancaria.saldo_atual += baixa.valor_recebido
         
+        publicar_baixa_titulo(session, "receber", conta, baixa.valor_recebido)
         session.commit()
         session.refresh(conta)
         
@@ -1217,6 +1398,7 @@ def baixar_parcela_conta_pagar(
             conta.status = StatusPagamento.PARCIAL
             conta.valor_pago = valor_total_pago
     
+    publicar_baixa_titulo(session, "pagar", conta, baixa.valor_pago, parcela_id)
     session.commit()
     
     return {"message": "Parcela baixada com sucesso", "parcela_id": parcela_id}
@@ -1284,6 +1466,7 @@ def baixar_parcela_conta_receber(
             conta.status = StatusPagamento.PARCIAL
             conta.valor_recebido = valor_total_recebido
     
+    publicar_baixa_titulo(session, "receber", conta, baixa.valor_recebido, parcela_id)
     session.commit()
     
     return {"message": "Parcela recebida com sucesso", "parcela_id": parcela_id}
@@ -1438,14 +1621,8 @@ def ativar_conta_recorrente(
     return {"message": "Conta recorrente ativada com sucesso"}
 
 
-@router.post("/contas-recorrentes/gerar-mensal")
-def gerar_contas_recorrentes_mensal(
-    mes: int = Query(..., ge=1, le=12, description="Mês (1-12)"),
-    ano: int = Query(..., ge=2000, description="Ano"),
-    session: Session = Depends(get_session),
-    _: bool = Depends(require_permission("financeiro:create"))
-):
-    """Gera contas a pagar/receber do mês baseado nas contas recorrentes ativas"""
+def gerar_contas_recorrentes(session: Session, mes: int, ano: int, progresso=None) -> dict:
+    """Gera as contas do mês a partir das recorrentes ativas (sem commit)"""
     data_referencia = date(ano, mes, 1)
     contas_geradas = []
     
@@ -1455,7 +1632,10 @@ def gerar_contas_recorrentes_mensal(
         ContaRecorrente.data_inicio <= data_referencia
     ).all()
     
-    for conta_rec in contas_recorrentes:
+    for i, conta_rec in enumerate(contas_recorrentes, start=1):
+        if progresso:
+            progresso(100.0 * i / len(contas_recorrentes), f"{i}/{len(contas_recorrentes)} contas recorrentes")
+        
         # Verificar se já foi gerada neste mês
         if conta_rec.ultima_geracao and conta_rec.ultima_geracao.month == mes and conta_rec.ultima_geracao.year == ano:
             continue
@@ -1501,14 +1681,40 @@ def gerar_contas_recorrentes_mensal(
         # Atualizar última geração
         conta_rec.ultima_geracao = data_referencia
     
-    session.commit()
-    
     return {
         "message": f"{len(contas_geradas)} contas geradas para {mes}/{ano}",
         "contas_geradas": contas_geradas
     }
 
 
+@tarefa("financeiro.gerar_contas_recorrentes")
+def tarefa_gerar_contas_recorrentes(session: Session, parametros: dict, progresso) -> dict:
+    return gerar_contas_recorrentes(session, parametros["mes"], parametros["ano"], progresso)
+
+
+@router.post("/contas-recorrentes/gerar-mensal")
+def gerar_contas_recorrentes_mensal(
+    mes: int = Query(..., ge=1, le=12, description="Mês (1-12)"),
+    ano: int = Query(..., ge=2000, description="Ano"),
+    assincrono: bool = Query(False, description="Enfileira como job e responde 202"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    session: Session = Depends(get_session),
+    usuario = Depends(get_current_user),
+    _: bool = Depends(require_permission("financeiro:create"))
+):
+    """Gera contas a pagar/receber do mês baseado nas contas recorrentes ativas"""
+    if assincrono:
+        job, _criado = enfileirar(
+            session, "financeiro.gerar_contas_recorrentes", {"mes": mes, "ano": ano},
+            chave_idempotencia=idempotency_key, usuario_id=usuario.id
+        )
+        return resposta_job(job)
+    
+    resultado = gerar_contas_recorrentes(session, mes, ano)
+    session.commit()
+    return resultado
+
+
 # =============================================================================
 # CATEGORIAS FINANCEIRAS
 # =============================================================================
@@ -1656,6 +1862,58 @@ def relatorio_dre(
     }
 
 
+def _parametros_aging(faixas: Optional[str]):
+    try:
+        return interpretar_faixas(faixas)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/relatorios/aging/{tipo}")
+def relatorio_aging(
+    tipo: TipoAging,
+    data_base: Optional[date] = Query(None, description="Data-base (padrão: hoje)"),
+    faixas: Optional[str] = Query(None, description="Limites das faixas em dias, ex.: 30,60,90"),
+    entidade_id: Optional[int] = Query(None, description="Cliente (receber) ou fornecedor (pagar)"),
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("financeiro:read"))
+):
+    """Aging dos títulos e parcelas em aberto por cliente ou fornecedor (uma consulta agrupada)"""
+    limites = _parametros_aging(faixas)
+    return RespostaJSON(calcular_aging(session, tipo, data_base or date.today(), limites, entidade_id))
+
+
+@router.get("/relatorios/aging/{tipo}/exportar")
+def exportar_aging(
+    tipo: TipoAging,
+    data_base: Optional[date] = Query(None, description="Data-base (padrão: hoje)"),
+    faixas: Optional[str] = Query(None, description="Limites das faixas em dias, ex.: 30,60,90"),
+    entidade_id: Optional[int] = Query(None, description="Cliente (receber) ou fornecedor (pagar)"),
+    detalhado: bool = Query(False, description="Uma linha por título/parcela em vez do resumo"),
+    formato: FormatoExportacao = Query(FormatoExportacao.CSV),
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("financeiro:read"))
+):
+    """Exporta o aging (resumo por cliente/fornecedor ou itens em aberto) em streaming"""
+    limites = _parametros_aging(faixas)
+    data_base = data_base or date.today()
+    
+    if detalhado:
+        stmt = consulta_detalhe(tipo, data_base, limites, entidade_id)
+        transformar = transformar_detalhe(data_base, limites)
+    else:
+        stmt = consulta_resumo(tipo, data_base, limites, entidade_id)
+        transformar = transformar_resumo
+    
+    return resposta_exportacao(
+        colunas=colunas_exportacao(tipo, limites, detalhado),
+        linhas=iterar_consulta(session, stmt),
+        formato=formato,
+        nome_arquivo=f"aging_{tipo.value}_{data_base.isoformat()}",
+        transformar=transformar
+    )
+
+
 # =============================================================================
 # COMPENSAÇÃO DE CONTAS
 # =============================================================================
@@ -1795,12 +2053,7 @@ def listar_compensacoes(
 # BAIXA MÚLTIPLA
 # =============================================================================
 
-@router.post("/baixa-multipla")
-def baixa_gerando_multiplas(
-    request: BaixaMultiplaRequest,
-    session: Session = Depends(get_session),
-    _: bool = Depends(require_permission("financeiro:create"))
-):
+def executar_baixa_multipla(session: Session, request: BaixaMultiplaRequest) -> dict:
     """
     Baixa um título gerando múltiplos novos
     Exemplo: Recebe R$ 10.000 de venda no cartão
@@ -1817,122 +2070,149 @@ def baixa_gerando_multiplas(
     if not request.parcelas_geradas:
         raise HTTPException(status_code=400, detail="Informe as parcelas a serem geradas")
     
-    try:
-        # Buscar conta original
-        if request.tipo_conta == "RECEBER":
-            conta_original = session.query(ContaReceber).filter(
-                ContaReceber.id == request.conta_id
-            ).first()
-        else:
-            conta_original = session.query(ContaPagar).filter(
-                ContaPagar.id == request.conta_id
-            ).first()
-        
-        if not conta_original:
-            raise HTTPException(status_code=404, detail="Conta não encontrada")
-        
-        # Buscar conta bancária
-        conta_bancaria = session.query(ContaBancaria).filter(
-            ContaBancaria.id == request.conta_bancaria_destino_id
+    # Buscar conta original
+    if request.tipo_conta == "RECEBER":
+        conta_original = session.query(ContaReceber).filter(
+            ContaReceber.id == request.conta_id
         ).first()
-        
-        if not conta_bancaria:
-            raise HTTPException(status_code=404, detail="Conta bancária não encontrada")
-        
-        # Calcular valor total das parcelas
-        valor_total_parcelas = sum(p.valor for p in request.parcelas_geradas)
-        
-        # Validar se valor total corresponde ao valor da conta
-        if abs(valor_total_parcelas - conta_original.valor_original) > 0.01:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Valor total das parcelas (R$ {valor_total_parcelas:.2f}) não corresponde ao valor da conta (R$ {conta_original.valor_original:.2f})"
-            )
-        
-        # 1. Baixar conta original
-        if request.tipo_conta == "RECEBER":
-            conta_original.valor_recebido = conta_original.valor_original
-            conta_original.status = StatusPagamento.PAGO
-            conta_original.data_recebimento = datetime.utcnow()
-        else:
-            conta_original.valor_pago = conta_original.valor_original
-            conta_original.status = StatusPagamento.PAGO
-            conta_original.data_pagamento = datetime.utcnow()
-        
-        # 2. Criar movimentação bancária de entrada
-        movimentacao = MovimentacaoBancaria(
-            conta_bancaria_id=request.conta_bancaria_destino_id,
-            tipo=TipoMovimentacaoBancaria.DEPOSITO if request.tipo_conta == "RECEBER" else TipoMovimentacaoBancaria.SAQUE,
-            natureza="ENTRADA" if request.tipo_conta == "RECEBER" else "SAIDA",
-            data_movimentacao=datetime.utcnow(),
-            data_competencia=datetime.utcnow().date(),
-            valor=valor_total_parcelas,
-            descricao=f"Baixa múltipla - {conta_original.descricao}",
-            conciliado=False
+    else:
+        conta_original = session.query(ContaPagar).filter(
+            ContaPagar.id == request.conta_id
+        ).first()
+    
+    if not conta_original:
+        raise HTTPException(status_code=404, detail="Conta não encontrada")
+    
+    # Buscar conta bancária
+    conta_bancaria = session.query(ContaBancaria).filter(
+        ContaBancaria.id == request.conta_bancaria_destino_id
+    ).first()
+    
+    if not conta_bancaria:
+        raise HTTPException(status_code=404, detail="Conta bancária não encontrada")
+    
+    # Calcular valor total das parcelas
+    valor_total_parcelas = sum(p.valor for p in request.parcelas_geradas)
+    
+    # Validar se valor total corresponde ao valor da conta
+    if abs(valor_total_parcelas - conta_original.valor_original) > 0.01:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Valor total das parcelas (R$ {valor_total_parcelas:.2f}) não corresponde ao valor da conta (R$ {conta_original.valor_original:.2f})"
         )
-        session.add(movimentacao)
-        session.flush()
-        
-        # Atualizar saldo da conta bancária
+    
+    # 1. Baixar conta original
+    if request.tipo_conta == "RECEBER":
+        conta_original.valor_recebido = conta_original.valor_original
+        conta_original.status = StatusPagamento.PAGO
+        conta_original.data_recebimento = datetime.utcnow()
+    else:
+        conta_original.valor_pago = conta_original.valor_original
+        conta_original.status = StatusPagamento.PAGO
+        conta_original.data_pagamento = datetime.utcnow()
+    
+    # 2. Criar movimentação bancária de entrada
+    movimentacao = MovimentacaoBancaria(
+        conta_bancaria_id=request.conta_bancaria_destino_id,
+        tipo=TipoMovimentacaoBancaria.DEPOSITO if request.tipo_conta == "RECEBER" else TipoMovimentacaoBancaria.SAQUE,
+        natureza="ENTRADA" if request.tipo_conta == "RECEBER" else "SAIDA",
+        data_movimentacao=datetime.utcnow(),
+        data_competencia=datetime.utcnow().date(),
+        valor=valor_total_parcelas,
+        descricao=f"Baixa múltipla - {conta_original.descricao}",
+        conciliado=False
+    )
+    session.add(movimentacao)
+    session.flush()
+    
+    # Atualizar saldo da conta bancária
+    if request.tipo_conta == "RECEBER":
+        conta_bancaria.saldo_atual += valor_total_parcelas
+    else:
+        conta_bancaria.saldo_atual -= valor_total_parcelas
+    
+    # 3. Criar novas contas (inverter tipo: se era a receber, gera a pagar e vice-versa)
+    contas_geradas_ids = []
+    
+    for parcela in request.parcelas_geradas:
         if request.tipo_conta == "RECEBER":
-            conta_bancaria.saldo_atual += valor_total_parcelas
+            # Gera contas a pagar (repasse da operadora)
+            nova_conta = ContaPagar(
+                descricao=parcela.descricao,
+                fornecedor_id=conta_original.cliente_id,  # Cliente vira fornecedor no repasse
+                data_emissao=datetime.utcnow(),
+                data_vencimento=datetime.combine(parcela.vencimento, datetime.min.time()),
+                valor_original=parcela.valor,
+                status=StatusPagamento.PENDENTE,
+                observacoes=f"Gerada por baixa múltipla da conta {conta_original.id}"
+            )
         else:
-            conta_bancaria.saldo_atual -= valor_total_parcelas
-        
-        # 3. Criar novas contas (inverter tipo: se era a receber, gera a pagar e vice-versa)
-        contas_geradas_ids = []
-        
-        for parcela in request.parcelas_geradas:
-            if request.tipo_conta == "RECEBER":
-                # Gera contas a pagar (repasse da operadora)
-                nova_conta = ContaPagar(
-                    descricao=parcela.descricao,
-                    fornecedor_id=conta_original.cliente_id,  # Cliente vira fornecedor no repasse
-                    data_emissao=datetime.utcnow(),
-                    data_vencimento=datetime.combine(parcela.vencimento, datetime.min.time()),
-                    valor_original=parcela.valor,
-                    status=StatusPagamento.PENDENTE,
-                    observacoes=f"Gerada por baixa múltipla da conta {conta_original.id}"
-                )
-            else:
-                # Gera contas a receber
-                nova_conta = ContaReceber(
-                    descricao=parcela.descricao,
-                    cliente_id=conta_original.fornecedor_id,  # Fornecedor vira cliente
-                    data_emissao=datetime.utcnow(),
-                    data_vencimento=datetime.combine(parcela.vencimento, datetime.min.time()),
-                    valor_original=parcela.valor,
-                    status=StatusPagamento.PENDENTE,
-                    observacoes=f"Gerada por baixa múltipla da conta {conta_original.id}"
-                )
-            
-            session.add(nova_conta)
-            session.flush()
-            contas_geradas_ids.append(nova_conta.id)
+            # Gera contas a receber
+            nova_conta = ContaReceber(
+                descricao=parcela.descricao,
+                cliente_id=conta_original.fornecedor_id,  # Fornecedor vira cliente
+                data_emissao=datetime.utcnow(),
+                data_vencimento=datetime.combine(parcela.vencimento, datetime.min.time()),
+                valor_original=parcela.valor,
+                status=StatusPagamento.PENDENTE,
+                observacoes=f"Gerada por baixa múltipla da conta {conta_original.id}"
+            )
         
-        # 4. Registrar no histórico de liquidação
-        historico = HistoricoLiquidacao(
-            tipo_operacao="BAIXA_MULTIPLA",
-            valor_total=valor_total_parcelas,
-            conta_origem_id=conta_original.id,
-            tipo_conta_origem=request.tipo_conta,
-            contas_geradas_ids=contas_geradas_ids,
-            movimentacao_bancaria_id=movimentacao.id,
-            observacao=request.observacao
+        session.add(nova_conta)
+        session.flush()
+        contas_geradas_ids.append(nova_conta.id)
+    
+    # 4. Registrar no histórico de liquidação
+    historico = HistoricoLiquidacao(
+        tipo_operacao="BAIXA_MULTIPLA",
+        valor_total=valor_total_parcelas,
+        conta_origem_id=conta_original.id,
+        tipo_conta_origem=request.tipo_conta,
+        contas_geradas_ids=contas_geradas_ids,
+        movimentacao_bancaria_id=movimentacao.id,
+        observacao=request.observacao
+    )
+    session.add(historico)
+    
+    return {
+        "message": "Baixa múltipla realizada com sucesso",
+        "conta_original_id": conta_original.id,
+        "movimentacao_bancaria_id": movimentacao.id,
+        "contas_geradas": len(contas_geradas_ids),
+        "contas_geradas_ids": contas_geradas_ids,
+        "valor_total": valor_total_parcelas
+    }
+
+
+@tarefa("financeiro.baixa_multipla", max_tentativas=1)
+def tarefa_baixa_multipla(session: Session, parametros: dict, progresso) -> dict:
+    return executar_baixa_multipla(session, BaixaMultiplaRequest(**parametros))
+
+
+@router.post("/baixa-multipla")
+def baixa_gerando_multiplas(
+    request: BaixaMultiplaRequest,
+    assincrono: bool = Query(False, description="Enfileira como job e responde 202"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    session: Session = Depends(get_session),
+    usuario = Depends(get_current_user),
+    _: bool = Depends(require_permission("financeiro:create"))
+):
+    """Baixa um título gerando múltiplos novos (ver executar_baixa_multipla)"""
+    if assincrono:
+        job, _criado = enfileirar(
+            session, "financeiro.baixa_multipla", request.model_dump(mode="json"),
+            chave_idempotencia=idempotency_key, usuario_id=usuario.id
         )
-        session.add(historico)
-        
+        return resposta_job(job)
+    
+    try:
+        resultado = executar_baixa_multipla(session, request)
         session.commit()
-        
-        return {
-            "message": "Baixa múltipla realizada com sucesso",
-            "conta_original_id": conta_original.id,
-            "movimentacao_bancaria_id": movimentacao.id,
-            "contas_geradas": len(contas_geradas_ids),
-            "contas_geradas_ids": contas_geradas_ids,
-            "valor_total": valor_total_parcelas
-        }
-        
+        return resultado
+    except HTTPException:
+        session.rollback()
+        raise
     except Exception as e:
         session.rollback()
         raise HTTPException(status_code=500, detail=f"Erro ao realizar baixa múltipla: {str(e)}")
@@ -1955,3 +2235,60 @@ def listar_historico_liquidacao(
     return query.order_by(
         HistoricoLiquidacao.data_operacao.desc()
     ).offset(skip).limit(limit).all()
+
+
+# =============================================================================
+# VENCIMENTOS E ENCARGOS
+# =============================================================================
+
+def _parametros_varredura(parametros: dict) -> dict:
+    """Argumentos de varrer_vencidos a partir dos parâmetros do job"""
+    return {
+        "referencia": date.fromisoformat(parametros["data_referencia"]) if parametros.get("data_referencia") else None,
+        "regras": regras_padrao(
+            multa_percentual=parametros.get("multa_percentual"),
+            juros_mes_percentual=parametros.get("juros_mes_percentual"),
+            carencia_dias=parametros.get("carencia_dias")
+        ),
+        "lote": parametros.get("lote"),
+        "recalcular": bool(parametros.get("recalcular"))
+    }
+
+
+@tarefa("financeiro.varrer_vencidos", diaria=settings.VENCIMENTOS_VARREDURA_DIARIA)
+def tarefa_varrer_vencidos(session: Session, parametros: dict, progresso) -> dict:
+    # Commit por lote: a varredura é idempotente por linha, então uma nova
+    # tentativa continua de onde a anterior parou
+    return varrer_vencidos(session, **_parametros_varredura(parametros), confirmar=session.commit, progresso=progresso)
+
+
+@router.post("/vencimentos/varrer")
+def varrer_titulos_vencidos(
+    data_referencia: Optional[date] = Query(None, description="Data da apuração (padrão: hoje)"),
+    multa_percentual: Optional[float] = Query(None, ge=0),
+    juros_mes_percentual: Optional[float] = Query(None, ge=0),
+    carencia_dias: Optional[int] = Query(None, ge=0),
+    recalcular: bool = Query(False, description="Reapura linhas já apuradas na data"),
+    assincrono: bool = Query(False, description="Enfileira como job e responde 202"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    session: Session = Depends(get_session),
+    usuario = Depends(get_current_user),
+    _: bool = Depends(require_permission("financeiro:update"))
+):
+    """Marca títulos e parcelas vencidos como atrasados e apura multa e juros de mora"""
+    parametros = {
+        "data_referencia": data_referencia.isoformat() if data_referencia else None,
+        "multa_percentual": multa_percentual,
+        "juros_mes_percentual": juros_mes_percentual,
+        "carencia_dias": carencia_dias,
+        "recalcular": recalcular
+    }
+    if assincrono:
+        job, _criado = enfileirar(
+            session, "financeiro.varrer_vencidos", parametros,
+            chave_idempotencia=idempotency_key, usuario_id=usuario.id
+        )
+        return resposta_job(job)
+
+    return varrer_vencidos(session, **_parametros_varredura(parametros), confirmar=session.commit)
+
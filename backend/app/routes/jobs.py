@@ -0,0 +1,95 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.db import get_session
+from app.dependencies import get_current_user
+from app.schemas_modules import JobRead, StatusJob
+from app.models_modules import Job
+from app import crud
+from app.jobs import cancelar_job, notificar_executor, reprocessar_job
+
+router = APIRouter()
+
+
+# =============================================================================
+# JOBS EM SEGUNDO PLANO
+# =============================================================================
+
+def _eh_administrador(session: Session, usuario) -> bool:
+    _, permissoes = crud.get_user_roles_and_permissions(session, usuario.id)
+    return "*:*" in permissoes or "admin:read" in permissoes
+
+
+def _obter_job(session: Session, job_id: int, usuario) -> Job:
+    """Job do próprio usuário (ou qualquer job, para administradores)"""
+    job = session.get(Job, job_id)
+    if not job or (job.usuario_id != usuario.id and not _eh_administrador(session, usuario)):
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
+
+
+@router.get("/", response_model=List[JobRead])
+def listar_jobs(
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[StatusJob] = None,
+    tipo: Optional[str] = Query(None),
+    session: Session = Depends(get_session),
+    usuario = Depends(get_current_user)
+):
+    """Lista os jobs do usuário (administradores veem todos)"""
+    query = session.query(Job)
+    
+    if not _eh_administrador(session, usuario):
+        query = query.filter(Job.usuario_id == usuario.id)
+    if status:
+        query = query.filter(Job.status == status)
+    if tipo:
+        query = query.filter(Job.tipo == tipo)
+    
+    return query.order_by(Job.id.desc()).offset(skip).limit(limit).all()
+
+
+@router.get("/{job_id}", response_model=JobRead)
+def obter_job(
+    job_id: int,
+    session: Session = Depends(get_session),
+    usuario = Depends(get_current_user)
+):
+    """Status, progresso e resultado de um job"""
+    return _obter_job(session, job_id, usuario)
+
+
+@router.post("/{job_id}/cancelar", response_model=JobRead)
+def cancelar(
+    job_id: int,
+    session: Session = Depends(get_session),
+    usuario = Depends(get_current_user)
+):
+    """Cancela um job que ainda não começou a executar"""
+    job = _obter_job(session, job_id, usuario)
+    
+    if not cancelar_job(session, job):
+        raise HTTPException(status_code=400, detail="Apenas jobs pendentes podem ser cancelados")
+    
+    session.commit()
+    session.refresh(job)
+    return job
+
+
+@router.post("/{job_id}/reprocessar", response_model=JobRead)
+def reprocessar(
+    job_id: int,
+    session: Session = Depends(get_session),
+    usuario = Depends(get_current_user)
+):
+    """Devolve à fila um job que falhou"""
+    job = _obter_job(session, job_id, usuario)
+    
+    if not reprocessar_job(session, job):
+        raise HTTPException(status_code=400, detail="Apenas jobs com falha podem ser reprocessados")
+    
+    session.commit()
+    session.refresh(job)
+    notificar_executor()
+    return job
@@ -1,13 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import case, func, select
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 from app.db import get_session
 from app.dependencies import require_permission
 from app.schemas_modules import (
     LocalEstoqueCreate, LocalEstoqueRead, LocalEstoqueUpdate
 )
-from app.models_modules import LocalEstoque, EstoquePorLocal, Material
+from app.models_modules import LocalEstoque, EstoquePorLocal, Material, MovimentoEstoque, TipoMovimento
 from app.helpers import gerar_codigo_local_estoque
 
 router = APIRouter()
@@ -17,6 +18,96 @@ router = APIRouter()
 # LOCAIS DE ESTOQUE (ARMAZÉNS)
 # =============================================================================
 
+def consultar_estatisticas_locais(
+    session: Session,
+    janela_dias: int = 90,
+    local_id: Optional[int] = None,
+    apenas_ativos: bool = False
+):
+    """
+    Agrega as estatísticas de estoque por local em uma única consulta
+    
+    Contagens, quantidade e valor vêm de agregações condicionais sobre
+    EstoquePorLocal; o consumo (saídas na janela) é uma subconsulta agrupada
+    por local de origem, resolvida na mesma ida ao banco.
+    """
+    desde = datetime.utcnow() - timedelta(days=janela_dias)
+    
+    consumo = select(
+        MovimentoEstoque.local_origem_id.label("local_id"),
+        func.sum(MovimentoEstoque.quantidade).label("quantidade")
+    ).where(
+        MovimentoEstoque.tipo_movimento == TipoMovimento.SAIDA,
+        MovimentoEstoque.data_movimento >= desde,
+        MovimentoEstoque.local_origem_id.isnot(None)
+    ).group_by(MovimentoEstoque.local_origem_id).subquery()
+    
+    quantidade = func.coalesce(EstoquePorLocal.quantidade, 0.0)
+    
+    stmt = select(
+        LocalEstoque.id,
+        LocalEstoque.codigo,
+        LocalEstoque.nome,
+        LocalEstoque.tipo,
+        func.count(EstoquePorLocal.id).label("total_itens"),
+        func.coalesce(func.sum(case((EstoquePorLocal.quantidade > 0, 1), else_=0)), 0).label("itens_com_estoque"),
+        func.coalesce(func.sum(case((EstoquePorLocal.quantidade == 0, 1), else_=0)), 0).label("itens_zerados"),
+        func.coalesce(func.sum(case(
+            ((EstoquePorLocal.estoque_minimo > 0) & (EstoquePorLocal.quantidade < EstoquePorLocal.estoque_minimo), 1),
+            else_=0
+        )), 0).label("itens_criticos"),
+        func.coalesce(func.sum(quantidade), 0.0).label("quantidade_total"),
+        func.coalesce(func.sum(quantidade * func.coalesce(Material.preco_medio, 0.0)), 0.0).label("valor_estoque"),
+        func.coalesce(func.max(consumo.c.quantidade), 0.0).label("consumo_periodo")
+    ).select_from(LocalEstoque).outerjoin(
+        EstoquePorLocal, EstoquePorLocal.local_id == LocalEstoque.id
+    ).outerjoin(
+        Material, Material.id == EstoquePorLocal.material_id
+    ).outerjoin(
+        consumo, consumo.c.local_id == LocalEstoque.id
+    ).group_by(
+        LocalEstoque.id, LocalEstoque.codigo, LocalEstoque.nome, LocalEstoque.tipo
+    )
+    
+    if local_id is not None:
+        stmt = stmt.where(LocalEstoque.id == local_id)
+    
+    if apenas_ativos:
+        stmt = stmt.where(LocalEstoque.ativo == 1)
+    
+    return session.execute(
+        stmt.order_by(LocalEstoque.padrao.desc(), LocalEstoque.nome)
+    ).all()
+
+
+def _formatar_estatisticas(linha, janela_dias: int) -> dict:
+    """Monta a resposta de estatísticas de um local a partir da linha agregada"""
+    consumo_medio_diario = linha.consumo_periodo / janela_dias
+    dias_cobertura = (
+        round(linha.quantidade_total / consumo_medio_diario, 1)
+        if consumo_medio_diario > 0 else None
+    )
+    
+    return {
+        "local": {
+            "id": linha.id,
+            "codigo": linha.codigo,
+            "nome": linha.nome,
+            "tipo": linha.tipo
+        },
+        "estatisticas": {
+            "total_itens": linha.total_itens,
+            "itens_com_estoque": linha.itens_com_estoque,
+            "itens_zerados": linha.itens_zerados,
+            "itens_criticos": linha.itens_criticos,
+            "quantidade_total": linha.quantidade_total,
+            "valor_estoque": round(linha.valor_estoque, 2),
+            "consumo_medio_diario": round(consumo_medio_diario, 4),
+            "dias_cobertura": dias_cobertura
+        }
+    }
+
+
 @router.get("/locais", response_model=List[LocalEstoqueRead])
 def list_locais(
     skip: int = 0,
@@ -39,6 +130,23 @@ def list_locais(
     return locais
 
 
+@router.get("/locais/estatisticas")
+def list_estatisticas_locais(
+    janela_dias: int = Query(90, ge=1, le=365),
+    apenas_ativos: bool = True,
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("materiais:read"))
+):
+    """
+    Retorna as estatísticas de todos os locais em uma única consulta
+    
+    Inclui contagem de itens, valor do estoque (quantidade x preço médio)
+    e dias de cobertura com base no consumo médio diário da janela informada.
+    """
+    linhas = consultar_estatisticas_locais(session, janela_dias, apenas_ativos=apenas_ativos)
+    return [_formatar_estatisticas(linha, janela_dias) for linha in linhas]
+
+
 @router.post("/locais", response_model=LocalEstoqueRead)
 def create_local(
     local: LocalEstoqueCreate,
@@ -273,53 +381,16 @@ def transferir_estoque(
 @router.get("/locais/{local_id}/estatisticas")
 def get_estatisticas_local(
     local_id: int,
+    janela_dias: int = Query(90, ge=1, le=365),
     session: Session = Depends(get_session),
     _: bool = Depends(require_permission("materiais:read"))
 ):
     """Retorna estatísticas de um local de estoque"""
-    # Verificar se o local existe
-    local = session.query(LocalEstoque).filter(LocalEstoque.id == local_id).first()
-    if not local:
+    linhas = consultar_estatisticas_locais(session, janela_dias, local_id=local_id)
+    if not linhas:
         raise HTTPException(status_code=404, detail="Local não encontrado")
     
-    # Total de itens diferentes
-    total_itens = session.query(EstoquePorLocal).filter(
-        EstoquePorLocal.local_id == local_id
-    ).count()
-    
-    # Total de itens com estoque
-    itens_com_estoque = session.query(EstoquePorLocal).filter(
-        EstoquePorLocal.local_id == local_id,
-        EstoquePorLocal.quantidade > 0
-    ).count()
-    
-    # Itens zerados
-    itens_zerados = session.query(EstoquePorLocal).filter(
-        EstoquePorLocal.local_id == local_id,
-        EstoquePorLocal.quantidade == 0
-    ).count()
-    
-    # Itens críticos (abaixo do mínimo)
-    itens_criticos = session.query(EstoquePorLocal).filter(
-        EstoquePorLocal.local_id == local_id,
-        EstoquePorLocal.quantidade < EstoquePorLocal.estoque_minimo,
-        EstoquePorLocal.estoque_minimo > 0
-    ).count()
-    
-    return {
-        "local": {
-            "id": local.id,
-            "codigo": local.codigo,
-            "nome": local.nome,
-            "tipo": local.tipo
-        },
-        "estatisticas": {
-            "total_itens": total_itens,
-            "itens_com_estoque": itens_com_estoque,
-            "itens_zerados": itens_zerados,
-            "itens_criticos": itens_criticos
-        }
-    }
+    return _formatar_estatisticas(linhas[0], janela_dias)
 
 
 @router.post("/locais/definir-padrao/{local_id}")
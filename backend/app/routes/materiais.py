@@ -1,15 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 from app.db import get_session
 from app.dependencies import require_permission
 from app.schemas_modules import (
     CategoriaMaterialCreate, CategoriaMaterialRead,
     MaterialCreate, MaterialRead, MaterialUpdate,
-    MovimentoEstoqueCreate, MovimentoEstoqueRead
+    MovimentoEstoqueCreate, MovimentoEstoqueRead,
+    ReposicaoConverterRequest
 )
 from app.models_modules import CategoriaMaterial, Material, MovimentoEstoque, TipoMovimento
+from app.exportacao import FormatoExportacao, iterar_consulta, resposta_exportacao
+from app.reposicao import calcular_sugestoes_reposicao, gerar_documento_reposicao
+from app.reservas import consultar_disponibilidade, total_reservado
+from app.eventos import ESTOQUE_MOVIMENTADO, publicar
+from app.projecao import VisaoListagem, colunas_projecao, resposta_projecao
+from app.respostas import RespostaJSON
 
 router = APIRouter()
 
@@ -45,6 +53,9 @@ def create_categoria(
 # MATERIAIS
 # =============================================================================
 
+RESUMO_MATERIAL = ("codigo", "nome", "unidade_medida", "estoque_atual", "ativo")
+
+
 @router.get("/materiais", response_model=List[MaterialRead])
 def list_materiais(
     skip: int = 0,
@@ -52,6 +63,8 @@ def list_materiais(
     categoria_id: int = Query(None),
     ativo: int = Query(None),
     busca: str = Query(None),
+    fields: Optional[str] = Query(None, description="Colunas separadas por vírgula (resposta enxuta)"),
+    view: VisaoListagem = Query(VisaoListagem.FULL, description="summary: só as colunas de resumo"),
     session: Session = Depends(get_session),
     _: bool = Depends(require_permission("materiais:read"))
 ):
@@ -70,7 +83,11 @@ def list_materiais(
             (Material.nome.ilike(f"%{busca}%"))
         )
     
-    return query.offset(skip).limit(limit).all()
+    query = query.offset(skip).limit(limit)
+    colunas = colunas_projecao(MaterialRead, Material, fields, view, RESUMO_MATERIAL)
+    if colunas:
+        return resposta_projecao(session, query, Material, colunas)
+    return query.all()
 
 
 @router.post("/materiais", response_model=MaterialRead)
@@ -186,10 +203,26 @@ def create_movimento(
     if movimento.tipo_movimento in [TipoMovimento.ENTRADA, TipoMovimento.AJUSTE]:
         material.estoque_atual += movimento.quantidade
     elif movimento.tipo_movimento in [TipoMovimento.SAIDA]:
-        if material.estoque_atual < movimento.quantidade:
-            raise HTTPException(status_code=400, detail="Estoque insuficiente")
+        # O reservado para pedidos aprovados não pode sair
+        disponivel = material.estoque_atual - total_reservado(session, material.id)
+        if disponivel < movimento.quantidade:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Estoque insuficiente. Disponível: {disponivel}, Solicitado: {movimento.quantidade}"
+            )
         material.estoque_atual -= movimento.quantidade
     
+    session.flush()
+    sinal = -1 if movimento.tipo_movimento == TipoMovimento.SAIDA else (
+        1 if movimento.tipo_movimento in [TipoMovimento.ENTRADA, TipoMovimento.AJUSTE] else 0
+    )
+    publicar(session, ESTOQUE_MOVIMENTADO, "movimento_estoque", db_movimento.id, {
+        "documento": movimento.documento,
+        "local_id": None,
+        "sinal": sinal,
+        "itens": [{"material_id": movimento.material_id, "quantidade": movimento.quantidade}]
+    })
+    
     session.commit()
     session.refresh(db_movimento)
     return db_movimento
@@ -219,6 +252,92 @@ def list_estoque_baixo(
     ]
 
 
+# =============================================================================
+# REPOSIÇÃO DE ESTOQUE
+# =============================================================================
+
+@router.get("/reposicao/sugestoes")
+def list_sugestoes_reposicao(
+    lead_time_dias: int = Query(7, ge=0),
+    dias_cobertura: int = Query(30, ge=1),
+    local_id: Optional[int] = Query(None),
+    categoria_id: Optional[int] = Query(None),
+    incluir_sem_necessidade: bool = False,
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("materiais:read"))
+):
+    """
+    Sugestões de compra por material e local
+    
+    Considera a demanda diária das saídas recentes, os pedidos de compra
+    em aberto e o lead time informado.
+    """
+    sugestoes = calcular_sugestoes_reposicao(
+        session,
+        lead_time_dias=lead_time_dias,
+        dias_cobertura=dias_cobertura,
+        local_id=local_id,
+        categoria_id=categoria_id,
+        apenas_necessarios=not incluir_sem_necessidade
+    )
+    
+    return RespostaJSON({
+        "parametros": {
+            "lead_time_dias": lead_time_dias,
+            "dias_cobertura": dias_cobertura
+        },
+        "total_itens": len(sugestoes),
+        "valor_total_estimado": round(sum(s["valor_estimado"] for s in sugestoes), 2),
+        "sugestoes": sugestoes
+    })
+
+
+@router.post("/reposicao/converter")
+def converter_sugestoes_reposicao(
+    dados: ReposicaoConverterRequest,
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("compras:create"))
+):
+    """
+    Converte sugestões de reposição em uma cotação ou pedido de compra (rascunho)
+    
+    Sem lista de itens, converte todas as sugestões atuais para os filtros informados.
+    """
+    if dados.itens:
+        itens = [(item.material_id, item.quantidade) for item in dados.itens]
+    else:
+        sugestoes = calcular_sugestoes_reposicao(
+            session,
+            lead_time_dias=dados.lead_time_dias,
+            dias_cobertura=dados.dias_cobertura,
+            local_id=dados.local_id,
+            categoria_id=dados.categoria_id
+        )
+        itens = [(s["material_id"], s["quantidade_sugerida"]) for s in sugestoes]
+    
+    try:
+        documento = gerar_documento_reposicao(
+            session,
+            destino=dados.destino,
+            itens=itens,
+            fornecedor_id=dados.fornecedor_id,
+            observacoes=dados.observacoes
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    session.commit()
+    session.refresh(documento)
+    
+    return {
+        "message": "Sugestões convertidas com sucesso",
+        "destino": dados.destino,
+        "id": documento.id,
+        "numero": documento.numero,
+        "total_itens": len(documento.itens)
+    }
+
+
 @router.get("/materiais/{material_id}/historico")
 def get_historico_material(
     material_id: int,
@@ -308,6 +427,38 @@ def get_saldo_material(
     }
 
 
+@router.get("/disponibilidade")
+def get_disponibilidade(
+    material_id: Optional[int] = Query(None),
+    local_id: Optional[int] = Query(None),
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("materiais:read"))
+):
+    """
+    Disponível para promessa (ATP) por material e local
+    
+    disponivel = estoque - reservado (reservas de pedidos de venda aprovados)
+    """
+    linhas = consultar_disponibilidade(
+        session,
+        material_ids=[material_id] if material_id else None,
+        local_id=local_id
+    )
+    
+    return [
+        {
+            "material_id": linha.material_id,
+            "material_codigo": linha.codigo,
+            "material_nome": linha.nome,
+            "local_id": linha.local_id,
+            "estoque": linha.estoque,
+            "reservado": linha.reservado,
+            "disponivel": linha.disponivel
+        }
+        for linha in linhas
+    ]
+
+
 @router.get("/locais/{local_id}/estoque")
 def get_estoque_por_local(
     local_id: int,
@@ -475,7 +626,7 @@ def relatorio_posicao_estoque(
     
     materiais = query.offset(skip).limit(limit).all()
     
-    return [
+    return RespostaJSON([
         {
             "id": material.id,
             "codigo": material.codigo,
@@ -490,4 +641,112 @@ def relatorio_posicao_estoque(
             "categoria": material.categoria.nome if material.categoria else None
         }
         for material, quantidade in materiais
-    ]
+    ])
+
+
+@router.get("/relatorios/posicao-estoque/exportar")
+def exportar_posicao_estoque(
+    formato: FormatoExportacao = Query(FormatoExportacao.CSV),
+    local_id: int = None,
+    categoria_id: int = None,
+    apenas_zerados: bool = False,
+    apenas_criticos: bool = False,
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("materiais:read"))
+):
+    """
+    Exporta a posição de estoque completa (sem paginação) em streaming
+    Aceita os mesmos filtros do relatório de posição de estoque
+    """
+    from app.models_modules import EstoquePorLocal
+    
+    quantidade = EstoquePorLocal.quantidade if local_id else Material.estoque_atual
+    
+    stmt = select(
+        Material.id,
+        Material.codigo,
+        Material.nome,
+        Material.unidade_medida,
+        quantidade,
+        Material.estoque_minimo,
+        Material.estoque_maximo,
+        CategoriaMaterial.nome
+    ).outerjoin(
+        CategoriaMaterial, Material.categoria_id == CategoriaMaterial.id
+    )
+    
+    if local_id:
+        stmt = stmt.join(
+            EstoquePorLocal, Material.id == EstoquePorLocal.material_id
+        ).where(EstoquePorLocal.local_id == local_id)
+    
+    if categoria_id:
+        stmt = stmt.where(Material.categoria_id == categoria_id)
+    
+    if apenas_zerados:
+        stmt = stmt.where(quantidade == 0)
+    
+    if apenas_criticos:
+        stmt = stmt.where(quantidade < Material.estoque_minimo)
+    
+    stmt = stmt.where(Material.ativo == 1).order_by(Material.codigo)
+    
+    def montar_linha(row):
+        status = ("CRÍTICO" if row[4] < row[5]
+                  else "ZERADO" if row[4] == 0
+                  else "NORMAL")
+        return (*row[:7], status, row[7])
+    
+    return resposta_exportacao(
+        colunas=[
+            "id", "codigo", "nome", "unidade_medida", "quantidade",
+            "estoque_minimo", "estoque_maximo", "status", "categoria"
+        ],
+        linhas=iterar_consulta(session, stmt),
+        formato=formato,
+        nome_arquivo="posicao_estoque",
+        transformar=montar_linha
+    )
+
+
+@router.get("/materiais/{material_id}/historico/exportar")
+def exportar_historico_material(
+    material_id: int,
+    formato: FormatoExportacao = Query(FormatoExportacao.CSV),
+    data_inicio: Optional[datetime] = Query(None),
+    data_fim: Optional[datetime] = Query(None),
+    session: Session = Depends(get_session),
+    _: bool = Depends(require_permission("materiais:read"))
+):
+    """Exporta o histórico completo de movimentações de um material em streaming"""
+    material = session.query(Material).filter(Material.id == material_id).first()
+    if not material:
+        raise HTTPException(status_code=404, detail="Material não encontrado")
+    
+    stmt = select(
+        MovimentoEstoque.id,
+        MovimentoEstoque.data_movimento,
+        MovimentoEstoque.tipo_movimento,
+        MovimentoEstoque.quantidade,
+        MovimentoEstoque.local_origem_id,
+        MovimentoEstoque.local_destino_id,
+        MovimentoEstoque.documento,
+        MovimentoEstoque.observacao
+    ).where(MovimentoEstoque.material_id == material_id)
+    
+    if data_inicio:
+        stmt = stmt.where(MovimentoEstoque.data_movimento >= data_inicio)
+    if data_fim:
+        stmt = stmt.where(MovimentoEstoque.data_movimento <= data_fim)
+    
+    stmt = stmt.order_by(MovimentoEstoque.data_movimento.desc())
+    
+    return resposta_exportacao(
+        colunas=[
+            "id", "data_movimento", "tipo_movimento", "quantidade",
+            "local_origem_id", "local_destino_id", "documento", "observacao"
+        ],
+        linhas=iterar_consulta(session, stmt),
+        formato=formato,
+        nome_arquivo=f"historico_{material.codigo}"
+    )
@@ -1,27 +1,36 @@
 """Rotas para o módulo de Vendas/Comercial"""
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
 from datetime import datetime, timedelta
 from app.db import get_session
 from app.models_modules import Cliente, PedidoVenda, ItemPedidoVenda, Material, ContaReceber, MovimentoEstoque, LocalEstoque, TipoMovimento
 from app.schemas_modules import (
-    ClienteCreate, ClienteUpdate, ClienteRead,
+    ClienteCreate, ClienteUpdate, ClienteRead, ExposicaoCreditoRead,
     PedidoVendaCreate, PedidoVendaUpdate, PedidoVendaRead,
     ItemPedidoVendaCreate, ItemPedidoVendaUpdate, ItemPedidoVendaRead
 )
-from app.helpers import gerar_codigo_cliente, gerar_codigo_pedido_venda, validar_cpf, validar_cnpj, processar_movimentacao_estoque
+from app.helpers import gerar_codigo_cliente, gerar_codigo_pedido_venda, validar_cpf, validar_cnpj, processar_movimentacao_estoque, obter_local_padrao
+from app.reservas import ReservaInsuficienteError, reservar_pedido, liberar_reservas_pedido
+from app.credito import LimiteCreditoExcedido, consultar_exposicao, reconstruir_exposicao_credito, verificar_limite_credito
+from app.eventos import ESTOQUE_MOVIMENTADO, PEDIDO_FATURADO, publicar
+from app.projecao import VisaoListagem, colunas_projecao, resposta_projecao
 
 router = APIRouter()
 
 
+RESUMO_CLIENTE = ("codigo", "nome", "cpf_cnpj", "cidade", "estado", "ativo")
+
+
 @router.get("/clientes", response_model=List[ClienteRead])
 def listar_clientes(
     skip: int = 0,
     limit: int = 100,
     busca: Optional[str] = None,
     ativo: Optional[int] = None,
+    fields: Optional[str] = Query(None, description="Colunas separadas por vírgula (resposta enxuta)"),
+    view: VisaoListagem = Query(VisaoListagem.FULL, description="summary: só as colunas de resumo"),
     db: Session = Depends(get_session)
 ):
     """Lista todos os clientes com filtros opcionais"""
@@ -40,8 +49,41 @@ def listar_clientes(
     if ativo is not None:
         query = query.filter(Cliente.ativo == ativo)
     
-    clientes = query.offset(skip).limit(limit).all()
-    return clientes
+    query = query.offset(skip).limit(limit)
+    colunas = colunas_projecao(ClienteRead, Cliente, fields, view, RESUMO_CLIENTE)
+    if colunas:
+        return resposta_projecao(db, query, Cliente, colunas)
+    return query.all()
+
+
+@router.get("/clientes/credito", response_model=List[ExposicaoCreditoRead])
+def listar_exposicao_credito(
+    percentual_minimo: Optional[float] = Query(
+        80.0, ge=0, description="Só clientes com exposição a partir deste percentual do limite"
+    ),
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_session)
+):
+    """Clientes próximos ou acima do limite de crédito (mais comprometidos primeiro)"""
+    return consultar_exposicao(db, percentual_minimo=percentual_minimo, skip=skip, limit=limit)
+
+
+@router.post("/clientes/credito/reconstruir")
+def reconstruir_credito(db: Session = Depends(get_session)):
+    """Refaz a exposição de crédito de todos os clientes a partir dos títulos e pedidos"""
+    resultado = reconstruir_exposicao_credito(db)
+    db.commit()
+    return resultado
+
+
+@router.get("/clientes/{cliente_id}/credito", response_model=ExposicaoCreditoRead)
+def buscar_exposicao_credito(cliente_id: int, db: Session = Depends(get_session)):
+    """Limite, exposição (títulos em aberto + pedidos aprovados) e disponível do cliente"""
+    linhas = consultar_exposicao(db, cliente_id=cliente_id)
+    if not linhas:
+        raise HTTPException(status_code=404, detail="Cliente não encontrado")
+    return linhas[0]
 
 
 @router.get("/clientes/{cliente_id}", response_model=ClienteRead)
@@ -172,6 +214,10 @@ def buscar_cliente_por_codigo(codigo: str, db: Session = Depends(get_session)):
 # PEDIDOS DE VENDA
 # =============================================================================
 
+# Itens da página inteira em uma consulta (a serialização de PedidoVendaRead
+# carregaria os itens de cada pedido separadamente)
+CARREGAMENTO_PEDIDO_VENDA = (selectinload(PedidoVenda.itens),)
+
 @router.get("/pedidos", response_model=List[PedidoVendaRead])
 def listar_pedidos_venda(
     skip: int = 0,
@@ -183,7 +229,7 @@ def listar_pedidos_venda(
     db: Session = Depends(get_session)
 ):
     """Lista pedidos de venda com filtros opcionais"""
-    query = db.query(PedidoVenda)
+    query = db.query(PedidoVenda).options(*CARREGAMENTO_PEDIDO_VENDA)
     
     if status:
         query = query.filter(PedidoVenda.status == status)
@@ -468,7 +514,11 @@ def remover_item_pedido(
 
 @router.post("/pedidos/{pedido_id}/aprovar")
 def aprovar_pedido_venda(pedido_id: int, db: Session = Depends(get_session)):
-    """Aprova um pedido de venda (valida estoque)"""
+    """
+    Aprova um pedido de venda:
+    - Confere o limite de crédito do cliente (títulos em aberto + pedidos aprovados)
+    - Reserva o estoque dos itens no local padrão
+    """
     pedido = db.query(PedidoVenda).filter(PedidoVenda.id == pedido_id).first()
     if not pedido:
         raise HTTPException(status_code=404, detail="Pedido não encontrado")
@@ -476,14 +526,26 @@ def aprovar_pedido_venda(pedido_id: int, db: Session = Depends(get_session)):
     if pedido.status != "orcamento":
         raise HTTPException(status_code=400, detail="Apenas pedidos em orçamento podem ser aprovados")
     
-    # Validar estoque disponível para todos os itens
-    for item in pedido.itens:
-        material = db.query(Material).filter(Material.id == item.material_id).first()
-        if material.estoque_atual < item.quantidade:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Estoque insuficiente para {material.nome}. Disponível: {material.estoque_atual}, Solicitado: {item.quantidade}"
-            )
+    local_padrao = obter_local_padrao(db)
+    if not local_padrao:
+        raise HTTPException(status_code=400, detail="Nenhum local de estoque ativo encontrado")
+    
+    try:
+        verificar_limite_credito(db, pedido.cliente_id, pedido.cliente.limite_credito, pedido.valor_total or 0.0)
+    except LimiteCreditoExcedido as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Reservar estoque disponível (estoque - reservado) para todos os itens
+    try:
+        reservar_pedido(db, pedido, local_padrao.id)
+    except ReservaInsuficienteError as e:
+        db.rollback()
+        material = db.query(Material).filter(Material.id == e.material_id).first()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Estoque insuficiente para {material.nome if material else e.material_id}. Disponível: {e.disponivel}, Solicitado: {e.solicitado}"
+        )
     
     pedido.status = "aprovado"
     pedido.updated_at = datetime.utcnow()
@@ -503,6 +565,7 @@ def faturar_pedido_venda(pedido_id: int, db: Session = Depends(get_session)):
     - Baixa estoque
     - Gera Conta a Receber
     - Atualiza status para FATURADO
+    - Publica PedidoFaturado e EstoqueMovimentado
     """
     pedido = db.query(PedidoVenda).filter(PedidoVenda.id == pedido_id).first()
     if not pedido:
@@ -512,26 +575,19 @@ def faturar_pedido_venda(pedido_id: int, db: Session = Depends(get_session)):
         raise HTTPException(status_code=400, detail="Apenas pedidos aprovados podem ser faturados")
     
     try:
-        # Obter local padrão
-        local_padrao = db.query(LocalEstoque).filter(LocalEstoque.padrao == 1).first()
-        if not local_padrao:
-            # Se não houver local padrão, pegar o primeiro ativo
-            local_padrao = db.query(LocalEstoque).filter(LocalEstoque.ativo == 1).first()
+        # Local onde o pedido foi reservado (pedidos antigos: local padrão)
+        local_id = pedido.local_reserva_id
+        if not local_id:
+            local_padrao = obter_local_padrao(db)
+            if not local_padrao:
+                raise HTTPException(status_code=400, detail="Nenhum local de estoque ativo encontrado")
+            local_id = local_padrao.id
         
-        if not local_padrao:
-            raise HTTPException(status_code=400, detail="Nenhum local de estoque ativo encontrado")
+        # A reserva é consumida pela própria baixa
+        liberar_reservas_pedido(db, pedido)
         
-        # Validar e baixar estoque para cada item
+        # Baixar estoque para cada item (a baixa valida o saldo do local)
         for item in pedido.itens:
-            material = db.query(Material).filter(Material.id == item.material_id).first()
-            
-            # Validar estoque novamente
-            if material.estoque_atual < item.quantidade:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Estoque insuficiente para {material.nome}"
-                )
-            
             # Criar movimentação de saída
             movimento = MovimentoEstoque(
                 material_id=item.material_id,
@@ -540,7 +596,7 @@ def faturar_pedido_venda(pedido_id: int, db: Session = Depends(get_session)):
                 data_movimento=datetime.utcnow(),
                 documento=pedido.codigo,
                 observacao=f"Faturamento do pedido {pedido.codigo}",
-                local_origem_id=local_padrao.id
+                local_origem_id=local_id
             )
             db.add(movimento)
             
@@ -549,35 +605,47 @@ def faturar_pedido_venda(pedido_id: int, db: Session = Depends(get_session)):
                 material_id=item.material_id,
                 tipo_movimento="SAIDA",
                 quantidade=item.quantidade,
-                local_origem_id=local_padrao.id,
+                local_origem_id=local_id,
                 db=db
             )
             
             if not resultado["sucesso"]:
                 raise HTTPException(status_code=400, detail=resultado["mensagem"])
         
-        # Gerar Conta a Receber
-        cliente = pedido.cliente
-        data_vencimento = datetime.utcnow()
-        
-        # Calcular data de vencimento baseado nos dias do cliente
-        data_vencimento = data_vencimento + timedelta(days=cliente.dias_vencimento)
+        # Atualizar pedido
+        pedido.status = "faturado"
+        pedido.data_faturamento = datetime.utcnow()
+        pedido.updated_at = datetime.utcnow()
         
+        # Gerar Conta a Receber
         conta_receber = ContaReceber(
             descricao=f"Faturamento do pedido {pedido.codigo}",
             cliente_id=pedido.cliente_id,
-            cliente_nome=cliente.nome,
             pedido_venda_id=pedido.id,
-            data_vencimento=data_vencimento,
+            data_emissao=pedido.data_faturamento,
+            data_vencimento=pedido.data_faturamento + timedelta(days=pedido.cliente.dias_vencimento or 0),
             valor_original=pedido.valor_total,
             observacoes=f"Gerado automaticamente do pedido {pedido.codigo}"
         )
         db.add(conta_receber)
+        db.flush()
         
-        # Atualizar pedido
-        pedido.status = "faturado"
-        pedido.data_faturamento = datetime.utcnow()
-        pedido.updated_at = datetime.utcnow()
+        itens = [{"material_id": item.material_id, "quantidade": item.quantidade} for item in pedido.itens]
+        publicar(db, PEDIDO_FATURADO, "pedido_venda", pedido.id, {
+            "codigo": pedido.codigo,
+            "conta_receber_id": conta_receber.id,
+            "cliente_id": pedido.cliente_id,
+            "valor_total": pedido.valor_total,
+            "dias_vencimento": pedido.cliente.dias_vencimento,
+            "data_faturamento": pedido.data_faturamento.isoformat(),
+            "itens": itens
+        })
+        publicar(db, ESTOQUE_MOVIMENTADO, "pedido_venda", pedido.id, {
+            "documento": pedido.codigo,
+            "local_id": local_id,
+            "sinal": -1,
+            "itens": itens
+        })
         
         db.commit()
         db.refresh(pedido)
@@ -606,6 +674,9 @@ def cancelar_pedido_venda(pedido_id: int, db: Session = Depends(get_session)):
     if pedido.status == "faturado":
         raise HTTPException(status_code=400, detail="Pedidos faturados não podem ser cancelados")
     
+    # Devolver ao disponível o que foi reservado na aprovação
+    liberar_reservas_pedido(db, pedido)
+    
     pedido.status = "cancelado"
     pedido.updated_at = datetime.utcnow()
     
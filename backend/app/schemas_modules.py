@@ -90,6 +90,14 @@ class FormaPagamento(str, Enum):
     CHEQUE = "cheque"
 
 
+class StatusJob(str, Enum):
+    PENDENTE = "pendente"
+    EXECUTANDO = "executando"
+    CONCLUIDO = "concluido"
+    FALHOU = "falhou"
+    CANCELADO = "cancelado"
+
+
 # =============================================================================
 # MÓDULO DE COMPRAS - SCHEMAS
 # =============================================================================
@@ -162,6 +170,7 @@ class ItemPedidoCompraRead(ItemPedidoCompraBase):
     id: int
     pedido_id: int
     preco_total: float
+    quantidade_recebida: Optional[float] = 0.0
     
     class Config:
         from_attributes = True
@@ -191,6 +200,7 @@ class PedidoCompraRead(PedidoCompraBase):
     data_pedido: datetime
     status: StatusCompra
     valor_total: float
+    data_recebimento: Optional[datetime] = None
     created_at: datetime
     itens: List[ItemPedidoCompraRead] = []
     
@@ -198,6 +208,37 @@ class PedidoCompraRead(PedidoCompraBase):
         from_attributes = True
 
 
+# Recebimento de Pedido de Compra
+class ItemRecebimentoCompra(BaseModel):
+    item_id: int  # ItemPedidoCompra.id
+    quantidade: float = Field(..., gt=0)
+
+
+class CondicoesRecebimentoCompra(BaseModel):
+    local_id: Optional[int] = None  # Vazio = local padrão
+    data_recebimento: Optional[datetime] = None
+    gerar_conta_pagar: bool = True
+    quantidade_parcelas: int = Field(1, ge=1, le=120)
+    intervalo_dias: int = Field(30, ge=0)
+    data_primeira_parcela: Optional[datetime] = None  # Vazio = recebimento + intervalo_dias
+    forma_pagamento: Optional[FormaPagamento] = None
+
+
+class RecebimentoPedidoCompraRequest(CondicoesRecebimentoCompra):
+    itens: Optional[List[ItemRecebimentoCompra]] = None  # Vazio = todo o saldo pendente
+    numero_documento: Optional[str] = None  # NF do fornecedor
+
+
+class RecebimentoLoteItem(BaseModel):
+    pedido_id: int
+    itens: Optional[List[ItemRecebimentoCompra]] = None  # Vazio = todo o saldo pendente
+    numero_documento: Optional[str] = None
+
+
+class RecebimentoLoteRequest(CondicoesRecebimentoCompra):
+    recebimentos: List[RecebimentoLoteItem]
+
+
 # =============================================================================
 # MÓDULO FINANCEIRO - SCHEMAS
 # =============================================================================
@@ -781,6 +822,23 @@ class MovimentoEstoqueRead(MovimentoEstoqueBase):
         from_attributes = True
 
 
+# Reposição de Estoque
+class ItemReposicao(BaseModel):
+    material_id: int
+    quantidade: float = Field(..., gt=0)
+
+
+class ReposicaoConverterRequest(BaseModel):
+    destino: str = Field(..., pattern="^(cotacao|pedido)$")
+    fornecedor_id: Optional[int] = None  # Obrigatório quando destino = pedido
+    itens: Optional[List[ItemReposicao]] = None  # Vazio = todas as sugestões atuais
+    lead_time_dias: int = Field(7, ge=0)
+    dias_cobertura: int = Field(30, ge=1)
+    local_id: Optional[int] = None
+    categoria_id: Optional[int] = None
+    observacoes: Optional[str] = None
+
+
 # =============================================================================
 # NOVOS SCHEMAS - FASE 1
 # =============================================================================
@@ -858,6 +916,19 @@ class ClienteRead(ClienteBase):
         from_attributes = True
 
 
+class ExposicaoCreditoRead(BaseModel):
+    cliente_id: int
+    codigo: Optional[str] = None
+    nome: str
+    limite_credito: float
+    receber_aberto: float
+    pedidos_aprovados: float
+    exposicao: float
+    disponivel: Optional[float] = None  # None: cliente sem limite definido
+    utilizacao_percentual: Optional[float] = None
+    acima_limite: bool = False
+
+
 # -----------------------------------------------------------------------------
 # PEDIDOS DE VENDA
 # -----------------------------------------------------------------------------
@@ -925,6 +996,7 @@ class PedidoVendaRead(PedidoVendaBase):
     valor_produtos: float
     valor_desconto: float
     valor_total: float
+    local_reserva_id: Optional[int] = None
     created_at: datetime
     updated_at: datetime
     itens: List[ItemPedidoVendaRead] = []
@@ -1207,6 +1279,10 @@ class ItemNotaFiscalBase(BaseModel):
     valor_icms: float = 0.0
     aliquota_ipi: float = 0.0
     valor_ipi: float = 0.0
+    aliquota_pis: float = 0.0
+    valor_pis: float = 0.0
+    aliquota_cofins: float = 0.0
+    valor_cofins: float = 0.0
     cfop: Optional[str] = None
 
 
@@ -1240,6 +1316,7 @@ class NotaFiscalBase(BaseModel):
     valor_outras_despesas: float = 0.0
     natureza_operacao: str = "Venda de mercadoria"
     cfop: Optional[str] = None
+    local_estoque_id: Optional[int] = None
     observacao: Optional[str] = None
     informacoes_adicionais: Optional[str] = None
 
@@ -1248,6 +1325,12 @@ class NotaFiscalCreate(NotaFiscalBase):
     itens: List[ItemNotaFiscalCreate]
 
 
+class EmissaoLoteRequest(BaseModel):
+    nf_ids: Optional[List[int]] = None  # Vazio = todas as notas em rascunho
+    baixar_estoque: bool = True
+    local_id: Optional[int] = None  # Para notas sem local definido
+
+
 class NotaFiscalUpdate(BaseModel):
     numero: Optional[str] = None
     serie: Optional[str] = None
@@ -1259,11 +1342,44 @@ class NotaFiscalUpdate(BaseModel):
     valor_outras_despesas: Optional[float] = None
     natureza_operacao: Optional[str] = None
     cfop: Optional[str] = None
+    local_estoque_id: Optional[int] = None
     observacao: Optional[str] = None
     informacoes_adicionais: Optional[str] = None
     status: Optional[StatusNotaFiscal] = None
 
 
+class AutorizacaoLoteRequest(BaseModel):
+    nf_ids: Optional[List[int]] = None  # Vazio = todas as notas emitidas
+
+
+class RecalculoImpostosRequest(BaseModel):
+    nf_ids: Optional[List[int]] = None  # Vazio = todos os rascunhos
+
+
+class AliquotaTributariaBase(BaseModel):
+    ncm: Optional[str] = None
+    cfop: Optional[str] = None
+    uf: Optional[str] = None
+    aliquota_icms: Optional[float] = None  # Nulo = herda de regra mais genérica
+    aliquota_ipi: Optional[float] = None
+    aliquota_pis: Optional[float] = None
+    aliquota_cofins: Optional[float] = None
+    ativo: int = 1
+
+
+class AliquotaTributariaCreate(AliquotaTributariaBase):
+    pass
+
+
+class AliquotaTributariaRead(AliquotaTributariaBase):
+    id: int
+    created_at: datetime
+    updated_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
 class NotaFiscalRead(NotaFiscalBase):
     id: int
     valor_produtos: float
@@ -1283,3 +1399,29 @@ class NotaFiscalRead(NotaFiscalBase):
     class Config:
         from_attributes = True
 
+
+# =============================================================================
+# JOBS EM SEGUNDO PLANO - SCHEMAS
+# =============================================================================
+
+class JobRead(BaseModel):
+    id: int
+    tipo: str
+    status: StatusJob
+    parametros: Optional[dict] = None
+    resultado: Optional[dict] = None
+    erro: Optional[str] = None
+    progresso: float = 0.0
+    mensagem: Optional[str] = None
+    tentativas: int = 0
+    max_tentativas: int = 3
+    disponivel_em: Optional[datetime] = None
+    chave_idempotencia: Optional[str] = None
+    usuario_id: Optional[int] = None
+    iniciado_em: Optional[datetime] = None
+    concluido_em: Optional[datetime] = None
+    created_at: datetime
+    updated_at: datetime
+    
+    class Config:
+        from_attributes = True
@@ -0,0 +1,198 @@
+"""
+Varredura de vencimentos: atraso e encargos de contas a pagar e a receber.
+
+Uma vez por dia (tarefa diária do executor de jobs) os títulos e parcelas
+em aberto vencidos antes da data de referência passam para ATRASADO e têm
+multa e juros de mora apurados pelas regras configuradas:
+
+- multa: percentual único sobre o principal em aberto
+- juros de mora: percentual ao mês, pro rata pelos dias de atraso
+- carência: até esse número de dias de atraso não há encargos
+
+Os encargos são valores absolutos recalculados a cada dia e ficam em
+multa_apurada/juros_mora_apurados; a coluna juros recebe só a diferença
+para o valor anterior, preservando juros lançados manualmente. Títulos
+parcelados só mudam de status (os encargos ficam nas parcelas).
+
+Cada tabela é percorrida em lotes de ids: um UPDATE por lote, com commit
+entre lotes, então nenhuma transação segura muitas linhas por muito tempo.
+Linhas já apuradas na data de referência ficam de fora, o que torna a
+varredura idempotente no dia e permite retomar uma execução interrompida.
+"""
+from datetime import date, datetime, time
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import Date, case, cast, exists, func, literal, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.credito import recalcular_exposicao
+from app.models_modules import (
+    ContaPagar, ContaReceber, ParcelaContaPagar, ParcelaContaReceber, StatusPagamento
+)
+
+
+STATUS_EM_ABERTO = (StatusPagamento.PENDENTE, StatusPagamento.PARCIAL, StatusPagamento.ATRASADO)
+
+
+class RegrasEncargos(NamedTuple):
+    multa_percentual: float
+    juros_mes_percentual: float
+    carencia_dias: int
+
+
+def regras_padrao(**alteracoes) -> RegrasEncargos:
+    """Regras das configurações (ENCARGOS_*), com alterações opcionais"""
+    regras = RegrasEncargos(
+        settings.ENCARGOS_MULTA_PERCENTUAL,
+        settings.ENCARGOS_JUROS_MES_PERCENTUAL,
+        settings.ENCARGOS_CARENCIA_DIAS
+    )
+    return regras._replace(**{campo: valor for campo, valor in alteracoes.items() if valor is not None})
+
+
+class _Alvo(NamedTuple):
+    """Tabela varrida e suas colunas de valor, liquidação e título pai"""
+    nome: str
+    modelo: type
+    valor: object
+    liquidado: object
+    parcelas_titulo_id: Optional[object]  # títulos: FK das parcelas (parcelados não recebem encargos)
+
+
+ALVOS = (
+    _Alvo("contas_receber", ContaReceber, ContaReceber.valor_original, ContaReceber.valor_recebido,
+          ParcelaContaReceber.conta_receber_id),
+    _Alvo("parcelas_conta_receber", ParcelaContaReceber, ParcelaContaReceber.valor,
+          ParcelaContaReceber.valor_recebido, None),
+    _Alvo("contas_pagar", ContaPagar, ContaPagar.valor_original, ContaPagar.valor_pago,
+          ParcelaContaPagar.conta_pagar_id),
+    _Alvo("parcelas_conta_pagar", ParcelaContaPagar, ParcelaContaPagar.valor, ParcelaContaPagar.valor_pago, None),
+)
+
+
+def _dias_atraso(vencimento, referencia: date, dialeto: str):
+    """Dias corridos entre o vencimento e a data de referência, calculados no banco"""
+    if dialeto == "sqlite":
+        return func.julianday(referencia.isoformat()) - func.julianday(func.date(vencimento))
+    if dialeto == "postgresql":
+        return cast(literal(referencia), Date) - cast(vencimento, Date)
+    return func.datediff(literal(referencia), vencimento)
+
+
+def _condicao(alvo: _Alvo, referencia: date, recalcular: bool):
+    """Linhas em aberto vencidas antes da referência e ainda não apuradas nela"""
+    modelo = alvo.modelo
+    condicao = [
+        modelo.status.in_(STATUS_EM_ABERTO),
+        modelo.data_vencimento < datetime.combine(referencia, time.min)
+    ]
+    if not recalcular:
+        condicao.append(or_(
+            modelo.data_apuracao_encargos.is_(None),
+            modelo.data_apuracao_encargos < referencia
+        ))
+    return condicao
+
+
+def _valores(alvo: _Alvo, referencia: date, regras: RegrasEncargos, dialeto: str) -> dict:
+    """SET do UPDATE: status, encargos recalculados e juros ajustados pela diferença"""
+    modelo = alvo.modelo
+    dias = _dias_atraso(modelo.data_vencimento, referencia, dialeto)
+    principal = func.max(alvo.valor - func.coalesce(alvo.liquidado, 0.0), 0.0) if dialeto == "sqlite" else (
+        func.greatest(alvo.valor - func.coalesce(alvo.liquidado, 0.0), 0.0)
+    )
+
+    cobra = dias > regras.carencia_dias
+    if alvo.parcelas_titulo_id is not None:
+        cobra = cobra & ~exists().where(alvo.parcelas_titulo_id == modelo.id)
+
+    multa = case((cobra, func.round(principal * regras.multa_percentual / 100.0, 2)), else_=0.0)
+    juros_mora = case(
+        (cobra, func.round(principal * regras.juros_mes_percentual / 100.0 / 30.0 * dias, 2)),
+        else_=0.0
+    )
+    anteriores = func.coalesce(modelo.multa_apurada, 0.0) + func.coalesce(modelo.juros_mora_apurados, 0.0)
+
+    return {
+        "status": StatusPagamento.ATRASADO,
+        "juros": func.coalesce(modelo.juros, 0.0) - anteriores + multa + juros_mora,
+        "multa_apurada": multa,
+        "juros_mora_apurados": juros_mora,
+        "data_apuracao_encargos": referencia,
+        "updated_at": datetime.utcnow()
+    }
+
+
+def varrer_vencidos(
+    session: Session,
+    referencia: Optional[date] = None,
+    regras: Optional[RegrasEncargos] = None,
+    lote: Optional[int] = None,
+    recalcular: bool = False,
+    confirmar: Optional[Callable[[], None]] = None,
+    progresso: Optional[Callable[[float, Optional[str]], None]] = None
+) -> dict:
+    """
+    Marca como ATRASADO e apura encargos dos títulos e parcelas vencidos
+
+    Args:
+        referencia: data da apuração (padrão: hoje, UTC)
+        regras: multa, juros ao mês e carência (padrão: configurações)
+        lote: linhas por UPDATE (padrão: VENCIMENTOS_LOTE)
+        recalcular: reapura também linhas já apuradas na referência
+        confirmar: chamado após cada lote (commit); sem ele tudo fica na
+            transação do chamador
+
+    Returns:
+        dict com as linhas atualizadas por tabela e o total de encargos apurados
+    """
+    referencia = referencia or datetime.utcnow().date()
+    regras = regras or regras_padrao()
+    lote = lote or settings.VENCIMENTOS_LOTE
+    dialeto = session.get_bind().dialect.name
+
+    resultado = {
+        "data_referencia": referencia.isoformat(),
+        "regras": regras._asdict(),
+        "atualizados": {},
+        "encargos": {}
+    }
+    for indice, alvo in enumerate(ALVOS):
+        modelo = alvo.modelo
+        condicao = _condicao(alvo, referencia, recalcular)
+        valores = _valores(alvo, referencia, regras, dialeto)
+        atualizados, encargos, ultimo_id = 0, 0.0, 0
+
+        while True:
+            ids: List[int] = session.execute(
+                select(modelo.id).where(*condicao, modelo.id > ultimo_id).order_by(modelo.id).limit(lote)
+            ).scalars().all()
+            if not ids:
+                break
+
+            atualizados += session.execute(
+                update(modelo).where(modelo.id.in_(ids), *condicao).values(**valores)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            encargos += session.execute(
+                select(func.coalesce(func.sum(modelo.multa_apurada + modelo.juros_mora_apurados), 0.0))
+                .where(modelo.id.in_(ids))
+            ).scalar()
+
+            # Juros de contas a receber mudam o saldo usado no limite de crédito
+            if modelo is ContaReceber:
+                recalcular_exposicao(session, session.execute(
+                    select(ContaReceber.cliente_id).where(ContaReceber.id.in_(ids)).distinct()
+                ).scalars().all())
+
+            if confirmar is not None:
+                confirmar()
+            ultimo_id = ids[-1]
+
+        resultado["atualizados"][alvo.nome] = atualizados
+        resultado["encargos"][alvo.nome] = round(encargos, 2)
+        if progresso is not None:
+            progresso((indice + 1) * 100.0 / len(ALVOS), f"{alvo.nome}: {atualizados} atualizados")
+
+    return resultado
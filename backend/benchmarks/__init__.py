@@ -0,0 +1,8 @@
+"""
+Benchmarks de carga do ERP.
+
+- gerar_dados: popula o banco com volumes configuráveis (materiais,
+  movimentos de estoque, títulos, NFs, movimentações bancárias).
+- cenarios: executa cenários contra a aplicação FastAPI real e grava
+  vazão e latências p50/p95/p99 em JSON, comparáveis entre versões.
+"""
@@ -0,0 +1,467 @@
+"""
+Executor de cenários de carga
+
+Dispara requisições contra a aplicação FastAPI real (em processo, via
+TestClient, ou um servidor já rodando com --url) e mede vazão e latência
+p50/p95/p99 de cada cenário. O tempo de SQL e a quantidade de consultas vêm
+do cabeçalho Server-Timing da própria aplicação.
+
+Uso:
+    python -m benchmarks.cenarios executar --iteracoes 500 --concorrencia 4 \\
+        --saida resultados/v1.json
+    python -m benchmarks.cenarios comparar resultados/v1.json resultados/v2.json
+
+Os ids usados (clientes, materiais com saldo, contas bancárias) são lidos do
+banco em --database-url, normalmente populado por benchmarks.gerar_dados.
+"""
+import argparse
+import json
+import math
+import platform
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.models_modules import (
+    Cliente, ContaBancaria, ContaPagar, ContaReceber, EstoquePorLocal, LocalEstoque,
+    Material, MovimentacaoBancaria, MovimentoEstoque, NotaFiscal
+)
+from app.security import create_access_token
+
+
+AMOSTRA_IDS = 1_000
+PERCENTIS = (50, 95, 99)
+TABELAS_VOLUME = {
+    "materiais": Material,
+    "movimentos_estoque": MovimentoEstoque,
+    "contas_pagar": ContaPagar,
+    "contas_receber": ContaReceber,
+    "notas_fiscais": NotaFiscal,
+    "movimentacoes_bancarias": MovimentacaoBancaria,
+}
+
+_SERVER_TIMING_SQL = re.compile(r'sql;dur=([\d.]+)(?:;desc="(\d+)")?')
+
+
+class Ambiente(NamedTuple):
+    """Cliente HTTP e ids disponíveis para montar as requisições"""
+    cliente: Any
+    cabecalhos: Dict[str, str]
+    clientes: List[int]
+    materiais: List[Dict[str, Any]]
+    contas_bancarias: List[int]
+    locais: List[int]
+    hoje: date
+
+
+class Medicao(NamedTuple):
+    segundos: float
+    status: int
+    sql_ms: Optional[float]
+    consultas: Optional[int]
+
+
+# Cada cenário recebe o ambiente e um gerador aleatório e devolve a
+# requisição a ser cronometrada; o que vem antes (dados de apoio) não é medido
+CENARIOS: Dict[str, Callable[[Ambiente, random.Random], Callable[[], Any]]] = {}
+
+
+def cenario(nome: str):
+    """Registra um cenário"""
+    def registrar(funcao):
+        CENARIOS[nome] = funcao
+        return funcao
+    return registrar
+
+
+def _itens_pedido(ambiente: Ambiente, rng: random.Random) -> List[Dict[str, Any]]:
+    return [
+        {"material_id": material["id"], "quantidade": 1, "preco_unitario": material["preco"]}
+        for material in rng.sample(ambiente.materiais, min(len(ambiente.materiais), rng.randint(1, 5)))
+    ]
+
+
+def _json(resposta) -> Dict[str, Any]:
+    if resposta.status_code >= 400:
+        raise RuntimeError(f"{resposta.request.method} {resposta.request.url.path}: "
+                           f"{resposta.status_code} {resposta.text[:200]}")
+    return resposta.json()
+
+
+def _janela(ambiente: Ambiente, rng: random.Random, dias: int):
+    fim = ambiente.hoje - timedelta(days=rng.randint(0, 365))
+    return fim - timedelta(days=dias), fim
+
+
+# =============================================================================
+# CENÁRIOS
+# =============================================================================
+
+@cenario("pedido_venda")
+def cenario_pedido_venda(ambiente: Ambiente, rng: random.Random):
+    corpo = {"cliente_id": rng.choice(ambiente.clientes), "itens": _itens_pedido(ambiente, rng)}
+    return lambda: ambiente.cliente.post("/vendas/pedidos", json=corpo, headers=ambiente.cabecalhos)
+
+
+@cenario("faturamento")
+def cenario_faturamento(ambiente: Ambiente, rng: random.Random):
+    pedido = _json(ambiente.cliente.post("/vendas/pedidos", json={
+        "cliente_id": rng.choice(ambiente.clientes),
+        "itens": _itens_pedido(ambiente, rng)
+    }, headers=ambiente.cabecalhos))
+    _json(ambiente.cliente.post(f"/vendas/pedidos/{pedido['id']}/aprovar", headers=ambiente.cabecalhos))
+    return lambda: ambiente.cliente.post(f"/vendas/pedidos/{pedido['id']}/faturar", headers=ambiente.cabecalhos)
+
+
+@cenario("extrato")
+def cenario_extrato(ambiente: Ambiente, rng: random.Random):
+    inicio, fim = _janela(ambiente, rng, 30)
+    conta_id = rng.choice(ambiente.contas_bancarias)
+    return lambda: ambiente.cliente.get(
+        f"/financeiro/contas-bancarias/{conta_id}/extrato",
+        params={"data_inicio": inicio.isoformat(), "data_fim": fim.isoformat()},
+        headers=ambiente.cabecalhos
+    )
+
+
+@cenario("posicao_estoque")
+def cenario_posicao_estoque(ambiente: Ambiente, rng: random.Random):
+    params = {"local_id": rng.choice(ambiente.locais), "skip": rng.randint(0, 1_000), "limit": 100}
+    return lambda: ambiente.cliente.get(
+        "/materiais/relatorios/posicao-estoque", params=params, headers=ambiente.cabecalhos
+    )
+
+
+@cenario("dre")
+def cenario_dre(ambiente: Ambiente, rng: random.Random):
+    referencia = ambiente.hoje - timedelta(days=rng.randint(0, 365))
+    return lambda: ambiente.cliente.get(
+        "/financeiro/financeiro/dre",
+        params={"mes": referencia.month, "ano": referencia.year},
+        headers=ambiente.cabecalhos
+    )
+
+
+@cenario("fluxo_caixa")
+def cenario_fluxo_caixa(ambiente: Ambiente, rng: random.Random):
+    inicio, fim = _janela(ambiente, rng, 30)
+    return lambda: ambiente.cliente.get(
+        "/financeiro/fluxo-caixa",
+        params={"data_inicio": inicio.isoformat(), "data_fim": fim.isoformat()},
+        headers=ambiente.cabecalhos
+    )
+
+
+@cenario("aging")
+def cenario_aging(ambiente: Ambiente, rng: random.Random):
+    tipo = rng.choice(["receber", "pagar"])
+    data_base = ambiente.hoje - timedelta(days=rng.randint(0, 365))
+    return lambda: ambiente.cliente.get(
+        f"/financeiro/relatorios/aging/{tipo}",
+        params={"data_base": data_base.isoformat()},
+        headers=ambiente.cabecalhos
+    )
+
+
+# =============================================================================
+# EXECUÇÃO
+# =============================================================================
+
+def carregar_ambiente(engine: Engine, cliente, cabecalhos: Dict[str, str], semente: int = 42) -> Ambiente:
+    """Amostra os ids usados pelos cenários"""
+    rng = random.Random(semente)
+    with engine.connect() as conexao:
+        def amostra(consulta) -> list:
+            linhas = conexao.execute(consulta.limit(AMOSTRA_IDS * 10)).all()
+            return rng.sample(linhas, min(len(linhas), AMOSTRA_IDS))
+
+        local_padrao = conexao.execute(
+            select(LocalEstoque.id).where(LocalEstoque.ativo == 1)
+            .order_by(LocalEstoque.padrao.desc(), LocalEstoque.id).limit(1)
+        ).scalar()
+        # Materiais com saldo no local padrão (onde a aprovação reserva)
+        materiais = amostra(
+            select(Material.id, Material.preco_venda)
+            .join(EstoquePorLocal, EstoquePorLocal.material_id == Material.id)
+            .where(Material.ativo == 1, EstoquePorLocal.local_id == local_padrao, EstoquePorLocal.quantidade >= 50)
+        )
+        ambiente = Ambiente(
+            cliente=cliente,
+            cabecalhos=cabecalhos,
+            clientes=[linha.id for linha in amostra(select(Cliente.id).where(Cliente.ativo == 1))],
+            materiais=[{"id": linha.id, "preco": linha.preco_venda or 1.0} for linha in materiais],
+            contas_bancarias=[linha.id for linha in amostra(select(ContaBancaria.id).where(ContaBancaria.ativa == 1))],
+            locais=[linha.id for linha in amostra(select(LocalEstoque.id).where(LocalEstoque.ativo == 1))],
+            hoje=date.today()
+        )
+
+    faltando = [nome for nome in ("clientes", "materiais", "contas_bancarias", "locais") if not getattr(ambiente, nome)]
+    if faltando:
+        raise RuntimeError(f"Banco sem dados para os cenários ({', '.join(faltando)}); rode benchmarks.gerar_dados")
+    return ambiente
+
+
+def _medir(requisicao: Callable[[], Any]) -> Medicao:
+    inicio = time.perf_counter()
+    resposta = requisicao()
+    segundos = time.perf_counter() - inicio
+
+    sql_ms = consultas = None
+    encontrado = _SERVER_TIMING_SQL.search(resposta.headers.get("server-timing", ""))
+    if encontrado:
+        sql_ms = float(encontrado.group(1))
+        consultas = int(encontrado.group(2)) if encontrado.group(2) else None
+    return Medicao(segundos, resposta.status_code, sql_ms, consultas)
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil por posição mais próxima (valores já ordenados)"""
+    if not valores:
+        return 0.0
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+def resumir(medicoes: List[Medicao], duracao: float, erros: List[str]) -> Dict[str, Any]:
+    latencias = sorted(m.segundos * 1000 for m in medicoes)
+    sql = sorted(m.sql_ms for m in medicoes if m.sql_ms is not None)
+    consultas = [m.consultas for m in medicoes if m.consultas is not None]
+    falhas = sum(1 for m in medicoes if m.status >= 400) + len(erros)
+
+    return {
+        "requisicoes": len(medicoes),
+        "erros": falhas,
+        "duracao_s": round(duracao, 3),
+        "vazao_rps": round(len(medicoes) / duracao, 2) if duracao else 0.0,
+        "latencia_ms": {
+            "min": round(latencias[0], 2) if latencias else 0.0,
+            **{f"p{p}": round(percentil(latencias, p), 2) for p in PERCENTIS},
+            "max": round(latencias[-1], 2) if latencias else 0.0,
+            "media": round(sum(latencias) / len(latencias), 2) if latencias else 0.0,
+        },
+        "sql_ms": {f"p{p}": round(percentil(sql, p), 2) for p in PERCENTIS},
+        "consultas_media": round(sum(consultas) / len(consultas), 1) if consultas else None,
+        "exemplos_erro": erros[:5],
+    }
+
+
+def executar_cenario(
+    ambiente: Ambiente,
+    nome: str,
+    iteracoes: int,
+    concorrencia: int = 1,
+    aquecimento: int = 5,
+    semente: int = 42
+) -> Dict[str, Any]:
+    """Roda `iteracoes` requisições do cenário, divididas entre `concorrencia` threads"""
+    fabrica = CENARIOS[nome]
+    medicoes: List[Medicao] = []
+    erros: List[str] = []
+    lock = threading.Lock()
+
+    for indice in range(aquecimento):
+        try:
+            _medir(fabrica(ambiente, random.Random(semente - indice - 1)))
+        except Exception:
+            pass
+
+    def trabalhador(indice: int) -> None:
+        rng = random.Random(semente + indice)
+        for _ in range(iteracoes // concorrencia + (1 if indice < iteracoes % concorrencia else 0)):
+            try:
+                medicao = _medir(fabrica(ambiente, rng))
+            except Exception as erro:
+                with lock:
+                    erros.append((str(erro) or erro.__class__.__name__)[:300])
+                continue
+            with lock:
+                medicoes.append(medicao)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as pool:
+        list(pool.map(trabalhador, range(concorrencia)))
+    return resumir(medicoes, time.perf_counter() - inicio, erros)
+
+
+def _versao() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def volumes(engine: Engine) -> Dict[str, int]:
+    with engine.connect() as conexao:
+        return {
+            nome: conexao.execute(select(func.count()).select_from(modelo)).scalar()
+            for nome, modelo in TABELAS_VOLUME.items()
+        }
+
+
+def executar(
+    engine: Engine,
+    cliente,
+    cabecalhos: Dict[str, str],
+    cenarios: List[str],
+    iteracoes: int,
+    concorrencia: int = 1,
+    aquecimento: int = 5,
+    semente: int = 42,
+    alvo: str = "processo"
+) -> Dict[str, Any]:
+    """Executa os cenários e devolve o relatório (o mesmo gravado em JSON)"""
+    ambiente = carregar_ambiente(engine, cliente, cabecalhos, semente)
+    relatorio = {
+        "versao": _versao(),
+        "executado_em": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "banco": engine.dialect.name,
+        "alvo": alvo,
+        "volumes": volumes(engine),
+        "parametros": {
+            "iteracoes": iteracoes,
+            "concorrencia": concorrencia,
+            "aquecimento": aquecimento,
+            "semente": semente
+        },
+        "cenarios": {}
+    }
+    for nome in cenarios:
+        resultado = executar_cenario(ambiente, nome, iteracoes, concorrencia, aquecimento, semente)
+        relatorio["cenarios"][nome] = resultado
+        latencia = resultado["latencia_ms"]
+        print(
+            f"  {nome:<16} {resultado['vazao_rps']:>8.1f} req/s  "
+            f"p50 {latencia['p50']:>8.1f}ms  p95 {latencia['p95']:>8.1f}ms  "
+            f"p99 {latencia['p99']:>8.1f}ms  erros {resultado['erros']}"
+        )
+    return relatorio
+
+
+def comparar(base: Dict[str, Any], atual: Dict[str, Any], tolerancia: float = 10.0) -> List[Dict[str, Any]]:
+    """
+    Compara dois relatórios cenário a cenário
+
+    Returns:
+        Uma linha por cenário presente nos dois, com a variação percentual de
+        p50/p95/p99 e vazão; `regressao` indica p95 acima da tolerância
+    """
+    linhas = []
+    for nome, resultado in atual["cenarios"].items():
+        anterior = base["cenarios"].get(nome)
+        if not anterior:
+            continue
+
+        def variacao(antes: float, depois: float) -> Optional[float]:
+            return round((depois - antes) / antes * 100, 1) if antes else None
+
+        linha = {
+            "cenario": nome,
+            **{
+                f"p{p}": variacao(anterior["latencia_ms"][f"p{p}"], resultado["latencia_ms"][f"p{p}"])
+                for p in PERCENTIS
+            },
+            "vazao": variacao(anterior["vazao_rps"], resultado["vazao_rps"]),
+        }
+        linha["regressao"] = linha["p95"] is not None and linha["p95"] > tolerancia
+        linhas.append(linha)
+    return linhas
+
+
+# =============================================================================
+# LINHA DE COMANDO
+# =============================================================================
+
+def _cliente_http(args):
+    """Cliente para o servidor em --url ou, sem ele, para a aplicação em processo"""
+    if args.url:
+        import httpx
+        return httpx.Client(base_url=args.url, timeout=120)
+
+    from fastapi.testclient import TestClient
+    from main import app
+    # Erros do servidor viram respostas 500 contadas como erro, sem interromper a execução
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def _cabecalhos(cliente, args) -> Dict[str, str]:
+    if args.email:
+        resposta = cliente.post("/auth/login", data={"username": args.email, "password": args.senha})
+        token = _json(resposta)["access_token"]
+    else:
+        # Mesma SECRET_KEY do servidor: token com permissão total
+        token = create_access_token(subject="benchmark@erp.local", permissions=["*:*"])
+    return {"Authorization": f"Bearer {token}"}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de cenários do ERP")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    cmd_executar = comandos.add_parser("executar", help="Executa os cenários e grava o JSON")
+    cmd_executar.add_argument("--database-url", default=settings.DATABASE_URL)
+    cmd_executar.add_argument("--url", help="Servidor já rodando (padrão: aplicação em processo)")
+    cmd_executar.add_argument("--email", help="Usuário para /auth/login (padrão: token gerado localmente)")
+    cmd_executar.add_argument("--senha", default="")
+    cmd_executar.add_argument("--cenarios", default=",".join(CENARIOS), help="Lista separada por vírgula")
+    cmd_executar.add_argument("--iteracoes", type=int, default=200)
+    cmd_executar.add_argument("--concorrencia", type=int, default=1)
+    cmd_executar.add_argument("--aquecimento", type=int, default=5)
+    cmd_executar.add_argument("--semente", type=int, default=42)
+    cmd_executar.add_argument("--saida", default=f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json")
+
+    cmd_comparar = comandos.add_parser("comparar", help="Compara dois JSONs de resultado")
+    cmd_comparar.add_argument("base")
+    cmd_comparar.add_argument("atual")
+    cmd_comparar.add_argument("--tolerancia", type=float, default=10.0, help="Regressão máxima de p95 (%%)")
+
+    args = parser.parse_args(argv)
+
+    if args.comando == "comparar":
+        with open(args.base) as arquivo:
+            base = json.load(arquivo)
+        with open(args.atual) as arquivo:
+            atual = json.load(arquivo)
+        linhas = comparar(base, atual, args.tolerancia)
+        for linha in linhas:
+            marca = "❌" if linha["regressao"] else "✅"
+            print(
+                f"{marca} {linha['cenario']:<16} p50 {linha['p50']}%  p95 {linha['p95']}%  "
+                f"p99 {linha['p99']}%  vazão {linha['vazao']}%"
+            )
+        return 1 if any(linha["regressao"] for linha in linhas) else 0
+
+    cenarios = [nome.strip() for nome in args.cenarios.split(",") if nome.strip()]
+    desconhecidos = set(cenarios) - set(CENARIOS)
+    if desconhecidos:
+        parser.error(f"Cenários desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+    if not args.url and args.database_url != settings.DATABASE_URL:
+        parser.error("Em processo a aplicação usa DATABASE_URL do ambiente; exporte DATABASE_URL em vez de --database-url")
+
+    engine = create_engine(args.database_url)
+    with _cliente_http(args) as cliente:
+        relatorio = executar(
+            engine, cliente, _cabecalhos(cliente, args), cenarios, args.iteracoes,
+            args.concorrencia, args.aquecimento, args.semente, args.url or "processo"
+        )
+
+    with open(args.saida, "w") as arquivo:
+        json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+    print(f"✅ Resultado gravado em {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
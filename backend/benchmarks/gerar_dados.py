@@ -0,0 +1,502 @@
+"""
+Gerador de massa de dados para benchmark
+
+Insere volumes realistas direto nas tabelas (insert em lote do SQLAlchemy
+Core, ids atribuídos aqui para dispensar ida e volta ao banco) e depois
+consolida o estoque por local a partir dos movimentos gerados.
+
+Uso:
+    python -m benchmarks.gerar_dados --materiais 1000000 --movimentos 10000000 \\
+        --titulos 5000000 --notas 1000000
+
+A geração é determinística para a mesma --semente e pode ser repetida
+sobre um banco já populado (os ids continuam a partir do maior existente).
+"""
+import argparse
+import random
+import time
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import case, create_engine, func, insert, select, text, update
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.config import settings
+from app.db import Base
+from app import models  # noqa: F401 - registra as tabelas de autenticação
+from app.models_modules import (
+    ContaBancaria, ContaPagar, ContaReceber, Cliente, EstoquePorLocal,
+    FormaPagamento, Fornecedor, ItemNotaFiscal, LocalEstoque, Material,
+    MovimentacaoBancaria, MovimentoEstoque, NotaFiscal, StatusNotaFiscal,
+    StatusPagamento, TipoMovimentacaoBancaria, TipoMovimento, TipoNotaFiscal
+)
+
+
+LOTE_PADRAO = 10_000
+
+UFS = ["SP", "RJ", "MG", "PR", "RS", "SC", "BA", "GO", "PE", "CE"]
+NCMS = ["84713012", "85176299", "39269090", "73181500", "48201000", "94036000"]
+UNIDADES = ["UN", "CX", "KG", "M", "L", "PC"]
+
+
+@dataclass
+class Volumes:
+    """Quantidade de linhas a gerar por entidade"""
+    clientes: int = 10_000
+    fornecedores: int = 2_000
+    locais: int = 5
+    contas_bancarias: int = 5
+    materiais: int = 1_000_000
+    movimentos: int = 10_000_000
+    titulos: int = 5_000_000
+    notas: int = 1_000_000
+    movimentacoes_bancarias: int = 1_000_000
+
+
+@dataclass
+class Contexto:
+    """Faixas de ids das entidades de cadastro, usadas pelas transações"""
+    clientes: range
+    fornecedores: range
+    locais: range
+    contas_bancarias: range
+    materiais: range
+
+
+def _lotes(linhas: Iterable[dict], tamanho: int) -> Iterator[List[dict]]:
+    iterador = iter(linhas)
+    while True:
+        lote = list(islice(iterador, tamanho))
+        if not lote:
+            return
+        yield lote
+
+
+def _proximo_id(conexao: Connection, modelo) -> int:
+    return (conexao.execute(select(func.max(modelo.id))).scalar() or 0) + 1
+
+
+def _inserir(conexao: Connection, modelo, linhas: Iterable[dict], lote: int, total: int) -> None:
+    """Insere em lotes com commit a cada lote, informando o progresso"""
+    tabela = modelo.__table__
+    inicio = time.perf_counter()
+    inseridas = 0
+    for parte in _lotes(linhas, lote):
+        conexao.execute(insert(tabela), parte)
+        conexao.commit()
+        inseridas += len(parte)
+        decorrido = time.perf_counter() - inicio
+        print(
+            f"\r  {tabela.name}: {inseridas:,}/{total:,} "
+            f"({inseridas / decorrido if decorrido else 0:,.0f} linhas/s)",
+            end="", flush=True
+        )
+    if total:
+        print()
+
+
+def _data(rng: random.Random, agora: datetime, dias: int) -> datetime:
+    return agora - timedelta(seconds=rng.randrange(dias * 86400))
+
+
+# =============================================================================
+# CADASTROS
+# =============================================================================
+
+def _clientes(rng: random.Random, inicio: int, quantidade: int, agora: datetime) -> Iterator[dict]:
+    for id_ in range(inicio, inicio + quantidade):
+        pj = rng.random() < 0.4
+        yield {
+            "id": id_,
+            "codigo": f"BCLI-{id_:08d}",
+            "nome": f"Cliente Benchmark {id_}",
+            "razao_social": f"Cliente Benchmark {id_} Ltda" if pj else None,
+            "cpf_cnpj": f"{id_:014d}" if pj else f"{id_:011d}",
+            "tipo_pessoa": "PJ" if pj else "PF",
+            "estado": rng.choice(UFS),
+            "tipo_cliente": rng.choice(["varejo", "atacado", "distribuidor"]),
+            "limite_credito": round(rng.uniform(1_000, 100_000), 2),
+            "dias_vencimento": rng.choice([0, 15, 28, 30, 45, 60]),
+            "ativo": 1,
+            "created_at": agora,
+            "updated_at": agora,
+        }
+
+
+def _fornecedores(rng: random.Random, inicio: int, quantidade: int, agora: datetime) -> Iterator[dict]:
+    for id_ in range(inicio, inicio + quantidade):
+        yield {
+            "id": id_,
+            "codigo": f"BFOR-{id_:08d}",
+            "nome": f"Fornecedor Benchmark {id_}",
+            "razao_social": f"Fornecedor Benchmark {id_} S.A.",
+            "cnpj": f"9{id_:013d}",
+            "estado": rng.choice(UFS),
+            "ativo": 1,
+            "created_at": agora,
+        }
+
+
+def _locais(inicio: int, quantidade: int, com_padrao: bool, agora: datetime) -> Iterator[dict]:
+    for indice, id_ in enumerate(range(inicio, inicio + quantidade)):
+        yield {
+            "id": id_,
+            "codigo": f"BLOC-{id_:04d}",
+            "nome": f"Depósito Benchmark {id_}",
+            "tipo": "deposito",
+            "ativo": 1,
+            "padrao": 1 if com_padrao and indice == 0 else 0,
+            "created_at": agora,
+        }
+
+
+def _contas_bancarias(inicio: int, quantidade: int, agora: datetime) -> Iterator[dict]:
+    for id_ in range(inicio, inicio + quantidade):
+        yield {
+            "id": id_,
+            "nome": f"Conta Benchmark {id_}",
+            "banco": "001",
+            "agencia": f"{id_:04d}",
+            "conta": f"{id_:08d}-0",
+            "saldo_inicial": 100_000.0,
+            "saldo_atual": 100_000.0,
+            "ativa": 1,
+            "created_at": agora,
+        }
+
+
+def _materiais(rng: random.Random, inicio: int, quantidade: int, agora: datetime) -> Iterator[dict]:
+    for id_ in range(inicio, inicio + quantidade):
+        custo = round(rng.uniform(1, 2_000), 2)
+        yield {
+            "id": id_,
+            "codigo": f"BMAT-{id_:08d}",
+            "nome": f"Material Benchmark {id_}",
+            "unidade_medida": rng.choice(UNIDADES),
+            "estoque_minimo": float(rng.randint(0, 50)),
+            "estoque_maximo": float(rng.randint(100, 1_000)),
+            "estoque_atual": 0.0,
+            "preco_medio": custo,
+            "preco_venda": round(custo * rng.uniform(1.2, 2.0), 2),
+            "ativo": 1,
+            "created_at": agora,
+            "updated_at": agora,
+        }
+
+
+# =============================================================================
+# TRANSAÇÕES
+# =============================================================================
+
+def _movimentos(
+    rng: random.Random, inicio: int, quantidade: int, ctx: Contexto, agora: datetime, dias: int
+) -> Iterator[dict]:
+    for id_ in range(inicio, inicio + quantidade):
+        local = rng.choice(ctx.locais)
+        # Entradas maiores e mais frequentes que saídas mantêm os saldos positivos
+        entrada = rng.random() < 0.7
+        yield {
+            "id": id_,
+            "material_id": rng.choice(ctx.materiais),
+            "tipo_movimento": TipoMovimento.ENTRADA if entrada else TipoMovimento.SAIDA,
+            "quantidade": float(rng.randint(10, 500) if entrada else rng.randint(1, 50)),
+            "data_movimento": _data(rng, agora, dias),
+            "documento": f"BMOV-{id_}",
+            "local_origem_id": None if entrada else local,
+            "local_destino_id": local if entrada else None,
+        }
+
+
+def _contas_pagar(
+    rng: random.Random, inicio: int, quantidade: int, ctx: Contexto, agora: datetime, dias: int
+) -> Iterator[dict]:
+    for id_ in range(inicio, inicio + quantidade):
+        emissao = _data(rng, agora, dias)
+        vencimento = emissao + timedelta(days=rng.choice([0, 15, 30, 45, 60, 90]))
+        valor = round(rng.uniform(50, 50_000), 2)
+        pago = vencimento < agora and rng.random() < 0.8
+        pagamento = vencimento + timedelta(days=rng.randint(-5, 10)) if pago else None
+        yield {
+            "id": id_,
+            "descricao": f"Título a pagar {id_}",
+            "fornecedor_id": rng.choice(ctx.fornecedores),
+            "data_emissao": emissao,
+            "data_vencimento": vencimento,
+            "data_pagamento": pagamento,
+            "valor_original": valor,
+            "valor_pago": valor if pago else 0.0,
+            "juros": 0.0,
+            "desconto": 0.0,
+            "quantidade_parcelas": 1,
+            "forma_pagamento": rng.choice(list(FormaPagamento)) if pago else None,
+            "numero_documento": f"BCP-{id_}",
+            "status": StatusPagamento.PAGO if pago else StatusPagamento.PENDENTE,
+            "created_at": emissao,
+            "updated_at": pagamento or emissao,
+        }
+
+
+def _contas_receber(
+    rng: random.Random, inicio: int, quantidade: int, ctx: Contexto, agora: datetime, dias: int
+) -> Iterator[dict]:
+    for id_ in range(inicio, inicio + quantidade):
+        emissao = _data(rng, agora, dias)
+        vencimento = emissao + timedelta(days=rng.choice([0, 15, 28, 30, 45, 60]))
+        valor = round(rng.uniform(50, 30_000), 2)
+        recebido = vencimento < agora and rng.random() < 0.75
+        recebimento = vencimento + timedelta(days=rng.randint(-3, 20)) if recebido else None
+        yield {
+            "id": id_,
+            "descricao": f"Título a receber {id_}",
+            "cliente_id": rng.choice(ctx.clientes),
+            "data_emissao": emissao,
+            "data_vencimento": vencimento,
+            "data_recebimento": recebimento,
+            "valor_original": valor,
+            "valor_recebido": valor if recebido else 0.0,
+            "juros": 0.0,
+            "desconto": 0.0,
+            "quantidade_parcelas": 1,
+            "forma_pagamento": rng.choice(list(FormaPagamento)) if recebido else None,
+            "numero_documento": f"BCR-{id_}",
+            "status": StatusPagamento.PAGO if recebido else StatusPagamento.PENDENTE,
+            "created_at": emissao,
+            "updated_at": recebimento or emissao,
+        }
+
+
+def _notas(
+    rng: random.Random, inicio: int, quantidade: int, ctx: Contexto, agora: datetime, dias: int,
+    itens: List[dict], proximo_item: List[int]
+) -> Iterator[dict]:
+    """Gera as NFs e acumula os itens de cada uma em `itens`"""
+    for id_ in range(inicio, inicio + quantidade):
+        emissao = _data(rng, agora, dias)
+        valor_produtos = 0.0
+        valor_icms = 0.0
+        for _ in range(rng.randint(1, 4)):
+            quantidade_item = float(rng.randint(1, 20))
+            unitario = round(rng.uniform(5, 1_500), 2)
+            total = round(quantidade_item * unitario, 2)
+            icms = round(total * 0.18, 2)
+            valor_produtos += total
+            valor_icms += icms
+            itens.append({
+                "id": proximo_item[0],
+                "nota_fiscal_id": id_,
+                "material_id": rng.choice(ctx.materiais),
+                "descricao": "Item benchmark",
+                "ncm": rng.choice(NCMS),
+                "unidade": "UN",
+                "quantidade": quantidade_item,
+                "valor_unitario": unitario,
+                "aliquota_icms": 18.0,
+                "valor_icms": icms,
+                "valor_total": total,
+                "cfop": "5102",
+            })
+            proximo_item[0] += 1
+
+        cancelada = rng.random() < 0.02
+        yield {
+            "id": id_,
+            "numero": f"B{id_:09d}",
+            "serie": "1",
+            "tipo": TipoNotaFiscal.SAIDA,
+            "data_emissao": emissao,
+            "data_saida": emissao,
+            "cliente_id": rng.choice(ctx.clientes),
+            "valor_produtos": round(valor_produtos, 2),
+            "valor_icms": round(valor_icms, 2),
+            "valor_total": round(valor_produtos, 2),
+            "natureza_operacao": "Venda de mercadoria",
+            "cfop": "5102",
+            "status": StatusNotaFiscal.CANCELADA if cancelada else StatusNotaFiscal.AUTORIZADA,
+            "created_at": emissao,
+            "updated_at": emissao,
+        }
+
+
+def _movimentacoes_bancarias(
+    rng: random.Random, inicio: int, quantidade: int, ctx: Contexto, agora: datetime, dias: int
+) -> Iterator[dict]:
+    tipos_entrada = [TipoMovimentacaoBancaria.DEPOSITO, TipoMovimentacaoBancaria.JUROS]
+    tipos_saida = [TipoMovimentacaoBancaria.SAQUE, TipoMovimentacaoBancaria.TARIFA, TipoMovimentacaoBancaria.OUTROS]
+    for id_ in range(inicio, inicio + quantidade):
+        data = _data(rng, agora, dias)
+        entrada = rng.random() < 0.55
+        yield {
+            "id": id_,
+            "conta_bancaria_id": rng.choice(ctx.contas_bancarias),
+            "tipo": rng.choice(tipos_entrada if entrada else tipos_saida),
+            "natureza": "ENTRADA" if entrada else "SAIDA",
+            "data_movimentacao": data,
+            "data_competencia": data.date(),
+            "valor": round(rng.uniform(10, 20_000), 2),
+            "descricao": f"Movimentação benchmark {id_}",
+            "conciliado": rng.random() < 0.6,
+            "created_at": data,
+            "updated_at": data,
+        }
+
+
+def _consolidar_estoque(conexao: Connection, ctx: Contexto) -> None:
+    """Recalcula estoque_por_local e materiais.estoque_atual a partir dos movimentos gerados"""
+    print("  consolidando estoque por local...")
+    materiais = ctx.materiais
+    local = func.coalesce(MovimentoEstoque.local_destino_id, MovimentoEstoque.local_origem_id)
+    saldo = func.sum(case(
+        (MovimentoEstoque.tipo_movimento == TipoMovimento.ENTRADA, MovimentoEstoque.quantidade),
+        else_=-MovimentoEstoque.quantidade
+    ))
+    faixa = MovimentoEstoque.material_id.between(materiais.start, materiais.stop - 1)
+
+    conexao.execute(EstoquePorLocal.__table__.delete().where(
+        EstoquePorLocal.material_id.between(materiais.start, materiais.stop - 1)
+    ))
+    conexao.execute(insert(EstoquePorLocal.__table__).from_select(
+        ["material_id", "local_id", "quantidade", "updated_at"],
+        select(MovimentoEstoque.material_id, local, saldo, func.max(MovimentoEstoque.data_movimento))
+        .where(faixa)
+        .group_by(MovimentoEstoque.material_id, local)
+    ))
+    # Saldos que ficaram negativos pelo sorteio são zerados (a aplicação não permite)
+    conexao.execute(update(EstoquePorLocal).where(EstoquePorLocal.quantidade < 0).values(quantidade=0.0))
+    conexao.execute(update(Material).where(
+        Material.id.between(materiais.start, materiais.stop - 1)
+    ).values(estoque_atual=func.coalesce(
+        select(func.sum(EstoquePorLocal.quantidade))
+        .where(EstoquePorLocal.material_id == Material.id)
+        .scalar_subquery(),
+        0.0
+    )))
+    conexao.commit()
+
+
+def gerar(
+    engine: Engine,
+    volumes: Volumes,
+    semente: int = 42,
+    lote: int = LOTE_PADRAO,
+    dias: int = 730
+) -> Dict[str, int]:
+    """
+    Popula o banco com `volumes`
+
+    Args:
+        dias: janela (para trás a partir de agora) das datas geradas
+
+    Returns:
+        Linhas inseridas por tabela
+    """
+    vazios = [campo for campo in ("clientes", "fornecedores", "locais", "contas_bancarias", "materiais")
+              if not getattr(volumes, campo)]
+    if vazios and (volumes.movimentos or volumes.titulos or volumes.notas or volumes.movimentacoes_bancarias):
+        raise ValueError(f"Transações exigem cadastros: informe {', '.join(vazios)}")
+
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(semente)
+    agora = datetime.utcnow().replace(microsecond=0)
+    inseridas: Dict[str, int] = {}
+
+    with engine.connect() as conexao:
+        if engine.dialect.name == "sqlite":
+            conexao.execute(text("PRAGMA synchronous = OFF"))
+            conexao.execute(text("PRAGMA journal_mode = MEMORY"))
+
+        def faixa(modelo, quantidade: int) -> range:
+            inicio = _proximo_id(conexao, modelo)
+            return range(inicio, inicio + quantidade)
+
+        tem_padrao = conexao.execute(
+            select(LocalEstoque.id).where(LocalEstoque.padrao == 1, LocalEstoque.ativo == 1).limit(1)
+        ).first() is not None
+
+        ctx = Contexto(
+            clientes=faixa(Cliente, volumes.clientes),
+            fornecedores=faixa(Fornecedor, volumes.fornecedores),
+            locais=faixa(LocalEstoque, volumes.locais),
+            contas_bancarias=faixa(ContaBancaria, volumes.contas_bancarias),
+            materiais=faixa(Material, volumes.materiais),
+        )
+        for nome, modelo, linhas in (
+            ("clientes", Cliente, _clientes(rng, ctx.clientes.start, volumes.clientes, agora)),
+            ("fornecedores", Fornecedor, _fornecedores(rng, ctx.fornecedores.start, volumes.fornecedores, agora)),
+            ("locais", LocalEstoque, _locais(ctx.locais.start, volumes.locais, not tem_padrao, agora)),
+            ("contas_bancarias", ContaBancaria, _contas_bancarias(ctx.contas_bancarias.start, volumes.contas_bancarias, agora)),
+            ("materiais", Material, _materiais(rng, ctx.materiais.start, volumes.materiais, agora)),
+        ):
+            _inserir(conexao, modelo, linhas, lote, getattr(volumes, nome))
+            inseridas[nome] = getattr(volumes, nome)
+
+        _inserir(conexao, MovimentoEstoque, _movimentos(
+            rng, _proximo_id(conexao, MovimentoEstoque), volumes.movimentos, ctx, agora, dias
+        ), lote, volumes.movimentos)
+        inseridas["movimentos_estoque"] = volumes.movimentos
+        if volumes.materiais:
+            _consolidar_estoque(conexao, ctx)
+
+        a_pagar = volumes.titulos // 2
+        a_receber = volumes.titulos - a_pagar
+        _inserir(conexao, ContaPagar, _contas_pagar(
+            rng, _proximo_id(conexao, ContaPagar), a_pagar, ctx, agora, dias
+        ), lote, a_pagar)
+        _inserir(conexao, ContaReceber, _contas_receber(
+            rng, _proximo_id(conexao, ContaReceber), a_receber, ctx, agora, dias
+        ), lote, a_receber)
+        inseridas["contas_pagar"] = a_pagar
+        inseridas["contas_receber"] = a_receber
+
+        # Itens das NFs são gravados junto com cada lote de notas
+        itens: List[dict] = []
+        proximo_item = [_proximo_id(conexao, ItemNotaFiscal)]
+        inicio_itens = proximo_item[0]
+        notas = _notas(rng, _proximo_id(conexao, NotaFiscal), volumes.notas, ctx, agora, dias, itens, proximo_item)
+        inicio = time.perf_counter()
+        gravadas = 0
+        for parte in _lotes(notas, lote):
+            conexao.execute(insert(NotaFiscal.__table__), parte)
+            conexao.execute(insert(ItemNotaFiscal.__table__), itens)
+            conexao.commit()
+            itens.clear()
+            gravadas += len(parte)
+            print(f"\r  notas_fiscais: {gravadas:,}/{volumes.notas:,} "
+                  f"({gravadas / (time.perf_counter() - inicio):,.0f} notas/s)", end="", flush=True)
+        if volumes.notas:
+            print()
+        inseridas["notas_fiscais"] = volumes.notas
+        inseridas["itens_nota_fiscal"] = proximo_item[0] - inicio_itens
+
+        _inserir(conexao, MovimentacaoBancaria, _movimentacoes_bancarias(
+            rng, _proximo_id(conexao, MovimentacaoBancaria), volumes.movimentacoes_bancarias, ctx, agora, dias
+        ), lote, volumes.movimentacoes_bancarias)
+        inseridas["movimentacoes_bancarias"] = volumes.movimentacoes_bancarias
+
+    return inseridas
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Gera massa de dados para benchmark do ERP")
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    padrao = Volumes()
+    for campo in fields(Volumes):
+        parser.add_argument(f"--{campo.name.replace('_', '-')}", type=int, default=getattr(padrao, campo.name))
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--lote", type=int, default=LOTE_PADRAO)
+    parser.add_argument("--dias", type=int, default=730, help="Janela de datas geradas")
+    args = parser.parse_args(argv)
+
+    volumes = Volumes(**{campo.name: getattr(args, campo.name) for campo in fields(Volumes)})
+    engine = create_engine(args.database_url)
+
+    inicio = time.perf_counter()
+    inseridas = gerar(engine, volumes, args.semente, args.lote, args.dias)
+    print(f"✅ {sum(inseridas.values()):,} linhas em {time.perf_counter() - inicio:,.1f}s")
+    for tabela, quantidade in inseridas.items():
+        print(f"   {tabela}: {quantidade:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark de serialização JSON
+
+Compara, sobre payloads no formato das listagens grandes, o caminho padrão
+do FastAPI para dicionários (jsonable_encoder + json), a RespostaJSON
+(orjson) e o dump_json do Pydantic usado nas rotas com response_model.
+Não usa banco: isola o custo de serialização.
+
+Uso:
+    python -m benchmarks.serializacao --linhas 5000 --repeticoes 20 --saida serializacao.json
+"""
+import argparse
+import json
+import random
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.models_modules import StatusNotaFiscal, TipoMovimentacaoBancaria, TipoNotaFiscal
+from app.respostas import orjson, serializar_json
+from app.schemas_modules import NotaFiscalRead
+
+
+def payload_extrato(linhas: int, rng: random.Random) -> Dict[str, Any]:
+    inicio = date(2026, 1, 1)
+    return {
+        "conta": {"id": 1, "nome": "Conta Benchmark", "banco": "001", "agencia": "0001", "conta": "12345-6"},
+        "periodo": {"inicio": inicio, "fim": inicio + timedelta(days=365)},
+        "saldo_inicial": 1000.0,
+        "movimentacoes": [
+            {
+                "id": i,
+                "data": inicio + timedelta(days=rng.randrange(365)),
+                "tipo": rng.choice(list(TipoMovimentacaoBancaria)).value,
+                "natureza": rng.choice(["ENTRADA", "SAIDA"]),
+                "descricao": f"Movimentação {i}",
+                "valor": round(rng.uniform(10, 20_000), 2),
+                "conciliado": rng.random() < 0.5
+            }
+            for i in range(linhas)
+        ]
+    }
+
+
+def payload_notas(linhas: int, rng: random.Random) -> List[Dict[str, Any]]:
+    agora = datetime(2026, 10, 1, 12, 0, 0)
+    notas = []
+    for i in range(linhas):
+        itens = [
+            {
+                "id": i * 10 + j, "nota_fiscal_id": i, "material_id": j + 1, "codigo_produto": f"MAT-{j}",
+                "descricao": "Item", "ncm": "84713012", "unidade": "UN", "quantidade": 2.0,
+                "valor_unitario": 10.5, "valor_desconto": 0.0, "aliquota_icms": 18.0, "aliquota_ipi": 0.0,
+                "aliquota_pis": 1.65, "aliquota_cofins": 7.6, "cfop": "5102", "valor_total": 21.0
+            }
+            for j in range(rng.randint(1, 4))
+        ]
+        notas.append({
+            "id": i, "numero": f"{i:09d}", "serie": "1", "tipo": TipoNotaFiscal.SAIDA,
+            "data_emissao": agora - timedelta(minutes=i), "cliente_id": rng.randint(1, 500),
+            "natureza_operacao": "Venda de mercadoria", "cfop": "5102",
+            "valor_produtos": 100.0, "valor_frete": 0.0, "valor_seguro": 0.0, "valor_desconto": 0.0,
+            "valor_outras_despesas": 0.0, "valor_icms": 18.0, "valor_ipi": 0.0, "valor_pis": 1.65,
+            "valor_cofins": 7.6, "valor_total": 100.0, "status": StatusNotaFiscal.AUTORIZADA,
+            "created_at": agora, "updated_at": agora, "itens": itens
+        })
+    return notas
+
+
+def _medir(funcao: Callable[[], bytes], repeticoes: int) -> Dict[str, float]:
+    funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        corpo = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    tempos.sort()
+    mediana = tempos[len(tempos) // 2]
+    return {
+        "mediana_ms": round(mediana * 1000, 3),
+        "melhor_ms": round(tempos[0] * 1000, 3),
+        "por_segundo": round(1 / mediana, 1) if mediana else 0.0,
+        "bytes": len(corpo)
+    }
+
+
+def executar(linhas: int = 5000, repeticoes: int = 20, semente: int = 42) -> Dict[str, Any]:
+    rng = random.Random(semente)
+    extrato = payload_extrato(linhas, rng)
+    notas_dict = payload_notas(linhas, rng)
+    adaptador = TypeAdapter(List[NotaFiscalRead])
+    notas = adaptador.validate_python(notas_dict)
+
+    casos = {
+        "extrato": {
+            "jsonable_encoder+json": lambda: json.dumps(jsonable_encoder(extrato)).encode("utf-8"),
+            "resposta_json": lambda: serializar_json(extrato),
+        },
+        "notas_fiscais": {
+            "jsonable_encoder+json": lambda: json.dumps(jsonable_encoder(notas)).encode("utf-8"),
+            "pydantic_dump_json": lambda: adaptador.dump_json(notas),
+            "resposta_json": lambda: serializar_json(adaptador.dump_python(notas)),
+        },
+    }
+    return {
+        "executado_em": datetime.utcnow().isoformat(),
+        "orjson": getattr(orjson, "__version__", None),
+        "parametros": {"linhas": linhas, "repeticoes": repeticoes},
+        "resultados": {
+            payload: {nome: _medir(funcao, repeticoes) for nome, funcao in caminhos.items()}
+            for payload, caminhos in casos.items()
+        }
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de serialização JSON")
+    parser.add_argument("--linhas", type=int, default=5000)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--saida", help="Grava o resultado em JSON")
+    args = parser.parse_args(argv)
+
+    relatorio = executar(args.linhas, args.repeticoes)
+    for payload, caminhos in relatorio["resultados"].items():
+        base = caminhos["jsonable_encoder+json"]["mediana_ms"]
+        for nome, resultado in caminhos.items():
+            print(
+                f"  {payload:<14} {nome:<22} {resultado['mediana_ms']:>9.2f}ms  "
+                f"{resultado['por_segundo']:>8.1f}/s  {base / resultado['mediana_ms']:>6.1f}x"
+            )
+
+    if args.saida:
+        with open(args.saida, "w") as arquivo:
+            json.dump(relatorio, arquivo, indent=2)
+        print(f"✅ Resultado gravado em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
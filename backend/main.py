@@ -1,17 +1,28 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import auth, compras, financeiro, materiais, vendas, cotacoes, locais, faturamento, dev_tools
+from app.routes import auth, compras, financeiro, materiais, vendas, cotacoes, locais, faturamento, dev_tools, jobs
 from app.db import init_db
 from app.core.config import settings
+from app.nfe import encerrar_pipeline
+from app.jobs import iniciar_executor, parar_executor
+from app.idempotencia import MiddlewareIdempotencia
+from app.metricas import MiddlewareMetricas, exportar_prometheus
+from app.perfilador import iniciar_vigia, parar_vigia
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     init_db()
+    iniciar_executor()
+    iniciar_vigia()
     yield
-    # Shutdown (se necessário adicionar cleanup no futuro)
+    # Shutdown
+    parar_vigia()
+    parar_executor()
+    encerrar_pipeline()
 
 
 app = FastAPI(
@@ -21,6 +32,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Idempotency-Key nos endpoints de escrita (dentro do CORS)
+app.add_middleware(MiddlewareIdempotencia)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -30,6 +44,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latência por rota e SQL por requisição (mais externo: mede tudo)
+app.add_middleware(MiddlewareMetricas)
+
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(compras.router, prefix="/compras", tags=["compras"])
 app.include_router(cotacoes.router, prefix="/cotacoes", tags=["cotacoes"])
@@ -38,6 +55,7 @@ app.include_router(materiais.router, prefix="/materiais", tags=["materiais"])
 app.include_router(locais.router, prefix="/locais", tags=["locais"])
 app.include_router(vendas.router, prefix="/vendas", tags=["vendas"])
 app.include_router(faturamento.router, prefix="/faturamento", tags=["faturamento"])
+app.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
 app.include_router(dev_tools.router, prefix="/dev", tags=["dev-tools"])
 
 
@@ -47,6 +65,12 @@ def root():
         "status": "ok",
         "service": "ERP Open Backend",
         "version": "1.0.0",
-        "modules": ["auth", "compras", "cotacoes", "financeiro", "materiais", "locais", "vendas", "faturamento", "dev"],
+        "modules": ["auth", "compras", "cotacoes", "financeiro", "materiais", "locais", "vendas", "faturamento", "jobs", "dev"],
         "docs": "/docs"
     }
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Métricas no formato texto do Prometheus"""
+    return PlainTextResponse(exportar_prometheus(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,27 @@
+-- Migration: Add aliquotas_tributarias table and PIS/COFINS per NF item
+-- Date: 2026-10-19
+
+-- Alíquotas por NCM, CFOP e UF de destino (chaves nulas valem como curinga,
+-- alíquota nula herda da regra mais genérica)
+CREATE TABLE IF NOT EXISTS aliquotas_tributarias (
+    id SERIAL PRIMARY KEY,
+    ncm VARCHAR,
+    cfop VARCHAR,
+    uf VARCHAR(2),
+    aliquota_icms FLOAT,
+    aliquota_ipi FLOAT,
+    aliquota_pis FLOAT,
+    aliquota_cofins FLOAT,
+    ativo INTEGER DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uk_aliquota_ncm_cfop_uf UNIQUE (ncm, cfop, uf)
+);
+
+-- PIS e COFINS por item da nota fiscal
+ALTER TABLE itens_nota_fiscal ADD COLUMN IF NOT EXISTS aliquota_pis FLOAT DEFAULT 0;
+ALTER TABLE itens_nota_fiscal ADD COLUMN IF NOT EXISTS valor_pis FLOAT DEFAULT 0;
+ALTER TABLE itens_nota_fiscal ADD COLUMN IF NOT EXISTS aliquota_cofins FLOAT DEFAULT 0;
+ALTER TABLE itens_nota_fiscal ADD COLUMN IF NOT EXISTS valor_cofins FLOAT DEFAULT 0;
+
+COMMENT ON TABLE aliquotas_tributarias IS 'Alíquotas de ICMS/IPI/PIS/COFINS por NCM, CFOP e UF; cada imposto vem da regra mais específica que o define';
@@ -0,0 +1,22 @@
+-- Migration: Add late charge columns swept by the overdue job
+-- Date: 2026-10-19
+
+-- contas_pagar: multa e juros de mora apurados (já somados em juros) e data da apuração
+ALTER TABLE contas_pagar ADD COLUMN IF NOT EXISTS multa_apurada FLOAT DEFAULT 0;
+ALTER TABLE contas_pagar ADD COLUMN IF NOT EXISTS juros_mora_apurados FLOAT DEFAULT 0;
+ALTER TABLE contas_pagar ADD COLUMN IF NOT EXISTS data_apuracao_encargos DATE;
+
+-- contas_receber: multa e juros de mora apurados (já somados em juros) e data da apuração
+ALTER TABLE contas_receber ADD COLUMN IF NOT EXISTS multa_apurada FLOAT DEFAULT 0;
+ALTER TABLE contas_receber ADD COLUMN IF NOT EXISTS juros_mora_apurados FLOAT DEFAULT 0;
+ALTER TABLE contas_receber ADD COLUMN IF NOT EXISTS data_apuracao_encargos DATE;
+
+-- parcelas_conta_pagar: multa e juros de mora apurados (já somados em juros) e data da apuração
+ALTER TABLE parcelas_conta_pagar ADD COLUMN IF NOT EXISTS multa_apurada FLOAT DEFAULT 0;
+ALTER TABLE parcelas_conta_pagar ADD COLUMN IF NOT EXISTS juros_mora_apurados FLOAT DEFAULT 0;
+ALTER TABLE parcelas_conta_pagar ADD COLUMN IF NOT EXISTS data_apuracao_encargos DATE;
+
+-- parcelas_conta_receber: multa e juros de mora apurados (já somados em juros) e data da apuração
+ALTER TABLE parcelas_conta_receber ADD COLUMN IF NOT EXISTS multa_apurada FLOAT DEFAULT 0;
+ALTER TABLE parcelas_conta_receber ADD COLUMN IF NOT EXISTS juros_mora_apurados FLOAT DEFAULT 0;
+ALTER TABLE parcelas_conta_receber ADD COLUMN IF NOT EXISTS data_apuracao_encargos DATE;
@@ -0,0 +1,17 @@
+-- Migration: Add estoque_reservado table and pedidos_venda.local_reserva_id
+-- Date: 2026-10-19
+
+-- Total reservado por (material, local) para pedidos de venda aprovados
+CREATE TABLE IF NOT EXISTS estoque_reservado (
+    id SERIAL PRIMARY KEY,
+    material_id INTEGER NOT NULL REFERENCES materiais(id),
+    local_id INTEGER NOT NULL REFERENCES locais_estoque(id),
+    quantidade FLOAT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uk_reserva_material_local UNIQUE (material_id, local_id)
+);
+
+-- Local em que o pedido reservou o estoque na aprovação
+ALTER TABLE pedidos_venda ADD COLUMN IF NOT EXISTS local_reserva_id INTEGER REFERENCES locais_estoque(id);
+
+COMMENT ON TABLE estoque_reservado IS 'Quantidade reservada por pedidos de venda aprovados e ainda não faturados';
@@ -0,0 +1,30 @@
+-- Migration: Add domain event outbox (eventos_dominio, consumos_evento)
+-- Date: 2026-10-19
+
+-- Eventos gravados na mesma transação da alteração de negócio
+CREATE TABLE IF NOT EXISTS eventos_dominio (
+    id SERIAL PRIMARY KEY,
+    tipo VARCHAR NOT NULL,  -- PedidoFaturado, NFEmitida, TituloBaixado, EstoqueMovimentado
+    agregado VARCHAR NOT NULL,
+    agregado_id INTEGER NOT NULL,
+    dados JSON,
+    usuario_id INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_eventos_dominio_tipo ON eventos_dominio (tipo);
+CREATE INDEX IF NOT EXISTS ix_eventos_dominio_agregado ON eventos_dominio (agregado, agregado_id);
+
+-- Um registro por consumidor e evento: garante a entrega idempotente
+CREATE TABLE IF NOT EXISTS consumos_evento (
+    id SERIAL PRIMARY KEY,
+    consumidor VARCHAR NOT NULL,
+    evento_id INTEGER NOT NULL REFERENCES eventos_dominio(id) ON DELETE CASCADE,
+    concluido INTEGER DEFAULT 0,
+    tentativas INTEGER DEFAULT 0,
+    erro TEXT,
+    processado_em TIMESTAMP,
+    CONSTRAINT uk_consumo_evento UNIQUE (consumidor, evento_id)
+);
+
+COMMENT ON TABLE eventos_dominio IS 'Outbox transacional de eventos de domínio consumidos de forma assíncrona';
@@ -0,0 +1,36 @@
+-- Migration: Add exposicao_credito table (customer credit exposure)
+-- Date: 2026-10-19
+
+-- Saldo em aberto de contas a receber e valor de pedidos aprovados por
+-- cliente, mantido de forma incremental pela aplicação e usado na aprovação
+-- de pedidos de venda. Para refazer: POST /vendas/clientes/credito/reconstruir
+CREATE TABLE IF NOT EXISTS exposicao_credito (
+    id SERIAL PRIMARY KEY,
+    cliente_id INTEGER NOT NULL REFERENCES clientes(id),
+    receber_aberto FLOAT NOT NULL DEFAULT 0,
+    pedidos_aprovados FLOAT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uk_exposicao_credito_cliente UNIQUE (cliente_id)
+);
+
+-- Carga inicial a partir dos títulos em aberto e pedidos aprovados
+INSERT INTO exposicao_credito (cliente_id, receber_aberto, pedidos_aprovados)
+SELECT c.id, COALESCE(t.aberto, 0), COALESCE(p.aprovados, 0)
+FROM clientes c
+LEFT JOIN (
+    SELECT cliente_id,
+           SUM(GREATEST(valor_original + COALESCE(juros, 0) - COALESCE(desconto, 0) - COALESCE(valor_recebido, 0), 0)) AS aberto
+    FROM contas_receber
+    WHERE status <> 'PAGO'
+    GROUP BY cliente_id
+) t ON t.cliente_id = c.id
+LEFT JOIN (
+    SELECT cliente_id, SUM(valor_total) AS aprovados
+    FROM pedidos_venda
+    WHERE status = 'aprovado'
+    GROUP BY cliente_id
+) p ON p.cliente_id = c.id
+WHERE t.cliente_id IS NOT NULL OR p.cliente_id IS NOT NULL
+ON CONFLICT (cliente_id) DO NOTHING;
+
+COMMENT ON TABLE exposicao_credito IS 'Exposição de crédito por cliente: contas a receber em aberto e pedidos de venda aprovados';
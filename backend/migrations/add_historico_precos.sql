@@ -0,0 +1,25 @@
+-- Migration: Add historico_precos table (purchase price history)
+-- Date: 2026-10-19
+
+-- Resumo incremental por (material, fornecedor), atualizado na aprovação de
+-- pedidos de compra e na gravação de respostas de cotação. Para carregar o
+-- histórico já existente: POST /compras/precos/reconstruir
+CREATE TABLE IF NOT EXISTS historico_precos (
+    id SERIAL PRIMARY KEY,
+    material_id INTEGER NOT NULL REFERENCES materiais(id),
+    fornecedor_id INTEGER NOT NULL REFERENCES fornecedores(id),
+    ultimo_preco FLOAT NOT NULL,
+    preco_minimo FLOAT NOT NULL,
+    preco_maximo FLOAT NOT NULL,
+    soma_precos FLOAT NOT NULL DEFAULT 0,
+    observacoes INTEGER NOT NULL DEFAULT 0,
+    media_movel FLOAT NOT NULL,
+    ultima_origem VARCHAR,
+    data_ultimo_preco TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uk_historico_preco_material_fornecedor UNIQUE (material_id, fornecedor_id)
+);
+
+CREATE INDEX IF NOT EXISTS ix_historico_precos_fornecedor ON historico_precos (fornecedor_id);
+
+COMMENT ON TABLE historico_precos IS 'Preços de compra por material e fornecedor: último, mínimo, máximo, média e média móvel';
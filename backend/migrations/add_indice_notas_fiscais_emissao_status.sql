@@ -0,0 +1,5 @@
+-- Migration: Add index for invoice statistics
+-- Date: 2026-10-19
+
+-- Estatísticas de NF por período (filtro por data_emissao, agregação por status)
+CREATE INDEX IF NOT EXISTS ix_notas_fiscais_emissao_status ON notas_fiscais(data_emissao, status);
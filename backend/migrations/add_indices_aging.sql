@@ -0,0 +1,8 @@
+-- Migration: Add installment indexes used by the aging report
+-- Date: 2026-10-19
+
+-- O aging separa títulos parcelados (conta pelas parcelas) dos demais com
+-- NOT EXISTS sobre as parcelas; sem estes índices cada título faria uma
+-- varredura na tabela de parcelas
+CREATE INDEX IF NOT EXISTS ix_parcelas_conta_receber_conta ON parcelas_conta_receber (conta_receber_id);
+CREATE INDEX IF NOT EXISTS ix_parcelas_conta_pagar_conta ON parcelas_conta_pagar (conta_pagar_id);
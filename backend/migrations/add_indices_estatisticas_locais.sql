@@ -0,0 +1,8 @@
+-- Migration: Add indexes for location statistics
+-- Date: 2026-10-19
+
+-- Agregações por local (contagens, quantidade e valor)
+CREATE INDEX IF NOT EXISTS ix_estoque_por_local_local_quantidade ON estoque_por_local(local_id, quantidade);
+
+-- Consumo (saídas) por local de origem dentro de uma janela de datas
+CREATE INDEX IF NOT EXISTS ix_movimentos_estoque_origem_tipo_data ON movimentos_estoque(local_origem_id, tipo_movimento, data_movimento);
@@ -0,0 +1,29 @@
+-- Migration: Add jobs table (background job queue)
+-- Date: 2026-10-19
+
+-- Operações longas executadas fora da requisição HTTP
+CREATE TABLE IF NOT EXISTS jobs (
+    id SERIAL PRIMARY KEY,
+    tipo VARCHAR NOT NULL,
+    status VARCHAR NOT NULL DEFAULT 'PENDENTE',  -- PENDENTE, EXECUTANDO, CONCLUIDO, FALHOU, CANCELADO
+    parametros JSON,
+    resultado JSON,
+    erro TEXT,
+    progresso FLOAT DEFAULT 0,
+    mensagem VARCHAR,
+    tentativas INTEGER DEFAULT 0,
+    max_tentativas INTEGER DEFAULT 3,
+    disponivel_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    chave_idempotencia VARCHAR UNIQUE,
+    worker VARCHAR,
+    usuario_id INTEGER,
+    iniciado_em TIMESTAMP,
+    concluido_em TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Varredura da fila: pendentes disponíveis em ordem
+CREATE INDEX IF NOT EXISTS ix_jobs_status_disponivel ON jobs (status, disponivel_em);
+
+COMMENT ON TABLE jobs IS 'Fila de jobs em segundo plano; a chave de idempotência devolve o job já criado';
@@ -0,0 +1,5 @@
+-- Migration: Add local_estoque_id to notas_fiscais
+-- Date: 2026-10-19
+
+-- Local de estoque usado na emissão (vazio = local padrão)
+ALTER TABLE notas_fiscais ADD COLUMN IF NOT EXISTS local_estoque_id INTEGER REFERENCES locais_estoque(id);
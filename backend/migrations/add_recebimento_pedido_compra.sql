@@ -0,0 +1,12 @@
+-- Migration: Add goods receipt columns to purchase orders
+-- Date: 2026-10-19
+
+-- Quantidade já recebida por item (recebimento parcial)
+ALTER TABLE itens_pedido_compra ADD COLUMN IF NOT EXISTS quantidade_recebida FLOAT DEFAULT 0;
+
+-- Data em que o pedido foi recebido por completo
+ALTER TABLE pedidos_compra ADD COLUMN IF NOT EXISTS data_recebimento TIMESTAMP;
+
+-- Pedidos já marcados como recebidos antes do fluxo de recebimento
+UPDATE itens_pedido_compra SET quantidade_recebida = quantidade
+WHERE pedido_id IN (SELECT id FROM pedidos_compra WHERE status = 'RECEBIDO');
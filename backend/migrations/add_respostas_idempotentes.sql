@@ -0,0 +1,22 @@
+-- Migration: Add respostas_idempotentes table (Idempotency-Key)
+-- Date: 2026-10-19
+
+-- Resposta gravada por usuário e chave; linhas expiradas são removidas
+-- pela manutenção do executor de jobs
+CREATE TABLE IF NOT EXISTS respostas_idempotentes (
+    id SERIAL PRIMARY KEY,
+    usuario VARCHAR NOT NULL,
+    chave VARCHAR NOT NULL,
+    impressao VARCHAR(64) NOT NULL,
+    status_code INTEGER,
+    tipo_conteudo VARCHAR,
+    corpo BYTEA,
+    concluida INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expira_em TIMESTAMP NOT NULL,
+    CONSTRAINT uk_resposta_idempotente UNIQUE (usuario, chave)
+);
+
+CREATE INDEX IF NOT EXISTS ix_respostas_idempotentes_expira_em ON respostas_idempotentes (expira_em);
+
+COMMENT ON TABLE respostas_idempotentes IS 'Respostas de endpoints de escrita por Idempotency-Key (corpo comprimido com zlib)';
@@ -0,0 +1,5 @@
+-- Migration: Add notas_fiscais.xml_nfe
+-- Date: 2026-10-19
+
+-- XML assinado da NF-e enviado à autorizadora
+ALTER TABLE notas_fiscais ADD COLUMN IF NOT EXISTS xml_nfe TEXT;
@@ -0,0 +1,13 @@
+-- Migration: Scope job idempotency keys by user and task
+-- Date: 2026-10-19
+
+-- A chave de idempotência deixa de ser global: a mesma chave enviada por
+-- outro usuário ou para outra tarefa cria um job novo
+ALTER TABLE jobs DROP CONSTRAINT IF EXISTS jobs_chave_idempotencia_key;
+
+-- Jobs de usuários: uma chave por (usuário, tarefa)
+CREATE UNIQUE INDEX IF NOT EXISTS uk_jobs_usuario_chave ON jobs (usuario_id, tipo, chave_idempotencia);
+
+-- Jobs do sistema (tarefas diárias): NULL não colide no índice acima
+CREATE UNIQUE INDEX IF NOT EXISTS uk_jobs_sistema_chave ON jobs (tipo, chave_idempotencia)
+    WHERE usuario_id IS NULL;
@@ -0,0 +1,25 @@
+-- Migration: Unique (material_id, local_id) on estoque_por_local
+-- Date: 2026-10-19
+
+-- Consolidar registros duplicados no de menor id
+UPDATE estoque_por_local
+SET quantidade = (
+    SELECT SUM(COALESCE(e2.quantidade, 0))
+    FROM estoque_por_local e2
+    WHERE e2.material_id = estoque_por_local.material_id
+      AND e2.local_id = estoque_por_local.local_id
+)
+WHERE id IN (
+    SELECT MIN(id) FROM estoque_por_local
+    GROUP BY material_id, local_id
+    HAVING COUNT(*) > 1
+);
+
+DELETE FROM estoque_por_local
+WHERE id NOT IN (
+    SELECT MIN(id) FROM estoque_por_local
+    GROUP BY material_id, local_id
+);
+
+-- Necessário para o upsert (INSERT ... ON CONFLICT (material_id, local_id))
+CREATE UNIQUE INDEX IF NOT EXISTS uk_material_local ON estoque_por_local(material_id, local_id);
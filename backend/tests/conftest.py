@@ -1,4 +1,7 @@
 """Pytest configuration and fixtures"""
+import re
+from typing import List, NamedTuple
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -117,3 +120,41 @@ def auth_headers(client, admin_user):
     assert response.status_code == 200
     token = response.json()["access_token"]
     return {"Authorization": f"Bearer {token}"}
+
+
+def consultas_sql(response) -> int:
+    """Queries executed by the request (Server-Timing sql;desc="N")"""
+    assert response.status_code == 200
+    return int(re.search(r'sql;dur=[\d.]+;desc="(\d+)"', response.headers["server-timing"]).group(1))
+
+
+class Cadastros(NamedTuple):
+    fornecedores: List[Fornecedor]
+    clientes: List[Cliente]
+    locais: List[LocalEstoque]
+    materiais: List[Material]
+
+
+@pytest.fixture
+def cadastros(db_session):
+    """Factory for committed master data; the first location created is the default one"""
+    def criar(fornecedores: int = 1, clientes: int = 0, locais: int = 0, materiais: int = 2) -> Cadastros:
+        criados = Cadastros(
+            [
+                Fornecedor(codigo=f"FOR-{i + 1:04d}", nome=f"Fornecedor {i}", cnpj=f"1122233300{i:04d}")
+                for i in range(fornecedores)
+            ],
+            [
+                Cliente(codigo=f"CLI-{i + 1:04d}", nome=f"Cliente {i}", cpf_cnpj=f"{52998224725 + i}")
+                for i in range(clientes)
+            ],
+            [
+                LocalEstoque(codigo=f"LOC-{i + 1:04d}", nome=f"Local {i}", ativo=1, padrao=int(i == 0))
+                for i in range(locais)
+            ],
+            [Material(codigo=f"MAT-{i}", nome=f"Material {i}", unidade_medida="UN") for i in range(materiais)]
+        )
+        db_session.add_all([registro for grupo in criados for registro in grupo])
+        db_session.commit()
+        return criados
+    return criar
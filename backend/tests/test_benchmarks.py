@@ -0,0 +1,53 @@
+"""Tests for the benchmark data generator and scenario runner"""
+from app.models_modules import EstoquePorLocal, Material, MovimentoEstoque, NotaFiscal
+from benchmarks.cenarios import comparar, executar, percentil
+from benchmarks.gerar_dados import Volumes, gerar
+
+
+VOLUMES_TESTE = Volumes(
+    clientes=20, fornecedores=5, locais=2, contas_bancarias=2, materiais=50,
+    movimentos=2000, titulos=200, notas=50, movimentacoes_bancarias=200
+)
+
+
+def test_gerar_dados_consolida_estoque(db_session):
+    engine = db_session.get_bind()
+    inseridas = gerar(engine, VOLUMES_TESTE, lote=500)
+
+    assert db_session.query(MovimentoEstoque).count() == 2000
+    assert db_session.query(NotaFiscal).count() == 50
+    assert inseridas["itens_nota_fiscal"] >= 50
+
+    # Saldo do material = soma dos saldos por local, nunca negativo
+    material = db_session.query(Material).first()
+    saldos = db_session.query(EstoquePorLocal).filter(EstoquePorLocal.material_id == material.id).all()
+    assert all(s.quantidade >= 0 for s in saldos)
+    assert material.estoque_atual == sum(s.quantidade for s in saldos)
+
+
+def test_executar_cenarios_gera_percentis(client, auth_headers, db_session):
+    engine = db_session.get_bind()
+    gerar(engine, VOLUMES_TESTE, lote=500)
+
+    relatorio = executar(
+        engine, client, auth_headers, ["pedido_venda", "extrato", "dre"],
+        iteracoes=5, aquecimento=1
+    )
+
+    assert relatorio["volumes"]["materiais"] == 50
+    for nome in ("pedido_venda", "extrato", "dre"):
+        resultado = relatorio["cenarios"][nome]
+        assert resultado["requisicoes"] == 5
+        assert resultado["erros"] == 0
+        latencia = resultado["latencia_ms"]
+        assert latencia["p50"] <= latencia["p95"] <= latencia["p99"] <= latencia["max"]
+
+    # Mesmo relatório comparado consigo mesmo não acusa regressão
+    assert not any(linha["regressao"] for linha in comparar(relatorio, relatorio))
+
+
+def test_percentil_posicao_mais_proxima():
+    valores = [float(v) for v in range(1, 101)]
+    assert percentil(valores, 50) == 50.0
+    assert percentil(valores, 99) == 99.0
+    assert percentil([], 95) == 0.0
@@ -0,0 +1,74 @@
+"""Query count regression tests for list endpoints with nested read models"""
+import pytest
+from app.models_modules import (
+    Cotacao, ItemCotacao, ItemNotaFiscal, ItemPedidoCompra, ItemPedidoVenda,
+    ItemRespostaFornecedor, NotaFiscal, PedidoCompra, PedidoVenda, RespostaFornecedor
+)
+from tests.conftest import consultas_sql
+
+
+def _criar_pedidos_venda(db_session, cliente, materiais, quantidade):
+    for i in range(quantidade):
+        db_session.add(PedidoVenda(
+            codigo=f"PV-{db_session.query(PedidoVenda).count() + 1}", cliente_id=cliente.id,
+            itens=[ItemPedidoVenda(material_id=m.id, quantidade=1, preco_unitario=10, subtotal=10) for m in materiais]
+        ))
+        db_session.commit()
+
+
+def _criar_pedidos_compra(db_session, fornecedor, materiais, quantidade):
+    for i in range(quantidade):
+        db_session.add(PedidoCompra(
+            numero=f"PC-{db_session.query(PedidoCompra).count() + 1}", fornecedor_id=fornecedor.id,
+            itens=[ItemPedidoCompra(material_id=m.id, descricao=m.nome, quantidade=1, preco_unitario=5, preco_total=5)
+                   for m in materiais]
+        ))
+        db_session.commit()
+
+
+def _criar_cotacoes(db_session, fornecedor, materiais, quantidade):
+    for i in range(quantidade):
+        itens = [ItemCotacao(material_id=m.id, descricao=m.nome, quantidade=1) for m in materiais]
+        cotacao = Cotacao(numero=f"COT-{db_session.query(Cotacao).count() + 1}", descricao="Cotação", itens=itens)
+        cotacao.respostas = [RespostaFornecedor(
+            fornecedor_id=fornecedor.id,
+            itens_resposta=[ItemRespostaFornecedor(item_cotacao=item, preco_unitario=3, preco_total=3) for item in itens]
+        )]
+        db_session.add(cotacao)
+        db_session.commit()
+
+
+def _criar_notas(db_session, cliente, materiais, quantidade):
+    for i in range(quantidade):
+        db_session.add(NotaFiscal(
+            numero=f"{db_session.query(NotaFiscal).count() + 1:09d}", cliente_id=cliente.id,
+            itens=[ItemNotaFiscal(material_id=m.id, descricao=m.nome, unidade="UN", quantidade=1, valor_unitario=7, valor_total=7)
+                   for m in materiais]
+        ))
+        db_session.commit()
+
+
+@pytest.mark.parametrize("url, criar, consultas_esperadas", [
+    ("/vendas/pedidos", lambda s, f, c, m, n: _criar_pedidos_venda(s, c, m, n), 2),
+    ("/compras/pedidos", lambda s, f, c, m, n: _criar_pedidos_compra(s, f, m, n), 2),
+    ("/cotacoes/cotacoes", lambda s, f, c, m, n: _criar_cotacoes(s, f, m, n), 4),
+    ("/faturamento/notas-fiscais", lambda s, f, c, m, n: _criar_notas(s, c, m, n), 2),
+])
+def test_listagem_com_quantidade_fixa_de_consultas(
+    client, auth_headers, db_session, cadastros, url, criar, consultas_esperadas
+):
+    """Test a page costs the same number of queries regardless of how many parents it has"""
+    (fornecedor,), (cliente,), _, materiais = cadastros(clientes=1)
+
+    criar(db_session, fornecedor, cliente, materiais, 2)
+    db_session.expire_all()
+    response = client.get(url, headers=auth_headers)
+    poucos = consultas_sql(response)
+    assert len(response.json()) == 2
+    assert all(len(item["itens"]) == 2 for item in response.json())
+
+    criar(db_session, fornecedor, cliente, materiais, 8)
+    db_session.expire_all()
+    response = client.get(url, headers=auth_headers)
+    assert len(response.json()) == 10
+    assert consultas_sql(response) == poucos == consultas_esperadas
@@ -0,0 +1,159 @@
+"""Tests for batch supplier responses and quotation conversion"""
+import pytest
+from app.models_modules import Cotacao, ItemCotacao, ItemPedidoCompra, ItemRespostaFornecedor
+from tests.conftest import consultas_sql
+
+
+@pytest.fixture
+def cotacao(db_session, cadastros):
+    fornecedores, _, _, materiais = cadastros(fornecedores=4, materiais=20)
+    cotacao = Cotacao(
+        numero="COT-0001", descricao="Cotação",
+        itens=[ItemCotacao(material_id=m.id, descricao=m.nome, quantidade=i + 1) for i, m in enumerate(materiais)]
+    )
+    db_session.add(cotacao)
+    db_session.commit()
+    return cotacao, fornecedores
+
+
+def _respostas(cotacao, fornecedores, itens=None):
+    return [
+        {
+            "fornecedor_id": fornecedor.id,
+            "prazo_entrega_dias": 10,
+            "itens": [{"item_cotacao_id": item.id, "preco_unitario": 2.0 + n} for item in cotacao.itens[:itens]]
+        }
+        for n, fornecedor in enumerate(fornecedores)
+    ]
+
+
+def test_respostas_em_lote_calcula_totais(client, auth_headers, db_session, cotacao):
+    cotacao, fornecedores = cotacao
+    response = client.post(
+        f"/cotacoes/cotacoes/{cotacao.id}/respostas/lote",
+        json=_respostas(cotacao, fornecedores), headers=auth_headers
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [r["fornecedor_id"] for r in data] == [f.id for f in fornecedores]
+    soma_quantidades = sum(range(1, 21))
+    assert [r["valor_total"] for r in data] == [(2.0 + n) * soma_quantidades for n in range(4)]
+    assert all(len(r["itens_resposta"]) == 20 for r in data)
+    assert data[0]["itens_resposta"][4]["preco_total"] == 2.0 * 5
+    assert db_session.query(ItemRespostaFornecedor).count() == 80
+
+    db_session.refresh(cotacao)
+    assert cotacao.status.value == "respondida"
+
+
+def test_respostas_em_lote_com_quantidade_fixa_de_consultas(client, auth_headers, db_session, cotacao):
+    cotacao, fornecedores = cotacao
+    url = f"/cotacoes/cotacoes/{cotacao.id}/respostas/lote"
+    client.post(url, json=_respostas(cotacao, fornecedores, itens=1), headers=auth_headers)  # aquecimento
+    poucos_itens = client.post(url, json=_respostas(cotacao, fornecedores, itens=2), headers=auth_headers)
+    muitos_itens = client.post(url, json=_respostas(cotacao, fornecedores), headers=auth_headers)
+    assert poucos_itens.status_code == muitos_itens.status_code == 200
+    assert consultas_sql(poucos_itens) == consultas_sql(muitos_itens)
+
+
+def test_respostas_em_lote_sao_tudo_ou_nada(client, auth_headers, db_session, cotacao):
+    cotacao, fornecedores = cotacao
+    respostas = _respostas(cotacao, fornecedores)
+    respostas[-1]["itens"].append({"item_cotacao_id": 99999, "preco_unitario": 1.0})
+
+    response = client.post(f"/cotacoes/cotacoes/{cotacao.id}/respostas/lote", json=respostas, headers=auth_headers)
+    assert response.status_code == 400
+    assert "99999" in response.json()["detail"]
+
+    respostas[-1]["itens"].pop()
+    respostas[-1]["fornecedor_id"] = 99999
+    response = client.post(f"/cotacoes/cotacoes/{cotacao.id}/respostas/lote", json=respostas, headers=auth_headers)
+    assert response.status_code == 404
+    assert db_session.query(ItemRespostaFornecedor).count() == 0
+
+
+def test_converter_cotacao_usa_itens_da_resposta_selecionada(client, auth_headers, db_session, cotacao):
+    cotacao, fornecedores = cotacao
+    base = f"/cotacoes/cotacoes/{cotacao.id}"
+    respostas = client.post(f"{base}/respostas/lote", json=_respostas(cotacao, fornecedores), headers=auth_headers).json()
+    client.post(f"{base}/selecionar-fornecedor/{respostas[1]['id']}", headers=auth_headers)
+
+    response = client.post(f"{base}/converter-pedido", headers=auth_headers)
+    assert response.status_code == 200
+    itens = db_session.query(ItemPedidoCompra).filter(
+        ItemPedidoCompra.pedido_id == response.json()["pedido_id"]
+    ).order_by(ItemPedidoCompra.id).all()
+    assert len(itens) == 20
+    assert [(i.quantidade, i.preco_unitario, i.preco_total) for i in itens[:2]] == [(1, 3.0, 3.0), (2, 3.0, 6.0)]
+
+
+def _precos(cotacao, fornecedores):
+    """
+    Quantities are 1..20. F0 quotes everything at 10, F1 at 8 (items 0-9) / 12,
+    F2 at 5 for items 0-4 only (30 days), F3 at 9 for items 10-19 only.
+    """
+    itens = cotacao.itens
+    f0, f1, f2, f3 = fornecedores
+
+    def resposta(fornecedor, precos, prazo=10):
+        return {
+            "fornecedor_id": fornecedor.id, "prazo_entrega_dias": prazo,
+            "itens": [{"item_cotacao_id": itens[i].id, "preco_unitario": preco} for i, preco in precos]
+        }
+
+    return [
+        resposta(f0, [(i, 10.0) for i in range(20)]),
+        resposta(f1, [(i, 8.0 if i < 10 else 12.0) for i in range(20)]),
+        resposta(f2, [(i, 5.0) for i in range(5)], prazo=30),
+        resposta(f3, [(i, 9.0) for i in range(10, 20)]),
+    ]
+
+
+@pytest.mark.parametrize("parametros, valor_total, vencedores", [
+    ({}, 1790.0, {2: 5, 1: 5, 3: 10}),
+    ({"prazo_maximo_dias": 20}, 1835.0, {1: 10, 3: 10}),
+    ({"max_fornecedores": 2}, 1835.0, {1: 10, 3: 10}),
+    ({"max_fornecedores": 1}, 2100.0, {0: 20}),
+])
+def test_adjudicacao_por_item(client, auth_headers, cotacao, parametros, valor_total, vencedores):
+    cotacao, fornecedores = cotacao
+    base = f"/cotacoes/cotacoes/{cotacao.id}"
+    client.post(f"{base}/respostas/lote", json=_precos(cotacao, fornecedores), headers=auth_headers)
+
+    response = client.get(f"{base}/adjudicacao", params=parametros, headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["otimo"] is True
+    assert data["valor_total"] == valor_total
+    assert {f["fornecedor_id"]: f["itens"] for f in data["fornecedores"]} == {
+        fornecedores[j].id: n for j, n in vencedores.items()
+    }
+    assert data["melhor_fornecedor_unico"]["fornecedor_id"] == fornecedores[0].id
+    assert data["economia"] == round(2100.0 - valor_total, 2)
+    assert data["itens_sem_cotacao"] == []
+
+
+def test_adjudicacao_gulosa_quando_ha_muitas_combinacoes(client, auth_headers, cotacao, monkeypatch):
+    from app import adjudicacao
+    monkeypatch.setattr(adjudicacao, "LIMITE_COMBINACOES", 0)
+    cotacao, fornecedores = cotacao
+    base = f"/cotacoes/cotacoes/{cotacao.id}"
+    client.post(f"{base}/respostas/lote", json=_precos(cotacao, fornecedores), headers=auth_headers)
+
+    data = client.get(f"{base}/adjudicacao", params={"max_fornecedores": 2}, headers=auth_headers).json()
+    assert data["otimo"] is False
+    assert data["valor_total"] == 1835.0
+
+
+def test_adjudicacao_inviavel_e_itens_sem_cotacao(client, auth_headers, cotacao):
+    cotacao, fornecedores = cotacao
+    base = f"/cotacoes/cotacoes/{cotacao.id}"
+    client.post(f"{base}/respostas/lote", json=_precos(cotacao, fornecedores)[2:], headers=auth_headers)
+
+    data = client.get(f"{base}/adjudicacao", headers=auth_headers).json()
+    assert [i["item_cotacao_id"] for i in data["itens_sem_cotacao"]] == [item.id for item in cotacao.itens[5:10]]
+    assert data["melhor_fornecedor_unico"] is None
+    assert data["economia"] is None
+
+    response = client.get(f"{base}/adjudicacao", params={"max_fornecedores": 1}, headers=auth_headers)
+    assert response.status_code == 400
@@ -111,3 +111,56 @@ def test_backend_only_feature_exists(client, auth_headers):
     assert data["has_backend"] is True
     assert data["has_frontend"] is False
     assert data["issue_number"] == 16
+
+
+def test_requisicao_lenta_capturada(client, auth_headers, monkeypatch):
+    """Requisições acima do limite ficam no buffer com SQL e tempos"""
+    from app.core.config import settings
+    from app.perfilador import limpar_capturas
+
+    limpar_capturas()
+    monkeypatch.setattr(settings, "PERFIL_LIMITE_LENTO_MS", 0.001)
+
+    response = client.get("/vendas/clientes", headers=auth_headers)
+    assert response.status_code == 200
+
+    monkeypatch.setattr(settings, "PERFIL_LIMITE_LENTO_MS", 1000)
+    response = client.get("/dev/requisicoes-lentas", headers=auth_headers)
+    assert response.status_code == 200
+    capturas = response.json()["capturas"]
+    captura = next(c for c in capturas if c["rota"] == "/vendas/clientes")
+    assert captura["consultas"] > 0
+
+    response = client.get(f"/dev/requisicoes-lentas/{captura['id']}", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["sql"]
+
+    assert client.get("/dev/requisicoes-lentas/999999", headers=auth_headers).status_code == 404
+    assert client.delete("/dev/requisicoes-lentas", headers=auth_headers).status_code == 200
+    assert client.get("/dev/requisicoes-lentas", headers=auth_headers).json()["capturas"] == []
+
+
+def test_perfil_formato_collapsed():
+    """O perfil sob demanda devolve pilhas 'quadro;quadro contagem'"""
+    import threading
+    from app.perfilador import formatar_colapsado, perfilar
+
+    parar = threading.Event()
+    thread = threading.Thread(target=parar.wait)
+    thread.start()
+    try:
+        amostras = perfilar(0.05, intervalo_ms=5, apenas_app=False)
+    finally:
+        parar.set()
+        thread.join()
+
+    linhas = formatar_colapsado(amostras).splitlines()
+    assert linhas
+    pilha, contagem = linhas[0].rsplit(" ", 1)
+    assert int(contagem) > 0
+    assert any("threading:wait" in linha for linha in linhas)
+
+
+def test_perfil_limita_duracao(client, auth_headers):
+    response = client.get("/dev/perfil?segundos=100000", headers=auth_headers)
+    assert response.status_code == 400
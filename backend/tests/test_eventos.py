@@ -0,0 +1,73 @@
+"""Tests for the domain event outbox"""
+import pytest
+from sqlalchemy.orm import sessionmaker
+from app.eventos import (
+    CONSUMIDORES, MAX_TENTATIVAS_CONSUMO, consumidor, existem_eventos_pendentes,
+    processar_eventos, publicar
+)
+from app.models_modules import ConsumoEvento, EventoDominio, Material, TipoMovimento
+
+
+@pytest.fixture
+def session_factory(db_session):
+    return sessionmaker(bind=db_session.get_bind(), autoflush=False)
+
+
+@pytest.fixture
+def consumidor_teste():
+    """Consumidor de EstoqueMovimentado que falha na primeira entrega"""
+    recebidos = []
+    
+    @consumidor("teste.estoque", "EstoqueMovimentado")
+    def registrar(session, evento):
+        recebidos.append(evento.id)
+        if len(recebidos) == 1:
+            raise RuntimeError("Indisponível")
+    
+    yield recebidos
+    CONSUMIDORES.pop("teste.estoque", None)
+
+
+def test_evento_gravado_com_a_transacao(client, auth_headers, db_session):
+    """Test the event exists only if the business change is committed"""
+    material = Material(codigo="MAT-0001", nome="Parafuso", unidade_medida="UN", estoque_atual=10.0)
+    db_session.add(material)
+    db_session.commit()
+    
+    publicar(db_session, "EstoqueMovimentado", "material", material.id, {"itens": []})
+    db_session.rollback()
+    assert db_session.query(EventoDominio).count() == 0
+    
+    response = client.post(
+        "/materiais/movimentos",
+        json={"material_id": material.id, "tipo_movimento": "saida", "quantidade": 3.0, "documento": "REQ-1"},
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    
+    evento = db_session.query(EventoDominio).one()
+    assert evento.tipo == "EstoqueMovimentado"
+    assert evento.agregado_id == response.json()["id"]
+    assert evento.dados["sinal"] == -1
+    assert evento.dados["itens"] == [{"material_id": material.id, "quantidade": 3.0}]
+
+
+def test_consumidor_idempotente_com_retentativa(db_session, session_factory, consumidor_teste):
+    """Test failed deliveries are retried and successful ones never repeated"""
+    evento = publicar(db_session, "EstoqueMovimentado", "material", 1, {"itens": []})
+    db_session.commit()
+    
+    assert processar_eventos(session_factory) == 0
+    consumo = db_session.query(ConsumoEvento).filter(ConsumoEvento.consumidor == "teste.estoque").one()
+    assert consumo.concluido == 0
+    assert consumo.erro == "Indisponível"
+    assert existem_eventos_pendentes(db_session)
+    
+    assert processar_eventos(session_factory) == 1
+    assert processar_eventos(session_factory) == 0
+    assert consumidor_teste == [evento.id, evento.id]
+    
+    db_session.refresh(consumo)
+    assert consumo.concluido == 1
+    assert consumo.tentativas == 2
+    assert consumo.tentativas < MAX_TENTATIVAS_CONSUMO
@@ -0,0 +1,360 @@
+"""Tests for faturamento (notas fiscais) module"""
+import pytest
+from datetime import datetime
+from app.core.config import settings
+from app.models_modules import (
+    AliquotaTributaria, Cliente, EstoquePorLocal, ItemNotaFiscal, LocalEstoque, Material,
+    MovimentoEstoque, NotaFiscal, StatusNotaFiscal, TipoNotaFiscal
+)
+from app.nfe import (
+    PipelineNFe, TransmissorNFe, calcular_digito_verificador, encerrar_pipeline, gerar_chave_acesso,
+    validar_chave_acesso, verificar_assinatura
+)
+
+
+def _criar_notas_rascunho(db_session, quantidades):
+    """Cria um local padrão com 10 unidades e uma NF de saída por quantidade"""
+    cliente = Cliente(codigo="CLI-0001", nome="Cliente NF", cpf_cnpj="12345678909", ativo=1)
+    local = LocalEstoque(codigo="LOC-0001", nome="Central", ativo=1, padrao=1)
+    material = Material(codigo="MAT-0001", nome="Parafuso", unidade_medida="UN", estoque_atual=10.0)
+    db_session.add_all([cliente, local, material])
+    db_session.commit()
+    
+    db_session.add(EstoquePorLocal(material_id=material.id, local_id=local.id, quantidade=10.0))
+    notas = []
+    for i, quantidade in enumerate(quantidades, start=1):
+        nf = NotaFiscal(
+            numero=str(i).zfill(9),
+            tipo=TipoNotaFiscal.SAIDA,
+            cliente_id=cliente.id,
+            status=StatusNotaFiscal.RASCUNHO,
+            itens=[
+                # Dois itens do mesmo material para validar a agregação
+                ItemNotaFiscal(
+                    material_id=material.id, descricao="Parafuso", unidade="UN",
+                    quantidade=quantidade / 2, valor_unitario=1.0, valor_total=quantidade / 2
+                ),
+                ItemNotaFiscal(
+                    material_id=material.id, descricao="Parafuso", unidade="UN",
+                    quantidade=quantidade / 2, valor_unitario=1.0, valor_total=quantidade / 2
+                ),
+            ]
+        )
+        db_session.add(nf)
+        notas.append(nf)
+    db_session.commit()
+    return material, local, notas
+
+
+def test_emitir_nota_fiscal_baixa_estoque(client, auth_headers, admin_user, db_session):
+    """Test single emission posts stock at the default location and records the user"""
+    material, local, (nf,) = _criar_notas_rascunho(db_session, [4.0])
+    
+    response = client.post(f"/faturamento/notas-fiscais/{nf.id}/emitir", headers=auth_headers)
+    
+    assert response.status_code == 200
+    db_session.expire_all()
+    assert db_session.get(NotaFiscal, nf.id).status == StatusNotaFiscal.EMITIDA
+    assert db_session.get(NotaFiscal, nf.id).usuario_emissao_id == admin_user.id
+    assert db_session.get(Material, material.id).estoque_atual == 6.0
+    
+    movimentos = db_session.query(MovimentoEstoque).filter(MovimentoEstoque.material_id == material.id).all()
+    assert len(movimentos) == 1
+    assert movimentos[0].quantidade == 4.0
+    assert movimentos[0].local_origem_id == local.id
+    assert movimentos[0].usuario_id == admin_user.id
+
+
+def test_emitir_lote_rejeita_sem_estoque(client, auth_headers, admin_user, db_session):
+    """Test batch emission emits what fits, rejects the rest and records the user"""
+    material, local, notas = _criar_notas_rascunho(db_session, [4.0, 8.0, 6.0])
+    
+    response = client.post(
+        "/faturamento/notas-fiscais/emitir-lote",
+        json={"nf_ids": [nf.id for nf in notas]},
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert [nf["id"] for nf in data["emitidas"]] == [notas[0].id, notas[2].id]
+    assert [nf["id"] for nf in data["rejeitadas"]] == [notas[1].id]
+    
+    db_session.expire_all()
+    estoque = db_session.query(EstoquePorLocal).filter(EstoquePorLocal.local_id == local.id).one()
+    assert estoque.quantidade == 0.0
+    assert db_session.get(NotaFiscal, notas[1].id).status == StatusNotaFiscal.RASCUNHO
+    assert db_session.get(NotaFiscal, notas[0].id).usuario_emissao_id == admin_user.id
+    assert [m.usuario_id for m in db_session.query(MovimentoEstoque)] == [admin_user.id] * 2
+
+
+def test_estatisticas_nf_agregadas(client, auth_headers, db_session):
+    """Test statistics are aggregated by status/tipo with series and breakdowns"""
+    cliente = Cliente(codigo="CLI-0001", nome="Cliente NF", cpf_cnpj="12345678909", ativo=1)
+    db_session.add(cliente)
+    db_session.commit()
+    
+    dados = [
+        ("000000001", TipoNotaFiscal.SAIDA, StatusNotaFiscal.EMITIDA, "2026-01-10", 100.0, "5102"),
+        ("000000002", TipoNotaFiscal.SAIDA, StatusNotaFiscal.AUTORIZADA, "2026-01-20", 50.0, "5102"),
+        ("000000003", TipoNotaFiscal.SAIDA, StatusNotaFiscal.CANCELADA, "2026-02-05", 999.0, "5102"),
+        ("000000004", TipoNotaFiscal.ENTRADA, StatusNotaFiscal.EMITIDA, "2026-02-15", 30.0, "1102"),
+    ]
+    for numero, tipo, status, data, valor, cfop in dados:
+        db_session.add(NotaFiscal(
+            numero=numero, tipo=tipo, status=status, cliente_id=cliente.id,
+            data_emissao=datetime.fromisoformat(data), valor_total=valor, cfop=cfop,
+            itens=[ItemNotaFiscal(descricao="Item", unidade="UN", quantidade=1.0,
+                                  valor_unitario=valor, valor_total=valor)]
+        ))
+    db_session.commit()
+    
+    response = client.get(
+        "/faturamento/notas-fiscais/estatisticas/resumo",
+        params={"agrupar_por": "mes", "incluir_clientes": True, "incluir_cfop": True},
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_notas"] == 4
+    assert data["emitidas"] == 2
+    assert data["autorizadas"] == 1
+    assert data["canceladas"] == 1
+    assert data["notas_saida"] == 3
+    assert data["notas_entrada"] == 1
+    assert data["valor_total"] == 180.0
+    assert data["serie"] == [
+        {"periodo": "2026-01", "quantidade": 2, "valor_total": 150.0},
+        {"periodo": "2026-02", "quantidade": 2, "valor_total": 30.0},
+    ]
+    assert data["por_cliente"][0]["valor_total"] == 180.0
+    assert {c["cfop"]: c["valor_total"] for c in data["por_cfop"]} == {"1102": 30.0, "5102": 150.0}
+    
+    filtrado = client.get(
+        "/faturamento/notas-fiscais/estatisticas/resumo",
+        params={"data_inicial": "2026-02-01"},
+        headers=auth_headers
+    ).json()
+    assert filtrado["total_notas"] == 2
+    assert "serie" not in filtrado
+
+
+def test_criar_nota_calcula_impostos_pela_tabela(client, auth_headers, db_session):
+    """Test item taxes come from the NCM/UF rate table with per-item rounding"""
+    cliente = Cliente(codigo="CLI-0001", nome="Cliente SP", cpf_cnpj="12345678909", estado="SP", ativo=1)
+    db_session.add_all([
+        cliente,
+        AliquotaTributaria(uf="SP", aliquota_icms=18.0),
+        AliquotaTributaria(ncm="8471.30.12", aliquota_ipi=10.0, aliquota_pis=1.65, aliquota_cofins=7.6),
+    ])
+    db_session.commit()
+    
+    response = client.post("/faturamento/notas-fiscais", json={
+        "tipo": "saida",
+        "cliente_id": cliente.id,
+        "valor_frete": 5.0,
+        "itens": [
+            {"descricao": "Notebook", "unidade": "UN", "ncm": "84713012",
+             "quantidade": 3, "valor_unitario": 33.335},
+            {"descricao": "Cabo", "unidade": "UN", "quantidade": 1,
+             "valor_unitario": 10.0, "aliquota_icms": 12.0},
+        ]
+    }, headers=auth_headers)
+    
+    assert response.status_code == 200
+    data = response.json()
+    notebook, cabo = data["itens"]
+    
+    # 3 x 33,335 = 100,005 -> 100,01 (ROUND_HALF_UP)
+    assert notebook["valor_total"] == 100.01
+    assert notebook["valor_icms"] == 18.0       # ICMS da regra por UF, IPI da regra por NCM
+    assert notebook["valor_ipi"] == 10.0
+    assert notebook["valor_pis"] == 1.35        # (100,01 - 18,00) x 1,65%
+    assert notebook["valor_cofins"] == 6.23     # (100,01 - 18,00) x 7,6%
+    assert cabo["aliquota_icms"] == 12.0        # Alíquota informada prevalece
+    assert cabo["valor_icms"] == 1.2
+    
+    assert data["valor_produtos"] == 110.01
+    assert data["valor_icms"] == 19.2
+    assert data["valor_pis"] == 1.35          # Cabo sem NCM não tem regra de PIS
+    assert data["valor_total"] == 125.01        # produtos + IPI + frete
+
+
+def test_recalcular_impostos_em_lote(client, auth_headers, db_session):
+    """Test bulk recalculation applies the current rate table to draft notes"""
+    cliente = Cliente(codigo="CLI-0001", nome="Cliente RJ", cpf_cnpj="12345678909", estado="RJ", ativo=1)
+    db_session.add(cliente)
+    db_session.commit()
+    
+    notas = []
+    for status in (StatusNotaFiscal.RASCUNHO, StatusNotaFiscal.AUTORIZADA):
+        nf = NotaFiscal(
+            numero=f"00000000{len(notas) + 1}", tipo=TipoNotaFiscal.SAIDA, status=status,
+            cliente_id=cliente.id, valor_total=200.0,
+            itens=[
+                ItemNotaFiscal(descricao=f"Item {i}", unidade="UN", quantidade=1.0,
+                               valor_unitario=100.0, valor_total=100.0)
+                for i in range(2)
+            ]
+        )
+        db_session.add(nf)
+        notas.append(nf)
+    db_session.add(AliquotaTributaria(uf="RJ", aliquota_icms=20.0))
+    db_session.commit()
+    
+    response = client.post(
+        "/faturamento/notas-fiscais/recalcular-impostos", json={}, headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    assert response.json() == {"notas": 1, "itens": 2, "ignoradas": []}
+    
+    db_session.expire_all()
+    rascunho = db_session.get(NotaFiscal, notas[0].id)
+    assert rascunho.valor_icms == 40.0
+    assert [item.valor_icms for item in rascunho.itens] == [20.0, 20.0]
+    assert db_session.get(NotaFiscal, notas[1].id).valor_icms == 0.0
+
+
+def test_recalcular_impostos_nao_altera_nota_autorizada(client, auth_headers, db_session):
+    """Test recalculation leaves authorized notes untouched and reports them as skipped"""
+    cliente = Cliente(codigo="CLI-0001", nome="Cliente RJ", cpf_cnpj="12345678909", estado="RJ", ativo=1)
+    db_session.add(cliente)
+    db_session.commit()
+    
+    autorizada = NotaFiscal(
+        numero="000000001", tipo=TipoNotaFiscal.SAIDA, status=StatusNotaFiscal.AUTORIZADA,
+        cliente_id=cliente.id, valor_produtos=100.0, valor_total=100.0, xml_nfe="<NFe/>",
+        itens=[ItemNotaFiscal(descricao="Item", unidade="UN", quantidade=1.0,
+                              valor_unitario=100.0, valor_total=100.0)]
+    )
+    db_session.add_all([autorizada, AliquotaTributaria(uf="RJ", aliquota_icms=20.0)])
+    db_session.commit()
+    
+    response = client.post(
+        "/faturamento/notas-fiscais/recalcular-impostos", json={"nf_ids": [autorizada.id]}, headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    assert response.json() == {"notas": 0, "itens": 0, "ignoradas": [autorizada.id]}
+    
+    db_session.expire_all()
+    nf = db_session.get(NotaFiscal, autorizada.id)
+    assert (nf.valor_icms, nf.valor_total, nf.xml_nfe) == (0.0, 100.0, "<NFe/>")
+    assert nf.itens[0].valor_icms == 0.0
+
+
+def test_digito_verificador_chave_acesso():
+    """Test the mod-11 check digit and the 44-digit access key layout"""
+    assert calcular_digito_verificador("0" * 42 + "1") == "9"
+    assert calcular_digito_verificador("0" * 42 + "6") == "0"   # resto 1
+    
+    chave = gerar_chave_acesso(
+        "SP", datetime(2026, 10, 19), "45.439.857/0001-40", "1", "000000123", "12345678"
+    )
+    assert len(chave) == 44
+    assert chave.startswith("352610454398570001405500100000012311234567")
+    assert validar_chave_acesso(chave)
+    assert not validar_chave_acesso(chave[:43] + str((int(chave[43]) + 1) % 10))
+
+
+@pytest.fixture
+def emitente_nfe(monkeypatch):
+    """Emitente configurado e assinatura no próprio processo"""
+    monkeypatch.setattr(settings, "NFE_CNPJ_EMITENTE", "45439857000140")
+    monkeypatch.setattr(settings, "NFE_WORKERS", 0)
+    encerrar_pipeline()
+    yield
+    encerrar_pipeline()
+
+
+def test_transmissor_sem_autorizar_nao_instancia():
+    """Test a transmitter missing autorizar fails when instantiated"""
+    class TransmissorIncompleto(TransmissorNFe):
+        pass
+    
+    with pytest.raises(TypeError):
+        TransmissorIncompleto()
+
+
+def test_autorizar_lote_gera_chave_e_xml_assinado(client, auth_headers, db_session, emitente_nfe):
+    """Test batch authorization signs the XML and stores key and protocol"""
+    material, local, notas = _criar_notas_rascunho(db_session, [2.0, 2.0])
+    for nf in notas:
+        nf.status = StatusNotaFiscal.EMITIDA
+    notas[1].status = StatusNotaFiscal.RASCUNHO
+    db_session.commit()
+    
+    response = client.post(
+        "/faturamento/notas-fiscais/autorizar-lote",
+        json={"nf_ids": [nf.id for nf in notas]},
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert [nf["id"] for nf in data["autorizadas"]] == [notas[0].id]
+    assert [nf["id"] for nf in data["rejeitadas"]] == [notas[1].id]
+    assert data["metricas"]["notas"] == 1
+    
+    db_session.expire_all()
+    nf = db_session.get(NotaFiscal, notas[0].id)
+    assert nf.status == StatusNotaFiscal.AUTORIZADA
+    assert validar_chave_acesso(nf.chave_acesso)
+    assert nf.protocolo_autorizacao
+    
+    xml = client.get(f"/faturamento/notas-fiscais/{nf.id}/xml", headers=auth_headers).content
+    assert f'Id="NFe{nf.chave_acesso}"'.encode() in xml
+    assert verificar_assinatura(xml)
+    assert not verificar_assinatura(xml.replace(b"Parafuso", b"Parafusx"))
+
+
+def test_autorizar_exige_emitente_configurado(client, auth_headers, db_session, monkeypatch):
+    """Test authorization fails clearly without the issuer CNPJ"""
+    monkeypatch.setattr(settings, "NFE_CNPJ_EMITENTE", "")
+    material, local, (nf,) = _criar_notas_rascunho(db_session, [1.0])
+    nf.status = StatusNotaFiscal.EMITIDA
+    db_session.commit()
+    
+    response = client.post(f"/faturamento/notas-fiscais/{nf.id}/autorizar", headers=auth_headers)
+    
+    assert response.status_code == 400
+    assert "CNPJ" in response.json()["detail"]
+
+
+def test_pipeline_nfe_em_pool_de_processos():
+    """Test XML generation and signing in a bounded process pool"""
+    emitente = {"cnpj": "45439857000140", "razao_social": "Emitente", "uf": "SP"}
+    notas = []
+    for i in range(1, 5):
+        numero = str(i).zfill(9)
+        notas.append({
+            "id": i,
+            "chave_acesso": gerar_chave_acesso("SP", datetime(2026, 10, 19), emitente["cnpj"], "1", numero, "87654321"),
+            "numero": numero, "serie": "1", "tipo": "saida", "data_emissao": datetime(2026, 10, 19),
+            "natureza_operacao": "Venda", "cfop": "5102", "ambiente": 2, "versao_aplicativo": "teste",
+            "emitente": emitente,
+            "destinatario": {"documento": "12345678909", "nome": "Cliente & Cia", "uf": "RJ"},
+            "valor_frete": 0.0, "valor_seguro": 0.0, "valor_desconto": 0.0,
+            "valor_outras_despesas": 0.0, "valor_total": 10.0, "informacoes_adicionais": None,
+            "itens": [{
+                "material_id": 1, "codigo_produto": "MAT-0001", "descricao": "Parafuso <M8>",
+                "ncm": "7318.15.00", "cfop": None, "unidade": "UN", "quantidade": 2.0,
+                "valor_unitario": 5.0, "valor_desconto": 0.0, "valor_frete": 0.0, "valor_seguro": 0.0,
+                "valor_outras_despesas": 0.0, "aliquota_icms": 12.0, "valor_icms": 1.2,
+                "aliquota_ipi": 0.0, "valor_ipi": 0.0, "aliquota_pis": 0.0, "valor_pis": 0.0,
+                "aliquota_cofins": 0.0, "valor_cofins": 0.0, "valor_total": 10.0,
+            }],
+        })
+    
+    pipeline = PipelineNFe(workers=2)
+    try:
+        xmls = pipeline.processar(notas)
+    finally:
+        pipeline.encerrar()
+    
+    assert sorted(xmls) == [1, 2, 3, 4]
+    assert all(verificar_assinatura(xml) for xml in xmls.values())
+    assert b"Cliente &amp; Cia" in xmls[1]
+    assert b"<xProd>Parafuso &lt;M8&gt;</xProd>" in xmls[1]
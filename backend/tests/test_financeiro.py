@@ -935,3 +935,376 @@ def test_baixar_conta_pagar_saldo_insuficiente(client, auth_headers, db_session)
     
     assert response.status_code == 400
     assert "insuficiente" in response.json()["detail"].lower()
+
+
+# =============================================================================
+# TESTS FOR EXPORTAÇÃO
+# =============================================================================
+
+def test_exportar_extrato_csv(client, auth_headers, db_session):
+    """Test exporting extrato as CSV with running balance"""
+    from datetime import timedelta
+    from app.models_modules import MovimentacaoBancaria, TipoMovimentacaoBancaria
+    
+    conta = ContaBancaria(
+        nome="Conta Exportação",
+        banco="001",
+        agencia="1234",
+        conta="99999-9",
+        saldo_inicial=1000.0,
+        saldo_atual=1000.0,
+        ativa=1
+    )
+    db_session.add(conta)
+    db_session.commit()
+    db_session.refresh(conta)
+    
+    db_session.add_all([
+        MovimentacaoBancaria(
+            conta_bancaria_id=conta.id,
+            tipo=TipoMovimentacaoBancaria.DEPOSITO,
+            natureza="ENTRADA",
+            valor=200.0,
+            descricao="Anterior",
+            data_competencia=date.today() - timedelta(days=10)
+        ),
+        MovimentacaoBancaria(
+            conta_bancaria_id=conta.id,
+            tipo=TipoMovimentacaoBancaria.DEPOSITO,
+            natureza="ENTRADA",
+            valor=100.0,
+            descricao="Deposito",
+            data_competencia=date.today()
+        ),
+        MovimentacaoBancaria(
+            conta_bancaria_id=conta.id,
+            tipo=TipoMovimentacaoBancaria.SAQUE,
+            natureza="SAIDA",
+            valor=50.0,
+            descricao="Saque",
+            data_competencia=date.today()
+        ),
+    ])
+    db_session.commit()
+    
+    response = client.get(
+        f"/financeiro/contas-bancarias/{conta.id}/extrato/exportar",
+        params={
+            "data_inicio": date.today().isoformat(),
+            "data_fim": date.today().isoformat()
+        },
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "attachment" in response.headers["content-disposition"]
+    
+    linhas = response.content.decode("utf-8-sig").strip().splitlines()
+    assert linhas[0].split(";")[-1] == "saldo"
+    assert len(linhas) == 3
+    assert linhas[1].split(";")[-1] == "1300.0"
+    assert linhas[2].split(";")[-1] == "1250.0"
+
+
+def test_exportar_contas_pagar_jsonl(client, auth_headers, db_session):
+    """Test exporting contas a pagar as JSON Lines"""
+    import json
+    from app.models_modules import Fornecedor
+    
+    fornecedor = Fornecedor(
+        nome="Fornecedor Exportação",
+        cnpj="12345678000199",
+        email="exportacao@test.com",
+        ativo=1
+    )
+    db_session.add(fornecedor)
+    db_session.commit()
+    
+    for i in range(3):
+        db_session.add(ContaPagar(
+            descricao=f"Conta {i}",
+            fornecedor_id=fornecedor.id,
+            data_vencimento=datetime.utcnow(),
+            valor_original=100.0 * (i + 1)
+        ))
+    db_session.commit()
+    
+    response = client.get(
+        "/financeiro/contas-pagar/exportar",
+        params={"formato": "jsonl", "fornecedor_id": fornecedor.id},
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    registros = [json.loads(l) for l in response.text.strip().splitlines()]
+    assert len(registros) == 3
+    assert sorted(r["valor_original"] for r in registros) == [100.0, 200.0, 300.0]
+    assert registros[0]["status"] == "pendente"
+
+
+def test_exportar_contas_pagar_xlsx(client, auth_headers, db_session):
+    """Test exporting contas a pagar as a streamed XLSX package with escaped text"""
+    import io
+    import zipfile
+    import xml.etree.ElementTree as ET
+    from app.models_modules import Fornecedor
+    
+    fornecedor = Fornecedor(nome="Fornecedor Planilha", cnpj="12345678000199", ativo=1)
+    db_session.add(fornecedor)
+    db_session.commit()
+    for i, descricao in enumerate(["Peças & Serviços", "Frete <urgente>", "Aluguel"]):
+        db_session.add(ContaPagar(
+            descricao=descricao,
+            fornecedor_id=fornecedor.id,
+            data_vencimento=datetime.utcnow(),
+            valor_original=100.0 * (i + 1)
+        ))
+    db_session.commit()
+    
+    response = client.get(
+        "/financeiro/contas-pagar/exportar",
+        params={"formato": "xlsx", "fornecedor_id": fornecedor.id},
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+    pacote = zipfile.ZipFile(io.BytesIO(response.content))
+    assert pacote.testzip() is None
+    assert "xl/worksheets/sheet1.xml" in pacote.read("[Content_Types].xml").decode()
+    
+    planilha = pacote.read("xl/worksheets/sheet1.xml").decode("utf-8")
+    assert "Peças &amp; Serviços" in planilha
+    assert "Frete &lt;urgente&gt;" in planilha
+    
+    ns = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+    linhas = ET.fromstring(planilha).findall("s:sheetData/s:row", ns)
+    assert len(linhas) == 4  # cabeçalho + 3 contas
+    textos = {t.text for t in ET.fromstring(planilha).iter("{%s}t" % ns["s"])}
+    assert {"Peças & Serviços", "Frete <urgente>", "Aluguel"} <= textos
+
+
+# =============================================================================
+# AGING
+# =============================================================================
+
+@pytest.fixture
+def titulos_aging(db_session):
+    """Títulos e parcelas em várias situações em relação à data-base 30/06/2026"""
+    from app.models_modules import Cliente, ParcelaContaReceber, StatusPagamento, TipoParcelamento
+    
+    cliente_a = Cliente(codigo="CLI-0001", nome="Cliente A", cpf_cnpj="11144477735")
+    cliente_b = Cliente(codigo="CLI-0002", nome="Cliente B", cpf_cnpj="52998224725")
+    db_session.add_all([cliente_a, cliente_b])
+    db_session.commit()
+    
+    def titulo(cliente, vencimento, valor, **extra):
+        conta = ContaReceber(
+            descricao="Título", cliente_id=cliente.id, data_emissao=extra.pop("data_emissao", datetime(2026, 1, 1)),
+            data_vencimento=vencimento, valor_original=valor, numero_documento=f"DOC-{valor:.0f}", **extra
+        )
+        db_session.add(conta)
+        return conta
+    
+    titulo(cliente_a, datetime(2026, 7, 10), 100.0)
+    titulo(cliente_a, datetime(2026, 6, 30, 18, 0), 50.0)
+    titulo(cliente_a, datetime(2026, 6, 15), 200.0, valor_recebido=80.0,
+           status=StatusPagamento.PARCIAL, data_recebimento=datetime(2026, 6, 20))
+    titulo(cliente_a, datetime(2026, 4, 1), 300.0)
+    titulo(cliente_a, datetime(2026, 3, 1), 400.0, valor_recebido=400.0,
+           status=StatusPagamento.PAGO, data_recebimento=datetime(2026, 7, 5))
+    titulo(cliente_a, datetime(2026, 5, 1), 500.0, valor_recebido=500.0,
+           status=StatusPagamento.PAGO, data_recebimento=datetime(2026, 6, 1))
+    titulo(cliente_a, datetime(2026, 6, 1), 600.0, data_emissao=datetime(2026, 7, 2))
+    titulo(cliente_b, datetime(2026, 6, 1), 1000.0)
+    
+    parcelado = titulo(cliente_a, datetime(2026, 7, 20), 301.0, tipo_parcelamento=TipoParcelamento.PARCELADO)
+    db_session.flush()
+    for numero, (vencimento, pago) in enumerate(
+        [(datetime(2026, 5, 20), True), (datetime(2026, 6, 20), False), (datetime(2026, 7, 20), False)], start=1
+    ):
+        db_session.add(ParcelaContaReceber(
+            conta_receber_id=parcelado.id, numero_parcela=numero, total_parcelas=3,
+            data_vencimento=vencimento, valor=100.0,
+            valor_recebido=100.0 if pago else 0.0,
+            data_recebimento=datetime(2026, 5, 25) if pago else None,
+            status=StatusPagamento.PAGO if pago else StatusPagamento.PENDENTE
+        ))
+    db_session.commit()
+    return cliente_a, cliente_b
+
+
+def test_aging_contas_receber_por_cliente(client, auth_headers, titulos_aging):
+    """Test receivables aging buckets titles and installments per client at the as-of date"""
+    cliente_a, cliente_b = titulos_aging
+    
+    response = client.get(
+        "/financeiro/relatorios/aging/receber", params={"data_base": "2026-06-30"}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [f["chave"] for f in data["faixas"]] == ["a_vencer", "1_30", "31_60", "61_90", "acima_90"]
+    
+    linha_a, linha_b = data["linhas"]
+    assert linha_a["cliente_id"] == cliente_a.id
+    assert {chave: linha_a[chave] for chave in ("a_vencer", "1_30", "31_60", "61_90", "acima_90", "total")} == {
+        "a_vencer": 250.0, "1_30": 220.0, "31_60": 0.0, "61_90": 300.0, "acima_90": 400.0, "total": 1170.0
+    }
+    assert linha_a["itens"] == 7
+    assert (linha_b["cliente_id"], linha_b["1_30"], linha_b["total"]) == (cliente_b.id, 1000.0, 1000.0)
+    assert data["totais"]["total"] == 2170.0
+    assert data["totais"]["itens"] == 8
+    
+    # Faixas configuráveis e filtro por cliente
+    response = client.get("/financeiro/relatorios/aging/receber", params={
+        "data_base": "2026-06-30", "faixas": "15,120", "entidade_id": cliente_a.id
+    }, headers=auth_headers)
+    linha = response.json()["linhas"][0]
+    assert (linha["a_vencer"], linha["1_15"], linha["16_120"], linha["acima_120"]) == (250.0, 220.0, 300.0, 400.0)
+    
+    for faixas in ("30,abc", "60,30", "0,30"):
+        response = client.get(
+            "/financeiro/relatorios/aging/receber", params={"faixas": faixas}, headers=auth_headers
+        )
+        assert response.status_code == 400
+
+
+def test_aging_contas_pagar_por_fornecedor(client, auth_headers, db_session):
+    """Test payables aging groups by supplier"""
+    from app.models_modules import Fornecedor
+    
+    fornecedor = Fornecedor(nome="Fornecedor Aging", cnpj="12345678000199", ativo=1)
+    db_session.add(fornecedor)
+    db_session.commit()
+    for vencimento, valor in ((datetime(2026, 6, 10), 70.0), (datetime(2026, 8, 1), 30.0)):
+        db_session.add(ContaPagar(
+            descricao="Conta", fornecedor_id=fornecedor.id, data_emissao=datetime(2026, 1, 1),
+            data_vencimento=vencimento, valor_original=valor
+        ))
+    db_session.commit()
+    
+    response = client.get(
+        "/financeiro/relatorios/aging/pagar", params={"data_base": "2026-06-30", "faixas": "15,45"},
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    linha = response.json()["linhas"][0]
+    assert linha["fornecedor_id"] == fornecedor.id
+    assert (linha["a_vencer"], linha["1_15"], linha["16_45"], linha["total"]) == (30.0, 0.0, 70.0, 100.0)
+
+
+def test_exportar_aging_csv(client, auth_headers, titulos_aging):
+    """Test streaming the aging summary and the open items as CSV"""
+    cliente_a, _ = titulos_aging
+    
+    response = client.get(
+        "/financeiro/relatorios/aging/receber/exportar", params={"data_base": "2026-06-30"}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    linhas = [l.split(";") for l in response.content.decode("utf-8-sig").strip().splitlines()]
+    assert linhas[0] == [
+        "cliente_id", "nome", "a_vencer", "1_30", "31_60", "61_90", "acima_90",
+        "total", "itens", "vencimento_mais_antigo"
+    ]
+    assert linhas[1][:2] == [str(cliente_a.id), "Cliente A"]
+    assert linhas[1][7] == "1170.0"
+    
+    response = client.get("/financeiro/relatorios/aging/receber/exportar", params={
+        "data_base": "2026-06-30", "detalhado": True, "entidade_id": cliente_a.id
+    }, headers=auth_headers)
+    linhas = [l.split(";") for l in response.content.decode("utf-8-sig").strip().splitlines()]
+    assert linhas[0][-3:] == ["dias_atraso", "faixa", "saldo"]
+    assert len(linhas) == 8
+    mais_antigo = linhas[1]
+    assert mais_antigo[-3:] == ["121", "acima_90", "400.0"]
+    parcelas = [l for l in linhas[1:] if l[3]]
+    assert sorted((l[3], l[-2]) for l in parcelas) == [("2", "1_30"), ("3", "a_vencer")]
+
+
+# =============================================================================
+# VENCIMENTOS E ENCARGOS
+# =============================================================================
+
+def test_varrer_vencidos_apura_encargos(client, auth_headers, db_session, titulos_aging):
+    """Test the sweep marks overdue items and accrues fine and pro rata interest once per day"""
+    from app.models_modules import ExposicaoCredito, ParcelaContaReceber, StatusPagamento
+    
+    cliente_a, cliente_b = titulos_aging
+    params = {"data_referencia": "2026-06-30", "multa_percentual": 2, "juros_mes_percentual": 3}
+    
+    response = client.post("/financeiro/vencimentos/varrer", params=params, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["atualizados"] == {
+        "contas_receber": 4, "parcelas_conta_receber": 1, "contas_pagar": 0, "parcelas_conta_pagar": 0
+    }
+    
+    db_session.expire_all()
+    contas = {c.valor_original: c for c in db_session.query(ContaReceber)}
+    # 1000 vencido há 29 dias: multa 20,00 + juros 1000 * 3% / 30 * 29 = 29,00
+    assert contas[1000.0].status == StatusPagamento.ATRASADO
+    assert (contas[1000.0].multa_apurada, contas[1000.0].juros_mora_apurados, contas[1000.0].juros) == (20.0, 29.0, 49.0)
+    # Encargos sobre o principal em aberto (200 - 80)
+    assert (contas[200.0].multa_apurada, contas[200.0].juros_mora_apurados) == (2.4, 1.8)
+    # A vencer, pagos e vencidos hoje ficam como estão
+    assert contas[100.0].status == StatusPagamento.PENDENTE
+    assert contas[50.0].status == StatusPagamento.PENDENTE
+    assert contas[500.0].status == StatusPagamento.PAGO
+    # Título parcelado: encargos só na parcela vencida
+    assert contas[301.0].status == StatusPagamento.PENDENTE
+    parcela = db_session.query(ParcelaContaReceber).filter_by(numero_parcela=2).one()
+    assert (parcela.status, parcela.juros, parcela.data_apuracao_encargos) == (
+        StatusPagamento.ATRASADO, 3.0, date(2026, 6, 30)
+    )
+    assert db_session.query(ExposicaoCredito).filter_by(cliente_id=cliente_b.id).one().receber_aberto == 1049.0
+    
+    # Mesmo dia: nada muda
+    repetida = client.post("/financeiro/vencimentos/varrer", params=params, headers=auth_headers)
+    assert sum(repetida.json()["atualizados"].values()) == 0
+    
+    # Dia seguinte: encargos recalculados sem perder juros lançados à mão
+    contas[1000.0].juros += 5.0
+    db_session.commit()
+    response = client.post("/financeiro/vencimentos/varrer", params={**params, "data_referencia": "2026-07-01"},
+                           headers=auth_headers)
+    assert response.json()["atualizados"]["contas_receber"] == 5
+    db_session.expire_all()
+    conta = db_session.get(ContaReceber, contas[1000.0].id)
+    assert (conta.juros_mora_apurados, conta.juros) == (30.0, 55.0)
+
+
+def test_varrer_vencidos_em_lotes(db_session):
+    """Test the sweep commits chunk by chunk and honours the grace period"""
+    from app.models_modules import Fornecedor, ParcelaContaPagar, StatusPagamento
+    from app.vencimentos import RegrasEncargos, varrer_vencidos
+    
+    fornecedor = Fornecedor(nome="Fornecedor Lote", cnpj="12345678000199", ativo=1)
+    db_session.add(fornecedor)
+    db_session.commit()
+    for dias in (3, 10, 20):
+        db_session.add(ContaPagar(
+            descricao="Conta", fornecedor_id=fornecedor.id, data_emissao=datetime(2026, 1, 1),
+            data_vencimento=datetime(2026, 6, 30 - dias), valor_original=300.0
+        ))
+    db_session.commit()
+    
+    commits = []
+    def confirmar():
+        commits.append(True)
+        db_session.commit()
+    
+    resultado = varrer_vencidos(
+        db_session, date(2026, 6, 30), RegrasEncargos(1.0, 3.0, 5), lote=2, confirmar=confirmar
+    )
+    assert resultado["atualizados"]["contas_pagar"] == 3
+    assert resultado["encargos"]["contas_pagar"] == 15.0
+    assert len(commits) == 2
+    
+    contas = db_session.query(ContaPagar).order_by(ContaPagar.data_vencimento).all()
+    assert [c.status for c in contas] == [StatusPagamento.ATRASADO] * 3
+    # 3 dias de atraso: dentro da carência
+    assert [c.juros for c in contas] == [9.0, 6.0, 0.0]
+    assert db_session.query(ParcelaContaPagar).count() == 0
@@ -5,8 +5,13 @@ from app.helpers import (
     gerar_codigo_cliente,
     gerar_codigo_material,
     validar_cpf,
-    validar_cnpj
+    validar_cnpj,
+    obter_saldo_por_local,
+    somar_estoque_local,
+    baixar_estoque_local,
+    processar_movimentacao_estoque
 )
+from app.models_modules import EstoquePorLocal, LocalEstoque, Material
 
 
 def test_gerar_codigo_fornecedor(db_session):
@@ -63,3 +68,65 @@ def test_validar_cnpj_formato_invalido():
     """Test validating CNPJ with invalid format"""
     assert validar_cnpj("123") is False
     assert validar_cnpj("abc") is False
+
+
+def _criar_material_e_locais(db_session):
+    """Cria um material e dois locais para os testes de estoque"""
+    material = Material(codigo="MAT-0001", nome="Parafuso", unidade_medida="UN")
+    origem = LocalEstoque(codigo="LOC-0001", nome="Origem")
+    destino = LocalEstoque(codigo="LOC-0002", nome="Destino")
+    db_session.add_all([material, origem, destino])
+    db_session.commit()
+    return material, origem, destino
+
+
+def test_somar_estoque_local_upsert(db_session):
+    """Test upsert creates the row once and accumulates deltas"""
+    material, origem, _ = _criar_material_e_locais(db_session)
+    
+    somar_estoque_local(material.id, origem.id, 10.0, db_session)
+    somar_estoque_local(material.id, origem.id, 5.0, db_session)
+    somar_estoque_local(material.id, origem.id, -3.0, db_session)
+    
+    registros = db_session.query(EstoquePorLocal).filter(
+        EstoquePorLocal.material_id == material.id
+    ).all()
+    assert len(registros) == 1
+    assert obter_saldo_por_local(material.id, origem.id, db_session) == 12.0
+
+
+def test_baixar_estoque_local_saldo_insuficiente(db_session):
+    """Test conditional decrement refuses to go negative"""
+    material, origem, _ = _criar_material_e_locais(db_session)
+    somar_estoque_local(material.id, origem.id, 4.0, db_session)
+    
+    assert baixar_estoque_local(material.id, origem.id, 5.0, db_session) is False
+    assert obter_saldo_por_local(material.id, origem.id, db_session) == 4.0
+    
+    assert baixar_estoque_local(material.id, origem.id, 4.0, db_session) is True
+    assert obter_saldo_por_local(material.id, origem.id, db_session) == 0.0
+
+
+def test_processar_transferencia_estoque(db_session):
+    """Test transfer updates both locations and the material total"""
+    material, origem, destino = _criar_material_e_locais(db_session)
+    
+    resultado = processar_movimentacao_estoque(
+        material.id, "ENTRADA", 10.0, local_destino_id=origem.id, db=db_session
+    )
+    assert resultado["sucesso"]
+    
+    resultado = processar_movimentacao_estoque(
+        material.id, "TRANSFERENCIA", 4.0,
+        local_origem_id=origem.id, local_destino_id=destino.id, db=db_session
+    )
+    assert resultado["sucesso"]
+    assert resultado["estoque_total"] == 10.0
+    assert obter_saldo_por_local(material.id, origem.id, db_session) == 6.0
+    assert obter_saldo_por_local(material.id, destino.id, db_session) == 4.0
+    
+    resultado = processar_movimentacao_estoque(
+        material.id, "SAIDA", 7.0, local_origem_id=origem.id, db=db_session
+    )
+    assert not resultado["sucesso"]
+    assert "Disponível: 6.0" in resultado["mensagem"]
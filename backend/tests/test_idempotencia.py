@@ -0,0 +1,73 @@
+"""Tests for Idempotency-Key support on write endpoints"""
+import pytest
+from datetime import datetime, timedelta
+from app.idempotencia import cache_respostas
+from app.models_modules import Material, MovimentoEstoque, RespostaIdempotente
+
+
+@pytest.fixture(autouse=True)
+def limpar_cache():
+    cache_respostas.limpar()
+    yield
+    cache_respostas.limpar()
+
+
+@pytest.fixture
+def material(db_session):
+    material = Material(codigo="MAT-0001", nome="Parafuso", unidade_medida="UN", estoque_atual=10.0)
+    db_session.add(material)
+    db_session.commit()
+    return material
+
+
+def _movimento(client, headers, material, quantidade=3.0):
+    return client.post(
+        "/materiais/movimentos",
+        json={"material_id": material.id, "tipo_movimento": "saida", "quantidade": quantidade},
+        headers=headers
+    )
+
+
+def test_repeticao_devolve_resposta_gravada(client, auth_headers, db_session, material):
+    """Test a retried request returns the stored response without executing again"""
+    headers = {**auth_headers, "Idempotency-Key": "pos-01-000123"}
+    
+    primeira = _movimento(client, headers, material)
+    assert primeira.status_code == 200
+    assert "idempotent-replayed" not in primeira.headers
+    
+    # Pelo banco (cache vazio) e depois pelo cache
+    cache_respostas.limpar()
+    for _ in range(2):
+        repetida = _movimento(client, headers, material)
+        assert repetida.status_code == 200
+        assert repetida.headers["idempotent-replayed"] == "true"
+        assert repetida.json() == primeira.json()
+    
+    db_session.expire_all()
+    assert db_session.query(MovimentoEstoque).count() == 1
+    assert db_session.get(Material, material.id).estoque_atual == 7.0
+    
+    # Sem chave a requisição é executada normalmente
+    assert _movimento(client, auth_headers, material).status_code == 200
+    assert db_session.query(MovimentoEstoque).count() == 2
+
+
+def test_chave_reutilizada_ou_em_andamento(client, auth_headers, db_session, material):
+    """Test a key reused with another body is rejected and an in-flight key conflicts"""
+    headers = {**auth_headers, "Idempotency-Key": "pos-01-000124"}
+    assert _movimento(client, headers, material, 3.0).status_code == 200
+    
+    response = _movimento(client, headers, material, 4.0)
+    assert response.status_code == 422
+    
+    db_session.add(RespostaIdempotente(
+        usuario="admin@test.com", chave="pos-01-000125", impressao="x" * 64,
+        concluida=0, expira_em=datetime.utcnow() + timedelta(hours=1)
+    ))
+    db_session.commit()
+    response = _movimento(client, {**auth_headers, "Idempotency-Key": "pos-01-000125"}, material)
+    assert response.status_code == 409
+    
+    db_session.expire_all()
+    assert db_session.query(MovimentoEstoque).count() == 1
@@ -0,0 +1,190 @@
+"""Tests for the background job queue"""
+import pytest
+from concurrent.futures import Future
+from datetime import date, datetime, timedelta
+from sqlalchemy import update
+from sqlalchemy.orm import sessionmaker
+from app.jobs import (
+    ErroDefinitivo, ExecutorJobs, TAREFAS, enfileirar, processar_pendentes, recuperar_jobs_orfaos,
+    reivindicar_jobs, tarefa
+)
+from app.models_modules import ContaPagar, ContaRecorrente, Fornecedor, Job, StatusJob
+
+
+@pytest.fixture
+def session_factory(db_session):
+    return sessionmaker(bind=db_session.get_bind(), autoflush=False)
+
+
+@pytest.fixture
+def tarefa_instavel():
+    """Tarefa de teste que falha nas primeiras execuções"""
+    chamadas = []
+    
+    @tarefa("teste.instavel", max_tentativas=2)
+    def instavel(session, parametros, progresso):
+        chamadas.append(parametros)
+        if parametros.get("definitivo"):
+            raise ErroDefinitivo("Dados inválidos")
+        if len(chamadas) < parametros.get("falhas", 0) + 1:
+            raise RuntimeError("Falha temporária")
+        return {"chamadas": len(chamadas)}
+    
+    yield chamadas
+    TAREFAS.pop("teste.instavel", None)
+
+
+def test_gerar_mensal_assincrono(client, auth_headers, db_session, session_factory):
+    """Test async monthly generation answers 202 and the job creates the accounts"""
+    fornecedor = Fornecedor(codigo="FOR-0001", nome="Fornecedor Aluguel", cnpj="11222333000181")
+    db_session.add(fornecedor)
+    db_session.commit()
+    db_session.add(ContaRecorrente(
+        tipo="pagar", descricao="Aluguel", fornecedor_id=fornecedor.id,
+        valor=2500.0, dia_vencimento=10, data_inicio=date(2026, 1, 1), ativa=1
+    ))
+    db_session.commit()
+    
+    headers = {**auth_headers, "Idempotency-Key": "gerar-2026-03"}
+    response = client.post(
+        "/financeiro/contas-recorrentes/gerar-mensal?mes=3&ano=2026&assincrono=true",
+        headers=headers
+    )
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert response.headers["location"] == f"/jobs/{job_id}"
+    assert db_session.query(ContaPagar).count() == 0
+    
+    # Mesma chave devolve o mesmo job
+    repetida = client.post(
+        "/financeiro/contas-recorrentes/gerar-mensal?mes=3&ano=2026&assincrono=true",
+        headers=headers
+    )
+    assert repetida.json()["job_id"] == job_id
+    assert db_session.query(Job).count() == 1
+    
+    assert processar_pendentes(session_factory) == 1
+    
+    db_session.expire_all()
+    conta = db_session.query(ContaPagar).one()
+    assert conta.valor_original == 2500.0
+    assert conta.data_vencimento == datetime(2026, 3, 10)
+    
+    response = client.get(f"/jobs/{job_id}", headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "concluido"
+    assert data["progresso"] == 100.0
+    assert data["resultado"]["contas_geradas"] == [{"tipo": "pagar", "descricao": "Aluguel"}]
+
+
+def test_job_retentativa_e_falha(db_session, session_factory, tarefa_instavel):
+    """Test transient errors are retried with backoff and definitive ones fail at once"""
+    job, criado = enfileirar(db_session, "teste.instavel", {"falhas": 1})
+    assert criado
+    
+    processar_pendentes(session_factory)
+    db_session.refresh(job)
+    assert job.status == StatusJob.PENDENTE
+    assert job.tentativas == 1
+    assert job.erro == "Falha temporária"
+    assert job.disponivel_em > datetime.utcnow()
+    
+    # Antes do backoff o job não é executado
+    assert processar_pendentes(session_factory) == 0
+    
+    job.disponivel_em = datetime.utcnow()
+    db_session.commit()
+    processar_pendentes(session_factory)
+    db_session.refresh(job)
+    assert job.status == StatusJob.CONCLUIDO
+    assert job.resultado == {"chamadas": 2}
+    
+    definitivo, _ = enfileirar(db_session, "teste.instavel", {"definitivo": True})
+    processar_pendentes(session_factory)
+    db_session.refresh(definitivo)
+    assert definitivo.status == StatusJob.FALHOU
+    assert definitivo.tentativas == 1
+    assert definitivo.erro == "Dados inválidos"
+
+
+def test_cancelar_e_reprocessar_job(client, auth_headers, db_session, tarefa_instavel):
+    """Test pending jobs can be cancelled and failed ones requeued"""
+    pendente, _ = enfileirar(db_session, "teste.instavel", {})
+    response = client.post(f"/jobs/{pendente.id}/cancelar", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["status"] == "cancelado"
+    
+    response = client.post(f"/jobs/{pendente.id}/reprocessar", headers=auth_headers)
+    assert response.status_code == 400
+    
+    falho, _ = enfileirar(db_session, "teste.instavel", {})
+    falho.status = StatusJob.FALHOU
+    falho.tentativas = 2
+    db_session.commit()
+    
+    response = client.post(f"/jobs/{falho.id}/reprocessar", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["status"] == "pendente"
+    assert response.json()["tentativas"] == 0
+
+
+def test_agendar_tarefas_diarias(db_session, session_factory):
+    """Test daily tasks are enqueued once per day and the overdue sweep runs from the queue"""
+    from app.jobs import agendar_tarefas_diarias
+    import app.routes.financeiro  # noqa: F401 - registra financeiro.varrer_vencidos
+    
+    assert TAREFAS["financeiro.varrer_vencidos"].diaria
+    assert agendar_tarefas_diarias(db_session, date(2026, 6, 30)) >= 1
+    assert agendar_tarefas_diarias(db_session, date(2026, 6, 30)) == 0
+    assert agendar_tarefas_diarias(db_session, date(2026, 7, 1)) >= 1
+    
+    job = db_session.query(Job).filter_by(chave_idempotencia="financeiro.varrer_vencidos:2026-06-30").one()
+    processar_pendentes(session_factory)
+    db_session.refresh(job)
+    assert job.status == StatusJob.CONCLUIDO
+    assert job.resultado["atualizados"]["contas_pagar"] == 0
+
+
+def test_chave_idempotencia_por_usuario_e_tarefa(db_session, tarefa_instavel):
+    """Test an idempotency key only returns the job of the same user and task"""
+    job, criado = enfileirar(db_session, "teste.instavel", {}, chave_idempotencia="lote-1", usuario_id=1)
+    assert criado
+    
+    mesmo, criado = enfileirar(db_session, "teste.instavel", {}, chave_idempotencia="lote-1", usuario_id=1)
+    assert (mesmo.id, criado) == (job.id, False)
+    
+    outro_usuario, criado = enfileirar(db_session, "teste.instavel", {}, chave_idempotencia="lote-1", usuario_id=2)
+    assert criado and outro_usuario.id != job.id
+    
+    sistema, criado = enfileirar(db_session, "teste.instavel", {}, chave_idempotencia="lote-1")
+    assert criado
+    assert enfileirar(db_session, "teste.instavel", {}, chave_idempotencia="lote-1")[0].id == sistema.id
+    assert db_session.query(Job).count() == 3
+
+
+def test_recupera_apenas_jobs_sem_sinal_de_vida(db_session, session_factory, tarefa_instavel):
+    """Test the executor heartbeat keeps long jobs claimed until their worker is gone"""
+    job, _ = enfileirar(db_session, "teste.instavel", {})
+    executor = ExecutorJobs(1, session_factory=session_factory)
+    assert reivindicar_jobs(db_session, executor.nome) == [job.id]
+    
+    def envelhecer():
+        db_session.execute(
+            update(Job).where(Job.id == job.id).values(updated_at=datetime.utcnow() - timedelta(hours=1))
+        )
+        db_session.commit()
+    
+    # Tarefa longa sem gravar progresso: o despacho renova o sinal de vida
+    envelhecer()
+    executor._em_andamento = {Future(): job.id}
+    executor._sinal_de_vida()
+    assert recuperar_jobs_orfaos(db_session, 60) == 0
+    db_session.refresh(job)
+    assert job.status == StatusJob.EXECUTANDO
+    
+    # Worker encerrado: sem sinal de vida o job volta para a fila
+    envelhecer()
+    assert recuperar_jobs_orfaos(db_session, 60) == 1
+    db_session.refresh(job)
+    assert (job.status, job.worker) == (StatusJob.PENDENTE, None)
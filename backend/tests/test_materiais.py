@@ -230,3 +230,219 @@ def test_get_material_saldo(client, auth_headers, db_session):
     if response.status_code == 200:
         data = response.json()
         assert "saldo_total" in data or "estoque_atual" in data
+
+
+# =============================================================================
+# TESTS FOR ESTATÍSTICAS DE LOCAIS
+# =============================================================================
+
+def _criar_locais_com_estoque(db_session):
+    """Cria dois locais, um com itens normais, zerados, críticos e consumo"""
+    from app.models_modules import EstoquePorLocal, TipoMovimento
+    
+    local_a = LocalEstoque(codigo="LOC-A", nome="Almoxarifado A", tipo="almoxarifado", ativo=1, padrao=1)
+    local_b = LocalEstoque(codigo="LOC-B", nome="Depósito B", tipo="deposito", ativo=1, padrao=0)
+    db_session.add_all([local_a, local_b])
+    
+    materiais = [
+        Material(codigo=f"MAT-{i}", nome=f"Material {i}", unidade_medida="UN", preco_medio=10.0)
+        for i in range(3)
+    ]
+    db_session.add_all(materiais)
+    db_session.commit()
+    
+    db_session.add_all([
+        EstoquePorLocal(material_id=materiais[0].id, local_id=local_a.id, quantidade=30.0, estoque_minimo=5.0),
+        EstoquePorLocal(material_id=materiais[1].id, local_id=local_a.id, quantidade=0.0),
+        EstoquePorLocal(material_id=materiais[2].id, local_id=local_a.id, quantidade=2.0, estoque_minimo=10.0),
+        EstoquePorLocal(material_id=materiais[0].id, local_id=local_b.id, quantidade=5.0),
+        MovimentoEstoque(
+            material_id=materiais[0].id,
+            tipo_movimento=TipoMovimento.SAIDA,
+            quantidade=32.0,
+            local_origem_id=local_a.id
+        ),
+    ])
+    db_session.commit()
+    return local_a, local_b
+
+
+def test_get_estatisticas_local(client, auth_headers, db_session):
+    """Test single-location statistics with value and coverage"""
+    local_a, _ = _criar_locais_com_estoque(db_session)
+    
+    response = client.get(
+        f"/locais/locais/{local_a.id}/estatisticas",
+        params={"janela_dias": 16},
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    estatisticas = response.json()["estatisticas"]
+    assert estatisticas["total_itens"] == 3
+    assert estatisticas["itens_com_estoque"] == 2
+    assert estatisticas["itens_zerados"] == 1
+    assert estatisticas["itens_criticos"] == 1
+    assert estatisticas["valor_estoque"] == 320.0
+    assert estatisticas["consumo_medio_diario"] == 2.0
+    assert estatisticas["dias_cobertura"] == 16.0
+
+
+def test_list_estatisticas_locais(client, auth_headers, db_session):
+    """Test statistics for all locations in one call"""
+    local_a, local_b = _criar_locais_com_estoque(db_session)
+    
+    response = client.get("/locais/locais/estatisticas", headers=auth_headers)
+    
+    assert response.status_code == 200
+    data = {item["local"]["id"]: item["estatisticas"] for item in response.json()}
+    assert data[local_a.id]["total_itens"] == 3
+    assert data[local_b.id]["total_itens"] == 1
+    assert data[local_b.id]["valor_estoque"] == 50.0
+    assert data[local_b.id]["dias_cobertura"] is None
+
+
+def test_get_estatisticas_local_not_found(client, auth_headers):
+    """Test statistics for a missing location"""
+    response = client.get("/locais/locais/999/estatisticas", headers=auth_headers)
+    assert response.status_code == 404
+
+
+# =============================================================================
+# TESTS FOR REPOSIÇÃO
+# =============================================================================
+
+def _criar_cenario_reposicao(client, auth_headers, db_session):
+    """Material com saldo baixo, consumo recente e um pedido de compra recebido pela metade"""
+    from datetime import timedelta
+    from app.models_modules import Fornecedor, PedidoCompra, ItemPedidoCompra, StatusCompra, TipoMovimento
+    
+    local = client.post("/locais/locais", json={"nome": "Central", "padrao": 1}, headers=auth_headers).json()
+    material = client.post("/materiais/materiais", json={
+        "codigo": "MAT-R", "nome": "Rolamento", "unidade_medida": "UN", "estoque_minimo": 2.0
+    }, headers=auth_headers).json()
+    fornecedor = Fornecedor(nome="Fornecedor Reposição", cnpj="11222333000181", ativo=1)
+    db_session.add(fornecedor)
+    db_session.commit()
+    
+    pedido = PedidoCompra(
+        numero="PC-2026-00001",
+        fornecedor_id=fornecedor.id,
+        status=StatusCompra.APROVADO,
+        itens=[ItemPedidoCompra(
+            material_id=material["id"], descricao="Rolamento",
+            quantidade=10.0, preco_unitario=10.0, preco_total=100.0
+        )]
+    )
+    db_session.add(pedido)
+    db_session.commit()
+    response = client.post(f"/compras/pedidos/{pedido.id}/receber", json={
+        "itens": [{"item_id": pedido.itens[0].id, "quantidade": 5}], "local_id": local["id"]
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    
+    # Histórico de consumo do local (a API registra saídas sempre na data atual)
+    db_session.add(MovimentoEstoque(
+        material_id=material["id"],
+        tipo_movimento=TipoMovimento.SAIDA,
+        quantidade=60.0,
+        local_origem_id=local["id"],
+        data_movimento=datetime.utcnow() - timedelta(days=10)
+    ))
+    db_session.commit()
+    return (
+        db_session.get(Material, material["id"]), db_session.get(LocalEstoque, local["id"]), fornecedor, pedido
+    )
+
+
+def test_list_sugestoes_reposicao(client, auth_headers, db_session):
+    """Test replenishment suggestion nets open purchase orders"""
+    material, local, _, _ = _criar_cenario_reposicao(client, auth_headers, db_session)
+    
+    response = client.get("/materiais/reposicao/sugestoes", headers=auth_headers)
+    
+    assert response.status_code == 200
+    sugestoes = response.json()["sugestoes"]
+    assert len(sugestoes) == 1
+    sugestao = sugestoes[0]
+    assert sugestao["material_id"] == material.id
+    assert sugestao["local_id"] == local.id
+    assert sugestao["quantidade"] == 5.0
+    assert sugestao["estoque_minimo"] == 2.0  # Do cadastro do material
+    assert sugestao["pedidos_abertos"] == 5.0
+    # demanda = 0.6 * 60/30 + 0.4 * 60/90; alvo = demanda * 37 + 2
+    assert sugestao["quantidade_sugerida"] == 47
+    assert sugestao["valor_estimado"] == 470.0
+
+
+def test_sugestoes_reposicao_minimo_do_material_sem_consumo(client, auth_headers, db_session):
+    """Test a never-stocked material below its registered minimum is suggested at the default location only"""
+    from app.models_modules import EstoquePorLocal
+    
+    central = client.post("/locais/locais", json={"nome": "Central", "padrao": 1}, headers=auth_headers).json()
+    filial = client.post("/locais/locais", json={"nome": "Filial"}, headers=auth_headers).json()
+    nunca_estocado = client.post("/materiais/materiais", json={
+        "codigo": "MAT-M", "nome": "Filtro", "unidade_medida": "UN", "estoque_minimo": 10.0
+    }, headers=auth_headers).json()
+    so_na_filial = client.post("/materiais/materiais", json={
+        "codigo": "MAT-N", "nome": "Correia", "unidade_medida": "UN", "estoque_minimo": 10.0
+    }, headers=auth_headers).json()
+    db_session.add(EstoquePorLocal(material_id=so_na_filial["id"], local_id=filial["id"], quantidade=3.0))
+    db_session.commit()
+    
+    response = client.get("/materiais/reposicao/sugestoes", headers=auth_headers)
+    
+    assert response.status_code == 200
+    sugestoes = {(s["material_id"], s["local_id"]): s for s in response.json()["sugestoes"]}
+    # O mínimo da empresa vale só no local padrão: nada é sugerido para a filial
+    assert set(sugestoes) == {(nunca_estocado["id"], central["id"]), (so_na_filial["id"], central["id"])}
+    sugestao = sugestoes[(nunca_estocado["id"], central["id"])]
+    assert (sugestao["quantidade"], sugestao["demanda_diaria"]) == (0.0, 0.0)
+    assert sugestao["quantidade_sugerida"] == 10
+
+
+def test_sugestoes_reposicao_recebimento_parcial(client, auth_headers, db_session):
+    """Test units already received are not counted again as pending supply"""
+    material, local, _, pedido = _criar_cenario_reposicao(client, auth_headers, db_session)
+    
+    response = client.post(f"/compras/pedidos/{pedido.id}/receber", json={
+        "itens": [{"item_id": pedido.itens[0].id, "quantidade": 3}], "local_id": local.id
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    
+    response = client.get("/materiais/reposicao/sugestoes", headers=auth_headers)
+    
+    assert response.status_code == 200
+    sugestao = response.json()["sugestoes"][0]
+    assert sugestao["quantidade"] == 8.0
+    assert sugestao["pedidos_abertos"] == 2.0
+    # Posição projetada 8 + 2 abaixo do ponto de pedido; alvo = demanda * 37 + 2
+    assert sugestao["quantidade_sugerida"] == 47
+
+
+def test_converter_sugestoes_em_pedido(client, auth_headers, db_session):
+    """Test bulk conversion of suggestions into a draft purchase order"""
+    from app.models_modules import PedidoCompra, StatusCompra
+    
+    material, _, fornecedor, _ = _criar_cenario_reposicao(client, auth_headers, db_session)
+    
+    response = client.post(
+        "/materiais/reposicao/converter",
+        json={"destino": "pedido", "fornecedor_id": fornecedor.id},
+        headers=auth_headers
+    )
+    
+    assert response.status_code == 200
+    pedido = db_session.query(PedidoCompra).filter(PedidoCompra.id == response.json()["id"]).first()
+    assert pedido.status == StatusCompra.RASCUNHO
+    assert pedido.numero.endswith("00002")
+    assert len(pedido.itens) == 1
+    assert pedido.itens[0].material_id == material.id
+    assert pedido.itens[0].quantidade == 47
+    
+    response = client.post(
+        "/materiais/reposicao/converter",
+        json={"destino": "pedido"},
+        headers=auth_headers
+    )
+    assert response.status_code == 400
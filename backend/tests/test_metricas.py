@@ -0,0 +1,48 @@
+"""Tests for request instrumentation and /metrics"""
+import logging
+from app.metricas import (
+    ContextoRequisicao, _rotulos, finalizar_requisicao, forma_comando, n_mais_um_total
+)
+from app.models_modules import Material
+
+
+def test_metrics_expoe_latencia_e_sql_por_rota(client, auth_headers, db_session):
+    """Test each request records route latency and SQL counts exposed in Prometheus format"""
+    material = Material(codigo="MAT-0001", nome="Parafuso", unidade_medida="UN")
+    db_session.add(material)
+    db_session.commit()
+    
+    response = client.get(f"/materiais/materiais/{material.id}", headers=auth_headers)
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    assert timing.startswith("app;dur=")
+    assert "sql;dur=" in timing
+    
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain")
+    texto = metrics.text
+    assert "# TYPE http_requisicao_duracao_segundos histogram" in texto
+    assert 'http_requisicoes_total{metodo="GET",rota="/materiais/materiais/{material_id}",status="200"}' in texto
+    assert 'http_sql_consultas_por_requisicao_count{metodo="GET",rota="/materiais/materiais/{material_id}"}' in texto
+    assert 'http_requisicao_duracao_segundos_bucket{le="+Inf",metodo="GET",rota="/materiais/materiais/{material_id}"}' not in texto
+    assert 'http_requisicao_duracao_segundos_bucket{metodo="GET",rota="/materiais/materiais/{material_id}",le="+Inf"}' in texto
+
+
+def test_n_mais_um_detectado(caplog):
+    """Test the same statement shape above the threshold is flagged as N+1"""
+    assert forma_comando("SELECT * FROM t WHERE id IN (?, ?, ?) AND x = 'a'") == \
+        forma_comando("SELECT * FROM t WHERE id IN (?)  AND x = 'b'")
+    
+    contexto = ContextoRequisicao("GET", "/vendas/pedidos")
+    for material_id in range(15):
+        contexto.registrar(f"SELECT * FROM materiais WHERE materiais.id = {material_id}", 0.001)
+    contexto.registrar("SELECT * FROM pedidos_venda", 0.002)
+    
+    rotulos = _rotulos(metodo="GET", rota="/vendas/pedidos")
+    antes = n_mais_um_total.valor(rotulos)
+    with caplog.at_level(logging.WARNING, logger="app.metricas"):
+        finalizar_requisicao(contexto, "/vendas/pedidos", 200, 0.05)
+    
+    assert n_mais_um_total.valor(rotulos) == antes + 1
+    assert "repetido 15 vezes (16 consultas no total)" in caplog.text
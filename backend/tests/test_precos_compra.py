@@ -0,0 +1,122 @@
+"""Tests for the purchase price history and price analytics endpoints"""
+import pytest
+from app.models_modules import (
+    Cotacao, HistoricoPreco, ItemCotacao, ItemPedidoCompra, PedidoCompra, StatusCompra
+)
+from app.precos_compra import PESO_MEDIA_MOVEL, reconstruir_historico_precos
+
+
+def _aprovar_pedido(client, auth_headers, db_session, fornecedor, itens):
+    pedido = PedidoCompra(
+        numero=f"PC-{db_session.query(PedidoCompra).count() + 1}",
+        fornecedor_id=fornecedor.id,
+        status=StatusCompra.SOLICITADO,
+        itens=[
+            ItemPedidoCompra(material_id=m.id, descricao=m.nome, quantidade=q, preco_unitario=p, preco_total=q * p)
+            for m, q, p in itens
+        ]
+    )
+    db_session.add(pedido)
+    db_session.commit()
+    response = client.post(f"/compras/pedidos/{pedido.id}/aprovar", headers=auth_headers)
+    assert response.status_code == 200
+    return pedido
+
+
+def test_aprovacao_atualiza_historico_incrementalmente(client, auth_headers, db_session, cadastros):
+    (f0, f1, _), _, _, (m0, m1) = cadastros(fornecedores=3)
+    # Same material twice in one order counts as one observation (quantity-weighted)
+    _aprovar_pedido(client, auth_headers, db_session, f0, [(m0, 1, 10.0), (m0, 3, 14.0)])
+    _aprovar_pedido(client, auth_headers, db_session, f0, [(m0, 1, 16.0)])
+    _aprovar_pedido(client, auth_headers, db_session, f1, [(m0, 1, 12.0), (m1, 5, 3.0)])
+
+    response = client.get(f"/compras/precos/materiais/{m0.id}", headers=auth_headers)
+    assert response.status_code == 200
+    linhas = response.json()["fornecedores"]
+    assert [l["fornecedor_id"] for l in linhas] == [f1.id, f0.id]
+
+    f0_linha = linhas[1]
+    assert f0_linha["ultimo_preco"] == 16.0
+    assert (f0_linha["preco_minimo"], f0_linha["preco_maximo"]) == (13.0, 16.0)
+    assert f0_linha["observacoes"] == 2
+    assert f0_linha["preco_medio"] == 14.5
+    assert f0_linha["media_movel"] == pytest.approx(13.0 + PESO_MEDIA_MOVEL * 3.0)
+    assert f0_linha["tendencia_percentual"] < 0  # moving average lags behind the jump
+    assert f0_linha["ultima_origem"] == "pedido"
+
+    tendencias = client.get("/compras/precos/tendencias", params={"alta": False}, headers=auth_headers).json()
+    assert [(t["material_id"], t["fornecedor_id"]) for t in tendencias] == [(m0.id, f0.id)]
+
+    referencia = client.get(
+        "/compras/precos/referencia", params={"material_id": [m0.id, m1.id, 99999]}, headers=auth_headers
+    ).json()
+    assert referencia["sem_historico"] == [99999]
+    r0 = referencia["referencias"][0]
+    assert (r0["menor_ultimo_preco"], r0["melhor_fornecedor_id"], r0["fornecedores"]) == (12.0, f1.id, 2)
+    assert r0["preco_medio"] == round((13.0 + 16.0 + 12.0) / 3, 4)
+
+
+def test_respostas_de_cotacao_alimentam_referencia(client, auth_headers, db_session, cadastros):
+    (f0, f1, _), _, _, (m0, m1) = cadastros(fornecedores=3)
+    cotacao = Cotacao(numero="COT-0001", descricao="Cotação", itens=[
+        ItemCotacao(material_id=m0.id, descricao=m0.nome, quantidade=2),
+        ItemCotacao(descricao="Serviço sem material", quantidade=1),
+    ])
+    db_session.add(cotacao)
+    db_session.commit()
+    itens = cotacao.itens
+
+    client.post(f"/cotacoes/cotacoes/{cotacao.id}/respostas/lote", json=[
+        {"fornecedor_id": f.id, "itens": [
+            {"item_cotacao_id": itens[0].id, "preco_unitario": preco},
+            {"item_cotacao_id": itens[1].id, "preco_unitario": 50.0},
+        ]}
+        for f, preco in ((f0, 9.0), (f1, 7.5))
+    ], headers=auth_headers)
+
+    assert db_session.query(HistoricoPreco).count() == 2
+    response = client.get(f"/cotacoes/cotacoes/{cotacao.id}/precos-referencia", headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data[0]["referencia"]["menor_ultimo_preco"] == 7.5
+    assert data[0]["referencia"]["melhor_fornecedor_id"] == f1.id
+    assert data[1]["referencia"] is None
+
+
+def test_ranking_fornecedores(client, auth_headers, db_session, cadastros):
+    (f0, f1, f2), _, _, (m0, m1) = cadastros(fornecedores=3)
+    _aprovar_pedido(client, auth_headers, db_session, f0, [(m0, 1, 10.0), (m1, 1, 20.0)])
+    _aprovar_pedido(client, auth_headers, db_session, f1, [(m0, 1, 12.0), (m1, 1, 20.0)])
+    _aprovar_pedido(client, auth_headers, db_session, f2, [(m0, 1, 15.0)])
+
+    ranking = client.get("/compras/precos/ranking-fornecedores", headers=auth_headers).json()
+    assert [r["fornecedor_id"] for r in ranking] == [f0.id, f1.id, f2.id]
+    assert ranking[0]["indice_preco"] == 1.0
+    assert ranking[1]["indice_preco"] == pytest.approx((1.2 + 1.0) / 2)
+    assert ranking[1]["materiais_mais_barato"] == 1
+
+    apenas_dois = client.get(
+        "/compras/precos/ranking-fornecedores", params={"minimo_materiais": 2}, headers=auth_headers
+    ).json()
+    assert [r["fornecedor_id"] for r in apenas_dois] == [f0.id, f1.id]
+
+
+def test_reconstrucao_reproduz_historico_incremental(client, auth_headers, db_session, cadastros):
+    (f0, f1, _), _, _, (m0, m1) = cadastros(fornecedores=3)
+    for preco in (10.0, 11.0, 9.5):
+        _aprovar_pedido(client, auth_headers, db_session, f0, [(m0, 2, preco), (m1, 1, preco * 2)])
+    _aprovar_pedido(client, auth_headers, db_session, f1, [(m0, 1, 8.0)])
+
+    colunas = ("material_id", "fornecedor_id", "ultimo_preco", "preco_minimo", "preco_maximo",
+               "soma_precos", "observacoes", "media_movel", "ultima_origem")
+
+    def _estado():
+        db_session.expire_all()
+        return sorted(tuple(getattr(h, c) for c in colunas) for h in db_session.query(HistoricoPreco))
+
+    incremental = _estado()
+    assert reconstruir_historico_precos(db_session) == {"pares": 3, "documentos": 4}
+    db_session.commit()
+    reconstruido = _estado()
+    assert [r[:7] + r[8:] for r in reconstruido] == [r[:7] + r[8:] for r in incremental]
+    assert [r[7] for r in reconstruido] == pytest.approx([r[7] for r in incremental])
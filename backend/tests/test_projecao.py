@@ -0,0 +1,46 @@
+"""Tests for summary/fields projections on list endpoints"""
+from datetime import datetime, timedelta
+from app.models_modules import ContaPagar, Fornecedor, Material, StatusPagamento
+
+
+def test_materiais_view_summary(client, auth_headers, db_session):
+    db_session.add_all([
+        Material(codigo=f"MAT-{i:04d}", nome=f"Material {i}", unidade_medida="UN", estoque_atual=i)
+        for i in range(5)
+    ])
+    db_session.commit()
+
+    completa = client.get("/materiais/materiais?limit=3", headers=auth_headers).json()
+    response = client.get("/materiais/materiais?limit=3&view=summary", headers=auth_headers)
+    assert response.status_code == 200
+    resumo = response.json()
+
+    assert len(resumo) == 3
+    assert list(resumo[0]) == ["id", "codigo", "nome", "unidade_medida", "estoque_atual", "ativo"]
+    # Mesmos valores da resposta completa nas colunas projetadas
+    assert resumo == [{campo: item[campo] for campo in resumo[0]} for item in completa]
+
+
+def test_contas_pagar_fields(client, auth_headers, db_session):
+    fornecedor = Fornecedor(codigo="FOR-0001", nome="Fornecedor", cnpj="11222333000181")
+    db_session.add(fornecedor)
+    db_session.commit()
+    db_session.add(ContaPagar(
+        descricao="Aluguel", fornecedor_id=fornecedor.id, valor_original=1500.0,
+        data_vencimento=datetime(2026, 1, 10), status=StatusPagamento.PENDENTE
+    ))
+    db_session.commit()
+
+    response = client.get(
+        "/financeiro/contas-pagar?fields=descricao,status,data_vencimento", headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json() == [{
+        "id": 1, "descricao": "Aluguel", "status": "pendente", "data_vencimento": "2026-01-10T00:00:00"
+    }]
+
+
+def test_fields_invalido(client, auth_headers):
+    response = client.get("/vendas/clientes?fields=nome,senha", headers=auth_headers)
+    assert response.status_code == 400
+    assert "senha" in response.json()["detail"]
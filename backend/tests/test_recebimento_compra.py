@@ -0,0 +1,144 @@
+"""Tests for purchase order goods receipt"""
+import pytest
+from app.models_modules import (
+    ContaPagar, EstoquePorLocal, ItemPedidoCompra, Material, MovimentoEstoque, PedidoCompra, StatusCompra
+)
+from tests.conftest import consultas_sql
+
+
+def _pedido(db_session, fornecedor, linhas, status=StatusCompra.APROVADO):
+    pedido = PedidoCompra(
+        numero=f"PC-{db_session.query(PedidoCompra).count() + 1:04d}",
+        fornecedor_id=fornecedor.id,
+        status=status,
+        valor_total=sum(q * p for _, q, p in linhas),
+        itens=[
+            ItemPedidoCompra(material_id=m.id, descricao=m.nome, quantidade=q, preco_unitario=p, preco_total=q * p)
+            for m, q, p in linhas
+        ]
+    )
+    db_session.add(pedido)
+    db_session.commit()
+    return pedido
+
+
+def test_recebimento_parcial_e_total(client, auth_headers, db_session, cadastros):
+    (fornecedor,), _, (local,), materiais = cadastros(locais=1, materiais=12)
+    m0, m1 = materiais[:2]
+    m0.estoque_atual, m0.preco_medio = 10.0, 8.0
+    db_session.add(EstoquePorLocal(material_id=m0.id, local_id=local.id, quantidade=10.0))
+    db_session.commit()
+    pedido = _pedido(db_session, fornecedor, [(m0, 10, 12.0), (m1, 4, 5.0)])
+    item0, item1 = pedido.itens
+
+    response = client.post(f"/compras/pedidos/{pedido.id}/receber", json={
+        "itens": [{"item_id": item0.id, "quantidade": 6}],
+        "numero_documento": "NF-123",
+        "quantidade_parcelas": 3,
+        "intervalo_dias": 30
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["completo"] is False
+    assert data["valor_recebido"] == 72.0
+    assert data["itens"] == [{
+        "item_id": item0.id, "material_id": m0.id, "quantidade": 6.0, "quantidade_recebida": 6.0, "saldo": 4.0
+    }]
+
+    db_session.expire_all()
+    assert db_session.get(Material, m0.id).estoque_atual == 16.0
+    assert db_session.get(Material, m0.id).preco_medio == pytest.approx((10 * 8.0 + 6 * 12.0) / 16)
+    conta = db_session.get(ContaPagar, data["conta_pagar_id"])
+    assert (conta.valor_original, conta.numero_documento, conta.pedido_compra_id) == (72.0, "NF-123", pedido.id)
+    assert [p.valor for p in conta.parcelas] == [24.0, 24.0, 24.0]
+    assert db_session.get(PedidoCompra, pedido.id).status == StatusCompra.APROVADO
+
+    # Sem itens: recebe todo o saldo pendente
+    response = client.post(f"/compras/pedidos/{pedido.id}/receber", json={}, headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["completo"] is True
+    assert data["status"] == "recebido"
+    assert {i["item_id"]: i["quantidade"] for i in data["itens"]} == {item0.id: 4.0, item1.id: 4.0}
+
+    db_session.expire_all()
+    pedido = db_session.get(PedidoCompra, pedido.id)
+    assert pedido.data_recebimento is not None
+    assert [i.quantidade_recebida for i in pedido.itens] == [10.0, 4.0]
+    saldos = {e.material_id: e.quantidade for e in db_session.query(EstoquePorLocal)}
+    assert saldos == {m0.id: 20.0, m1.id: 4.0}
+    assert db_session.get(Material, m1.id).preco_medio == 5.0
+    assert db_session.query(MovimentoEstoque).filter(MovimentoEstoque.documento == f"PC {pedido.numero}").count() == 3
+
+    response = client.post(f"/compras/pedidos/{pedido.id}/receber", json={}, headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_recebimento_rejeita_quantidade_acima_do_saldo(client, auth_headers, db_session, cadastros):
+    (fornecedor,), _, (local,), materiais = cadastros(locais=1, materiais=12)
+    pedido = _pedido(db_session, fornecedor, [(materiais[0], 2, 1.0)])
+    rascunho = _pedido(db_session, fornecedor, [(materiais[0], 2, 1.0)], status=StatusCompra.RASCUNHO)
+
+    response = client.post(f"/compras/pedidos/{pedido.id}/receber", json={
+        "itens": [{"item_id": pedido.itens[0].id, "quantidade": 3}]
+    }, headers=auth_headers)
+    assert response.status_code == 400
+    assert "saldo" in response.json()["detail"]
+
+    assert client.post(f"/compras/pedidos/{rascunho.id}/receber", json={}, headers=auth_headers).status_code == 400
+    assert client.post("/compras/pedidos/99999/receber", json={}, headers=auth_headers).status_code == 404
+    assert db_session.query(MovimentoEstoque).count() == 0
+    assert db_session.query(ContaPagar).count() == 0
+
+
+def test_recebimento_com_quantidade_fixa_de_consultas(client, auth_headers, db_session, cadastros):
+    (fornecedor,), _, (local,), materiais = cadastros(locais=1, materiais=12)
+    pequeno = _pedido(db_session, fornecedor, [(m, 1, 2.0) for m in materiais[:2]])
+    grande = _pedido(db_session, fornecedor, [(m, 1, 2.0) for m in materiais])
+    aquecimento = _pedido(db_session, fornecedor, [(materiais[0], 1, 2.0)])
+    client.post(f"/compras/pedidos/{aquecimento.id}/receber", json={}, headers=auth_headers)
+
+    consultas = [
+        consultas_sql(client.post(f"/compras/pedidos/{pedido.id}/receber", json={"quantidade_parcelas": 2}, headers=auth_headers))
+        for pedido in (pequeno, grande)
+    ]
+    assert consultas[0] == consultas[1]
+
+
+def test_recebimento_em_lote_e_arquivo_da_doca(client, auth_headers, db_session, cadastros):
+    (fornecedor,), _, (local,), materiais = cadastros(locais=1, materiais=12)
+    m0, m1 = materiais[:2]
+    p1 = _pedido(db_session, fornecedor, [(m0, 3, 2.0), (m1, 1, 4.0)])
+    p2 = _pedido(db_session, fornecedor, [(m0, 5, 2.0)])
+    p3 = _pedido(db_session, fornecedor, [(m1, 2, 4.0)])
+
+    response = client.post("/compras/pedidos/receber-lote", json={
+        "recebimentos": [{"pedido_id": p2.id}, {"pedido_id": 99999}],
+        "gerar_conta_pagar": False
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert [r["pedido_id"] for r in data["recebidos"]] == [p2.id]
+    assert [r["pedido_id"] for r in data["rejeitadas"]] == [99999]
+    assert db_session.query(ContaPagar).count() == 0
+
+    arquivo = "\n".join([
+        "numero_pedido;codigo_material;quantidade",
+        f"{p1.numero};{m0.codigo}",
+        f"{p1.numero};{m0.codigo}",
+        f"{p1.numero};{m1.codigo};1",
+        f"{p3.numero};{m1.codigo};5",
+        "PC-9999;MAT-0;1",
+    ])
+    response = client.post(
+        "/compras/pedidos/receber-lote/arquivo", content=arquivo,
+        headers={**auth_headers, "Content-Type": "text/csv"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [(r["numero"], r["completo"]) for r in data["recebidos"]] == [(p1.numero, False)]
+    assert {r["numero"] for r in data["rejeitadas"]} == {p3.numero, "PC-9999"}
+
+    db_session.expire_all()
+    assert [i.quantidade_recebida for i in db_session.get(PedidoCompra, p1.id).itens] == [2.0, 1.0]
+    assert db_session.get(Material, m0.id).estoque_atual == 7.0
@@ -0,0 +1,57 @@
+"""Tests for the orjson-backed JSON response"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from app import respostas
+from app.models_modules import StatusPagamento
+from app.schemas_modules import CentroCustoBase
+from app.respostas import RespostaJSON, serializar_json
+
+
+CONTEUDO = {
+    "data": date(2026, 1, 31),
+    "criado_em": datetime(2026, 1, 31, 10, 30, 15, 123456),
+    "status": StatusPagamento.PAGO,
+    "valor": Decimal("10.50"),
+    "itens": [{"id": 1, "conciliado": True, "descricao": "Tarifa ção"}],
+    "centro": CentroCustoBase(codigo="CC-01", nome="Adm"),
+}
+
+
+@pytest.mark.parametrize("com_orjson", [True, False])
+def test_serializa_como_jsonable_encoder(monkeypatch, com_orjson):
+    """Test the fast path produces the same JSON as FastAPI's default encoder"""
+    if not com_orjson:
+        monkeypatch.setattr(respostas, "orjson", None)
+
+    assert json.loads(serializar_json(CONTEUDO)) == jsonable_encoder(CONTEUDO)
+
+
+def test_resposta_json(client, auth_headers, db_session):
+    """Test extrato is served through RespostaJSON with ISO dates"""
+    from app.models_modules import ContaBancaria, MovimentacaoBancaria, TipoMovimentacaoBancaria
+    conta = ContaBancaria(nome="Conta", saldo_inicial=100.0)
+    db_session.add(conta)
+    db_session.commit()
+    db_session.add(MovimentacaoBancaria(
+        conta_bancaria_id=conta.id, tipo=TipoMovimentacaoBancaria.DEPOSITO, natureza="ENTRADA",
+        valor=50.0, descricao="Depósito", data_competencia=date(2026, 1, 5)
+    ))
+    db_session.commit()
+
+    response = client.get(
+        f"/financeiro/contas-bancarias/{conta.id}/extrato?data_inicio=2026-01-01&data_fim=2026-01-31",
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    data = response.json()
+    assert data["periodo"] == {"inicio": "2026-01-01", "fim": "2026-01-31"}
+    assert data["movimentacoes"][0]["data"] == "2026-01-05"
+    assert data["movimentacoes"][0]["tipo"] == "deposito"
+    assert data["saldo_final"] == 150.0
+    assert RespostaJSON(data).body == serializar_json(data)
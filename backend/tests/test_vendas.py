@@ -177,3 +177,303 @@ def test_list_clientes_with_data(client, auth_headers, db_session):
     assert response.status_code == 200
     data = response.json()
     assert len(data) == 3
+
+
+# =============================================================================
+# TESTS FOR RESERVA DE ESTOQUE
+# =============================================================================
+
+def _criar_pedidos_concorrentes(db_session):
+    """Dois pedidos em orçamento que, juntos, excedem o estoque do local padrão"""
+    from app.models_modules import (
+        EstoquePorLocal, LocalEstoque, Material, PedidoVenda, ItemPedidoVenda
+    )
+    
+    cliente = Cliente(codigo="CLI-0001", nome="Cliente Reserva", cpf_cnpj="12345678909", ativo=1)
+    local = LocalEstoque(codigo="LOC-0001", nome="Central", ativo=1, padrao=1)
+    material = Material(codigo="MAT-0001", nome="Parafuso", unidade_medida="UN", estoque_atual=10.0)
+    db_session.add_all([cliente, local, material])
+    db_session.commit()
+    
+    db_session.add(EstoquePorLocal(material_id=material.id, local_id=local.id, quantidade=10.0))
+    pedidos = []
+    for i in range(2):
+        pedido = PedidoVenda(
+            codigo=f"PV-000{i + 1}",
+            cliente_id=cliente.id,
+            status="orcamento",
+            valor_total=60.0,
+            itens=[ItemPedidoVenda(
+                material_id=material.id, quantidade=6.0, preco_unitario=10.0, subtotal=60.0
+            )]
+        )
+        db_session.add(pedido)
+        pedidos.append(pedido)
+    db_session.commit()
+    return material, local, pedidos
+
+
+def test_aprovar_pedido_reserva_estoque(client, auth_headers, db_session):
+    """Test approval reserves stock so a second order cannot promise it again"""
+    material, local, (pedido1, pedido2) = _criar_pedidos_concorrentes(db_session)
+    
+    response = client.post(f"/vendas/pedidos/{pedido1.id}/aprovar", headers=auth_headers)
+    assert response.status_code == 200
+    
+    response = client.post(f"/vendas/pedidos/{pedido2.id}/aprovar", headers=auth_headers)
+    assert response.status_code == 400
+    assert "Disponível: 4.0" in response.json()["detail"]
+    
+    response = client.get(
+        "/materiais/disponibilidade",
+        params={"material_id": material.id},
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json()[0]["reservado"] == 6.0
+    assert response.json()[0]["disponivel"] == 4.0
+    
+    # Cancelar o primeiro libera a reserva para o segundo
+    response = client.post(f"/vendas/pedidos/{pedido1.id}/cancelar", headers=auth_headers)
+    assert response.status_code == 200
+    
+    response = client.post(f"/vendas/pedidos/{pedido2.id}/aprovar", headers=auth_headers)
+    assert response.status_code == 200
+
+
+def test_saidas_respeitam_reservas(client, auth_headers, db_session):
+    """Test manual stock-outs, transfers and NF emission cannot consume reserved stock"""
+    from app.emissao_nf import emitir_notas
+    from app.models_modules import (
+        EstoquePorLocal, ItemNotaFiscal, LocalEstoque, NotaFiscal, StatusNotaFiscal, TipoNotaFiscal
+    )
+    
+    material, local, (pedido1, _) = _criar_pedidos_concorrentes(db_session)
+    destino = LocalEstoque(codigo="LOC-0002", nome="Loja", ativo=1)
+    db_session.add(destino)
+    db_session.commit()
+    assert client.post(f"/vendas/pedidos/{pedido1.id}/aprovar", headers=auth_headers).status_code == 200
+    
+    # 10 em estoque, 6 reservados: só 4 disponíveis
+    response = client.post("/materiais/movimentos", json={
+        "material_id": material.id, "tipo_movimento": "saida", "quantidade": 5.0
+    }, headers=auth_headers)
+    assert response.status_code == 400
+    assert "Disponível: 4.0" in response.json()["detail"]
+    
+    response = client.post(f"/locais/locais/{local.id}/transferir", params={
+        "destino_id": destino.id, "material_id": material.id, "quantidade": 5.0
+    }, headers=auth_headers)
+    assert response.status_code == 400
+    assert "Disponível: 4.0" in response.json()["detail"]
+    
+    nf = NotaFiscal(
+        numero="000000001", tipo=TipoNotaFiscal.SAIDA, status=StatusNotaFiscal.RASCUNHO,
+        cliente_id=pedido1.cliente_id, local_estoque_id=local.id,
+        itens=[ItemNotaFiscal(material_id=material.id, descricao="Parafuso", unidade="UN",
+                              quantidade=5.0, valor_unitario=10.0, valor_total=50.0)]
+    )
+    db_session.add(nf)
+    db_session.commit()
+    resultado = emitir_notas(db_session, [nf])
+    assert resultado["emitidas"] == []
+    assert "Estoque insuficiente" in resultado["rejeitadas"][0]["motivo"]
+    db_session.rollback()
+    
+    # O faturamento consome a própria reserva
+    assert client.post(f"/vendas/pedidos/{pedido1.id}/faturar", headers=auth_headers).status_code == 200
+    db_session.expire_all()
+    assert db_session.query(EstoquePorLocal).filter_by(material_id=material.id, local_id=local.id).one().quantidade == 4.0
+
+
+def test_faturar_pedido_consome_reserva(client, auth_headers, db_session):
+    """Test invoicing consumes the reservation and the physical stock"""
+    from app.models_modules import ContaReceber
+    from app.reservas import consultar_disponibilidade
+    
+    material, local, (pedido1, _) = _criar_pedidos_concorrentes(db_session)
+    
+    assert client.post(f"/vendas/pedidos/{pedido1.id}/aprovar", headers=auth_headers).status_code == 200
+    
+    response = client.post(f"/vendas/pedidos/{pedido1.id}/faturar", headers=auth_headers)
+    assert response.status_code == 200
+    
+    linha = consultar_disponibilidade(db_session, material_ids=[material.id])[0]
+    assert linha.estoque == 4.0
+    assert linha.reservado == 0.0
+    
+    conta = db_session.get(ContaReceber, response.json()["conta_receber_id"])
+    assert (conta.pedido_venda_id, conta.valor_original) == (pedido1.id, pedido1.valor_total)
+    assert db_session.query(ContaReceber).filter(
+        ContaReceber.pedido_venda_id == pedido1.id
+    ).count() == 1
+
+
+# =============================================================================
+# TESTS FOR LIMITE DE CRÉDITO
+# =============================================================================
+
+def _cenario_credito(db_session, limite=1000.0, pedidos=3, titulos=0):
+    """Cliente com limite, estoque de sobra e pedidos de 100,00 em orçamento"""
+    from datetime import datetime
+    from app.models_modules import (
+        ContaReceber, EstoquePorLocal, LocalEstoque, Material, PedidoVenda, ItemPedidoVenda
+    )
+    
+    cliente = Cliente(codigo="CLI-0001", nome="Cliente Crédito", cpf_cnpj="12345678909", ativo=1, limite_credito=limite)
+    local = LocalEstoque(codigo="LOC-0001", nome="Central", ativo=1, padrao=1)
+    material = Material(codigo="MAT-0001", nome="Parafuso", unidade_medida="UN", estoque_atual=1000.0)
+    db_session.add_all([cliente, local, material])
+    db_session.commit()
+    
+    db_session.add(EstoquePorLocal(material_id=material.id, local_id=local.id, quantidade=1000.0))
+    db_session.add_all([
+        ContaReceber(descricao=f"Título {i}", cliente_id=cliente.id, data_vencimento=datetime(2026, 12, 1), valor_original=10.0)
+        for i in range(titulos)
+    ])
+    lista = [
+        PedidoVenda(
+            codigo=f"PV-{i + 1:04d}", cliente_id=cliente.id, status="orcamento", valor_total=100.0,
+            itens=[ItemPedidoVenda(material_id=material.id, quantidade=1.0, preco_unitario=100.0, subtotal=100.0)]
+        )
+        for i in range(pedidos)
+    ]
+    db_session.add_all(lista)
+    db_session.commit()
+    return cliente, lista
+
+
+def _exposicao(client, cliente_id):
+    return client.get(f"/vendas/clientes/{cliente_id}/credito").json()
+
+
+def test_aprovar_pedido_respeita_limite_de_credito(client, auth_headers, db_session):
+    """Test approval checks open receivables + approved orders against the credit limit"""
+    from datetime import datetime
+    from app.models_modules import ContaReceber, StatusPagamento
+    
+    cliente, (pedido1, pedido2, pedido3) = _cenario_credito(db_session, limite=250.0)
+    titulo = ContaReceber(
+        descricao="Título", cliente_id=cliente.id, data_vencimento=datetime(2026, 12, 1), valor_original=80.0
+    )
+    db_session.add(titulo)
+    db_session.commit()
+    
+    assert client.post(f"/vendas/pedidos/{pedido1.id}/aprovar", headers=auth_headers).status_code == 200
+    assert _exposicao(client, cliente.id)["exposicao"] == 180.0
+    
+    response = client.post(f"/vendas/pedidos/{pedido2.id}/aprovar", headers=auth_headers)
+    assert response.status_code == 400
+    assert "Limite de crédito excedido" in response.json()["detail"]
+    assert db_session.get(type(pedido2), pedido2.id).status == "orcamento"
+    
+    # Recebimento parcial do título libera crédito
+    titulo.valor_recebido = 30.0
+    titulo.status = StatusPagamento.PARCIAL
+    db_session.commit()
+    assert client.post(f"/vendas/pedidos/{pedido2.id}/aprovar", headers=auth_headers).status_code == 200
+    
+    dados = _exposicao(client, cliente.id)
+    assert (dados["receber_aberto"], dados["pedidos_aprovados"], dados["disponivel"]) == (50.0, 200.0, 0.0)
+    
+    # Cancelar um pedido aprovado devolve o valor ao disponível
+    assert client.post(f"/vendas/pedidos/{pedido1.id}/cancelar", headers=auth_headers).status_code == 200
+    assert client.post(f"/vendas/pedidos/{pedido3.id}/aprovar", headers=auth_headers).status_code == 200
+    
+    # Cliente sem limite (0) não é bloqueado
+    cliente.limite_credito = 0.0
+    db_session.commit()
+    assert _exposicao(client, cliente.id)["disponivel"] is None
+
+
+def test_faturar_pedido_mantem_exposicao_de_credito(client, auth_headers, db_session):
+    """Test invoicing moves the order value to open receivables without a gap in exposure"""
+    cliente, (pedido1, pedido2, _) = _cenario_credito(db_session, limite=200.0)
+    for pedido in (pedido1, pedido2):
+        assert client.post(f"/vendas/pedidos/{pedido.id}/aprovar", headers=auth_headers).status_code == 200
+    
+    # Sem processar eventos: o título já existe ao concluir o faturamento
+    assert client.post(f"/vendas/pedidos/{pedido1.id}/faturar", headers=auth_headers).status_code == 200
+    dados = _exposicao(client, cliente.id)
+    assert (dados["receber_aberto"], dados["pedidos_aprovados"], dados["disponivel"]) == (100.0, 100.0, 0.0)
+
+
+def test_exposicao_incremental_confere_com_reconstrucao(client, auth_headers, db_session):
+    """Test the incrementally maintained exposure matches a full recomputation"""
+    from sqlalchemy.orm import sessionmaker
+    from app.credito import consultar_exposicao, reconstruir_exposicao_credito
+    from app.eventos import processar_eventos
+    from app.models_modules import ContaReceber, StatusPagamento
+    
+    cliente, (pedido1, pedido2, pedido3) = _cenario_credito(db_session, titulos=4)
+    for pedido in (pedido1, pedido2, pedido3):
+        assert client.post(f"/vendas/pedidos/{pedido.id}/aprovar", headers=auth_headers).status_code == 200
+    assert client.post(f"/vendas/pedidos/{pedido2.id}/cancelar", headers=auth_headers).status_code == 200
+    assert client.post(f"/vendas/pedidos/{pedido3.id}/faturar", headers=auth_headers).status_code == 200
+    processar_eventos(sessionmaker(bind=db_session.get_bind()))
+    
+    titulos = db_session.query(ContaReceber).order_by(ContaReceber.id).all()
+    titulos[0].status = StatusPagamento.PAGO
+    titulos[0].valor_recebido = 10.0
+    titulos[1].valor_recebido = 4.0
+    titulos[2].juros = 1.5
+    db_session.delete(titulos[3])
+    db_session.commit()
+    db_session.expire_all()
+    
+    incremental = consultar_exposicao(db_session, cliente_id=cliente.id)[0]
+    assert (incremental["receber_aberto"], incremental["pedidos_aprovados"]) == (6.0 + 11.5 + 100.0, 100.0)
+    
+    reconstruir_exposicao_credito(db_session)
+    db_session.commit()
+    assert consultar_exposicao(db_session, cliente_id=cliente.id)[0] == incremental
+
+
+def test_aprovacao_nao_soma_titulos(client, auth_headers, db_session):
+    """Test approval query count does not grow with the client's open receivables"""
+    from datetime import datetime
+    from app.models_modules import ContaReceber
+    from tests.conftest import consultas_sql
+    
+    def aprovar(pedido):
+        return consultas_sql(client.post(f"/vendas/pedidos/{pedido.id}/aprovar", headers=auth_headers))
+    
+    cliente, (aquecimento, pedido1, pedido2) = _cenario_credito(db_session, limite=10_000.0, titulos=1)
+    aprovar(aquecimento)
+    com_um_titulo = aprovar(pedido1)
+    
+    db_session.add_all([
+        ContaReceber(descricao="Título", cliente_id=cliente.id, data_vencimento=datetime(2026, 12, 1), valor_original=10.0)
+        for _ in range(60)
+    ])
+    db_session.commit()
+    assert aprovar(pedido2) == com_um_titulo
+    assert _exposicao(client, cliente.id)["exposicao"] == 610.0 + 300.0
+
+
+def test_listar_clientes_proximos_do_limite(client, auth_headers, db_session):
+    """Test listing clients near or over their credit limit"""
+    from app.models_modules import ContaReceber
+    from datetime import datetime
+    
+    clientes = [
+        Cliente(codigo=f"CLI-{i:04d}", nome=f"Cliente {i}", cpf_cnpj=documento, ativo=1, limite_credito=limite)
+        for i, (documento, limite) in enumerate([
+            ("11144477735", 100.0), ("52998224725", 100.0), ("39053344705", 0.0), ("12345678909", 100.0)
+        ])
+    ]
+    db_session.add_all(clientes)
+    db_session.commit()
+    for cliente, valor in zip(clientes, (85.0, 130.0, 500.0, 20.0)):
+        db_session.add(ContaReceber(
+            descricao="Título", cliente_id=cliente.id, data_vencimento=datetime(2026, 12, 1), valor_original=valor
+        ))
+    db_session.commit()
+    
+    response = client.get("/vendas/clientes/credito", params={"percentual_minimo": 80})
+    assert response.status_code == 200
+    data = response.json()
+    assert [c["cliente_id"] for c in data] == [clientes[1].id, clientes[0].id]
+    assert data[0]["acima_limite"] is True
+    assert data[0]["utilizacao_percentual"] == 130.0
+    assert data[1]["disponivel"] == 15.0